@@ -7,8 +7,8 @@ import base64
 import asyncio
 import uuid
 import io
-from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect, UploadFile, File
-from fastapi.responses import StreamingResponse, HTMLResponse, FileResponse
+from fastapi import FastAPI, HTTPException, Depends, Request, WebSocket, WebSocketDisconnect, UploadFile, File, Query
+from fastapi.responses import StreamingResponse, HTMLResponse, FileResponse, Response
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
 from pydantic import ValidationError
@@ -17,8 +17,8 @@ import uvicorn
 import os
 # 修改导入路径
 from config import get_config
-from utils.log import log
-from core.chat_memory import get_async_chat_memory
+from utils.log import get_logger, get_log_stats, log
+from core.chat_memory import get_async_chat_memory, get_memory_cache_stats
 from utils.performance import get_performance_monitor, performance_monitor
 from core.personality_manager import PersonalityManager
 from services.tools.registry import tool_registry
@@ -32,6 +32,23 @@ from services.tools.manager import ToolManager
 # 添加引擎管理器导入
 from core.engine_manager import get_engine_manager, get_current_engine
 from core.chat_engine import ChatEngine
+from core.openai_client import close_shared_async_openai, get_openai_connection_stats
+from core.memory_write_queue import get_memory_write_queue
+from core.memory_backend import get_memory_backend
+from core.token_budget import get_token_counter
+from core.conversation_log import close_conversation_log, get_conversation_log
+from core.conversation_summarizer import get_conversation_summarizer
+from core.request_coalescer import coalesced_request, get_request_coalescer
+from core.response_cache import get_response_cache
+from utils.cache import close_async_cache, get_cache_namespace_stats
+from utils.near_duplicate import get_near_duplicate_stats
+from utils.metrics import CONTENT_TYPE_LATEST, get_metrics_registry
+from utils.tracing import get_tracer, shutdown_tracer
+from utils.traffic_capture import TrafficCaptureMiddleware, get_traffic_capture_stats, shutdown_traffic_recorder
+from monitoring.loop_monitor import get_loop_monitor
+from monitoring.sampling_profiler import ProfilerBusyError, get_sampling_profiler
+from monitoring.memory_profiler import get_memory_profiler, register_default_subsystems
+from monitoring.metrics_collectors import register_default_collectors
 # 添加实时处理器导入（延迟导入避免循环引用）
 # from core.realtime_handler import realtime_handler
 # 添加WebSocket相关导入
@@ -73,6 +90,8 @@ warnings.filterwarnings("ignore", category=DeprecationWarning, message=".*model_
 warnings.filterwarnings("ignore", category=DeprecationWarning, message=".*on_event.*")
 config = get_config()
 
+_request_log = get_logger("chat.request")
+
 # 使用引擎管理器（统一入口）
 engine_manager = get_engine_manager()
 
@@ -108,6 +127,10 @@ app = FastAPI(
     }
 )
 
+# 可选的流量录制（匿名化，供 benchmarks/replay_traffic.py 回放）
+if config.TRAFFIC_CAPTURE_ENABLED:
+    app.add_middleware(TrafficCaptureMiddleware)
+
 # 添加lifespan事件处理器
 from contextlib import asynccontextmanager
 
@@ -151,11 +174,18 @@ async def lifespan(app: FastAPI):
         # 初始化性能监控
         if config.ENABLE_PERFORMANCE_MONITOR:
             log.info(f"✅ 性能监控已启用 (采样率: {config.PERFORMANCE_SAMPLING_RATE*100:.0f}%, 历史记录: {config.PERFORMANCE_MAX_HISTORY}条)")
-            # 设置监控器的最大历史记录数
-            performance_monitor._max_history = config.PERFORMANCE_MAX_HISTORY
+            # 设置监控器的最大历史记录数与采样率
+            performance_monitor.configure(
+                max_history=config.PERFORMANCE_MAX_HISTORY,
+                sampling_rate=config.PERFORMANCE_SAMPLING_RATE
+            )
         else:
             log.info("⚪ 性能监控已禁用")
         
+        # 启动事件循环延迟监控
+        if config.LOOP_MONITOR_ENABLED:
+            await get_loop_monitor().start()
+        
         # 初始化并注册MCP工具
         try:
             discover_and_register_mcp_tools()
@@ -218,7 +248,23 @@ async def lifespan(app: FastAPI):
     
     # 关闭时清理
     log.info("🔄 应用正在关闭...")
-    # 这里可以添加清理逻辑
+    # 停止事件循环监控
+    await get_loop_monitor().stop()
+    # 等待进行中的会话摘要（依赖上游连接池，需在其关闭前完成）
+    await get_conversation_summarizer().shutdown()
+    # 刷写尚未落盘的Memory写入
+    await get_memory_write_queue().shutdown()
+    # 释放共享Memory后端线程池
+    get_memory_backend().shutdown()
+    # 关闭会话日志持久层
+    await close_conversation_log()
+    # 关闭异步缓存的Redis连接池
+    await close_async_cache()
+    # 释放OpenAI上游连接池
+    await close_shared_async_openai()
+    # 写出剩余的流量录制与追踪数据
+    shutdown_traffic_recorder()
+    shutdown_tracer()
     log.info("✅ 应用已关闭")
 
 # 设置lifespan
@@ -270,10 +316,9 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.post("/v1/chat/completions", response_model=ChatCompletionResponse)
 async def create_chat_completion(request: ChatCompletionRequest, api_key: str = Depends(verify_api_key)):
     try:
-        # 打印完整的request内容，用于调试conversation_id问题
-        log.debug(f"完整的请求内容: {request.model_dump()}")
-        log.debug(f"request.conversation_id: {request.conversation_id}, type: {type(request.conversation_id)}")
-        log.debug(f"request.user: {request.user}, type: {type(request.user)}")
+        # 打印完整的request内容，用于调试conversation_id问题（惰性求值，DEBUG关闭时不序列化请求）
+        _request_log.debug(lambda: f"完整的请求内容: {request.model_dump()}")
+        _request_log.debug("request.conversation_id: {}, user: {}", request.conversation_id, request.user)
         
         # 验证conversation_id，如果没有则使用user作为会话标识
         conversation_id = request.conversation_id or request.user
@@ -284,7 +329,19 @@ async def create_chat_completion(request: ChatCompletionRequest, api_key: str =
             log.warning(f"未提供有效的conversation_id和user，使用默认值: {conversation_id}")
             
         # 记录请求日志
-        log.debug(f"Chat completion request: model={request.model}, conversation_id={conversation_id}")
+        _request_log.debug("Chat completion request: model={}, conversation_id={}", request.model, conversation_id)
+
+        # 服务端会话日志：客户端只上传本轮新消息，历史由服务端补齐，成功后追加本轮消息与回复
+        messages = request.messages
+        conversation_log = None
+        if request.server_history:
+            if not config.CONVERSATION_LOG_ENABLED:
+                raise HTTPException(status_code=400, detail={"error": {"message": "server_history is disabled", "type": "invalid_request_error"}})
+            if conversation_id == "default_conversation":
+                raise HTTPException(status_code=400, detail={"error": {"message": "server_history requires conversation_id or user", "type": "invalid_request_error"}})
+            conversation_log = get_conversation_log()
+            history = await conversation_log.load(conversation_id, config.MAX_MESSAGE_HISTORY_COUNT)
+            messages = history + request.messages
         
         if request.stream:
             # 流式响应处理
@@ -296,8 +353,8 @@ async def create_chat_completion(request: ChatCompletionRequest, api_key: str =
                     enable_voice = bool(getattr(request, "enable_voice", False))
                     client_id = getattr(request, "client_id", None)
                     
-                    # 中断标志
-                    interrupted = False
+                    # 引擎以 finish_reason="error" 的块返回失败，这样的回复不写入会话日志
+                    failed = False
 
                     # 发出stream_start元事件（向后兼容：作为单独SSE事件，不改变原chunk结构）
                     log.debug(f"SSE stream_start: session_id={session_id}, message_id={message_id}, enable_voice={enable_voice}, client_id={client_id}")
@@ -309,12 +366,16 @@ async def create_chat_completion(request: ChatCompletionRequest, api_key: str =
                     yield f"data: {json.dumps(start_meta)}\n\n"
 
                     generator = await chat_engine.generate_response(
-                        request.messages,
+                        messages,
                         conversation_id,
                         request.personality_id,
                         request.use_tools,
                         stream=True
                     )
+                    # 复用了在途的相同请求：会话日志与语音合成由首个请求负责
+                    duplicate = coalesced_request.get()
+                    if duplicate and enable_voice:
+                        log.info(f"重复请求已合并，跳过TTS: session_id={session_id}, message_id={message_id}")
                 except Exception as gen_err:
                     log.error(f"Error creating stream generator: {gen_err}")
                     error_message = f"发生错误: {str(gen_err)}"
@@ -334,17 +395,14 @@ async def create_chat_completion(request: ChatCompletionRequest, api_key: str =
                     
                     # 初始化流式TTS管理器
                     tts_manager = None
-                    if enable_voice and client_id:
+                    if enable_voice and client_id and not duplicate:
                         from services.streaming_tts_manager import StreamingTTSManager
                         tts_manager = StreamingTTSManager()
                         log.info(f"TTS streaming initialized: session_id={session_id}, message_id={message_id}, client_id={client_id}")
                     
                     async for chunk in generator:
-                        # 检查是否被中断
-                        if interrupted:
-                            log.info(f"SSE流被中断: session_id={session_id}, message_id={message_id}")
-                            break
-                            
+                        if chunk.get("finish_reason") == "error":
+                            failed = True
                         if chunk.get("stream", False):
                             response_data = {
                                 "id": f"chatcmpl-{conversation_id}",
@@ -401,6 +459,12 @@ async def create_chat_completion(request: ChatCompletionRequest, api_key: str =
                 except Exception as end_err:
                     log.warning(f"emit stream_end meta failed: {end_err}")
 
+                # 失败的回复不写入会话日志，客户端重试时不会出现重复的用户消息或错误文本
+                if conversation_log is not None and not failed and not duplicate:
+                    await conversation_log.append(
+                        conversation_id, request.messages + [{"role": "assistant", "content": "".join(full_content_parts)}]
+                    )
+
                 # 完成流式TTS处理
                 if tts_manager:
                     try:
@@ -408,20 +472,25 @@ async def create_chat_completion(request: ChatCompletionRequest, api_key: str =
                         log.info(f"TTS streaming completed: session_id={session_id}, message_id={message_id}, client_id={client_id}")
                     except Exception as tts_err:
                         log.error(f"TTS finalization failed: {tts_err}", exc_info=True)
-                elif enable_voice and not client_id:
+                elif enable_voice and not client_id and not duplicate:
                     log.warning(f"enable_voice=true but missing client_id; skip TTS. session_id={session_id}, message_id={message_id}")
             
             return StreamingResponse(stream_generator(), media_type="text/event-stream")
         else:
             # 非流式响应处理
             response = await chat_engine.generate_response(
-                request.messages,
+                messages,
                 conversation_id,
                 request.personality_id,
                 request.use_tools,
                 stream=False
             )
             
+            # 引擎的错误回复带 finish_reason="error"（与流式错误块一致）
+            failed = response.get("finish_reason") == "error"
+            duplicate = coalesced_request.get()
+            message = {key: value for key, value in response.items() if key != "finish_reason"}
+            
             # 构建响应
             result = ChatCompletionResponse(
                 id=f"chatcmpl-{conversation_id}",
@@ -430,17 +499,24 @@ async def create_chat_completion(request: ChatCompletionRequest, api_key: str =
                 model=response.get("model", request.model),
                 choices=[ChatCompletionResponseChoice(
                     index=0,
-                    message=response,
-                    finish_reason="stop"
+                    message=message,
+                    finish_reason="error" if failed else "stop"
                 )]
             )
             
             # 添加usage信息
             if "usage" in response:
                 result.usage = ChatCompletionResponseUsage(**response["usage"])
+
+            if conversation_log is not None and not failed and not duplicate:
+                await conversation_log.append(
+                    conversation_id, request.messages + [{"role": "assistant", "content": response.get("content") or ""}]
+                )
             
             return result
             
+    except HTTPException:
+        raise
     except ValidationError as e:
         log.error(f"Validation error: {e}")
         raise HTTPException(status_code=400, detail={"error": {"message": str(e), "type": "validation_error"}})
@@ -501,6 +577,18 @@ async def clear_conversation_memory(conversation_id: str, api_key: str = Depends
             "error": result.get("error", "Unknown error")
         }
 
+# 获取服务端会话日志API（server_history 模式下服务端保存的历史）
+@app.get("/v1/conversations/{conversation_id}/messages", tags=["Services"])
+async def get_conversation_messages(conversation_id: str, limit: int | None = None, api_key: str = Depends(verify_api_key)):
+    messages = await get_conversation_log().load(conversation_id, limit)
+    return {"object": "list", "data": messages, "total": len(messages)}
+
+# 清除服务端会话日志API
+@app.delete("/v1/conversations/{conversation_id}/messages", tags=["Services"])
+async def clear_conversation_messages(conversation_id: str, api_key: str = Depends(verify_api_key)):
+    await get_conversation_log().delete(conversation_id)
+    return {"success": True, "message": f"Messages for conversation {conversation_id} cleared"}
+
 # 获取会话记忆API
 @app.get("/v1/conversations/{conversation_id}/memory", tags=["Services"])
 async def get_conversation_memory(conversation_id: str, limit: int | None = None, api_key: str = Depends(verify_api_key)):
@@ -668,11 +756,122 @@ async def get_performance_stats(api_key: str = Depends(verify_api_key)):
     try:
         monitor = get_performance_monitor()
         stats = monitor.get_statistics()
+        stats["upstream"] = get_openai_connection_stats()
+        stats["memory_cache"] = get_memory_cache_stats()
+        stats["memory_write_queue"] = get_memory_write_queue().get_stats()
+        stats["memory_backend"] = get_memory_backend().get_stats()
+        stats["cache_namespaces"] = get_cache_namespace_stats()
+        stats["token_counter"] = get_token_counter().get_stats()
+        stats["conversation_summary"] = get_conversation_summarizer().get_stats()
+        stats["conversation_log"] = get_conversation_log().get_stats()
+        stats["request_coalescing"] = get_request_coalescer().get_stats()
+        stats["response_cache"] = get_response_cache().get_stats()
+        stats["near_duplicate"] = get_near_duplicate_stats()
+        stats["tracing"] = get_tracer().get_stats()
+        stats["traffic_capture"] = get_traffic_capture_stats()
+        stats["event_loop"] = get_loop_monitor().get_stats()
+        stats["logging"] = get_log_stats()
         return stats
     except Exception as e:
         log.error(f"Failed to get performance stats: {e}")
         raise HTTPException(status_code=500, detail={"error": {"message": str(e), "type": "server_error"}})
 
+@app.get("/v1/performance/loop", tags=["Monitoring"])
+async def get_event_loop_stats(events: bool = True, api_key: str = Depends(verify_api_key)):
+    """获取事件循环延迟与阻塞调用点（含调用栈）"""
+    try:
+        return get_loop_monitor().get_stats(include_events=events)
+    except Exception as e:
+        log.error(f"Failed to get event loop stats: {e}")
+        raise HTTPException(status_code=500, detail={"error": {"message": str(e), "type": "server_error"}})
+
+@app.delete("/v1/performance/loop", tags=["Monitoring"])
+async def reset_event_loop_stats(api_key: str = Depends(verify_api_key)):
+    """清除事件循环阻塞统计"""
+    try:
+        get_loop_monitor().reset()
+        return {"success": True, "message": "事件循环统计已清除"}
+    except Exception as e:
+        log.error(f"Failed to reset event loop stats: {e}")
+        raise HTTPException(status_code=500, detail={"error": {"message": str(e), "type": "server_error"}})
+
+@app.post("/v1/performance/profile", tags=["Monitoring"])
+async def run_sampling_profile(
+    seconds: float = 10.0,
+    interval_ms: float = 5.0,
+    group: Optional[List[str]] = Query(None),
+    format: str = "json",
+    api_key: str = Depends(verify_api_key)
+):
+    """
+    按需采样分析：在 seconds 秒内采样各线程调用栈，返回 collapsed stacks
+    group 可选 event_loop/tts_executor/audio_processor/to_thread/memory_backend/other；format=collapsed 时返回纯文本
+    """
+    try:
+        profile = await get_sampling_profiler().profile(seconds, interval_ms / 1000, group)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail={"error": {"message": str(e), "type": "conflict"}})
+    except Exception as e:
+        log.error(f"Failed to run sampling profile: {e}")
+        raise HTTPException(status_code=500, detail={"error": {"message": str(e), "type": "server_error"}})
+    if format == "collapsed":
+        return Response(content=profile["collapsed"] + "\n", media_type="text/plain")
+    return profile
+
+# 内存分析API（tracemalloc 快照对比与子系统字节统计）
+@app.get("/v1/performance/memory", tags=["Monitoring"])
+async def get_memory_profile_status(api_key: str = Depends(verify_api_key)):
+    """获取 tracemalloc 状态、已保存的快照与各子系统字节统计"""
+    try:
+        profiler = get_memory_profiler()
+        status = profiler.get_status()
+        status["subsystems"] = profiler.get_subsystem_usage()
+        return status
+    except Exception as e:
+        log.error(f"Failed to get memory profile status: {e}")
+        raise HTTPException(status_code=500, detail={"error": {"message": str(e), "type": "server_error"}})
+
+@app.post("/v1/performance/memory/start", tags=["Monitoring"])
+async def start_memory_tracing(frames: int = 1, api_key: str = Depends(verify_api_key)):
+    """启动 tracemalloc（开启期间所有分配都有额外开销，排查结束后请停止）"""
+    return get_memory_profiler().start(frames)
+
+@app.post("/v1/performance/memory/stop", tags=["Monitoring"])
+async def stop_memory_tracing(api_key: str = Depends(verify_api_key)):
+    """停止 tracemalloc 并丢弃全部快照"""
+    return get_memory_profiler().stop()
+
+@app.post("/v1/performance/memory/snapshots", tags=["Monitoring"])
+async def take_memory_snapshot(label: Optional[str] = None, api_key: str = Depends(verify_api_key)):
+    """拍摄带标签的 tracemalloc 快照"""
+    try:
+        return await asyncio.to_thread(get_memory_profiler().take_snapshot, label)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail={"error": {"message": str(e), "type": "conflict"}})
+
+@app.delete("/v1/performance/memory/snapshots/{label}", tags=["Monitoring"])
+async def delete_memory_snapshot(label: str, api_key: str = Depends(verify_api_key)):
+    """删除快照"""
+    if not get_memory_profiler().delete_snapshot(label):
+        raise HTTPException(status_code=404, detail={"error": {"message": f"快照不存在: {label}", "type": "not_found"}})
+    return {"success": True}
+
+@app.get("/v1/performance/memory/diff", tags=["Monitoring"])
+async def diff_memory_snapshots(
+    base: str,
+    target: Optional[str] = None,
+    limit: int = 20,
+    group_by: str = "module",
+    api_key: str = Depends(verify_api_key)
+):
+    """对比两份快照的分配差异（不指定 target 时与当前状态对比，不保存当前状态的快照），默认按模块聚合"""
+    try:
+        return await asyncio.to_thread(get_memory_profiler().diff, base, target, limit, group_by)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail={"error": {"message": str(e.args[0]), "type": "not_found"}})
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail={"error": {"message": str(e), "type": "conflict"}})
+
 # Dashboard专用API（无需认证，仅用于Dashboard）—统一到/v1并隐藏旧/api
 @app.get("/v1/dashboard/stats", tags=["Dashboard"], include_in_schema=False)
 async def get_dashboard_stats_v1():
@@ -868,6 +1067,28 @@ async def get_websocket_handlers():
     }
 
 
+# OpenMetrics 采集器：抓取时读取各模块统计
+register_default_collectors(
+    websocket_manager=websocket_manager,
+    audio_cache_getter=lambda: audio_service.audio_cache if audio_service else None
+)
+# 内存分析：按流量增长的子系统
+register_default_subsystems(
+    get_memory_profiler(),
+    audio_cache_getter=lambda: audio_service.audio_cache if audio_service else None
+)
+
+
+@app.get("/metrics", tags=["Monitoring"])
+async def get_metrics():
+    """OpenMetrics 格式的指标导出（聊天、Memory、工具、语音与WebSocket）"""
+    try:
+        return Response(content=get_metrics_registry().render(), media_type=CONTENT_TYPE_LATEST)
+    except Exception as e:
+        log.error(f"Failed to render metrics: {e}")
+        raise HTTPException(status_code=500, detail={"error": {"message": str(e), "type": "server_error"}})
+
+
 @app.get("/monitoring/voice/metrics", tags=["Monitoring"])
 async def get_voice_metrics():
     """获取语音性能指标"""
@@ -0,0 +1,3 @@
+"""
+YYChat 性能基准与压测工具
+"""
@@ -0,0 +1,456 @@
+"""
+每请求热函数微基准（pytest-benchmark 风格）
+每个用例自动校准循环次数（单轮不少于 --min-time 秒），跑 --rounds 轮，记录每次调用耗时的 min/median/mean；
+结果可保存为基线，之后的运行与基线逐项比较（默认比较 min，受调度噪声影响最小），
+任一用例慢于基线超过容差即以退出码 1 失败。
+每个用例前后各测一次参考负载（纯 Python 的字典/字符串/json 操作），比较前按参考负载的耗时比例
+归一化，抵消机器整体快慢（CPU 频率、共享宿主机负载）在运行之间和运行之中的漂移；--no-normalize 关闭。
+容差优先级：--tolerance > 基线中用例自身的 tolerance > 基线 meta.tolerance > 0.25。
+
+用例:
+    select_tool_choice[miss|weather]     core.tools_adapter.select_tool_choice
+    compose_system_prompt                core.prompt_builder.compose_system_prompt
+    estimate_tokens / should_include_memory / trim_messages_to_budget
+    build_request_params                 core.request_builder.build_request_params（10 个工具、命中天气）
+    segment_with_force_split             TTSSegmenter 对一段带/不带标点的回复分块
+    process_streaming_text               StreamingTTSManager 每个流式 token 的分块（不含合成）
+    audio_buffer.add_chunk / audio_buffer.utterance   AudioStreamBuffer 加块，及 50 块加入后取完整音频
+    vad.process_audio_stream             VoiceActivityDetector 每个 100ms 音频块
+    ws.send_message[audio_stream|stream_chunk]        WebSocketManager.send_message 序列化与发送（空 socket）
+
+用法:
+    python -m benchmarks.bench_hot_paths                    # 与 benchmarks/baselines/hot_paths.json 比较
+    python -m benchmarks.bench_hot_paths --save             # 运行并覆盖基线
+    python -m benchmarks.bench_hot_paths -k tts --tolerance 0.5
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines", "hot_paths.json")
+DEFAULT_TOLERANCE = 0.25
+
+# 名称 -> 构造函数；构造函数完成准备工作并返回被测的无参函数（同步或 async）
+BENCHMARKS: Dict[str, Callable[[], Callable[[], Any]]] = {}
+
+
+def benchmark(name: str):
+    def decorator(setup: Callable[[], Callable[[], Any]]):
+        BENCHMARKS[name] = setup
+        return setup
+    return decorator
+
+
+# ---------- 测试数据 ----------
+
+_REPLY = ("今天北京天气晴朗，气温在十五到二十五度之间，适合户外活动。建议您穿着轻便的外套，注意防晒！"
+          "如果下午出门的话，记得带上一瓶水，因为紫外线比较强烈。另外，晚上温差较大，请注意保暖，"
+          "祝您有愉快的一天")
+_UNPUNCTUATED = "这是一段没有任何标点符号的很长的语音识别结果" * 8
+
+
+def _history(turns: int = 10) -> List[Dict[str, str]]:
+    messages = []
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"第{i}轮：请帮我规划一下周末的行程，我想去郊外爬山，顺便吃点当地特色菜"})
+        messages.append({"role": "assistant", "content": _REPLY})
+    return messages
+
+
+def _tools_schema(count: int = 10) -> List[Dict[str, Any]]:
+    names = ["maps_weather", "gettime"] + [f"tool_{i}" for i in range(count - 2)]
+    return [{"type": "function", "function": {
+        "name": name, "description": f"{name} 工具",
+        "parameters": {"type": "object", "properties": {"city": {"type": "string"}}, "required": []},
+    }} for name in names]
+
+
+# ---------- 用例 ----------
+
+@benchmark("select_tool_choice[miss]")
+def _select_tool_choice_miss():
+    from core.tools_adapter import select_tool_choice
+    message = "帮我写一首关于秋天的诗，要求七言绝句，表达思乡之情"
+    return lambda: select_tool_choice(message, ["maps_weather", "gettime"])
+
+
+@benchmark("select_tool_choice[weather]")
+def _select_tool_choice_weather():
+    from core.tools_adapter import select_tool_choice
+    message = "明天上海的天气怎么样？需要带伞吗"
+    return lambda: select_tool_choice(message, ["maps_weather", "gettime"])
+
+
+@benchmark("compose_system_prompt")
+def _compose_system_prompt():
+    from core.prompt_builder import compose_system_prompt
+    messages = [{"role": "system", "content": "旧的系统提示"}] + _history()
+    personality = "你是一位耐心细致的健康助手，" * 20
+    memory = "\n".join(f"- 用户记忆 {i}：喜欢爬山，对花生过敏，住在北京朝阳区" for i in range(20))
+    return lambda: compose_system_prompt(messages, personality, memory)
+
+
+@benchmark("estimate_tokens")
+def _estimate_tokens():
+    from core.token_budget import estimate_tokens
+    messages = _history()
+    return lambda: estimate_tokens(messages)
+
+
+@benchmark("should_include_memory")
+def _should_include_memory():
+    from core.token_budget import should_include_memory
+    messages = _history()
+    memory = "\n".join(f"- 用户记忆 {i}：喜欢爬山，对花生过敏" for i in range(20))
+    return lambda: should_include_memory(messages, memory, max_tokens=8192)
+
+
+@benchmark("trim_messages_to_budget")
+def _trim_messages_to_budget():
+    from core.token_budget import trim_messages_to_budget
+    messages = [{"role": "system", "content": "你是一位耐心细致的健康助手，" * 20}] + _history(15)
+    tools = _tools_schema()
+    return lambda: trim_messages_to_budget(messages, 2000, tools)
+
+
+@benchmark("build_request_params")
+def _build_request_params():
+    from core.request_builder import build_request_params
+    messages = _history() + [{"role": "user", "content": "明天上海的天气怎么样？"}]
+    tools = _tools_schema()
+    allowed = [t["function"]["name"] for t in tools]
+    return lambda: build_request_params(model="gpt-4.1", temperature=0.7, messages=messages, use_tools=True,
+                                        all_tools_schema=tools, allowed_tool_names=allowed)
+
+
+@benchmark("segment_with_force_split")
+def _segment_with_force_split():
+    from services.tts_segmenter import TTSSegmenter
+    segmenter = TTSSegmenter()
+    text = _REPLY + _UNPUNCTUATED
+    return lambda: segmenter.segment_with_force_split(text)
+
+
+class _NullExecutor:
+    """吞掉合成任务，只测事件循环上的分块开销"""
+
+    def submit(self, *args, **kwargs):
+        return None
+
+
+@benchmark("process_streaming_text")
+def _process_streaming_text():
+    from services.streaming_tts_manager import StreamingTTSManager
+    manager = StreamingTTSManager()
+    manager.executor.shutdown(wait=False)
+    manager.executor = _NullExecutor()
+    tokens = [_REPLY[i:i + 2] for i in range(0, len(_REPLY), 2)]
+    state = {"index": 0}
+
+    def step():
+        index = state["index"]
+        if index == len(tokens):
+            # 一条回复结束，模拟 finalize_tts 清空待处理文本
+            manager.pending_segments = []
+            index = 0
+        manager.process_streaming_text(tokens[index], "bench-client", "bench-session", "bench-message", voice="shimmer")
+        state["index"] = index + 1
+
+    return step
+
+
+@benchmark("audio_buffer.add_chunk")
+def _audio_buffer_add_chunk():
+    from core.audio_stream_buffer import AudioStreamBuffer
+    buffer = AudioStreamBuffer(max_size=100)
+    chunk = bytes(3200)
+    return lambda: buffer.add_chunk("bench-client", chunk)
+
+
+@benchmark("audio_buffer.utterance")
+def _audio_buffer_utterance():
+    from core.audio_stream_buffer import AudioStreamBuffer
+    buffer = AudioStreamBuffer(max_size=100)
+    chunk = bytes(3200)
+
+    async def utterance():
+        # 5 秒语音：50 个 100ms 块，然后取完整音频并清空
+        for _ in range(50):
+            await buffer.add_chunk("bench-client", chunk)
+        await buffer.get_complete_audio("bench-client", clear_buffer=True)
+
+    return utterance
+
+
+@benchmark("vad.process_audio_stream")
+def _vad_process_audio_stream():
+    from core.voice_activity_detector import VoiceActivityDetector
+    detector = VoiceActivityDetector()
+    chunk = bytes(3200)  # 100ms, 16kHz PCM16
+    state = {"count": 0}
+
+    def step():
+        state["count"] += 1
+        if state["count"] % 50 == 0:
+            # 每 5 秒语音换一个客户端状态，模拟一次说话结束
+            detector.speech_segments.pop("bench-client", None)
+            detector.frame_buffers.pop("bench-client", None)
+        detector.process_audio_stream("bench-client", chunk)
+
+    return step
+
+
+class _NullWebSocket:
+    async def send_text(self, data: str):
+        return None
+
+
+def _ws_send(message: dict):
+    from core.websocket_manager import ConnectionInfo, WebSocketManager
+    manager = WebSocketManager()
+    manager.active_connections["bench-client"] = ConnectionInfo(_NullWebSocket(), "bench-client")
+    return lambda: manager.send_message("bench-client", message)
+
+
+@benchmark("ws.send_message[audio_stream]")
+def _ws_send_audio():
+    audio = base64.b64encode(bytes(4800)).decode("ascii")
+    return _ws_send({"type": "audio_stream", "audio": audio, "message_id": "m-1", "session_id": "s-1",
+                     "timestamp": time.time(), "seq": 12, "item_id": "item_1", "event_id": "evt_1"})
+
+
+@benchmark("ws.send_message[stream_chunk]")
+def _ws_send_chunk():
+    return _ws_send({"type": "stream_chunk", "content": "你好", "session_id": "s-1", "message_id": "m-1",
+                     "timestamp": time.time()})
+
+
+# ---------- 计时与比较 ----------
+
+REFERENCE = "_reference"
+
+
+def _reference():
+    """与被测函数相近的解释器负载，用于归一化机器速度"""
+    payload = {"type": "stream_chunk", "content": "你好" * 8, "seq": 1}
+
+    def work():
+        text = json.dumps(payload)
+        parts = [part for part in text.split(",") if part]
+        return sum(len(part) for part in parts) + len({str(i): i for i in range(16)})
+
+    return work
+
+
+@dataclass
+class BenchResult:
+    """单个用例的每次调用耗时（秒）"""
+    name: str
+    rounds: int
+    number: int
+    min: float
+    median: float
+    mean: float
+    stdev: float
+    reference: Optional[float] = None  # 同一时段参考负载的每次调用耗时
+
+
+def measure(name: str, func: Callable[[], Any], rounds: int = 7, min_time: float = 0.02,
+            loop: Optional[asyncio.AbstractEventLoop] = None) -> BenchResult:
+    """校准循环次数后计时；func 返回协程时在给定事件循环中执行"""
+    is_async = asyncio.iscoroutine(probe := func())
+    if is_async:
+        loop = loop or asyncio.new_event_loop()
+        loop.run_until_complete(probe)
+
+        async def run_async(n: int):
+            for _ in range(n):
+                await func()
+
+        run = lambda n: loop.run_until_complete(run_async(n))
+    else:
+        def run(n: int):
+            for _ in range(n):
+                func()
+
+    number = 1
+    while True:
+        start = time.perf_counter()
+        run(number)
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        run(number)
+        timings.append((time.perf_counter() - start) / number)
+    return BenchResult(name=name, rounds=rounds, number=number, min=min(timings),
+                       median=statistics.median(timings), mean=statistics.fmean(timings),
+                       stdev=statistics.stdev(timings) if rounds > 1 else 0.0)
+
+
+@dataclass
+class Comparison:
+    name: str
+    current: float
+    baseline: Optional[float]
+    tolerance: float
+
+    @property
+    def ratio(self) -> Optional[float]:
+        return self.current / self.baseline if self.baseline else None
+
+    @property
+    def status(self) -> str:
+        if self.ratio is None:
+            return "new"
+        if self.ratio > 1 + self.tolerance:
+            return "regressed"
+        if self.ratio < 1 / (1 + self.tolerance):
+            return "improved"
+        return "ok"
+
+
+def run_case(name: str, func: Callable[[], Any], rounds: int = 7, min_time: float = 0.02,
+             loop: Optional[asyncio.AbstractEventLoop] = None) -> BenchResult:
+    """测量用例，并在其前后测量参考负载"""
+    reference = _reference()
+    before = measure(REFERENCE, reference, rounds=3, min_time=min_time)
+    result = measure(name, func, rounds=rounds, min_time=min_time, loop=loop)
+    after = measure(REFERENCE, reference, rounds=3, min_time=min_time)
+    result.reference = (before.min + after.min) / 2
+    return result
+
+
+def compare(results: List[BenchResult], baseline: Dict[str, Any], tolerance: Optional[float] = None,
+            stat: str = "min", normalize: bool = True) -> List[Comparison]:
+    """
+    按 stat（min/median/mean）与基线比较；tolerance 为 None 时使用基线中的配置。
+    normalize 时当前耗时按两次参考负载耗时之比换算到基线当时的机器速度。
+    """
+    entries = baseline.get("benchmarks", {})
+    default = baseline.get("meta", {}).get("tolerance", DEFAULT_TOLERANCE)
+    comparisons = []
+    for result in results:
+        entry = entries.get(result.name, {})
+        allowed = tolerance if tolerance is not None else entry.get("tolerance", default)
+        current = getattr(result, stat)
+        if normalize and result.reference and entry.get("reference"):
+            current *= entry["reference"] / result.reference
+        comparisons.append(Comparison(result.name, current, entry.get(stat), allowed))
+    return comparisons
+
+
+def load_baseline(path: str) -> Dict[str, Any]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _stats(result: BenchResult) -> Dict[str, Any]:
+    return {key: value for key, value in asdict(result).items() if key != "name"}
+
+
+def save_baseline(path: str, results: List[BenchResult], previous: Dict[str, Any]):
+    """保存基线，保留已有的容差配置"""
+    meta = {
+        "tolerance": previous.get("meta", {}).get("tolerance", DEFAULT_TOLERANCE),
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+    }
+    benchmarks = dict(previous.get("benchmarks", {}))
+    for result in results:
+        entry = _stats(result)
+        if "tolerance" in benchmarks.get(result.name, {}):
+            entry["tolerance"] = benchmarks[result.name]["tolerance"]
+        benchmarks[result.name] = entry
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"meta": meta, "benchmarks": benchmarks}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def _us(seconds: Optional[float]) -> str:
+    return f"{seconds * 1e6:.2f}" if seconds is not None else "-"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="每请求热函数微基准")
+    parser.add_argument("-k", dest="keyword", help="只运行名称包含该关键字的用例")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--min-time", type=float, default=0.02, help="单轮最短耗时（秒），据此校准循环次数")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save", action="store_true", help="将本次结果写入基线")
+    parser.add_argument("--tolerance", type=float, help="允许的变慢比例（0.25 = 25%%），覆盖基线中的配置")
+    parser.add_argument("--stat", choices=["min", "median", "mean"], default="min", help="与基线比较的统计量")
+    parser.add_argument("--no-normalize", action="store_true", help="不按参考负载归一化机器速度")
+    parser.add_argument("--retries", type=int, default=2, help="超出容差的用例重测确认的次数")
+    parser.add_argument("--json", help="本次结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    # 与生产一致使用 enqueue=True 的文件 sink，写到 /dev/null 以排除磁盘与控制台影响
+    from config import Config
+    from utils.log import log
+    log.remove()
+    log.add(os.devnull, level=Config.LOG_LEVEL,
+            format="{time:YYYY-MM-DD at HH:mm:ss} | {level} | {file}:{line} | {message}", enqueue=True)
+
+    names = [name for name in BENCHMARKS if not args.keyword or args.keyword in name]
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    run = lambda name: run_case(name, BENCHMARKS[name](), rounds=args.rounds, min_time=args.min_time, loop=loop)
+    results = [run(name) for name in names]
+
+    baseline = load_baseline(args.baseline)
+    compare_all = lambda: compare(results, baseline, args.tolerance, args.stat, normalize=not args.no_normalize)
+    comparisons = compare_all()
+    # 超出容差的用例重测确认，排除偶发的调度抖动
+    for _ in range(0 if args.save else args.retries):
+        suspects = [i for i, c in enumerate(comparisons) if c.status == "regressed"]
+        if not suspects:
+            break
+        for i in suspects:
+            results[i] = run(results[i].name)
+        comparisons = compare_all()
+    loop.close()
+    print(f"{'benchmark':<34} {'min µs':>10} {'median µs':>10} {'base ' + args.stat:>10} {'ratio':>7} status")
+    for result, comparison in zip(results, comparisons):
+        ratio = f"{comparison.ratio:.2f}x" if comparison.ratio else "-"
+        print(f"{result.name:<34} {_us(result.min):>10} {_us(result.median):>10} {_us(comparison.baseline):>10} "
+              f"{ratio:>7} {comparison.status}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump([asdict(result) for result in results], f, ensure_ascii=False, indent=2)
+    if args.save:
+        save_baseline(args.baseline, results, baseline)
+        print(f"基线已保存: {args.baseline}")
+        return 0
+
+    regressed = [c for c in comparisons if c.status == "regressed"]
+    if regressed:
+        for c in regressed:
+            print(f"回归: {c.name} 慢了 {(c.ratio - 1) * 100:.0f}%（容差 {c.tolerance * 100:.0f}%）")
+        return 1
+    if baseline:
+        print(f"无回归（基线: {baseline.get('meta', {}).get('created', '?')} {baseline.get('meta', {}).get('platform', '')}）")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""
+日志热路径基准：直接 f-string 调用 loguru vs 类别日志门面(get_logger)
+按每个流式 token / 每个音频块 / 每个 Realtime 事件测量调用方线程的 CPU 时间（process_time，
+包含 enqueue=True 时记录入队的开销，不含后台写出线程）
+
+场景与原代码一一对应：
+    token        WebSocketManager.send_message 的 "WS下行" DEBUG 日志
+    tool_chunk   ChatEngine 流式工具调用 chunk 的 DEBUG 日志
+    audio_chunk  AudioStreamBuffer.add_chunk 每块两条 DEBUG 日志
+    rt_event     VoiceCallHandler._process_realtime_response 复制事件字典后的 DEBUG 日志
+    audio_delta  每个 AI 音频 delta 的 INFO 日志（门面按 LOG_RATE_LIMITS 限流）
+
+用法:
+    python -m benchmarks.bench_logging --iterations 200000
+    LOG_LEVEL=DEBUG python -m benchmarks.bench_logging    # DEBUG 开启时的对比
+"""
+import argparse
+import os
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict
+
+from config import Config
+from utils.log import CategoryLogger, get_logger, log
+
+
+def _cpu_per_call(func: Callable[[int], None], iterations: int) -> float:
+    start = time.process_time()
+    for i in range(iterations):
+        func(i)
+    return (time.process_time() - start) / iterations
+
+
+def _scenarios() -> Dict[str, Dict[str, Callable[[int], None]]]:
+    message = {"type": "text_chunk", "session_id": "s-1", "message_id": "m-1", "content": "你好"}
+    client_id = "client-1"
+    audio_chunk = bytes(3200)
+    event = {"type": "response.audio.delta", "delta": "A" * 4000, "item_id": "item_1", "event_id": "evt_1"}
+    tool_call = SimpleNamespace(index=0, id="call_1", function=SimpleNamespace(name="weather", arguments='{"c'))
+
+    send_log = get_logger("ws.send")
+    stream_log = get_logger("chat.stream")
+    chunk_log = get_logger("audio.chunk")
+    event_log = get_logger("realtime.event")
+    delta_log = get_logger("voice.audio_delta")
+
+    def legacy_token(i):
+        msg_type = message.get("type", "unknown")
+        session_id = message.get("session_id") or message.get("conversation_id")
+        message_id = message.get("message_id")
+        log.debug(f"WS下行 | type={msg_type} client_id={client_id} session_id={session_id} message_id={message_id}")
+
+    def facade_token(i):
+        send_log.debug("WS下行 | type={} client_id={} session_id={} message_id={}", message.get("type", "unknown"),
+                       client_id, message.get("session_id") or message.get("conversation_id"), message.get("message_id"))
+
+    def legacy_tool_chunk(i):
+        log.debug(f"收到工具调用 chunk: index={tool_call.index}, id={getattr(tool_call, 'id', None)}, "
+                  f"has_function={hasattr(tool_call, 'function')}, function={getattr(tool_call, 'function', None)}")
+
+    def facade_tool_chunk(i):
+        stream_log.debug(lambda: f"收到工具调用 chunk: index={tool_call.index}, id={getattr(tool_call, 'id', None)}, "
+                                 f"has_function={hasattr(tool_call, 'function')}, function={getattr(tool_call, 'function', None)}")
+
+    def legacy_audio_chunk(i):
+        log.debug(f"add_chunk called with client_id={client_id}, audio_chunk type={type(audio_chunk)}, length={len(audio_chunk)}")
+        log.debug(f"audio_chunk sample: {audio_chunk[:20]}")
+
+    def facade_audio_chunk(i):
+        chunk_log.debug(lambda: f"add_chunk called with client_id={client_id}, audio_chunk type={type(audio_chunk)}, "
+                                f"length={len(audio_chunk)}, sample={audio_chunk[:20]}")
+
+    def legacy_rt_event(i):
+        log_data = event.copy()
+        if "delta" in log_data and isinstance(log_data["delta"], str) and len(log_data["delta"]) > 15:
+            log_data["delta"] = log_data["delta"][:15] + "..."
+        log.debug(f"收到Realtime API消息: {client_id}, 类型: {event['type']}, 数据: {log_data}")
+
+    def facade_rt_event(i):
+        event_log.debug(lambda: f"收到Realtime API消息: {client_id}, 类型: {event['type']}, "
+                                f"数据: {{**event, 'delta': event['delta'][:15] + '...'}}")
+
+    def legacy_audio_delta(i):
+        log.info(f"🎵 收到AI音频数据: {client_id}, 数据大小: {len(event['delta'])}, sequence_number={i}, "
+                 f"item_id={event['item_id']}, event_id={event['event_id']}")
+
+    def facade_audio_delta(i):
+        delta_log.info("🎵 收到AI音频数据: {}, 数据大小: {}, sequence_number={}, item_id={}, event_id={}",
+                       client_id, len(event["delta"]), i, event["item_id"], event["event_id"])
+
+    return {
+        "token": {"legacy": legacy_token, "facade": facade_token},
+        "tool_chunk": {"legacy": legacy_tool_chunk, "facade": facade_tool_chunk},
+        "audio_chunk": {"legacy": legacy_audio_chunk, "facade": facade_audio_chunk},
+        "rt_event": {"legacy": legacy_rt_event, "facade": facade_rt_event},
+        "audio_delta": {"legacy": legacy_audio_delta, "facade": facade_audio_delta},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="日志热路径基准")
+    parser.add_argument("--iterations", type=int, default=100000)
+    args = parser.parse_args()
+
+    # 与生产一致使用 enqueue=True 的文件 sink，写到 /dev/null 以排除磁盘影响
+    log.remove()
+    log.add(os.devnull, level=Config.LOG_LEVEL,
+            format="{time:YYYY-MM-DD at HH:mm:ss} | {level} | {file}:{line} | {message}", enqueue=True)
+
+    print(f"LOG_LEVEL={Config.LOG_LEVEL} LOG_RATE_LIMITS={Config.LOG_RATE_LIMITS!r} iterations={args.iterations}")
+    print(f"{'scenario':<12} {'legacy µs':>10} {'facade µs':>10} {'saved µs':>10} {'speedup':>8}")
+    for name, variants in _scenarios().items():
+        legacy = _cpu_per_call(variants["legacy"], args.iterations) * 1e6
+        facade = _cpu_per_call(variants["facade"], args.iterations) * 1e6
+        print(f"{name:<12} {legacy:>10.3f} {facade:>10.3f} {legacy - facade:>10.3f} {legacy / facade if facade else 0:>7.1f}x")
+    log.complete()
+
+
+if __name__ == "__main__":
+    main()
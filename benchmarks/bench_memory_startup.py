@@ -0,0 +1,127 @@
+"""
+Memory 后端启动基准：各调用方独立创建 mem0 实例 vs 共享Memory后端
+每种模式在独立子进程中运行，测量初始化耗时、RSS 增量、打开的文件描述符与网络连接数
+
+独立模式复现改造前的行为：
+    ChatMemory -> Memory, AsyncChatMemory -> AsyncMemory,
+    Mem0Client -> Mem0(config) 内部的 Memory, MemoryAdapter -> AsyncMemory
+共享模式：四个调用方都从 get_memory_backend() 取同步/异步门面或 Mem0 代理
+
+用法:
+    python -m benchmarks.bench_memory_startup
+    python -m benchmarks.bench_memory_startup --vector-store qdrant
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import psutil
+
+
+def _snapshot() -> Dict[str, int]:
+    process = psutil.Process()
+    return {
+        "rss": process.memory_info().rss,
+        "fds": process.num_fds(),
+        "connections": len(process.net_connections(kind="inet")),
+    }
+
+
+def _build_independent(config):
+    from mem0 import AsyncMemory, Memory
+    from mem0.configs.base import MemoryConfig
+    from mem0.proxy.main import Mem0
+
+    from core.memory_backend import build_memory_config
+
+    config_dict = build_memory_config(config)
+    return [
+        Memory(config=MemoryConfig(**config_dict)),
+        AsyncMemory(config=MemoryConfig(**config_dict)),
+        Mem0(config=config_dict),
+        AsyncMemory(config=MemoryConfig(**config_dict)),
+    ]
+
+
+def _build_shared(config):
+    from core.memory_backend import get_memory_backend
+
+    backend = get_memory_backend(config)
+    return [
+        backend.get_sync_memory(),
+        backend.get_async_memory(),
+        backend.get_mem0_proxy(),
+        backend.get_async_memory(),
+    ]
+
+
+def run_child(mode: str) -> Dict:
+    """在当前进程中按指定模式创建四个调用方的Memory，返回测量结果"""
+    from config.config import get_config
+
+    config = get_config()
+    # 预先导入依赖，只统计实例创建本身的开销
+    import mem0.proxy.main  # noqa: F401
+    from mem0 import Memory  # noqa: F401
+
+    before = _snapshot()
+    start = time.perf_counter()
+    instances = _build_shared(config) if mode == "shared" else _build_independent(config)
+    elapsed = time.perf_counter() - start
+    after = _snapshot()
+    return {
+        "mode": mode,
+        "instances": len(instances),
+        "init_s": elapsed,
+        "rss_mb": (after["rss"] - before["rss"]) / 1024 / 1024,
+        "fds": after["fds"] - before["fds"],
+        "connections": after["connections"] - before["connections"],
+    }
+
+
+def _spawn(mode: str, args) -> Dict:
+    env = dict(os.environ)
+    env.setdefault("OPENAI_API_KEY", "sk-bench")
+    env["MEMO_USE_LOCAL"] = "true"
+    env["MEM0_TELEMETRY"] = "False"
+    env["VECTOR_STORE_PROVIDER"] = args.vector_store
+    env["CHROMA_PERSIST_DIRECTORY"] = args.chroma_dir
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_memory_startup", "--child", mode],
+        env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _print(result: Dict):
+    print(
+        f"{result['mode']:<12} instances={result['instances']} init={result['init_s']:.2f}s "
+        f"RSS +{result['rss_mb']:.1f}MB fds +{result['fds']} connections +{result['connections']}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory 后端启动基准")
+    parser.add_argument("--vector-store", choices=["chroma", "qdrant"], default="chroma")
+    parser.add_argument("--chroma-dir", default=None)
+    parser.add_argument("--child", choices=["independent", "shared"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_child(args.child)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        args.chroma_dir = args.chroma_dir or tmp
+        print(f"vector_store={args.vector_store}")
+        for mode in ("independent", "shared"):
+            _print(_spawn(mode, args))
+
+
+if __name__ == "__main__":
+    main()
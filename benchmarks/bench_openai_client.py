@@ -0,0 +1,100 @@
+"""
+OpenAI 客户端流式基准：线程池包装(AsyncOpenAIWrapper) vs 原生异步(AsyncOpenAIClient)
+针对本地 mock 上游测量 TTFT 与 tokens/s
+
+用法:
+    python -m benchmarks.bench_openai_client --requests 200 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Dict, List
+
+import httpx
+from openai import AsyncOpenAI, OpenAI
+
+from benchmarks.mock_openai_upstream import LatencyProfile, MockUpstreamServer
+from core.openai_client import AsyncOpenAIClient, AsyncOpenAIWrapper
+
+
+def _percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+async def _run(client, total: int, concurrency: int) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    ttfts: List[float] = []
+    token_count = 0
+
+    async def one():
+        nonlocal token_count
+        async with semaphore:
+            start = time.perf_counter()
+            first = True
+            async for chunk in client.create_chat_stream({
+                "model": "mock",
+                "messages": [{"role": "user", "content": "hi"}],
+            }):
+                if chunk.choices and chunk.choices[0].delta.content:
+                    if first:
+                        ttfts.append(time.perf_counter() - start)
+                        first = False
+                    token_count += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    wall = time.perf_counter() - wall_start
+    return {
+        "wall_s": wall,
+        "ttft_p50_ms": _percentile(ttfts, 0.5) * 1000,
+        "ttft_p95_ms": _percentile(ttfts, 0.95) * 1000,
+        "ttft_mean_ms": (statistics.mean(ttfts) * 1000) if ttfts else 0.0,
+        "tokens_per_s": token_count / wall if wall else 0.0,
+    }
+
+
+def _print(name: str, result: Dict[str, float]):
+    print(
+        f"{name:<10} wall={result['wall_s']:.2f}s "
+        f"TTFT p50={result['ttft_p50_ms']:.1f}ms p95={result['ttft_p95_ms']:.1f}ms "
+        f"tokens/s={result['tokens_per_s']:.0f}"
+    )
+
+
+async def main_async(args):
+    profile = LatencyProfile(ttft=args.ttft, itl=args.itl, tokens=args.tokens)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    with MockUpstreamServer(profile, port=args.port) as server:
+        sync_client = OpenAI(api_key="sk-bench", base_url=server.base_url,
+                             http_client=httpx.Client(http2=True, limits=limits))
+        wrapper = AsyncOpenAIWrapper(sync_client)
+
+        async_http = httpx.AsyncClient(http2=True, limits=limits)
+        native = AsyncOpenAIClient(AsyncOpenAI(api_key="sk-bench", base_url=server.base_url, http_client=async_http))
+
+        print(f"requests={args.requests} concurrency={args.concurrency} "
+              f"tokens={args.tokens} ttft={args.ttft}s itl={args.itl}s")
+        _print("wrapper", await _run(wrapper, args.requests, args.concurrency))
+        _print("native", await _run(native, args.requests, args.concurrency))
+
+        sync_client.close()
+        await async_http.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OpenAI 客户端流式基准")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--tokens", type=int, default=50)
+    parser.add_argument("--ttft", type=float, default=0.1)
+    parser.add_argument("--itl", type=float, default=0.005)
+    parser.add_argument("--port", type=int, default=18080)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""
+/v1/chat/completions 压测：RPS、TTFT 与 token 间延迟(ITL)分位数
+默认自带本地 mock 上游，并为每个引擎（chat_engine / mem0_proxy）启动一个独立的 uvicorn 子进程，
+子进程的 OPENAI_BASE_URL 指向 mock 上游、向量库写到临时目录，不依赖任何外部服务。
+也可用 --target 压测已在运行的服务（此时只测该服务当前的引擎）。
+
+用法:
+    python -m benchmarks.load_chat --concurrency 20 --duration 30
+    python -m benchmarks.load_chat --engines chat_engine --mode stream --profile gpt-4o
+    python -m benchmarks.load_chat --target http://127.0.0.1:9800 --api-key yk-xxx --json result.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.mock_openai_upstream import MockUpstreamServer, add_profile_arguments, build_profile
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# 引擎内部出错时以 200 返回的错误文本前缀，计为失败
+ERROR_PREFIXES = ("发生内部错误", "发生错误")
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * p), len(values) - 1)]
+
+
+@dataclass
+class LoadResult:
+    """单个场景（引擎 × 流式/非流式）的压测结果"""
+    engine: str
+    stream: bool
+    completed: int = 0
+    errors: int = 0
+    wall: float = 0.0
+    latencies: List[float] = field(default_factory=list)
+    ttfts: List[float] = field(default_factory=list)
+    itls: List[float] = field(default_factory=list)
+    error_samples: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, float]:
+        ms = lambda values, p: round(percentile(values, p) * 1000, 1)
+        result = {
+            "engine": self.engine,
+            "mode": "stream" if self.stream else "non_stream",
+            "completed": self.completed,
+            "errors": self.errors,
+            "rps": round(self.completed / self.wall, 2) if self.wall else 0.0,
+            "latency_p50_ms": ms(self.latencies, 0.5),
+            "latency_p99_ms": ms(self.latencies, 0.99),
+        }
+        if self.stream:
+            result.update({
+                "ttft_p50_ms": ms(self.ttfts, 0.5),
+                "ttft_p90_ms": ms(self.ttfts, 0.9),
+                "ttft_p99_ms": ms(self.ttfts, 0.99),
+                "itl_p50_ms": ms(self.itls, 0.5),
+                "itl_p90_ms": ms(self.itls, 0.9),
+                "itl_p99_ms": ms(self.itls, 0.99),
+            })
+        return result
+
+
+async def _one_request(client: httpx.AsyncClient, payload: dict, result: LoadResult):
+    start = time.perf_counter()
+    if not payload["stream"]:
+        response = await client.post("/v1/chat/completions", json=payload)
+        response.raise_for_status()
+        content = response.json()["choices"][0]["message"].get("content") or ""
+        if content.startswith(ERROR_PREFIXES):
+            raise RuntimeError(content)
+        result.latencies.append(time.perf_counter() - start)
+        return
+
+    last_token_at: Optional[float] = None
+    async with client.stream("POST", "/v1/chat/completions", json=payload) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if not line.startswith("data: ") or line == "data: [DONE]":
+                continue
+            data = json.loads(line[6:])
+            choices = data.get("choices") or []
+            if choices and choices[0].get("finish_reason") == "error":
+                raise RuntimeError(choices[0].get("delta", {}).get("content", "stream error"))
+            content = choices[0].get("delta", {}).get("content") if choices else None
+            if not content:
+                continue
+            if last_token_at is None and content.startswith(ERROR_PREFIXES):
+                raise RuntimeError(content)
+            now = time.perf_counter()
+            if last_token_at is None:
+                result.ttfts.append(now - start)
+            else:
+                result.itls.append(now - last_token_at)
+            last_token_at = now
+    result.latencies.append(time.perf_counter() - start)
+
+
+async def run_load(base_url: str, api_key: str, engine: str, stream: bool, concurrency: int,
+                   duration: float, total: Optional[int], personality_id: Optional[str],
+                   use_tools: bool, conversations: int) -> LoadResult:
+    """闭环压测：concurrency 个 worker 持续发请求，直到 duration 秒或共 total 个请求"""
+    result = LoadResult(engine=engine, stream=stream)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    timeout = httpx.Timeout(120.0, connect=10.0)
+    issued = 0
+    deadline = time.perf_counter() + duration
+
+    async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {api_key}"},
+                                 limits=limits, timeout=timeout) as client:
+        async def worker(worker_id: int):
+            nonlocal issued
+            while time.perf_counter() < deadline and (total is None or issued < total):
+                issued += 1
+                payload = {
+                    "messages": [{"role": "user", "content": f"压测消息 {uuid.uuid4().hex[:8]}"}],
+                    "stream": stream,
+                    "use_tools": use_tools,
+                    "conversation_id": f"load-{(worker_id + issued) % conversations}",
+                }
+                if personality_id:
+                    payload["personality_id"] = personality_id
+                try:
+                    await _one_request(client, payload, result)
+                    result.completed += 1
+                except Exception as e:
+                    result.errors += 1
+                    if len(result.error_samples) < 5:
+                        result.error_samples.append(f"{type(e).__name__}: {e}")
+
+        wall_start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        result.wall = time.perf_counter() - wall_start
+    return result
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class AppProcess:
+    """以子进程方式启动 yychat，上游指向 mock"""
+
+    def __init__(self, engine: str, upstream_url: str, api_key: str, extra_env: Dict[str, str]):
+        self.engine = engine
+        self.port = _free_port()
+        self._data_dir = tempfile.TemporaryDirectory(prefix=f"yychat-load-{engine}-")
+        self.env = {
+            **os.environ,
+            "CHAT_ENGINE": engine,
+            "OPENAI_BASE_URL": upstream_url,
+            "OPENAI_API_KEY": "sk-mock",
+            "YYCHAT_API_KEY": api_key,
+            "MEMO_USE_LOCAL": "true",
+            "VECTOR_STORE_PROVIDER": "chroma",
+            "CHROMA_PERSIST_DIRECTORY": self._data_dir.name,
+            "USE_REDIS_CACHE": "false",
+            "TRACING_ENABLED": "false",
+            "LOG_LEVEL": "WARNING",
+            **extra_env,
+        }
+        self._process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self._process.pid if self._process else None
+
+    def start(self, timeout: float = 120.0) -> "AppProcess":
+        self._process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning"],
+            cwd=_PROJECT_ROOT, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self._process.poll() is not None:
+                raise RuntimeError(f"{self.engine} 进程启动失败 (exit={self._process.returncode})")
+            try:
+                if httpx.get(f"{self.base_url}/", timeout=1.0).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        self.stop()
+        raise RuntimeError(f"{self.engine} 进程启动超时")
+
+    def stop(self):
+        if self._process and self._process.poll() is None:
+            self._process.terminate()
+            try:
+                self._process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self._process.kill()
+        self._data_dir.cleanup()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _print(summary: Dict[str, float]):
+    line = (f"{summary['engine']:<12} {summary['mode']:<10} ok={summary['completed']:<6} err={summary['errors']:<4} "
+            f"rps={summary['rps']:<8} latency p50={summary['latency_p50_ms']}ms p99={summary['latency_p99_ms']}ms")
+    if "ttft_p50_ms" in summary:
+        line += (f" | TTFT p50/p90/p99={summary['ttft_p50_ms']}/{summary['ttft_p90_ms']}/{summary['ttft_p99_ms']}ms"
+                 f" | ITL p50/p90/p99={summary['itl_p50_ms']}/{summary['itl_p90_ms']}/{summary['itl_p99_ms']}ms")
+    print(line)
+
+
+async def _load_all(args, targets: List[tuple]) -> List[Dict[str, float]]:
+    modes = {"stream": [True], "non-stream": [False], "both": [True, False]}[args.mode]
+    summaries = []
+    for engine, base_url in targets:
+        for stream in modes:
+            result = await run_load(base_url, args.api_key, engine, stream, args.concurrency, args.duration,
+                                    args.requests, args.personality, args.use_tools, args.conversations)
+            summary = result.summary()
+            _print(summary)
+            for sample in result.error_samples:
+                print(f"    error: {sample}")
+            summaries.append(summary)
+    return summaries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/v1/chat/completions 压测")
+    parser.add_argument("--target", help="已运行服务的地址；不指定时自动启动 mock 上游与各引擎子进程")
+    parser.add_argument("--engines", default="chat_engine,mem0_proxy")
+    parser.add_argument("--mode", choices=["stream", "non-stream", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=20.0, help="每个场景的持续时间（秒）")
+    parser.add_argument("--requests", type=int, help="每个场景的请求数上限")
+    parser.add_argument("--conversations", type=int, default=50, help="轮换使用的会话数（影响记忆缓存命中）")
+    parser.add_argument("--personality")
+    parser.add_argument("--use-tools", action="store_true")
+    parser.add_argument("--api-key", default="yk-load-test")
+    parser.add_argument("--upstream-port", type=int, default=18080)
+    parser.add_argument("--env", action="append", default=[], help="传给引擎子进程的额外环境变量 KEY=VALUE")
+    parser.add_argument("--json", help="结果写入 JSON 文件")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    if args.target:
+        summaries = asyncio.run(_load_all(args, [("target", args.target.rstrip("/"))]))
+    else:
+        profile = build_profile(args)
+        extra_env = dict(item.split("=", 1) for item in args.env)
+        summaries = []
+        with MockUpstreamServer(profile, port=args.upstream_port) as upstream:
+            print(f"mock upstream {upstream.base_url} ttft={profile.ttft}s itl={profile.itl}s tokens={profile.tokens} "
+                  f"concurrency={args.concurrency} duration={args.duration}s")
+            for engine in args.engines.split(","):
+                with AppProcess(engine, upstream.base_url, args.api_key, extra_env) as app:
+                    summaries.extend(asyncio.run(_load_all(args, [(engine, app.base_url)])))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
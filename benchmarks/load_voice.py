@@ -0,0 +1,294 @@
+"""
+/ws/chat 语音压测：N 个 WebSocket 客户端按实时速率推送 PCM16 音频
+每个客户端：启动语音会话 → 按 --frame-ms 节拍发送 audio_stream 帧（持续 --utterance 秒）→ audio_complete
+→ 等待本轮 AI 音频回放完成，重复 --turns 轮。上游 Realtime API 由 mock 上游的 /v1/realtime 替代，
+服务进程按 --clients 给出的 N 逐级加压（同一进程内递增）。
+
+场景:
+    voice_call  voice_command(start_voice_call) + audio_stream(scenario=voice_call) + audio_complete
+                → VoiceCallHandler（input_audio_buffer.* 事件）
+    realtime    start_realtime_dialogue + audio_stream(scenario=realtime_dialogue)
+                → RealtimeHandler（conversation.item.* 事件，依赖 server_vad 断句）
+
+指标:
+    mouth_to_ear  最后一帧发出 → 首个 audio_stream 下行，p50/p90/p99
+    frames        发送帧数 / 落后节拍超过一帧才发出的帧数 / 上游未收到的帧数（发送数 - mock 计数）
+    audio         下行收到的音频块数 / mock 回放的 delta 数
+    rss/conn      加压期间服务进程 RSS 峰值相对加压前的增量 / N
+    loop lag      /v1/performance/loop 的 p99、最大值与卡顿次数（每级开始前清零）
+
+用法:
+    python -m benchmarks.load_voice --clients 1,10,50 --turns 3
+    python -m benchmarks.load_voice --scenario realtime --clients 20 --frame-ms 40
+    python -m benchmarks.load_voice --scenario both --profile gpt-4o --json voice.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import math
+import time
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import httpx
+import psutil
+import websockets
+
+from benchmarks.load_chat import AppProcess, percentile
+from benchmarks.mock_openai_upstream import MockUpstreamServer, add_profile_arguments, build_profile
+
+SAMPLE_RATE = 24000  # Realtime API 的 pcm16 为 24kHz 单声道
+
+SCENARIOS = {
+    "voice_call": {
+        "start": {"type": "voice_command", "command": "start_voice_call"},
+        "started": "voice_call_started",
+        "stop": {"type": "voice_command", "command": "stop_voice_call"},
+        "frame": lambda audio: {"type": "audio_stream", "scenario": "voice_call", "audio_base64": audio},
+        "commit": {"type": "audio_complete"},
+    },
+    "realtime": {
+        "start": {"type": "start_realtime_dialogue"},
+        "started": "realtime_dialogue_started",
+        "stop": {"type": "stop_realtime_dialogue"},
+        "frame": lambda audio: {"type": "audio_stream", "scenario": "realtime_dialogue", "audio_data": audio,
+                                "format": "pcm16"},
+        # RealtimeHandler 没有提交入口，由上游 server_vad 断句
+        "commit": None,
+    },
+}
+
+
+def _turn_done(message: dict) -> bool:
+    """一轮回复结束：VoiceCallHandler 下发 AI 转录，RealtimeHandler 下发 stream_end"""
+    if message.get("type") == "transcription_result":
+        return message.get("role") == "assistant"
+    return message.get("type") == "stream_end"
+
+
+def pcm16_tone(frame_ms: int, sample_rate: int = SAMPLE_RATE, freq: float = 440.0) -> bytes:
+    samples = sample_rate * frame_ms // 1000
+    return array("h", (int(8000 * math.sin(2 * math.pi * freq * i / sample_rate)) for i in range(samples))).tobytes()
+
+
+def _ms(value: str) -> float:
+    """解析监控接口返回的 "12.3ms" """
+    return float(str(value).rstrip("ms") or 0)
+
+
+@dataclass
+class VoiceStepResult:
+    """一个场景在并发数 N 下的压测结果"""
+    scenario: str
+    clients: int
+    connected: int = 0
+    turns: int = 0
+    errors: int = 0
+    frames_sent: int = 0
+    frames_late: int = 0
+    audio_received: int = 0
+    mouth_to_ear: List[float] = field(default_factory=list)
+    upstream: Dict[str, int] = field(default_factory=dict)
+    rss_per_conn: Optional[float] = None
+    loop: Dict[str, float] = field(default_factory=dict)
+    error_samples: List[str] = field(default_factory=list)
+
+    def error(self, message: str):
+        self.errors += 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(message)
+
+    def summary(self) -> Dict[str, float]:
+        ms = lambda p: round(percentile(self.mouth_to_ear, p) * 1000, 1)
+        result = {
+            "scenario": self.scenario,
+            "clients": self.clients,
+            "connected": self.connected,
+            "turns": self.turns,
+            "errors": self.errors,
+            "mouth_to_ear_p50_ms": ms(0.5),
+            "mouth_to_ear_p90_ms": ms(0.9),
+            "mouth_to_ear_p99_ms": ms(0.99),
+            "frames_sent": self.frames_sent,
+            "frames_late": self.frames_late,
+            "audio_received": self.audio_received,
+        }
+        if self.upstream:
+            result["frames_dropped"] = max(self.frames_sent - self.upstream.get("frames", 0), 0)
+            result["audio_dropped"] = max(self.upstream.get("deltas", 0) - self.audio_received, 0)
+        if self.rss_per_conn is not None:
+            result["rss_per_conn_mb"] = round(self.rss_per_conn, 2)
+        result.update(self.loop)
+        return result
+
+
+async def _voice_client(ws_url: str, scenario: str, frame: bytes, frame_ms: int, utterance: float, turns: int,
+                        turn_timeout: float, result: VoiceStepResult, start_gate: asyncio.Event):
+    spec = SCENARIOS[scenario]
+    frame_s = frame_ms / 1000
+    frames_per_turn = max(int(utterance / frame_s), 1)
+    frame_message = json.dumps(spec["frame"](base64.b64encode(frame).decode("ascii")))
+    state = {"last_frame_at": None, "first_audio": False}
+    started, turn_done = asyncio.Event(), asyncio.Event()
+
+    async def receiver(ws):
+        async for raw in ws:
+            message = json.loads(raw)
+            message_type = message.get("type")
+            if message_type == spec["started"]:
+                started.set()
+            elif message_type == "audio_stream":
+                result.audio_received += 1
+                if not state["first_audio"] and state["last_frame_at"] is not None:
+                    state["first_audio"] = True
+                    result.mouth_to_ear.append(time.perf_counter() - state["last_frame_at"])
+            elif message_type == "error":
+                error = message.get("error")
+                result.error(error.get("message") if isinstance(error, dict) else str(message.get("message")))
+            elif _turn_done(message):
+                turn_done.set()
+
+    async with websockets.connect(ws_url, max_size=None, open_timeout=30) as ws:
+        result.connected += 1
+        receive_task = asyncio.create_task(receiver(ws))
+        try:
+            await start_gate.wait()
+            await ws.send(json.dumps(spec["start"]))
+            await asyncio.wait_for(started.wait(), timeout=turn_timeout)
+            for _ in range(turns):
+                state.update(last_frame_at=None, first_audio=False)
+                turn_done.clear()
+                begin = time.perf_counter()
+                for i in range(frames_per_turn):
+                    due = begin + i * frame_s
+                    delay = due - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    elif -delay > frame_s:
+                        result.frames_late += 1
+                    await ws.send(frame_message)
+                    result.frames_sent += 1
+                state["last_frame_at"] = time.perf_counter()
+                if spec["commit"]:
+                    await ws.send(json.dumps(spec["commit"]))
+                try:
+                    await asyncio.wait_for(turn_done.wait(), timeout=turn_timeout)
+                    result.turns += 1
+                except asyncio.TimeoutError:
+                    result.error(f"第 {result.turns + 1} 轮回复超时 ({turn_timeout}s)")
+            await ws.send(json.dumps(spec["stop"]))
+        except asyncio.TimeoutError:
+            result.error(f"{spec['started']} 超时")
+        finally:
+            receive_task.cancel()
+
+
+async def run_step(app: AppProcess, upstream_url: str, api_key: str, scenario: str, clients: int, args) -> VoiceStepResult:
+    """以 N 个并发客户端跑一级压测"""
+    result = VoiceStepResult(scenario=scenario, clients=clients)
+    ws_url = app.base_url.replace("http://", "ws://") + "/ws/chat"
+    frame = pcm16_tone(args.frame_ms)
+    headers = {"Authorization": f"Bearer {api_key}"}
+    process = psutil.Process(app.pid)
+
+    async with httpx.AsyncClient(timeout=10.0) as http:
+        await http.delete(f"{app.base_url}/v1/performance/loop", headers=headers)
+        upstream_before = (await http.get(f"{upstream_url}/mock/realtime")).json()
+        baseline_rss = process.memory_info().rss
+        peak_rss = baseline_rss
+        start_gate = asyncio.Event()
+
+        async def client(index: int):
+            # 错开建连，避免握手风暴掩盖稳态指标
+            await asyncio.sleep(index * args.ramp / max(clients, 1))
+            try:
+                await _voice_client(ws_url, scenario, frame, args.frame_ms, args.utterance, args.turns,
+                                    args.turn_timeout, result, start_gate)
+            except Exception as e:
+                result.error(f"{type(e).__name__}: {e}")
+
+        async def sample_rss():
+            nonlocal peak_rss
+            while True:
+                peak_rss = max(peak_rss, process.memory_info().rss)
+                await asyncio.sleep(0.2)
+
+        sampler = asyncio.create_task(sample_rss())
+        tasks = [asyncio.create_task(client(i)) for i in range(clients)]
+        await asyncio.sleep(args.ramp)
+        start_gate.set()
+        await asyncio.gather(*tasks)
+        sampler.cancel()
+
+        upstream_after = (await http.get(f"{upstream_url}/mock/realtime")).json()
+        result.upstream = {key: upstream_after[key] - upstream_before[key] for key in ("frames", "deltas", "responses")}
+        result.rss_per_conn = (peak_rss - baseline_rss) / (1024 * 1024) / max(result.connected, 1)
+        loop = (await http.get(f"{app.base_url}/v1/performance/loop", headers=headers)).json()
+        lag = loop.get("lag", {})
+        result.loop = {
+            "loop_lag_p99_ms": _ms(lag.get("p99", 0)),
+            "loop_lag_max_ms": _ms(lag.get("max", 0)),
+            "loop_stalls": loop.get("stalls", 0),
+        }
+    return result
+
+
+def _print(summary: Dict[str, float]):
+    line = (f"{summary['scenario']:<10} N={summary['clients']:<4} turns={summary['turns']:<5} err={summary['errors']:<4} "
+            f"mouth-to-ear p50/p90/p99={summary['mouth_to_ear_p50_ms']}/{summary['mouth_to_ear_p90_ms']}/"
+            f"{summary['mouth_to_ear_p99_ms']}ms | frames sent={summary['frames_sent']} late={summary['frames_late']} "
+            f"dropped={summary.get('frames_dropped', '-')} | audio recv={summary['audio_received']} "
+            f"dropped={summary.get('audio_dropped', '-')}")
+    if "rss_per_conn_mb" in summary:
+        line += f" | rss/conn={summary['rss_per_conn_mb']}MB"
+    if "loop_lag_p99_ms" in summary:
+        line += (f" | loop lag p99={summary['loop_lag_p99_ms']}ms max={summary['loop_lag_max_ms']}ms "
+                 f"stalls={summary['loop_stalls']}")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/ws/chat 语音压测")
+    parser.add_argument("--scenario", choices=["voice_call", "realtime", "both"], default="voice_call")
+    parser.add_argument("--clients", default="1,5,10,20", help="逐级并发客户端数，逗号分隔")
+    parser.add_argument("--turns", type=int, default=3, help="每个客户端的对话轮数")
+    parser.add_argument("--utterance", type=float, default=2.0, help="每轮说话时长（秒）")
+    parser.add_argument("--frame-ms", type=int, default=100, help="每个 audio_stream 帧的音频时长")
+    parser.add_argument("--ramp", type=float, default=1.0, help="建连错开的总时长（秒）")
+    parser.add_argument("--turn-timeout", type=float, default=30.0)
+    parser.add_argument("--engine", default="chat_engine")
+    parser.add_argument("--api-key", default="yk-load-test")
+    parser.add_argument("--upstream-port", type=int, default=18080)
+    parser.add_argument("--env", action="append", default=[], help="传给服务子进程的额外环境变量 KEY=VALUE")
+    parser.add_argument("--json", help="结果写入 JSON 文件")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    scenarios = ["voice_call", "realtime"] if args.scenario == "both" else [args.scenario]
+    steps = [int(n) for n in args.clients.split(",")]
+    profile = build_profile(args)
+    extra_env = dict(item.split("=", 1) for item in args.env)
+    summaries = []
+    with MockUpstreamServer(profile, port=args.upstream_port) as upstream:
+        upstream_url = upstream.base_url.rsplit("/v1", 1)[0]
+        print(f"mock realtime {upstream_url}/v1/realtime latency={profile.realtime_latency}s "
+              f"deltas={profile.realtime_deltas} frame={args.frame_ms}ms utterance={args.utterance}s turns={args.turns}")
+        for scenario in scenarios:
+            with AppProcess(args.engine, upstream.base_url, args.api_key, extra_env) as app:
+                for clients in steps:
+                    result = asyncio.run(run_step(app, upstream_url, args.api_key, scenario, clients, args))
+                    summary = result.summary()
+                    _print(summary)
+                    for sample in result.error_samples:
+                        print(f"    error: {sample}")
+                    summaries.append(summary)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summaries, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+本地 OpenAI 兼容 mock 上游
+用于基准测试与压测，不依赖真实 API：
+- POST /v1/chat/completions      流式(SSE)与非流式；请求带 tools 时按 tool_call_rate 返回工具调用
+- POST /v1/audio/speech          TTS：按输入长度返回固定大小的音频字节
+- POST /v1/audio/transcriptions  STT：返回固定转写文本（json / text）
+- POST /v1/embeddings            确定性向量（供 mem0 本地模式检索/写入）
+- WS   /v1/realtime              Realtime API 替身：模拟 server_vad 断句，按画像回放音频 delta
+                                 （input_audio_buffer.* 新事件给 VoiceCallHandler，conversation.item.* 旧事件给 RealtimeHandler）
+- GET/PUT /mock/profile          查看或在运行中调整延迟画像
+- GET /mock/realtime             Realtime 连接计数（会话数、收到的音频帧、回放的 delta 数）
+
+用法:
+    python -m benchmarks.mock_openai_upstream --port 18080 --ttft 0.2 --itl 0.02
+    python -m benchmarks.mock_openai_upstream --profile gpt-4o --tool-call-rate 0.2
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import random
+import struct
+import threading
+import time
+from dataclasses import asdict, dataclass, fields, replace
+
+import uvicorn
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+
+@dataclass
+class LatencyProfile:
+    """上游延迟画像"""
+    ttft: float = 0.2            # 首个token延迟（秒）
+    itl: float = 0.02            # token间延迟（秒）
+    tokens: int = 50             # 每个响应的token数
+    token_text: str = "你好"      # 每个token的文本
+    jitter: float = 0.0          # 延迟随机抖动比例（0.1 = ±10%）
+    tool_call_rate: float = 0.0  # 请求带 tools 时返回工具调用的概率
+    tts_latency: float = 0.15    # TTS 首字节延迟（秒）
+    tts_bytes_per_char: int = 600  # 每个输入字符对应的音频字节数（约 24kbps mp3）
+    stt_latency: float = 0.3     # 转写延迟（秒）
+    transcript: str = "你好，今天天气怎么样？"
+    embedding_latency: float = 0.01
+    embedding_dims: int = 1536
+    realtime_latency: float = 0.3          # Realtime 断句后到首个音频 delta 的延迟（秒）
+    realtime_deltas: int = 10              # 每轮回复的音频 delta 数
+    realtime_delta_ms: int = 100           # 每个 delta 的音频时长（24kHz PCM16）
+    realtime_delta_interval: float = 0.05  # delta 间隔（秒），真实 API 快于实时播放
+
+
+# 常用画像：在真实上游上测得的大致量级
+PROFILES = {
+    "instant": LatencyProfile(ttft=0.0, itl=0.0, tokens=20, tts_latency=0.0, stt_latency=0.0, embedding_latency=0.0,
+                              realtime_latency=0.0, realtime_delta_interval=0.0),
+    "fast": LatencyProfile(ttft=0.05, itl=0.005, tokens=50),
+    "gpt-4o": LatencyProfile(ttft=0.45, itl=0.012, tokens=120, jitter=0.2, realtime_latency=0.5),
+    "gpt-4.1": LatencyProfile(ttft=0.6, itl=0.015, tokens=150, jitter=0.2),
+    "slow": LatencyProfile(ttft=1.5, itl=0.05, tokens=200, jitter=0.3),
+}
+
+
+def _delay(seconds: float, jitter: float) -> float:
+    if jitter and seconds:
+        seconds *= 1 + random.uniform(-jitter, jitter)
+    return max(seconds, 0.0)
+
+
+def _chunk(model: str, content=None, finish_reason=None, tool_calls=None) -> str:
+    delta = {}
+    if content is not None:
+        delta = {"role": "assistant", "content": content}
+    elif tool_calls is not None:
+        delta = {"role": "assistant", "tool_calls": tool_calls}
+    data = {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion.chunk",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+    }
+    return f"data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _pick_tool(body: dict, profile: LatencyProfile):
+    """请求带 tools 且上一条不是工具结果时，按概率选中第一个工具"""
+    tools = body.get("tools") or []
+    messages = body.get("messages") or []
+    if not tools or (messages and messages[-1].get("role") == "tool"):
+        return None
+    if random.random() >= profile.tool_call_rate:
+        return None
+    return tools[0].get("function", {}).get("name")
+
+
+# mem0 事实抽取/记忆更新要求 JSON 输出：返回空结果
+_JSON_REPLY = json.dumps({"facts": [], "memory": []})
+
+
+def _embedding(text: str, dims: int, encoding_format: str = "float"):
+    """按文本哈希生成确定性向量；openai SDK 默认请求 base64（float32 小端）"""
+    digest = hashlib.sha256(text.encode("utf-8")).digest()
+    rng = random.Random(struct.unpack("<Q", digest[:8])[0])
+    vector = [rng.uniform(-1.0, 1.0) for _ in range(dims)]
+    if encoding_format == "base64":
+        return base64.b64encode(struct.pack(f"<{dims}f", *vector)).decode("ascii")
+    return vector
+
+
+class _RealtimeSession:
+    """单个 Realtime 连接：音频停止 silence_duration_ms 后（或收到 commit）断句，再按画像回放一轮回复"""
+
+    def __init__(self, websocket: WebSocket, app: FastAPI):
+        self.websocket = websocket
+        self.app = app
+        self.stats = app.state.realtime_stats
+        self.silence = 0.5
+        self.legacy = False       # 收到 conversation.item.* 旧格式事件（RealtimeHandler）
+        self.buffered = 0         # 当前轮尚未提交的音频帧数
+        self.last_append = 0.0
+        self.turns = 0
+        self._send_lock = asyncio.Lock()
+        self._vad_task = None
+        self._response_task = None
+
+    async def send(self, event_type: str, **payload):
+        event = {"type": event_type, "event_id": f"evt_{random.getrandbits(32):08x}", **payload}
+        async with self._send_lock:
+            await self.websocket.send_text(json.dumps(event, ensure_ascii=False))
+
+    async def run(self):
+        await self.send("session.created", session={})
+        try:
+            while True:
+                await self.handle(json.loads(await self.websocket.receive_text()))
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in (self._vad_task, self._response_task):
+                if task:
+                    task.cancel()
+
+    async def handle(self, event: dict):
+        event_type = event.get("type", "")
+        if event_type == "session.update":
+            turn_detection = event.get("session", {}).get("turn_detection") or {}
+            self.silence = turn_detection.get("silence_duration_ms", 500) / 1000
+            await self.send("session.updated", session=event.get("session", {}))
+        elif event_type.endswith("input_audio_buffer.append"):
+            self.legacy = event_type.startswith("conversation.item.")
+            self.stats["frames"] += 1
+            if not self.buffered:
+                await self.send("input_audio_buffer.speech_started", audio_start_ms=0)
+            self.buffered += 1
+            self.last_append = time.perf_counter()
+            if self._vad_task is None or self._vad_task.done():
+                self._vad_task = asyncio.create_task(self._server_vad())
+        elif event_type == "input_audio_buffer.commit":
+            await self.commit()
+        elif event_type == "response.cancel" and self._response_task:
+            self._response_task.cancel()
+
+    async def _server_vad(self):
+        while self.buffered:
+            remaining = self.last_append + self.silence - time.perf_counter()
+            if remaining <= 0:
+                await self.commit()
+                return
+            await asyncio.sleep(remaining)
+
+    async def commit(self):
+        # 缓冲区已被 server_vad 提交时忽略客户端的 commit
+        if not self.buffered:
+            return
+        self.buffered = 0
+        self.turns += 1
+        if self._response_task and not self._response_task.done():
+            self._response_task.cancel()
+        await self.send("input_audio_buffer.speech_stopped", audio_end_ms=0)
+        await self.send("input_audio_buffer.committed", item_id=f"item_in_{self.turns}")
+        self._response_task = asyncio.create_task(self._respond(self.turns))
+
+    async def _respond(self, turn: int):
+        p: LatencyProfile = self.app.state.profile
+        response_id, item_id = f"resp_{turn}", f"item_out_{turn}"
+        audio = base64.b64encode(bytes(p.realtime_delta_ms * 48)).decode("ascii")
+        text = p.token_text * p.tokens
+        try:
+            if not self.legacy:
+                await self.send("conversation.item.input_audio_transcription.completed",
+                                item_id=f"item_in_{turn}", transcript=p.transcript)
+            await asyncio.sleep(_delay(p.realtime_latency, p.jitter))
+            await self.send("response.created", response={"id": response_id})
+            for i in range(p.realtime_deltas):
+                if i:
+                    await asyncio.sleep(_delay(p.realtime_delta_interval, p.jitter))
+                if self.legacy:
+                    await self.send("conversation.item.output_audio_buffer.delta", item_id=item_id, delta=audio)
+                else:
+                    await self.send("response.audio.delta", response_id=response_id, item_id=item_id,
+                                    output_index=0, content_index=0, delta=audio)
+                self.stats["deltas"] += 1
+            if self.legacy:
+                await self.send("conversation.item.output_text.committed", item_id=item_id, text=text)
+            else:
+                # 每轮文本带轮次后缀，避免被 VoiceCallHandler 的 5 秒重复文本过滤吞掉
+                await self.send("response.audio_transcript.done", response_id=response_id, item_id=item_id,
+                                transcript=f"{text}#{turn}")
+                await self.send("response.done", response={"id": response_id, "status": "completed", "output": []})
+            self.stats["responses"] += 1
+        except (WebSocketDisconnect, RuntimeError):
+            # 客户端已断开
+            pass
+
+
+def create_app(profile: LatencyProfile = None) -> FastAPI:
+    """创建 mock 上游应用"""
+    profile = profile or LatencyProfile()
+    app = FastAPI(title="mock-openai-upstream")
+    app.state.profile = profile
+    app.state.realtime_stats = {"sessions": 0, "active": 0, "frames": 0, "responses": 0, "deltas": 0}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get("model", "mock")
+        p: LatencyProfile = app.state.profile
+        tool_name = _pick_tool(body, p)
+        json_mode = (body.get("response_format") or {}).get("type") == "json_object"
+        tool_call = {
+            "index": 0,
+            "id": f"call_{random.getrandbits(32):08x}",
+            "type": "function",
+            "function": {"name": tool_name, "arguments": "{}"},
+        } if tool_name else None
+
+        if body.get("stream"):
+            async def event_stream():
+                await asyncio.sleep(_delay(p.ttft, p.jitter))
+                if tool_call:
+                    yield _chunk(model, tool_calls=[tool_call])
+                    yield _chunk(model, finish_reason="tool_calls")
+                else:
+                    for i in range(p.tokens):
+                        if i:
+                            await asyncio.sleep(_delay(p.itl, p.jitter))
+                        yield _chunk(model, p.token_text)
+                    yield _chunk(model, finish_reason="stop")
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+        if tool_call:
+            await asyncio.sleep(_delay(p.ttft, p.jitter))
+            message = {"role": "assistant", "content": None, "tool_calls": [tool_call]}
+            finish_reason = "tool_calls"
+        else:
+            await asyncio.sleep(_delay(p.ttft + p.itl * max(p.tokens - 1, 0), p.jitter))
+            content = _JSON_REPLY if json_mode else p.token_text * p.tokens
+            message = {"role": "assistant", "content": content}
+            finish_reason = "stop"
+        return JSONResponse({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": p.tokens, "total_tokens": p.tokens},
+        })
+
+    @app.post("/v1/audio/speech")
+    async def audio_speech(request: Request):
+        body = await request.json()
+        p: LatencyProfile = app.state.profile
+        await asyncio.sleep(_delay(p.tts_latency, p.jitter))
+        size = max(len(body.get("input", "")), 1) * p.tts_bytes_per_char
+        return Response(content=b"ID3" + bytes(size), media_type="audio/mpeg")
+
+    @app.post("/v1/audio/transcriptions")
+    async def audio_transcriptions(request: Request):
+        form = await request.form()
+        p: LatencyProfile = app.state.profile
+        await asyncio.sleep(_delay(p.stt_latency, p.jitter))
+        if form.get("response_format") == "text":
+            return PlainTextResponse(p.transcript)
+        return JSONResponse({"text": p.transcript})
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        p: LatencyProfile = app.state.profile
+        inputs = body.get("input", "")
+        inputs = [inputs] if isinstance(inputs, str) else inputs
+        await asyncio.sleep(_delay(p.embedding_latency, p.jitter))
+        return JSONResponse({
+            "object": "list",
+            "model": body.get("model", "mock-embedding"),
+            "data": [
+                {
+                    "object": "embedding",
+                    "index": i,
+                    "embedding": _embedding(str(text), body.get("dimensions") or p.embedding_dims,
+                                            body.get("encoding_format", "float")),
+                }
+                for i, text in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 0, "total_tokens": 0},
+        })
+
+    @app.websocket("/v1/realtime")
+    async def realtime(websocket: WebSocket):
+        await websocket.accept()
+        stats = app.state.realtime_stats
+        stats["sessions"] += 1
+        stats["active"] += 1
+        try:
+            await _RealtimeSession(websocket, app).run()
+        finally:
+            stats["active"] -= 1
+
+    @app.get("/mock/realtime")
+    async def realtime_stats():
+        return dict(app.state.realtime_stats)
+
+    @app.get("/mock/profile")
+    async def get_profile():
+        return asdict(app.state.profile)
+
+    @app.put("/mock/profile")
+    async def update_profile(request: Request):
+        updates = await request.json()
+        if "profile" in updates:
+            app.state.profile = replace(PROFILES[updates.pop("profile")])
+        known = {field.name for field in fields(LatencyProfile)}
+        app.state.profile = replace(app.state.profile, **{k: v for k, v in updates.items() if k in known})
+        return asdict(app.state.profile)
+
+    return app
+
+
+class MockUpstreamServer:
+    """在后台线程中运行 mock 上游，便于在同一进程内做基准测试"""
+
+    def __init__(self, profile: LatencyProfile = None, host: str = "127.0.0.1", port: int = 18080):
+        self.host = host
+        self.port = port
+        self.app = create_app(profile)
+        self._server = uvicorn.Server(uvicorn.Config(self.app, host=host, port=port, log_level="warning"))
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self, timeout: float = 10.0):
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+        self._thread.start()
+        deadline = time.time() + timeout
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("mock上游启动超时")
+            time.sleep(0.05)
+        return self
+
+    def stop(self):
+        self._server.should_exit = True
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def build_profile(args) -> LatencyProfile:
+    """命令行参数 -> 延迟画像（--profile 为基础，显式给出的参数覆盖之）"""
+    profile = replace(PROFILES[args.profile]) if args.profile else LatencyProfile()
+    overrides = {
+        name: getattr(args, name)
+        for name in ("ttft", "itl", "tokens", "jitter", "tool_call_rate", "tts_latency", "stt_latency",
+                     "realtime_latency", "realtime_deltas")
+        if getattr(args, name, None) is not None
+    }
+    if getattr(args, "tokens_per_second", None):
+        overrides["itl"] = 1.0 / args.tokens_per_second
+    return replace(profile, **overrides)
+
+
+def add_profile_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--profile", choices=sorted(PROFILES), help="预置延迟画像")
+    parser.add_argument("--ttft", type=float)
+    parser.add_argument("--itl", type=float)
+    parser.add_argument("--tokens-per-second", type=float, help="按 token 速率设置 itl")
+    parser.add_argument("--tokens", type=int)
+    parser.add_argument("--jitter", type=float)
+    parser.add_argument("--tool-call-rate", type=float)
+    parser.add_argument("--tts-latency", type=float)
+    parser.add_argument("--stt-latency", type=float)
+    parser.add_argument("--realtime-latency", type=float, help="Realtime 断句后到首个音频 delta 的延迟")
+    parser.add_argument("--realtime-deltas", type=int, help="Realtime 每轮回复的音频 delta 数")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容 mock 上游")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(create_app(build_profile(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
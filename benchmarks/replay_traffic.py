@@ -0,0 +1,279 @@
+"""
+流量回放：把 utils/traffic_capture 录制的匿名化流量按原始节奏（或缩放后）重放到本地服务
+- 文本按录制的 (长度, 哈希, 是否中文) 生成确定性内容：相同原文 → 相同回放文本，重复请求/缓存命中形态不变
+- 标识字段（conversation_id 等）还原为 replay-<哈希>，同一会话的请求仍落在同一会话
+- 音频按录制的 base64 长度回放等长静音
+默认自带 mock 上游并启动服务子进程（与 load_chat 相同）；也可用 --target 回放到已运行的服务。
+每条记录在 (ts - 首条ts) / --speed 时刻发出，--speed 0 表示不等待、尽快发出。
+
+指标（回放值 vs 录制值）:
+    http   状态码不一致数、TTFB 与总耗时 p50/p90/p99
+    ws     回放后下行消息数、上行消息 → 下一条下行消息的响应延迟 p50/p90/p99
+
+用法:
+    python -m benchmarks.replay_traffic logs/traffic_capture.jsonl
+    python -m benchmarks.replay_traffic logs/traffic_capture.jsonl --speed 10 --profile gpt-4o
+    python -m benchmarks.replay_traffic capture.jsonl --target http://127.0.0.1:9800 --api-key yk-xxx --json replay.json
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import random
+import string
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import httpx
+import websockets
+
+from benchmarks.load_chat import AppProcess, percentile
+from benchmarks.mock_openai_upstream import MockUpstreamServer, add_profile_arguments, build_profile
+
+_CJK_CHARS = "的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可也你说年"
+_ASCII_CHARS = string.ascii_letters + string.digits + "     "
+
+
+def synthesize_text(length: int, digest: str, cjk: bool) -> str:
+    """由录制的长度与哈希生成确定性文本"""
+    rng = random.Random(digest)
+    alphabet = _CJK_CHARS if cjk else _ASCII_CHARS
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+
+def restore(value: Any) -> Any:
+    """匿名化结构 → 可发送的请求/消息"""
+    if isinstance(value, list):
+        return [restore(item) for item in value]
+    if isinstance(value, dict):
+        if set(value) == {"len", "h", "cjk"}:
+            return synthesize_text(value["len"], value["h"], value["cjk"])
+        if set(value) == {"b64len"}:
+            # 全 "A" 的 base64 解码为全零字节，即静音 PCM
+            return "A" * (value["b64len"] // 4 * 4)
+        return {key: restore(item) for key, item in value.items()}
+    if isinstance(value, str) and value.startswith("h:"):
+        return f"replay-{value[2:]}"
+    return value
+
+
+def load_capture(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """读取录制文件及其滚动备份（path.N, ..., path.1, path），按时间排序"""
+    files = []
+    index = 1
+    while os.path.exists(f"{path}.{index}"):
+        files.append(f"{path}.{index}")
+        index += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    records = []
+    for name in files:
+        with open(name, encoding="utf-8") as f:
+            records.extend(json.loads(line) for line in f if line.strip())
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit else records
+
+
+@dataclass
+class ReplayResult:
+    """一次回放的结果"""
+    http_replayed: int = 0
+    http_status_mismatch: int = 0
+    ws_replayed: int = 0
+    ws_out_recorded: int = 0
+    ws_out_replayed: int = 0
+    errors: int = 0
+    wall: float = 0.0
+    recorded_span: float = 0.0
+    ttfb: List[float] = field(default_factory=list)
+    ttfb_recorded: List[float] = field(default_factory=list)
+    duration: List[float] = field(default_factory=list)
+    duration_recorded: List[float] = field(default_factory=list)
+    ws_latency: List[float] = field(default_factory=list)
+    ws_latency_recorded: List[float] = field(default_factory=list)
+    error_samples: List[str] = field(default_factory=list)
+
+    def error(self, message: str):
+        self.errors += 1
+        if len(self.error_samples) < 5:
+            self.error_samples.append(message)
+
+    def summary(self) -> Dict[str, float]:
+        result = {
+            "http_replayed": self.http_replayed,
+            "http_status_mismatch": self.http_status_mismatch,
+            "ws_replayed": self.ws_replayed,
+            "ws_out_recorded": self.ws_out_recorded,
+            "ws_out_replayed": self.ws_out_replayed,
+            "errors": self.errors,
+            "wall_s": round(self.wall, 2),
+            "recorded_span_s": round(self.recorded_span, 2),
+        }
+        for name in ("ttfb", "duration", "ws_latency"):
+            for suffix, values in (("", getattr(self, name)), ("_recorded", getattr(self, f"{name}_recorded"))):
+                if values:
+                    for p in (50, 90, 99):
+                        result[f"{name}{suffix}_p{p}_ms"] = round(percentile(values, p / 100) * 1000, 1)
+        return result
+
+
+async def _replay_http(client: httpx.AsyncClient, record: Dict[str, Any], result: ReplayResult):
+    payload = restore(record.get("request") or {})
+    start = time.perf_counter()
+    first_chunk: Optional[float] = None
+    async with client.stream("POST", record["path"], json=payload) as response:
+        async for chunk in response.aiter_raw():
+            if chunk and first_chunk is None:
+                first_chunk = time.perf_counter() - start
+    result.http_replayed += 1
+    if response.status_code != record.get("status"):
+        result.http_status_mismatch += 1
+    if first_chunk is not None and record.get("ttfb") is not None:
+        result.ttfb.append(first_chunk)
+        result.ttfb_recorded.append(record["ttfb"])
+    result.duration.append(time.perf_counter() - start)
+    result.duration_recorded.append(record["duration"])
+
+
+def _recorded_ws_latencies(events: List[Dict[str, Any]]) -> Dict[int, float]:
+    """上行事件下标 → 录制时到下一条下行消息的间隔（下一条仍是上行的不计）"""
+    latencies = {}
+    for index, event in enumerate(events):
+        if event["dir"] == "in" and index + 1 < len(events) and events[index + 1]["dir"] == "out":
+            latencies[index] = events[index + 1]["t"] - event["t"]
+    return latencies
+
+
+async def _replay_ws(ws_url: str, record: Dict[str, Any], speed: float, tail: float, result: ReplayResult):
+    events = record.get("events") or []
+    expected_out = sum(1 for event in events if event["dir"] == "out")
+    recorded_latencies = _recorded_ws_latencies(events)
+    state = {"out": 0, "pending": None}
+    all_received = asyncio.Event()
+
+    async def receiver(ws):
+        async for _ in ws:
+            state["out"] += 1
+            if state["pending"] is not None:
+                index, sent_at = state["pending"]
+                state["pending"] = None
+                result.ws_latency.append(time.perf_counter() - sent_at)
+                result.ws_latency_recorded.append(recorded_latencies[index])
+            if state["out"] >= expected_out:
+                all_received.set()
+
+    async with websockets.connect(ws_url, max_size=None, open_timeout=30) as ws:
+        receive_task = asyncio.create_task(receiver(ws))
+        try:
+            begin = time.perf_counter()
+            for index, event in enumerate(events):
+                if event["dir"] != "in" or "msg" not in event:
+                    continue
+                if speed > 0:
+                    delay = begin + event["t"] / speed - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                await ws.send(json.dumps(restore(event["msg"]), ensure_ascii=False))
+                if index in recorded_latencies:
+                    state["pending"] = (index, time.perf_counter())
+            if expected_out and not all_received.is_set():
+                try:
+                    await asyncio.wait_for(all_received.wait(), timeout=tail)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            receive_task.cancel()
+    result.ws_replayed += 1
+    result.ws_out_recorded += expected_out
+    result.ws_out_replayed += state["out"]
+
+
+async def replay(base_url: str, api_key: str, records: List[Dict[str, Any]], speed: float = 1.0,
+                 max_concurrency: int = 100, tail: float = 10.0) -> ReplayResult:
+    """按录制时间表回放全部记录"""
+    result = ReplayResult()
+    if not records:
+        return result
+    t0 = records[0]["ts"]
+    result.recorded_span = records[-1]["ts"] - t0
+    ws_base = base_url.replace("https://", "wss://").replace("http://", "ws://")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+
+    async with httpx.AsyncClient(base_url=base_url, headers={"Authorization": f"Bearer {api_key}"},
+                                 limits=limits, timeout=httpx.Timeout(120.0, connect=10.0)) as client:
+        begin = time.perf_counter()
+
+        async def run(record: Dict[str, Any]):
+            if speed > 0:
+                delay = begin + (record["ts"] - t0) / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            async with semaphore:
+                try:
+                    if record["kind"] == "http":
+                        await _replay_http(client, record, result)
+                    elif record["kind"] == "ws":
+                        await _replay_ws(ws_base + record["path"], record, speed, tail, result)
+                except Exception as e:
+                    result.error(f"{record['kind']} {record['path']}: {type(e).__name__}: {e}")
+
+        await asyncio.gather(*(run(record) for record in records))
+        result.wall = time.perf_counter() - begin
+    return result
+
+
+def _print(summary: Dict[str, float]):
+    print(f"http={summary['http_replayed']} status_mismatch={summary['http_status_mismatch']} "
+          f"ws={summary['ws_replayed']} ws_out={summary['ws_out_replayed']}/{summary['ws_out_recorded']} "
+          f"err={summary['errors']} wall={summary['wall_s']}s (recorded {summary['recorded_span_s']}s)")
+    for name in ("ttfb", "duration", "ws_latency"):
+        if f"{name}_p50_ms" in summary:
+            replayed = "/".join(str(summary[f"{name}_p{p}_ms"]) for p in (50, 90, 99))
+            recorded = "/".join(str(summary[f"{name}_recorded_p{p}_ms"]) for p in (50, 90, 99))
+            print(f"    {name:<10} p50/p90/p99 replay={replayed}ms recorded={recorded}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="录制流量回放")
+    parser.add_argument("capture", help="录制文件（TRAFFIC_CAPTURE_PATH），自动包含滚动备份")
+    parser.add_argument("--speed", type=float, default=1.0, help="回放速度倍数，0 表示尽快发出")
+    parser.add_argument("--limit", type=int, help="只回放前 N 条记录")
+    parser.add_argument("--max-concurrency", type=int, default=100)
+    parser.add_argument("--tail", type=float, default=10.0, help="WebSocket 最后一条上行后等待下行的最长时间（秒）")
+    parser.add_argument("--target", help="已运行服务的地址；不指定时自动启动 mock 上游与服务子进程")
+    parser.add_argument("--engine", default="chat_engine")
+    parser.add_argument("--api-key", default="yk-load-test")
+    parser.add_argument("--upstream-port", type=int, default=18080)
+    parser.add_argument("--env", action="append", default=[], help="传给服务子进程的额外环境变量 KEY=VALUE")
+    parser.add_argument("--json", help="结果写入 JSON 文件")
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    records = load_capture(args.capture, args.limit)
+    print(f"loaded {len(records)} records from {args.capture} speed={args.speed or 'max'}")
+    if args.target:
+        result = asyncio.run(replay(args.target.rstrip("/"), args.api_key, records, args.speed,
+                                    args.max_concurrency, args.tail))
+    else:
+        profile = build_profile(args)
+        extra_env = dict(item.split("=", 1) for item in args.env)
+        with MockUpstreamServer(profile, port=args.upstream_port) as upstream:
+            with AppProcess(args.engine, upstream.base_url, args.api_key, extra_env) as app:
+                result = asyncio.run(replay(app.base_url, args.api_key, records, args.speed,
+                                            args.max_concurrency, args.tail))
+    summary = result.summary()
+    _print(summary)
+    for sample in result.error_samples:
+        print(f"    error: {sample}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
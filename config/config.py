@@ -81,6 +81,10 @@ class Config:
     # 日志配置
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
     LOG_FILE_NAME = os.getenv("LOG_FILE_NAME", "app.log")
+    LOG_JSON_ENABLED = os.getenv("LOG_JSON_ENABLED", "false").lower() == "true"  # 额外输出紧凑JSON日志文件
+    LOG_JSON_FILE_NAME = os.getenv("LOG_JSON_FILE_NAME", "app.jsonl")
+    LOG_RATE_LIMITS = os.getenv("LOG_RATE_LIMITS", "voice.audio_delta=5")  # 按类别限流：类别=每秒条数[:突发]，逗号分隔
+    LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")  # 按类别采样：类别=采样率(0-1)，逗号分隔
     
     # 服务器配置
     SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
@@ -111,6 +115,8 @@ class Config:
     OPENAI_WRITE_TIMEOUT = float(os.getenv("OPENAI_WRITE_TIMEOUT", "10.0"))
     OPENAI_POOL_TIMEOUT = float(os.getenv("OPENAI_POOL_TIMEOUT", "30.0"))
     OPENAI_API_RETRIES = int(os.getenv("OPENAI_API_RETRIES", "2"))
+    # 是否使用原生异步客户端（AsyncOpenAI + HTTP/2连接池），关闭时回退到线程池包装的同步客户端
+    OPENAI_NATIVE_ASYNC = os.getenv("OPENAI_NATIVE_ASYNC", "true").lower() == "true"
     
     # HTTP客户端配置
     MAX_CONNECTIONS = int(os.getenv("MAX_CONNECTIONS", "100"))
@@ -121,12 +127,60 @@ class Config:
     # 记忆管理配置
     MEMORY_RETRIEVAL_LIMIT = int(os.getenv("MEMORY_RETRIEVAL_LIMIT", "5"))
     MEMORY_RETRIEVAL_TIMEOUT = float(os.getenv("MEMORY_RETRIEVAL_TIMEOUT", "0.5"))
+    # 检索超时时返回会话最近一次成功的记忆快照，检索在后台完成后刷新快照
+    MEMORY_STALE_WHILE_REVALIDATE = os.getenv("MEMORY_STALE_WHILE_REVALIDATE", "true").lower() == "true"
+    MEMORY_STALE_MAX_AGE = float(os.getenv("MEMORY_STALE_MAX_AGE", "600"))  # 快照最大陈旧时间（秒）
+    MEMORY_SNAPSHOT_MAXSIZE = int(os.getenv("MEMORY_SNAPSHOT_MAXSIZE", "1000"))  # 最多保留的会话快照数
+    # 共享Memory后端：异步门面执行同步mem0调用的线程数（同时也是向量库的最大并发调用数）
+    MEMORY_BACKEND_MAX_WORKERS = int(os.getenv("MEMORY_BACKEND_MAX_WORKERS", "8"))
+    
+    # 请求前置阶段截止时间（与记忆检索并发执行，超时降级）
+    PERSONALITY_LOAD_TIMEOUT = float(os.getenv("PERSONALITY_LOAD_TIMEOUT", "0.5"))
+    TOOL_SCHEMA_TIMEOUT = float(os.getenv("TOOL_SCHEMA_TIMEOUT", "2.0"))
     
     # 历史消息限制配置
     # 发送给模型的历史消息最大数量（保留最近的N条消息，避免请求过大）
     # 建议值：20-30条（既能保持对话连贯性，又不会导致token消耗过大）
     # 默认值：30条（约15轮对话，与前端保持一致）
     MAX_MESSAGE_HISTORY_COUNT = int(os.getenv("MAX_MESSAGE_HISTORY_COUNT", "30"))
+    # 发送给模型的提示 token 预算（系统提示 + 记忆 + 工具schema + 历史），超出时从最早的历史消息开始裁剪；0 表示只按条数限制
+    PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "12000"))
+    TOKENIZER_ENCODING = os.getenv("TOKENIZER_ENCODING", "cl100k_base")  # tiktoken 编码；不可用时回退到中日韩字符感知的估算
+    TOKEN_COUNT_CACHE_SIZE = int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "4096"))  # 按内容哈希缓存的文本 token 数条目上限
+    
+    # 会话滚动摘要：最近N条消息原文发送，更早的消息被后台摘要覆盖后以摘要替代
+    CONVERSATION_SUMMARY_ENABLED = os.getenv("CONVERSATION_SUMMARY_ENABLED", "false").lower() == "true"
+    CONVERSATION_SUMMARY_MODEL = os.getenv("CONVERSATION_SUMMARY_MODEL", "")  # 留空使用 OPENAI_MODEL
+    CONVERSATION_SUMMARY_KEEP_RECENT = int(os.getenv("CONVERSATION_SUMMARY_KEEP_RECENT", "10"))  # 始终原文发送的最近消息数
+    CONVERSATION_SUMMARY_MIN_MESSAGES = int(os.getenv("CONVERSATION_SUMMARY_MIN_MESSAGES", "6"))  # 未覆盖的较早消息达到该数量才触发摘要
+    CONVERSATION_SUMMARY_MAX_CHARS = int(os.getenv("CONVERSATION_SUMMARY_MAX_CHARS", "400"))  # 摘要长度上限（字）
+    CONVERSATION_SUMMARY_MAX_CONVERSATIONS = int(os.getenv("CONVERSATION_SUMMARY_MAX_CONVERSATIONS", "1000"))  # 保留摘要的会话数（LRU）
+    CONVERSATION_SUMMARY_TIMEOUT = float(os.getenv("CONVERSATION_SUMMARY_TIMEOUT", "30"))  # 单次摘要调用超时（秒）
+    CONVERSATION_SUMMARY_RETRY_INTERVAL = float(os.getenv("CONVERSATION_SUMMARY_RETRY_INTERVAL", "60"))  # 摘要失败后的重试间隔（秒）
+    
+    # 服务端会话日志：请求带 server_history=true 时只上传新消息，历史由服务端按会话保存
+    CONVERSATION_LOG_ENABLED = os.getenv("CONVERSATION_LOG_ENABLED", "true").lower() == "true"
+    CONVERSATION_LOG_BACKEND = os.getenv("CONVERSATION_LOG_BACKEND", "memory")  # memory / redis / file（进程内热层始终启用）
+    CONVERSATION_LOG_MAX_MESSAGES = int(os.getenv("CONVERSATION_LOG_MAX_MESSAGES", "200"))  # 每个会话保留的消息数
+    CONVERSATION_LOG_MAX_CONVERSATIONS = int(os.getenv("CONVERSATION_LOG_MAX_CONVERSATIONS", "1000"))  # 进程内热层保留的会话数（LRU）
+    CONVERSATION_LOG_TTL = int(os.getenv("CONVERSATION_LOG_TTL", str(7 * 24 * 3600)))  # Redis 持久层过期时间（秒），0 表示不过期
+    CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR", "./data/conversation_logs")  # file 持久层目录
+    
+    # 相同在途请求合并：相同的 (conversation_id, messages, personality_id, use_tools, stream) 并发到达时只调用一次引擎
+    REQUEST_COALESCING_ENABLED = os.getenv("REQUEST_COALESCING_ENABLED", "true").lower() == "true"
+    
+    # 精确匹配响应缓存（可选）：无记忆上下文的相同问题直接返回缓存回答；人格JSON中的 response_cache_ttl 覆盖默认TTL
+    RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "false").lower() == "true"
+    RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "3600"))  # 默认TTL（秒），0 表示仅缓存显式配置了TTL的人格
+    RESPONSE_CACHE_REPLAY_CHUNK_CHARS = int(os.getenv("RESPONSE_CACHE_REPLAY_CHUNK_CHARS", "16"))  # 流式重放时每块最大字符数
+    
+    # 近似重复查询（本地 MinHash + LSH，不调用向量接口）：改写/标点不同的提问复用响应缓存与记忆检索缓存
+    NEAR_DUPLICATE_ENABLED = os.getenv("NEAR_DUPLICATE_ENABLED", "false").lower() == "true"
+    NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))  # 字符bigram的Jaccard相似度阈值（另校验否定词与数字）
+    NEAR_DUPLICATE_NUM_PERM = int(os.getenv("NEAR_DUPLICATE_NUM_PERM", "32"))  # MinHash 排列数
+    NEAR_DUPLICATE_BANDS = int(os.getenv("NEAR_DUPLICATE_BANDS", "8"))  # LSH band 数（须整除排列数）
+    NEAR_DUPLICATE_SHINGLE_SIZE = int(os.getenv("NEAR_DUPLICATE_SHINGLE_SIZE", "2"))  # 字符 n-gram 长度
+    NEAR_DUPLICATE_MAX_ENTRIES = int(os.getenv("NEAR_DUPLICATE_MAX_ENTRIES", "10000"))  # 每个索引的条目上限（LRU）
     
     # 实时语音配置
     REALTIME_VOICE_ENABLED = os.getenv("REALTIME_VOICE_ENABLED", "true").lower() == "true"
@@ -177,6 +231,7 @@ class Config:
     # 音频缓存配置
     AUDIO_CACHE_MAX_SIZE = int(os.getenv("AUDIO_CACHE_MAX_SIZE", "100"))  # 音频缓存最大条目数
     TTS_CACHE_SIZE = int(os.getenv("TTS_CACHE_SIZE", "50"))  # TTS缓存大小
+    AUDIO_CACHE_TTL = int(os.getenv("AUDIO_CACHE_TTL", "86400"))  # TTS结果缓存过期时间（秒）
     
     # WebSocket音频配置
     AUDIO_CHUNK_SIZE = int(os.getenv("AUDIO_CHUNK_SIZE", "1024"))  # WebSocket音频块大小 (字节)
@@ -188,12 +243,46 @@ class Config:
     # 可选值: both(同时保存用户输入和助手回复), user_only(只保存用户输入), assistant_only(只保存助手回复)
     MEMORY_SAVE_MODE = os.getenv("MEMORY_SAVE_MODE", "both")
     
+    # Memory写后队列配置（写入在后台批量执行，不占用请求路径）
+    MEMORY_WRITE_QUEUE_MAX_SIZE = int(os.getenv("MEMORY_WRITE_QUEUE_MAX_SIZE", "1000"))  # 最大待写入消息数
+    MEMORY_WRITE_WORKERS = int(os.getenv("MEMORY_WRITE_WORKERS", "2"))  # 写入worker数
+    # 队列满时的策略: block(等待空间，超时后丢弃新消息), drop_new(丢弃新消息), drop_oldest(丢弃最早的待写入批次)
+    MEMORY_WRITE_QUEUE_POLICY = os.getenv("MEMORY_WRITE_QUEUE_POLICY", "block")
+    MEMORY_WRITE_QUEUE_PUT_TIMEOUT = float(os.getenv("MEMORY_WRITE_QUEUE_PUT_TIMEOUT", "1.0"))
+    MEMORY_WRITE_FLUSH_TIMEOUT = float(os.getenv("MEMORY_WRITE_FLUSH_TIMEOUT", "10.0"))  # 关闭时刷盘超时
+    
     # 性能监控配置
     ENABLE_PERFORMANCE_MONITOR = os.getenv("ENABLE_PERFORMANCE_MONITOR", "true").lower() == "true"
     PERFORMANCE_LOG_ENABLED = os.getenv("PERFORMANCE_LOG_ENABLED", "true").lower() == "true"
     PERFORMANCE_MAX_HISTORY = int(os.getenv("PERFORMANCE_MAX_HISTORY", "1000"))
     PERFORMANCE_SAMPLING_RATE = float(os.getenv("PERFORMANCE_SAMPLING_RATE", "1.0"))  # 1.0 = 100%采样
     
+    # 请求追踪配置
+    TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+    TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "jsonl")  # jsonl 或 otlp
+    TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1.0"))  # 按请求（根span）采样
+    TRACING_JSONL_PATH = os.getenv("TRACING_JSONL_PATH", "./logs/traces.jsonl")
+    TRACING_JSONL_MAX_BYTES = int(os.getenv("TRACING_JSONL_MAX_BYTES", str(50 * 1024 * 1024)))
+    TRACING_JSONL_BACKUP_COUNT = int(os.getenv("TRACING_JSONL_BACKUP_COUNT", "5"))
+    TRACING_OTLP_ENDPOINT = os.getenv("TRACING_OTLP_ENDPOINT", "http://127.0.0.1:4318/v1/traces")
+    
+    # 流量录制配置（匿名化录制 /v1/chat/completions 与 /ws/chat，用于 benchmarks/replay_traffic.py 回放）
+    TRAFFIC_CAPTURE_ENABLED = os.getenv("TRAFFIC_CAPTURE_ENABLED", "false").lower() == "true"
+    TRAFFIC_CAPTURE_PATH = os.getenv("TRAFFIC_CAPTURE_PATH", "./logs/traffic_capture.jsonl")
+    TRAFFIC_CAPTURE_SAMPLE_RATE = float(os.getenv("TRAFFIC_CAPTURE_SAMPLE_RATE", "1.0"))  # 按请求/连接采样
+    TRAFFIC_CAPTURE_SALT = os.getenv("TRAFFIC_CAPTURE_SALT", "")  # 哈希盐，留空则每个进程随机生成
+    TRAFFIC_CAPTURE_MAX_BYTES = int(os.getenv("TRAFFIC_CAPTURE_MAX_BYTES", str(100 * 1024 * 1024)))
+    TRAFFIC_CAPTURE_BACKUP_COUNT = int(os.getenv("TRAFFIC_CAPTURE_BACKUP_COUNT", "5"))
+    TRAFFIC_CAPTURE_MAX_WS_EVENTS = int(os.getenv("TRAFFIC_CAPTURE_MAX_WS_EVENTS", "5000"))  # 单个WebSocket连接最多录制的消息数
+    
+    # 事件循环监控配置
+    LOOP_MONITOR_ENABLED = os.getenv("LOOP_MONITOR_ENABLED", "true").lower() == "true"
+    LOOP_MONITOR_INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL", "0.1"))  # 心跳间隔（秒）
+    LOOP_MONITOR_BLOCK_THRESHOLD = float(os.getenv("LOOP_MONITOR_BLOCK_THRESHOLD", "0.1"))  # 超过该时长视为阻塞并抓取调用栈（秒）
+    LOOP_MONITOR_MAX_EVENTS = int(os.getenv("LOOP_MONITOR_MAX_EVENTS", "50"))  # 保留的最近阻塞事件数
+    PROFILER_MAX_SECONDS = float(os.getenv("PROFILER_MAX_SECONDS", "60"))  # 按需采样分析的最长时长（秒）
+    MEMORY_PROFILER_MAX_SNAPSHOTS = int(os.getenv("MEMORY_PROFILER_MAX_SNAPSHOTS", "5"))  # 保留的tracemalloc快照数
+    
     # Redis缓存配置
     USE_REDIS_CACHE = os.getenv("USE_REDIS_CACHE", "false").lower() == "true"
     REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
@@ -201,6 +290,17 @@ class Config:
     REDIS_DB = int(os.getenv("REDIS_DB", "0"))
     REDIS_PASSWORD = os.getenv("REDIS_PASSWORD", None)
     REDIS_TTL = int(os.getenv("REDIS_TTL", "1800"))  # 默认30分钟
+    # 异步Redis连接池与超时（超时后按缓存未命中降级，不阻塞事件循环）
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+    REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "0.5"))
+    # 两级缓存：进程内L1(TTLCache) + Redis L2，L1的TTL应短于L2以限制多实例间的不一致
+    CACHE_TIERED = os.getenv("CACHE_TIERED", "true").lower() == "true"
+    CACHE_L1_MAXSIZE = int(os.getenv("CACHE_L1_MAXSIZE", "1000"))
+    CACHE_L1_TTL = int(os.getenv("CACHE_L1_TTL", "60"))
+    # 缓存命中时按概率提前后台刷新（越接近过期、加载越慢越容易触发），0表示关闭
+    CACHE_EARLY_REFRESH_BETA = float(os.getenv("CACHE_EARLY_REFRESH_BETA", "1.0"))
+    # 可缓存工具（声明了cache_ttl的工具）结果的默认过期时间（秒）
+    TOOL_RESULT_CACHE_TTL = int(os.getenv("TOOL_RESULT_CACHE_TTL", "300"))
     
     # 内存缓存配置（作为Redis的降级方案）
     MEMORY_CACHE_MAXSIZE = int(os.getenv("MEMORY_CACHE_MAXSIZE", "1000"))
@@ -19,8 +19,8 @@ class RealtimeConfig:
         
         # Realtime API 配置 - 使用自定义base URL
         if self.OPENAI_BASE_URL and self.OPENAI_BASE_URL != "https://api.openai.com/v1":
-            # 将 https:// 替换为 wss://，并添加 /realtime 路径
-            base_url = self.OPENAI_BASE_URL.replace("https://", "wss://")
+            # 将 https:// 替换为 wss://（本地 http:// 上游替换为 ws://），并添加 /realtime 路径
+            base_url = self.OPENAI_BASE_URL.replace("https://", "wss://").replace("http://", "ws://")
             self.REALTIME_API_URL = f"{base_url}/realtime"
         else:
             # 默认使用官方OpenAI Realtime API
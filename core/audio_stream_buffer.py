@@ -10,7 +10,9 @@ import time
 from collections import deque
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
-from utils.log import log
+from utils.log import get_logger, log
+
+_chunk_log = get_logger("audio.chunk")
 
 
 @dataclass
@@ -63,8 +65,9 @@ class AudioStreamBuffer:
         """
         try:
             # Debug logging
-            log.debug(f"add_chunk called with client_id={client_id}, audio_chunk type={type(audio_chunk)}, length={len(audio_chunk) if hasattr(audio_chunk, '__len__') else 'N/A'}")
-            log.debug(f"audio_chunk sample: {audio_chunk[:20] if hasattr(audio_chunk, '__getitem__') else 'N/A'}")
+            _chunk_log.debug(lambda: f"add_chunk called with client_id={client_id}, audio_chunk type={type(audio_chunk)}, "
+                                     f"length={len(audio_chunk) if hasattr(audio_chunk, '__len__') else 'N/A'}, "
+                                     f"sample={audio_chunk[:20] if hasattr(audio_chunk, '__getitem__') else 'N/A'}")
             
             # 检查参数类型
             if not isinstance(audio_chunk, bytes):
@@ -99,7 +102,7 @@ class AudioStreamBuffer:
                     sequence=sequence,
                     client_id=client_id
                 )
-                log.debug(f"Created AudioChunk: sequence={sequence}, data_length={len(audio_chunk)}")
+                _chunk_log.debug("Created AudioChunk: sequence={}, data_length={}", sequence, len(audio_chunk))
             except Exception as chunk_error:
                 log.error(f"Failed to create AudioChunk: {type(chunk_error).__name__}: {chunk_error}")
                 log.error(f"Parameters: data type={type(audio_chunk)}, timestamp={time.time()}, sequence={sequence}, client_id={client_id}")
@@ -117,8 +120,7 @@ class AudioStreamBuffer:
                 # Log buffer status
                 buffer_size = len(self.buffers[client_id])
                 if buffer_size % 10 == 0:  # Log every 10 chunks
-                    log.debug(f"Client {client_id}: buffer size={buffer_size}, "
-                            f"sequence={sequence}")
+                    _chunk_log.debug("Client {}: buffer size={}, sequence={}", client_id, buffer_size, sequence)
             
             return True
             
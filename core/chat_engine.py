@@ -1,11 +1,11 @@
 import asyncio
 import time
 import json
-from typing import List, Dict, Any, Optional, AsyncGenerator, Union
+from typing import List, Dict, Any, Optional, AsyncGenerator, Union, Tuple
 from openai import OpenAI
 from config.config import get_config
-from utils.log import log
-from core.chat_memory import ChatMemory, get_async_chat_memory
+from utils.log import get_logger, log
+from core.chat_memory import ChatMemory, get_async_chat_memory, memory_retrieval_source
 from core.personality_manager import PersonalityManager
 from services.tools.manager import ToolManager
 import httpx
@@ -13,19 +13,25 @@ from services.tools.registry import tool_registry
 from services.mcp.manager import get_mcp_manager
 from services.mcp.exceptions import MCPServiceError, MCPServerNotFoundError, MCPToolNotFoundError
 # 新增模块导入
-from core.openai_client import AsyncOpenAIWrapper
+from core.openai_client import HTTP2_AVAILABLE, AsyncOpenAIWrapper, AsyncOpenAIClient
 from core.request_builder import build_request_params
 from core.tools_adapter import normalize_tool_calls, build_tool_response_messages
-from core.token_budget import should_include_memory
+from core.token_budget import should_include_memory, trim_messages_to_budget
 from core.prompt_builder import compose_system_prompt
+from core.conversation_summarizer import get_conversation_summarizer
+from core.memory_write_queue import get_memory_write_queue
+from core.request_coalescer import coalesce_requests
+from core.response_cache import ResponseCacheLookup, get_response_cache
 # 性能监控
 from utils.performance import performance_monitor, PerformanceMetrics
+from utils.tracing import get_tracer
 import uuid
 # 基类导入
 from core.base_engine import BaseEngine, EngineCapabilities, EngineStatus
 
 
 config = get_config()
+_stream_log = get_logger("chat.stream")
 
 class ChatEngine(BaseEngine):
     def __init__(self):
@@ -37,7 +43,7 @@ class ChatEngine(BaseEngine):
             http_client=httpx.Client(
                 follow_redirects=True,
                 verify=config.VERIFY_SSL,
-                http2=True,
+                http2=HTTP2_AVAILABLE,
                 timeout=httpx.Timeout(
                     connect=config.OPENAI_CONNECT_TIMEOUT,
                     read=config.OPENAI_READ_TIMEOUT,
@@ -51,8 +57,11 @@ class ChatEngine(BaseEngine):
                 )
             )
         )
-        # 包装为异步客户端
-        self.client = AsyncOpenAIWrapper(self.sync_client)
+        # 异步客户端：默认使用原生 AsyncOpenAI（共享HTTP/2连接池），可配置回退到线程池包装
+        if config.OPENAI_NATIVE_ASYNC:
+            self.client = AsyncOpenAIClient()
+        else:
+            self.client = AsyncOpenAIWrapper(self.sync_client)
         self.chat_memory = None
         self.async_chat_memory = None
         self.personality_manager = None
@@ -71,6 +80,7 @@ class ChatEngine(BaseEngine):
             log.info("ChatEngine: 延迟初始化完成")
        
     # 在generate_response方法中添加性能监控
+    @coalesce_requests
     async def generate_response(self, messages: List[Dict[str, str]], conversation_id: str = "default", 
                                personality_id: Optional[str] = None, use_tools: Optional[bool] = None, 
                                stream: Optional[bool] = None) -> Any:
@@ -88,6 +98,16 @@ class ChatEngine(BaseEngine):
             use_tools=use_tools if use_tools is not None else config.USE_TOOLS_DEFAULT,
             personality_id=personality_id
         )
+        # 请求根span：流式响应时由包装生成器接管并在流结束时关闭
+        span = get_tracer().start_span("chat.request", {
+            "request_id": metrics.request_id,
+            "conversation_id": conversation_id,
+            "personality": personality_id or "",
+            "stream": metrics.stream,
+            "use_tools": metrics.use_tools,
+        })
+        span.activate()
+        stream_owns_span = False
         try:
             # 验证输入参数
             if not messages or not isinstance(messages, list):
@@ -97,7 +117,7 @@ class ChatEngine(BaseEngine):
                     async def error_gen():
                         yield {"role": "assistant", "content": error_msg, "finish_reason": "error", "stream": True}
                     return error_gen()
-                return {"role": "assistant", "content": error_msg}
+                return {"role": "assistant", "content": error_msg, "finish_reason": "error"}
             
             # 验证每条消息格式
             for idx, msg in enumerate(messages):
@@ -108,7 +128,7 @@ class ChatEngine(BaseEngine):
                         async def error_gen():
                             yield {"role": "assistant", "content": error_msg, "finish_reason": "error", "stream": True}
                         return error_gen()
-                    return {"role": "assistant", "content": error_msg}
+                    return {"role": "assistant", "content": error_msg, "finish_reason": "error"}
                 
                 # 检查必需字段，但允许工具消息格式
                 if "role" not in msg:
@@ -118,7 +138,7 @@ class ChatEngine(BaseEngine):
                         async def error_gen():
                             yield {"role": "assistant", "content": error_msg, "finish_reason": "error", "stream": True}
                         return error_gen()
-                    return {"role": "assistant", "content": error_msg}
+                    return {"role": "assistant", "content": error_msg, "finish_reason": "error"}
                 
                 # 对于工具消息，允许没有content字段（使用tool_call_id）
                 if msg["role"] == "tool":
@@ -129,7 +149,7 @@ class ChatEngine(BaseEngine):
                             async def error_gen():
                                 yield {"role": "assistant", "content": error_msg, "finish_reason": "error", "stream": True}
                             return error_gen()
-                        return {"role": "assistant", "content": error_msg}
+                        return {"role": "assistant", "content": error_msg, "finish_reason": "error"}
                 elif msg["role"] == "assistant":
                     # assistant消息可以包含tool_calls或content，或两者都有
                     if "content" not in msg and "tool_calls" not in msg:
@@ -139,7 +159,7 @@ class ChatEngine(BaseEngine):
                             async def error_gen():
                                 yield {"role": "assistant", "content": error_msg, "finish_reason": "error", "stream": True}
                             return error_gen()
-                        return {"role": "assistant", "content": error_msg}
+                        return {"role": "assistant", "content": error_msg, "finish_reason": "error"}
                 else:
                     # 其他角色消息必须有content字段
                     if "content" not in msg:
@@ -149,18 +169,29 @@ class ChatEngine(BaseEngine):
                             async def error_gen():
                                 yield {"role": "assistant", "content": error_msg, "finish_reason": "error", "stream": True}
                             return error_gen()
-                        return {"role": "assistant", "content": error_msg}
+                        return {"role": "assistant", "content": error_msg, "finish_reason": "error"}
             
             # 打印传入的参数值，用于调试
             log.debug(f"传入参数 - personality_id: {personality_id}, use_tools: {use_tools}, stream: {stream}, type(personality_id): {type(personality_id)}, type(use_tools): {type(use_tools)}, type(stream): {type(stream)}")
             
-            # 创建messages的深拷贝，避免修改原始列表
-            messages_copy = [msg.copy() for msg in messages]
             # 若历史过长，仅保留最近的N条消息，减少请求体体积和token消耗
             max_history = config.MAX_MESSAGE_HISTORY_COUNT
-            if len(messages_copy) > max_history:
-                messages_copy = messages_copy[-max_history:]
+            dropped_history = []
+            if len(messages) > max_history:
+                dropped_history = messages[:-max_history]
                 log.debug(f"历史消息过多，已限制为最近{max_history}条消息")
+            # 先截断再拷贝（只拷贝要发送的消息），避免修改原始列表及服务端会话日志中的消息
+            messages_copy = [msg.copy() for msg in messages[-max_history:]]
+            
+            # 已被会话摘要覆盖的较早消息以摘要替代，未覆盖的交给后台摘要
+            conversation_summary = ""
+            if config.CONVERSATION_SUMMARY_ENABLED and conversation_id != "default":
+                try:
+                    messages_copy, conversation_summary = get_conversation_summarizer().compact(
+                        conversation_id, messages_copy, dropped_history
+                    )
+                except Exception as e:
+                    log.warning(f"会话摘要压缩失败，使用原始历史: {e}")
             
             log.debug(f"原始消息: {messages_copy}")
             
@@ -179,58 +210,20 @@ class ChatEngine(BaseEngine):
                 stream = config.STREAM_DEFAULT
                 log.info(f"未指定stream，使用默认值: {stream}")
             
-            # 获取记忆和人格信息
-            memory_section = ""
-            personality_system = ""
-            
-            # 从记忆中检索相关内容
-            if config.ENABLE_MEMORY_RETRIEVAL and conversation_id != "default" and messages_copy:
-                memory_start = time.time()
-                query_text = messages_copy[-1]["content"][:100]  # 只记录前100个字符
-                log.debug(f"🔍 开始检索记忆: conversation_id={conversation_id}, query='{query_text}...'")
-                relevant_memories = await self.async_chat_memory.get_relevant_memory(conversation_id, messages_copy[-1]["content"])
-                metrics.memory_retrieval_time = time.time() - memory_start
-                log.debug(f"🔍 记忆检索完成: conversation_id={conversation_id}, 耗时={metrics.memory_retrieval_time:.3f}s, 找到{len(relevant_memories)}条记忆")
-                
-                # 检查是否命中缓存（通过检索时间判断）
-                metrics.memory_cache_hit = metrics.memory_retrieval_time < 0.01  # 小于10ms认为是缓存命中
-                
-                if relevant_memories:
-                    memory_text = "\n".join(relevant_memories)
-                    memory_section = f"参考记忆：\n{memory_text}"
-                    log.debug(f"✅ 检索到相关记忆 {len(relevant_memories)} 条，内容预览: {memory_text[:200]}...")
-                    
-                    # 使用新的token预算模块检查是否应该包含记忆
-                    max_tokens = getattr(config, 'OPENAI_MAX_TOKENS', 8192)
-                    if not should_include_memory(messages_copy, memory_section, max_tokens):
-                        log.warning("⚠️ 避免超出模型token限制，不添加记忆到系统提示")
-                        memory_section = ""
-                    else:
-                        log.debug(f"✅ 记忆已添加到系统提示，包含 {len(relevant_memories)} 条记忆")
-                else:
-                    log.debug(f"⚠️ 未检索到相关记忆: conversation_id={conversation_id}")
-            elif not config.ENABLE_MEMORY_RETRIEVAL:
-                log.debug("❌ Memory检索已禁用 (ENABLE_MEMORY_RETRIEVAL=false)")
-            elif conversation_id == "default":
-                log.debug(f"⚠️ Memory检索跳过: conversation_id='default' (默认会话不使用记忆)")
-            elif not messages_copy:
-                log.debug(f"⚠️ Memory检索跳过: messages_copy为空")
-            
-            # 获取人格的系统提示
-            if personality_id:
-                try:
-                    personality = self.personality_manager.get_personality(personality_id)
-                    if personality:
-                        personality_system = personality.system_prompt or ""
-                except Exception as e:
-                    log.warning(f"获取人格时出错，忽略人格设置: {e}")
+            # 并发执行请求前置阶段（记忆检索 / 人格加载 / 工具schema），各阶段独立截止时间
+            memory_section, personality_system, allowed_tools_schema = await self._prepare_request_context(
+                messages_copy, conversation_id, personality_id, use_tools, metrics
+            )
             
-            # 使用新的提示构建器合成系统提示
-            messages_copy = compose_system_prompt(messages_copy, personality_system, memory_section)
+            # 合并阶段结果：使用提示构建器合成系统提示
+            messages_copy = compose_system_prompt(messages_copy, personality_system, memory_section, conversation_summary)
+            # 系统提示（人格 + 记忆 + 会话摘要）与工具schema占用预算后，按剩余token预算裁剪历史
+            try:
+                messages_copy = trim_messages_to_budget(messages_copy, config.PROMPT_TOKEN_BUDGET, allowed_tools_schema)
+            except Exception as e:
+                log.warning(f"按token预算裁剪历史失败，保留原消息: {e}")
             log.debug(f"合成系统提示后消息: {messages_copy}")
             
-            # 使用新的方法获取允许的工具schema（已根据personality过滤）
-            allowed_tools_schema = await self.get_allowed_tools_schema(personality_id) if use_tools else None
             request_params = build_request_params(
                 model=config.OPENAI_MODEL,
                 temperature=float(config.OPENAI_TEMPERATURE),
@@ -243,14 +236,53 @@ class ChatEngine(BaseEngine):
             log.debug(f"最终请求参数: {request_params}")
             # 记录总请求处理时间
             log.debug(f"总请求处理时间一: {time.time() - total_start_time:.2f}秒")
+            
+            # 无记忆上下文（也无会话摘要）的请求走精确匹配响应缓存
+            response_cache_lookup, response_cache_ttl = None, 0
+            if config.RESPONSE_CACHE_ENABLED and not memory_section and not conversation_summary:
+                try:
+                    response_cache = get_response_cache()
+                    response_cache_ttl = response_cache.ttl_for(self.personality_manager.get_personality(personality_id))
+                    if response_cache_ttl > 0:
+                        response_cache_lookup = response_cache.make_lookup(personality_id, request_params)
+                        cached = await response_cache.find(response_cache_lookup, personality_id)
+                        if cached:
+                            log.debug(f"💾 响应缓存命中: personality={personality_id}, key={response_cache_lookup.key[:12]}")
+                            metrics.response_cache_hit = True
+                            span.set_attribute("response_cache_hit", True)
+                            if conversation_id:
+                                await self._async_save_message_to_memory(
+                                    conversation_id, [messages[-1], {"role": "assistant", "content": cached["content"]}]
+                                )
+                            if stream:
+                                stream_owns_span = True
+                                return self._wrap_streaming_response_with_performance(
+                                    response_cache.replay(cached), metrics, total_start_time, span
+                                )
+                            metrics.total_time = time.time() - total_start_time
+                            if config.ENABLE_PERFORMANCE_MONITOR:
+                                performance_monitor.record(metrics, log_enabled=config.PERFORMANCE_LOG_ENABLED)
+                            return {
+                                "role": "assistant",
+                                "content": cached["content"],
+                                "model": cached.get("model") or request_params.get("model"),
+                                "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                            }
+                except Exception as e:
+                    log.warning(f"响应缓存查询失败，直接请求上游: {e}")
+                    response_cache_lookup = None
+            
             if stream:
                 # 包装异步生成器以确保性能指标被记录
+                stream_owns_span = True
                 return self._wrap_streaming_response_with_performance(
-                    self._generate_streaming_response(request_params, conversation_id, messages, personality_id, metrics),
-                    metrics, total_start_time
+                    self._generate_streaming_response(request_params, conversation_id, messages, personality_id, metrics,
+                                                      response_cache_lookup, response_cache_ttl),
+                    metrics, total_start_time, span
                 )
             else:
-                result = await self._generate_non_streaming_response(request_params, conversation_id, messages, personality_id, metrics)
+                result = await self._generate_non_streaming_response(request_params, conversation_id, messages, personality_id, metrics,
+                                                                     response_cache_lookup, response_cache_ttl)
                 
                 # 记录性能指标
                 metrics.total_time = time.time() - total_start_time
@@ -260,6 +292,7 @@ class ChatEngine(BaseEngine):
                 return result
         except Exception as e:
             log.error(f"Error in generate_response: {e}")
+            span.record_exception(e)
             # 返回适当的错误响应对象，而不是简单的错误字典
             if stream:
                 # 对于流式响应，返回一个可以异步迭代的对象
@@ -273,7 +306,133 @@ class ChatEngine(BaseEngine):
                 return error_generator()
             else:
                 # 对于非流式响应，返回标准的错误消息格式
-                return {"role": "assistant", "content": f"发生错误: {str(e)}"}
+                return {"role": "assistant", "content": f"发生错误: {str(e)}", "finish_reason": "error"}
+        finally:
+            span.deactivate()
+            if not stream_owns_span:
+                span.end()
+    
+    async def _prepare_request_context(
+        self,
+        messages: List[Dict[str, Any]],
+        conversation_id: str,
+        personality_id: Optional[str],
+        use_tools: bool,
+        metrics: PerformanceMetrics
+    ) -> Tuple[str, str, Optional[List[Dict]]]:
+        """并发执行LLM调用前的独立阶段，返回 (memory_section, personality_system, tools_schema)
+        
+        各阶段互不依赖，作为一组任务同时运行，记忆检索延迟被隐藏在其他准备工作之后；
+        任一阶段超时或出错时降级为空结果，不影响其他阶段。
+        """
+        pre_llm_start = time.time()
+        pre_llm_span = get_tracer().span("chat.pre_llm")
+        pre_llm_span.activate()
+        stages = [
+            # 记忆检索自身按 MEMORY_RETRIEVAL_TIMEOUT 截止并回退到过期快照，这里的截止时间仅作兜底
+            self._run_pre_llm_stage(
+                "memory", self._retrieve_memory_section(messages, conversation_id, metrics),
+                config.MEMORY_RETRIEVAL_TIMEOUT * 2, "", metrics
+            ),
+            self._run_pre_llm_stage(
+                "personality", self._load_personality_system(personality_id),
+                config.PERSONALITY_LOAD_TIMEOUT, "", metrics, "personality_apply_time"
+            ),
+        ]
+        if use_tools:
+            stages.append(self._run_pre_llm_stage(
+                "tools", self.get_allowed_tools_schema(personality_id),
+                config.TOOL_SCHEMA_TIMEOUT, None, metrics, "tool_schema_build_time"
+            ))
+        try:
+            results = await asyncio.gather(*stages)
+        finally:
+            pre_llm_span.deactivate()
+            pre_llm_span.end()
+        metrics.pre_llm_time = time.time() - pre_llm_start
+        memory_section, personality_system = results[0], results[1]
+        allowed_tools_schema = results[2] if use_tools else None
+        log.debug(f"前置阶段完成: 总耗时={metrics.pre_llm_time:.3f}s, "
+                  f"memory={metrics.memory_retrieval_time:.3f}s, personality={metrics.personality_apply_time:.3f}s, "
+                  f"tools={metrics.tool_schema_build_time:.3f}s")
+        return memory_section, personality_system, allowed_tools_schema
+    
+    async def _run_pre_llm_stage(self, name: str, coro, timeout: float, default: Any,
+                                 metrics: PerformanceMetrics, metric_field: Optional[str] = None) -> Any:
+        """运行单个前置阶段：超过截止时间或出错时返回降级结果，并记录阶段耗时"""
+        stage_start = time.time()
+        span = get_tracer().span(f"chat.stage.{name}")
+        span.activate()
+        try:
+            return await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            log.warning(f"⏱️ 前置阶段[{name}]超时({timeout}s)，使用降级结果")
+            span.set_attribute("timeout", True)
+            return default
+        except Exception as e:
+            log.warning(f"前置阶段[{name}]出错，使用降级结果: {e}")
+            span.record_exception(e)
+            return default
+        finally:
+            span.deactivate()
+            span.end()
+            if metric_field:
+                setattr(metrics, metric_field, time.time() - stage_start)
+    
+    async def _retrieve_memory_section(self, messages: List[Dict[str, Any]], conversation_id: str,
+                                       metrics: PerformanceMetrics) -> str:
+        """检索相关记忆并构建记忆段落（受token预算约束）"""
+        if not config.ENABLE_MEMORY_RETRIEVAL:
+            log.debug("❌ Memory检索已禁用 (ENABLE_MEMORY_RETRIEVAL=false)")
+            return ""
+        if conversation_id == "default":
+            log.debug(f"⚠️ Memory检索跳过: conversation_id='default' (默认会话不使用记忆)")
+            return ""
+        if not messages:
+            log.debug(f"⚠️ Memory检索跳过: messages_copy为空")
+            return ""
+        
+        memory_start = time.time()
+        memory_retrieval_source.set(None)
+        query_text = messages[-1]["content"][:100]  # 只记录前100个字符
+        log.debug(f"🔍 开始检索记忆: conversation_id={conversation_id}, query='{query_text}...'")
+        try:
+            relevant_memories = await self.async_chat_memory.get_relevant_memory(conversation_id, messages[-1]["content"])
+        finally:
+            # 仅在实际检索时记录耗时（超时被取消时同样记录）
+            metrics.memory_retrieval_time = time.time() - memory_start
+        log.debug(f"🔍 记忆检索完成: conversation_id={conversation_id}, 耗时={metrics.memory_retrieval_time:.3f}s, 找到{len(relevant_memories)}条记忆")
+        
+        # 检索结果来源由 AsyncChatMemory 写入上下文（cache / fresh / stale / empty / error）
+        metrics.memory_cache_hit = memory_retrieval_source.get() == "cache"
+        
+        if not relevant_memories:
+            log.debug(f"⚠️ 未检索到相关记忆: conversation_id={conversation_id}")
+            return ""
+        
+        memory_text = "\n".join(relevant_memories)
+        memory_section = f"参考记忆：\n{memory_text}"
+        log.debug(f"✅ 检索到相关记忆 {len(relevant_memories)} 条，内容预览: {memory_text[:200]}...")
+        
+        # 使用新的token预算模块检查是否应该包含记忆
+        max_tokens = getattr(config, 'OPENAI_MAX_TOKENS', 8192)
+        if not should_include_memory(messages, memory_section, max_tokens):
+            log.warning("⚠️ 避免超出模型token限制，不添加记忆到系统提示")
+            return ""
+        log.debug(f"✅ 记忆已添加到系统提示，包含 {len(relevant_memories)} 条记忆")
+        return memory_section
+    
+    async def _load_personality_system(self, personality_id: Optional[str]) -> str:
+        """获取人格的系统提示"""
+        if not personality_id:
+            return ""
+        try:
+            personality = self.personality_manager.get_personality(personality_id)
+            if personality:
+                return personality.system_prompt or ""
+        except Exception as e:
+            log.warning(f"获取人格时出错，忽略人格设置: {e}")
+        return ""
     
     async def _generate_non_streaming_response(
         self,
@@ -281,17 +440,23 @@ class ChatEngine(BaseEngine):
         conversation_id: str,
         original_messages: List[Dict[str, str]],
         personality_id: Optional[str] = None,
-        metrics: Optional[PerformanceMetrics] = None
+        metrics: Optional[PerformanceMetrics] = None,
+        response_cache_lookup: Optional[ResponseCacheLookup] = None,
+        response_cache_ttl: int = 0
     ) -> Dict[str, Any]:
         try:
             # 调用异步OpenAI API
-            response = await self.client.create_chat(request_params)
+            api_start_time = time.time()
+            with get_tracer().span("llm.chat", model=request_params.get("model")):
+                response = await self.client.create_chat(request_params)
+            if metrics:
+                metrics.openai_api_time = time.time() - api_start_time
             log.debug(f"OpenAI API响应: {response}")
             
             # 增加响应格式验证
             if not hasattr(response, 'choices') or not response.choices:
                 log.error(f"Invalid API response format: {dir(response)}")
-                return {"role": "assistant", "content": "获取AI响应时发生格式错误，请检查API配置。"}
+                return {"role": "assistant", "content": "获取AI响应时发生格式错误，请检查API配置。", "finish_reason": "error"}
             
             # 处理响应
             if hasattr(response.choices[0].message, 'tool_calls') and response.choices[0].message.tool_calls:
@@ -300,24 +465,30 @@ class ChatEngine(BaseEngine):
                     response.choices[0].message.tool_calls,
                     conversation_id,
                     original_messages,
-                    personality_id
+                    personality_id,
+                    metrics
                 )
             else:
                 # 确保content存在
                 if not hasattr(response.choices[0].message, 'content') or response.choices[0].message.content is None:
                     log.error(f"Response missing content: {response}")
-                    return {"role": "assistant", "content": "AI响应内容为空，请检查API配置。"}
+                    return {"role": "assistant", "content": "AI响应内容为空，请检查API配置。", "finish_reason": "error"}
                 
                 # 普通响应
                 content = response.choices[0].message.content
                 
-                # 保存到记忆 - 使用原生异步API
+                # 保存到记忆 - 入队写后队列，由后台worker批量写入
                 if conversation_id:
-                    # 创建异步任务但不等待其完成
-                    asyncio.create_task(self._async_save_message_to_memory(
+                    await self._async_save_message_to_memory(
                         conversation_id, 
-                        [{"role": "assistant", "content": content}, original_messages[-1]]
-                    ))
+                        [original_messages[-1], {"role": "assistant", "content": content}]
+                    )
+                
+                # 普通回答（无工具调用）写入响应缓存
+                if response_cache_lookup:
+                    await get_response_cache().store(
+                        response_cache_lookup, content, getattr(response, 'model', None), response_cache_ttl, personality_id
+                    )
                 
                 return {
                     "role": "assistant",
@@ -332,31 +503,37 @@ class ChatEngine(BaseEngine):
                 
         except json.JSONDecodeError as e:
             log.error(f"JSON解析错误: {e}. 请检查API端点是否正确且返回有效JSON格式。")
-            return {"role": "assistant", "content": "API返回内容格式错误，请确认API端点配置正确。"}
+            return {"role": "assistant", "content": "API返回内容格式错误，请确认API端点配置正确。", "finish_reason": "error"}
         except Exception as e:
             log.error(f"生成响应时出错: {e}")
             # 尝试获取更详细的错误信息
             detailed_error = str(e)
             if hasattr(e, 'response') and hasattr(e.response, 'text'):
                 detailed_error += f"\n响应内容: {e.response.text[:200]}..."
-            return {"role": "assistant", "content": f"抱歉，我现在无法为您提供帮助。错误信息: {detailed_error}"}
+            return {"role": "assistant", "content": f"抱歉，我现在无法为您提供帮助。错误信息: {detailed_error}", "finish_reason": "error"}
     
     async def _wrap_streaming_response_with_performance(
         self, 
         streaming_generator: AsyncGenerator[Dict[str, Any], None], 
         metrics: PerformanceMetrics, 
-        total_start_time: float
+        total_start_time: float,
+        span=None
     ) -> AsyncGenerator[Dict[str, Any], None]:
-        """包装流式响应生成器，确保性能指标被记录"""
+        """包装流式响应生成器，确保性能指标被记录；span 为请求根span，在流结束时关闭"""
         log.info(f"[PERF WRAPPER] 开始包装流式响应，request_id={metrics.request_id}")
         first_chunk_time = None
         chunk_count = 0
+        if span is not None:
+            # 流由响应任务消费，在该上下文中恢复请求span，使后续阶段挂在同一条链路上
+            span.activate()
         
         try:
             async for chunk in streaming_generator:
                 chunk_count += 1
                 if chunk_count == 1:
                     first_chunk_time = time.time()
+                    if span is not None:
+                        span.add_event("first_chunk")
                     log.debug(f"流式响应首字节时间: {first_chunk_time - total_start_time:.2f}秒")
                 
                 #log.debug(f"流式响应chunk {chunk_count}: {chunk}")
@@ -364,6 +541,8 @@ class ChatEngine(BaseEngine):
                 
         except Exception as e:
             log.error(f"流式响应包装器出错: {e}")
+            if span is not None:
+                span.record_exception(e)
             # 重新抛出异常
             raise e
         finally:
@@ -372,7 +551,10 @@ class ChatEngine(BaseEngine):
             metrics.total_time = time.time() - total_start_time
             if first_chunk_time:
                 metrics.first_chunk_time = first_chunk_time - total_start_time
-            metrics.openai_api_time = metrics.total_time  # 流式响应中，总时间就是API时间
+            if span is not None:
+                span.set_attribute("chunks", chunk_count)
+                span.deactivate()
+                span.end()
             
             log.info(f"[PERF WRAPPER] 准备记录性能指标: ENABLE={config.ENABLE_PERFORMANCE_MONITOR}, total_time={metrics.total_time:.3f}s")
             if config.ENABLE_PERFORMANCE_MONITOR:
@@ -386,11 +568,14 @@ class ChatEngine(BaseEngine):
         conversation_id: str,
         original_messages: List[Dict[str, str]],
         personality_id: Optional[str] = None,
-        metrics: Optional[PerformanceMetrics] = None
+        metrics: Optional[PerformanceMetrics] = None,
+        response_cache_lookup: Optional[ResponseCacheLookup] = None,
+        response_cache_ttl: int = 0
     ) -> AsyncGenerator[Dict[str, Any], None]:
         try:
             # 记录API调用开始时间
             api_start_time = time.time()
+            llm_span = get_tracer().start_span("llm.stream", {"model": request_params.get("model")})
             
             # 初始化变量
             tool_calls = None
@@ -403,6 +588,7 @@ class ChatEngine(BaseEngine):
                 chunk_count += 1
                 if chunk_count == 1:
                     first_chunk_time = time.time()
+                    llm_span.add_event("first_chunk")
                     log.debug(f"首字节响应时间: {first_chunk_time - api_start_time:.2f}秒")
                     
                 if chunk.choices and len(chunk.choices) > 0:
@@ -414,9 +600,9 @@ class ChatEngine(BaseEngine):
                             tool_calls = []
                         # 收集工具调用信息
                         for tool_call in choice.delta.tool_calls:
-                            log.debug(f"收到工具调用 chunk: index={tool_call.index}, id={getattr(tool_call, 'id', None)}, "
-                                     f"has_function={hasattr(tool_call, 'function')}, "
-                                     f"function={getattr(tool_call, 'function', None)}")
+                            _stream_log.debug(lambda: f"收到工具调用 chunk: index={tool_call.index}, id={getattr(tool_call, 'id', None)}, "
+                                              f"has_function={hasattr(tool_call, 'function')}, "
+                                              f"function={getattr(tool_call, 'function', None)}")
                             
                             # 初始化或更新工具调用信息
                             if tool_call.index >= len(tool_calls):
@@ -425,18 +611,19 @@ class ChatEngine(BaseEngine):
                             # 更新 ID（可能在后续 chunk 中才提供）
                             if hasattr(tool_call, 'id') and tool_call.id:
                                 tool_calls[tool_call.index]["id"] = tool_call.id
-                                log.debug(f"更新工具调用 ID: index={tool_call.index}, id={tool_call.id}")
+                                _stream_log.debug("更新工具调用 ID: index={}, id={}", tool_call.index, tool_call.id)
                             
                             # 更新函数名称和参数
                             if hasattr(tool_call, 'function') and tool_call.function:
                                 if hasattr(tool_call.function, 'name') and tool_call.function.name:
                                     tool_calls[tool_call.index]["function"]["name"] = tool_call.function.name
-                                    log.debug(f"更新工具名称: index={tool_call.index}, name={tool_call.function.name}")
+                                    _stream_log.debug("更新工具名称: index={}, name={}", tool_call.index, tool_call.function.name)
                                 if hasattr(tool_call.function, 'arguments') and tool_call.function.arguments:
                                     if "arguments" not in tool_calls[tool_call.index]["function"]:
                                         tool_calls[tool_call.index]["function"]["arguments"] = ""
                                     tool_calls[tool_call.index]["function"]["arguments"] += tool_call.function.arguments
-                                    log.debug(f"累加工具参数: index={tool_call.index}, 当前长度={len(tool_calls[tool_call.index]['function']['arguments'])}")
+                                    _stream_log.debug("累加工具参数: index={}, 当前长度={}", tool_call.index,
+                                                      len(tool_calls[tool_call.index]['function']['arguments']))
                     
                     # 处理普通内容，优化分块输出
                     elif choice.delta.content is not None:
@@ -484,6 +671,12 @@ class ChatEngine(BaseEngine):
                                 "stream": True
                             }
             
+            # 上游流结束：记录真实的LLM耗时（不含后续工具执行）
+            llm_span.set_attributes(chunks=chunk_count, tool_calls=len(tool_calls) if tool_calls else 0)
+            llm_span.end()
+            if metrics:
+                metrics.openai_api_time = time.time() - api_start_time
+            
             # 检查是否有工具调用需要处理
             if tool_calls:
                 log.debug(f"收集到的工具调用原始数据: {tool_calls}")
@@ -518,7 +711,7 @@ class ChatEngine(BaseEngine):
                     })
                 
                 # 并行执行所有工具调用
-                tool_results = await self.tool_manager.execute_tools_concurrently(calls_to_execute)
+                tool_results = await self._execute_tools(calls_to_execute, metrics)
                 
                 # 使用新的工具适配器构建工具响应消息
                 tool_response_messages = build_tool_response_messages(normalized_calls, tool_results)
@@ -558,6 +751,8 @@ class ChatEngine(BaseEngine):
                 
                 # 继续流式输出工具调用后的回答
                 follow_up_content = ""
+                follow_up_start = time.time()
+                follow_up_span = get_tracer().start_span("llm.stream", {"model": follow_up_params.get("model"), "follow_up": True})
                 async for follow_up_chunk in self.client.create_chat_stream(follow_up_params):
                     if follow_up_chunk.choices and len(follow_up_chunk.choices) > 0:
                         choice = follow_up_chunk.choices[0]
@@ -570,12 +765,16 @@ class ChatEngine(BaseEngine):
                                 "stream": True
                             }
                 
+                follow_up_span.end()
+                if metrics:
+                    metrics.openai_api_time += time.time() - follow_up_start
+                
                 # 保存工具调用后的响应到记忆
                 if conversation_id and follow_up_content:
-                    asyncio.create_task(self._async_save_message_to_memory(
+                    await self._async_save_message_to_memory(
                         conversation_id, 
-                        [{"role": "assistant", "content": follow_up_content}, original_messages[-1]]
-                    ))
+                        [original_messages[-1], {"role": "assistant", "content": follow_up_content}]
+                    )
                 
                 # 发送结束标志
                     yield {
@@ -585,13 +784,18 @@ class ChatEngine(BaseEngine):
                         "stream": True
                     }
             else:
-                # 保存到记忆 - 使用原生异步API
+                # 保存到记忆 - 入队写后队列，由后台worker批量写入
                 if conversation_id and full_content:
-                    # 创建异步任务但不等待其完成
-                    asyncio.create_task(self._async_save_message_to_memory(
+                    await self._async_save_message_to_memory(
                         conversation_id, 
-                        [{"role": "assistant", "content": full_content}, original_messages[-1]]
-                    ))
+                        [original_messages[-1], {"role": "assistant", "content": full_content}]
+                    )
+                
+                # 普通回答（无工具调用）写入响应缓存
+                if response_cache_lookup and full_content:
+                    await get_response_cache().store(
+                        response_cache_lookup, full_content, request_params.get("model"), response_cache_ttl, personality_id
+                    )
                 
                 # 发送结束标志
                 yield {
@@ -615,7 +819,8 @@ class ChatEngine(BaseEngine):
         tool_calls: list,
         conversation_id: str,
         original_messages: List[Dict[str, str]],
-        personality_id: Optional[str] = None
+        personality_id: Optional[str] = None,
+        metrics: Optional[PerformanceMetrics] = None
     ) -> Dict[str, Any]:
         # 使用新的工具适配器规范化工具调用
         normalized_calls = normalize_tool_calls(tool_calls)
@@ -637,7 +842,7 @@ class ChatEngine(BaseEngine):
             })
         
         # 并行执行所有工具调用
-        tool_results = await self.tool_manager.execute_tools_concurrently(calls_to_execute)
+        tool_results = await self._execute_tools(calls_to_execute, metrics)
         
         # 使用新的工具适配器构建工具响应消息
         tool_response_messages = build_tool_response_messages(normalized_calls, tool_results)
@@ -650,6 +855,17 @@ class ChatEngine(BaseEngine):
         # 重新生成响应 - 明确设置stream=False，传递personality_id避免重复应用
         return await self.generate_response(new_messages, conversation_id, personality_id=personality_id, use_tools=False, stream=False)
     
+    async def _execute_tools(self, calls_to_execute: List[Dict[str, Any]],
+                             metrics: Optional[PerformanceMetrics] = None) -> list:
+        """并行执行工具调用，记录工具阶段耗时"""
+        tool_start = time.time()
+        with get_tracer().span("tools.execute", count=len(calls_to_execute)):
+            tool_results = await self.tool_manager.execute_tools_concurrently(calls_to_execute)
+        if metrics:
+            metrics.tool_called = True
+            metrics.tool_execution_time += time.time() - tool_start
+        return tool_results
+    
     def call_mcp_service(self, tool_name: str = None, params: dict = None, 
                          service_name: str = None, method_name: str = None, 
                          mcp_server: str = None):
@@ -723,7 +939,7 @@ class ChatEngine(BaseEngine):
 
     # 异步保存消息到记忆 - 使用原生异步API
     async def _async_save_message_to_memory(self, conversation_id: str, messages: list):
-        """异步保存消息到记忆，使用mem0的原生AsyncMemory API"""
+        """保存消息到记忆：按MEMORY_SAVE_MODE过滤后入队写后队列，不等待实际写入"""
         try:
             log.debug(f"💾 开始保存消息到记忆: conversation_id={conversation_id}, 总消息数={len(messages)}, MEMORY_SAVE_MODE={config.MEMORY_SAVE_MODE}")
             
@@ -754,9 +970,9 @@ class ChatEngine(BaseEngine):
                     if len(messages_to_save) > 1:
                         log.debug(f"💾 最后一条消息预览: conversation_id={conversation_id}, role={messages_to_save[-1].get('role')}, content='{messages_to_save[-1].get('content', '')[:100]}...'")
                 
-                # 批量保存消息
-                await self.async_chat_memory.add_messages_batch(conversation_id, messages_to_save)
-                log.debug(f"✅ 消息保存到记忆成功: conversation_id={conversation_id}, 保存了{len(messages_to_save)}条消息")
+                # 入队，由后台worker按会话合并后批量写入
+                if await get_memory_write_queue().enqueue(conversation_id, messages_to_save):
+                    log.debug(f"✅ 消息已加入记忆写入队列: conversation_id={conversation_id}, {len(messages_to_save)}条消息")
             else:
                 log.debug(f"⚠️ 根据配置 MEMORY_SAVE_MODE={config.MEMORY_SAVE_MODE}，没有消息需要保存到记忆: conversation_id={conversation_id}")
         except Exception as e:
@@ -1019,7 +1235,8 @@ class ChatEngine(BaseEngine):
                 if missing:
                     log.info(f"允许工具中缺少schema，尝试发现并注册MCP工具: {missing}")
                     try:
-                        discover_and_register_mcp_tools()
+                        # MCP发现为同步阻塞调用，放到线程中执行，避免阻塞并发的前置阶段
+                        await asyncio.to_thread(discover_and_register_mcp_tools)
                         # 重新获取并过滤
                         all_tools_schema = tool_registry.get_functions_schema()
                         filtered_tools = [
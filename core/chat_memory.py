@@ -2,14 +2,141 @@
 优化后的Memory管理模块
 包含缓存和异步优化
 """
-import os
+import time
+from contextvars import ContextVar
 from typing import Optional
 import threading
 import asyncio
 from cachetools import TTLCache
 import hashlib
 from config.config import get_config
+from utils.cache import get_namespace_stats
 from utils.log import log
+from utils.near_duplicate import get_near_duplicate_index
+from utils.tracing import get_tracer
+
+
+# 缓存未命中哨兵（缓存值本身可能是空列表）
+_CACHE_MISS = object()
+
+# 最近一次异步检索结果的来源（cache / fresh / stale / timeout / error），
+# 在调用方的上下文中可读，用于性能指标记录真实的缓存命中情况
+memory_retrieval_source: ContextVar[Optional[str]] = ContextVar("memory_retrieval_source", default=None)
+
+
+class ConversationScopedCache(TTLCache):
+    """
+    按会话划分的记忆检索缓存
+    - 维护 conversation_id -> cache_key 索引，写入只失效对应会话的条目
+    - 每个会话维护代数(generation)，失效前发起的检索结果不会回填缓存
+    - 代数取自全局递增计数；代数表超过容量的两倍时清理已无缓存条目的会话，
+      被清理的会话代数回落到不低于其原值的下限，旧检索仍无法回填
+    - 统计命中/未命中/容量淘汰/过期/失效次数
+    """
+
+    def __init__(self, maxsize: int, ttl: float, timer=time.monotonic):
+        super().__init__(maxsize=maxsize, ttl=ttl, timer=timer)
+        self._conversation_keys = {}  # conversation_id -> set(cache_key)
+        self._key_owner = {}          # cache_key -> conversation_id
+        self._generations = {}        # conversation_id -> int
+        self._generation_counter = 0  # 全局递增，保证同一会话的代数不会重复
+        self._generation_floor = 0    # 未记录（或已被清理）会话的代数
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def popitem(self):
+        # 容量满时由 Cache.__setitem__ 调用
+        key, value = super().popitem()
+        self.evictions += 1
+        self._forget(key)
+        return key, value
+
+    def expire(self, time=None):
+        expired = super().expire(time)
+        if expired:
+            self.expirations += len(expired)
+            for key, _ in expired:
+                self._forget(key)
+        return expired
+
+    def _forget(self, key):
+        conversation_id = self._key_owner.pop(key, None)
+        if conversation_id is None:
+            return
+        keys = self._conversation_keys.get(conversation_id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._conversation_keys[conversation_id]
+
+    def generation(self, conversation_id: str) -> int:
+        """获取会话当前代数"""
+        return self._generations.get(conversation_id, self._generation_floor)
+
+    def lookup(self, key):
+        """读取缓存并计入命中统计，未命中返回 _CACHE_MISS"""
+        try:
+            value = self[key]
+        except KeyError:
+            self.misses += 1
+            return _CACHE_MISS
+        self.hits += 1
+        return value
+
+    def store(self, conversation_id: str, key: str, value, generation: Optional[int] = None) -> bool:
+        """写入缓存；若检索期间会话已失效（代数变化）则放弃写入"""
+        if generation is not None and generation != self.generation(conversation_id):
+            return False
+        self[key] = value
+        self._key_owner[key] = conversation_id
+        self._conversation_keys.setdefault(conversation_id, set()).add(key)
+        return True
+
+    def invalidate(self, conversation_id: str) -> int:
+        """失效指定会话的所有缓存条目，返回清除数量"""
+        self._generation_counter += 1
+        self._generations[conversation_id] = self._generation_counter
+        keys = self._conversation_keys.pop(conversation_id, set())
+        removed = 0
+        for key in keys:
+            self._key_owner.pop(key, None)
+            if self.pop(key, _CACHE_MISS) is not _CACHE_MISS:
+                removed += 1
+        self.invalidations += 1
+        if len(self._generations) > 2 * self.maxsize:
+            self._prune_generations()
+        return removed
+
+    def _prune_generations(self):
+        """清理已无缓存条目的会话代数，下限抬高到被清理的最大代数（期间发起的检索回填会被放弃）"""
+        stale = [cid for cid in self._generations if cid not in self._conversation_keys]
+        for conversation_id in stale:
+            self._generation_floor = max(self._generation_floor, self._generations.pop(conversation_id))
+
+    def clear(self):
+        super().clear()
+        self._conversation_keys.clear()
+        self._key_owner.clear()
+
+    def get_stats(self) -> dict:
+        """获取缓存统计"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "conversations": len(self._conversation_keys),
+            "generations": len(self._generations),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{self.hits / total * 100:.1f}%" if total else "0.0%",
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
 
 
 class ChatMemory:
@@ -18,8 +145,8 @@ class ChatMemory:
         self.config = get_config()  # 保存配置为实例变量
         self.is_local = self.config.MEMO_USE_LOCAL
         
-        # 添加缓存 (5分钟过期，最多100条)
-        self._memory_cache = TTLCache(maxsize=100, ttl=300)
+        # 添加缓存 (5分钟过期，最多100条，按会话失效)
+        self._memory_cache = ConversationScopedCache(maxsize=100, ttl=300)
         
         # 如果没有提供memory对象，创建一个新的
         if memory is None:
@@ -29,72 +156,10 @@ class ChatMemory:
             self.memory = memory
     
     def _init_memory(self):
-        """根据配置初始化Memory实例（本地或API模式）"""
+        """使用共享Memory后端的同步门面（本地或API模式）"""
         try:
-            if self.is_local:
-                # 本地模式：使用 Memory + 可选向量库（chroma 或 qdrant）
-                from mem0 import Memory
-                from mem0.configs.base import MemoryConfig
-                
-                # 选择向量库
-                provider = getattr(self.config, 'VECTOR_STORE_PROVIDER', 'chroma').lower()
-                if provider == 'qdrant':
-                    vector_store = {
-                        "provider": "qdrant",
-                        "config": {
-                            "collection_name": getattr(self.config, 'QDRANT_COLLECTION_NAME', self.config.CHROMA_COLLECTION_NAME),
-                            "host": getattr(self.config, 'QDRANT_HOST', '127.0.0.1'),
-                            "port": int(getattr(self.config, 'QDRANT_PORT', 6333)),
-                            **({"api_key": self.config.QDRANT_API_KEY} if getattr(self.config, 'QDRANT_API_KEY', None) else {})
-                        }
-                    }
-                else:
-                    vector_store = {
-                        "provider": "chroma",
-                        "config": {
-                            "collection_name": self.config.CHROMA_COLLECTION_NAME,
-                            "path": self.config.CHROMA_PERSIST_DIRECTORY
-                        }
-                    }
-
-                memory_config = MemoryConfig(
-                    llm={
-                        "provider": self.config.MEM0_LLM_PROVIDER,
-                        "config": {
-                            "api_key": self.config.OPENAI_API_KEY,
-                            "openai_base_url": self.config.OPENAI_BASE_URL,
-                            "model": self.config.MEM0_LLM_CONFIG_MODEL,
-                            "max_tokens": self.config.MEM0_LLM_CONFIG_MAX_TOKENS
-                        }
-                    },
-                    vector_store=vector_store,
-                    embedder={
-                        "provider": "openai",
-                        "config": {
-                            "model": getattr(self.config, 'MEM0_EMBEDDER_MODEL', 'text-embedding-3-small'),
-                            "api_key": self.config.OPENAI_API_KEY,
-                            "openai_base_url": self.config.OPENAI_BASE_URL
-                        }
-                    }
-                )
-                
-                log.info(f"使用本地模式初始化Memory，配置: {memory_config}")
-                self.memory = Memory(config=memory_config)
-                log.info(f"成功创建本地Memory实例")
-                
-                # 确保持久化目录存在
-                if provider == 'chroma':
-                    os.makedirs(self.config.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
-            else:
-                # API模式：使用 MemoryClient
-                from mem0 import MemoryClient
-                
-                if not self.config.MEM0_API_KEY:
-                    raise ValueError("API模式需要配置 MEM0_API_KEY")
-                
-                log.info(f"使用API模式初始化MemoryClient")
-                self.memory = MemoryClient(api_key=self.config.MEM0_API_KEY)
-                log.info(f"成功创建API MemoryClient实例")
+            from core.memory_backend import get_memory_backend
+            self.memory = get_memory_backend(self.config).get_sync_memory()
         except Exception as e:
             log.error(f"初始化Memory失败: {e}")
             raise
@@ -114,9 +179,6 @@ class ChatMemory:
         try:
             log.debug(f"添加消息到记忆: {message}, conversation_id: {conversation_id}")
             
-            # 清除相关缓存
-            self._invalidate_cache(conversation_id)
-            
             # 创建metadata字典，只包含非None值
             metadata = {"role": message["role"]}
             # 只有当timestamp存在且不为None时才添加
@@ -145,6 +207,9 @@ class ChatMemory:
             log.debug("消息添加成功")
         except Exception as e:
             log.error(f"Failed to add message to memory: {e}", exc_info=True)
+        finally:
+            # 写入完成后再失效缓存，避免写入期间的检索结果回填旧数据
+            self._invalidate_cache(conversation_id)
     
     def _get_cache_key(self, conversation_id: str, query: str, limit: Optional[int]) -> str:
         """生成缓存键"""
@@ -152,19 +217,14 @@ class ChatMemory:
         return hashlib.md5(cache_str.encode()).hexdigest()
     
     def _invalidate_cache(self, conversation_id: str):
-        """清除指定会话的缓存"""
-        # 简单实现：清除所有包含该conversation_id的缓存
-        # 更精确的实现需要维护conversation_id到cache_key的映射
-        keys_to_remove = []
-        for key in list(self._memory_cache.keys()):
-            # 这里简化处理，实际应该维护更精确的映射
-            keys_to_remove.append(key)
-        
-        for key in keys_to_remove:
-            self._memory_cache.pop(key, None)
-        
-        if keys_to_remove:
-            log.debug(f"清除了 {len(keys_to_remove)} 个Memory缓存项")
+        """清除指定会话的缓存（不影响其他会话）"""
+        removed = self._memory_cache.invalidate(conversation_id)
+        if removed:
+            log.debug(f"清除了会话 {conversation_id} 的 {removed} 个Memory缓存项")
+    
+    def get_cache_stats(self) -> dict:
+        """获取Memory检索缓存统计"""
+        return self._memory_cache.get_stats()
     
     def get_relevant_memory(self, conversation_id: str, query: str, limit: Optional[int] = None) -> list:
         # 如果没有提供limit，使用配置中的默认值
@@ -175,9 +235,11 @@ class ChatMemory:
         cache_key = self._get_cache_key(conversation_id, query, limit)
         
         # 检查缓存
-        if cache_key in self._memory_cache:
+        cached_result = self._memory_cache.lookup(cache_key)
+        if cached_result is not _CACHE_MISS:
             log.debug(f"Memory缓存命中: {cache_key[:8]}...")
-            return self._memory_cache[cache_key]
+            return cached_result
+        generation = self._memory_cache.generation(conversation_id)
         
         try:
             # 添加超时控制
@@ -226,8 +288,8 @@ class ChatMemory:
             if exception:
                 raise exception
             
-            # 缓存结果
-            self._memory_cache[cache_key] = result
+            # 缓存结果（检索期间会话被写入则不回填）
+            self._memory_cache.store(conversation_id, cache_key, result, generation)
             log.debug(f"Memory检索完成，结果已缓存: {len(result)}条记忆")
             
             return result
@@ -293,18 +355,14 @@ class ChatMemory:
     
     def delete_memory(self, conversation_id: str):
         try:
-            # 清除缓存
-            self._invalidate_cache(conversation_id)
-            
             self.memory.delete_all(user_id=conversation_id)
         except Exception as e:
             log.error(f"Failed to delete memory: {e}")
+        finally:
+            self._invalidate_cache(conversation_id)
     
     def add_memory(self, conversation_id: str, user_message: str, assistant_message: str):
         try:
-            # 清除缓存
-            self._invalidate_cache(conversation_id)
-            
             content = f"User: {user_message}\nAssistant: {assistant_message}"
             self.memory.add(
                 content,
@@ -313,6 +371,8 @@ class ChatMemory:
             )
         except Exception as e:
             log.error(f"Failed to add memory: {e}")
+        finally:
+            self._invalidate_cache(conversation_id)
     
     def get_memory(self, conversation_id: str) -> list:
         return self.get_all_memory(conversation_id)
@@ -328,8 +388,24 @@ class AsyncChatMemory:
         self.config = get_config()
         self.is_local = self.config.MEMO_USE_LOCAL
         
-        # 添加缓存
-        self._memory_cache = TTLCache(maxsize=100, ttl=300)
+        # 添加缓存（按会话失效）
+        self._memory_cache = ConversationScopedCache(maxsize=100, ttl=300)
+        
+        # 每个会话最近一次成功检索的记忆快照（检索超时时返回，超过最大陈旧时间自动过期）
+        self._snapshots = TTLCache(
+            maxsize=self.config.MEMORY_SNAPSHOT_MAXSIZE,
+            ttl=self.config.MEMORY_STALE_MAX_AGE
+        )
+        # 进行中的检索任务（按 (缓存键, 会话代数) 去重，超时后继续在后台完成并刷新快照；
+        # 会话失效后到达的请求不会加入失效前发起的任务）
+        self._inflight = {}
+        # 每个进行中任务的等待者数量（共享任务只在最后一个等待者超时放弃时取消）
+        self._inflight_waiters = {}
+        self._swr_stats = {"fresh": 0, "stale": 0, "empty_on_timeout": 0, "background_refreshes": 0}
+        # 统一缓存命名空间统计（命中/未命中/加载耗时）
+        self._namespace_stats = get_namespace_stats("memory")
+        # 近似重复查询索引（同一会话、同一 limit 内，改写过的查询复用已缓存的检索结果）
+        self._near_index = get_near_duplicate_index("memory")
         
         # 如果没有提供memory对象，创建一个新的
         if memory is None:
@@ -339,64 +415,10 @@ class AsyncChatMemory:
             self.memory = memory
     
     def _init_memory(self):
-        """根据配置初始化AsyncMemory实例（本地或API模式）"""
+        """使用共享Memory后端的异步门面（与ChatMemory共享同一mem0实例）"""
         try:
-            if self.is_local:
-                from mem0 import AsyncMemory
-                from mem0.configs.base import MemoryConfig
-                
-                # 选择向量库
-                provider = getattr(self.config, 'VECTOR_STORE_PROVIDER', 'chroma').lower()
-                if provider == 'qdrant':
-                    vector_store = {
-                        "provider": "qdrant",
-                        "config": {
-                            "collection_name": getattr(self.config, 'QDRANT_COLLECTION_NAME', self.config.CHROMA_COLLECTION_NAME),
-                            "host": getattr(self.config, 'QDRANT_HOST', '127.0.0.1'),
-                            "port": int(getattr(self.config, 'QDRANT_PORT', 6333)),
-                            **({"api_key": self.config.QDRANT_API_KEY} if getattr(self.config, 'QDRANT_API_KEY', None) else {})
-                        }
-                    }
-                else:
-                    vector_store = {
-                        "provider": "chroma",
-                        "config": {
-                            "collection_name": self.config.CHROMA_COLLECTION_NAME,
-                            "path": self.config.CHROMA_PERSIST_DIRECTORY
-                        }
-                    }
-
-                memory_config = MemoryConfig(
-                    llm={
-                        "provider": self.config.MEM0_LLM_PROVIDER,
-                        "config": {
-                            "model": self.config.MEM0_LLM_CONFIG_MODEL,
-                            "max_tokens": self.config.MEM0_LLM_CONFIG_MAX_TOKENS
-                        }
-                    },
-                    vector_store=vector_store,
-                    embedder={
-                        "provider": "openai",
-                        "config": {
-                            "model": getattr(self.config, 'MEM0_EMBEDDER_MODEL', 'text-embedding-3-small'),
-                            "api_key": self.config.OPENAI_API_KEY,
-                            "openai_base_url": self.config.OPENAI_BASE_URL
-                        }
-                    }
-                )
-                
-                log.info(f"使用本地模式初始化AsyncMemory")
-                self.memory = AsyncMemory(config=memory_config)
-                if provider == 'chroma':
-                    os.makedirs(self.config.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
-            else:
-                from mem0 import AsyncMemoryClient
-                
-                if not self.config.MEM0_API_KEY:
-                    raise ValueError("API模式需要配置 MEM0_API_KEY")
-                
-                log.info(f"使用API模式初始化AsyncMemoryClient")
-                self.memory = AsyncMemoryClient(api_key=self.config.MEM0_API_KEY)
+            from core.memory_backend import get_memory_backend
+            self.memory = get_memory_backend(self.config).get_async_memory()
         except Exception as e:
             log.error(f"初始化AsyncMemory失败: {e}")
             raise
@@ -407,40 +429,151 @@ class AsyncChatMemory:
         return hashlib.md5(cache_str.encode()).hexdigest()
     
     def _invalidate_cache(self, conversation_id: str):
-        """清除指定会话的缓存"""
-        self._memory_cache.clear()  # 简化实现，清除所有缓存
-        log.debug(f"已清除所有Memory缓存")
+        """清除指定会话的缓存（不影响其他会话）"""
+        removed = self._memory_cache.invalidate(conversation_id)
+        log.debug(f"已清除会话Memory缓存: conversation_id={conversation_id}, 清除{removed}项")
+    
+    def get_cache_stats(self) -> dict:
+        """获取Memory检索缓存统计（含过期快照回退统计）"""
+        stats = self._memory_cache.get_stats()
+        served = self._swr_stats["fresh"] + self._swr_stats["stale"]
+        stats["stale_while_revalidate"] = {
+            "enabled": self.config.MEMORY_STALE_WHILE_REVALIDATE,
+            "max_age": self.config.MEMORY_STALE_MAX_AGE,
+            "snapshots": len(self._snapshots),
+            "inflight": len(self._inflight),
+            **self._swr_stats,
+            "stale_rate": f"{self._swr_stats['stale'] / served * 100:.1f}%" if served else "0.0%",
+        }
+        return stats
+    
+    def _get_snapshot(self, conversation_id: str):
+        """获取会话的最近成功检索快照，返回 (记忆列表, 陈旧秒数) 或 None"""
+        snapshot = self._snapshots.get(conversation_id)
+        if snapshot is None:
+            return None
+        result, updated_at = snapshot
+        return result, time.time() - updated_at
+    
+    async def _retrieve_and_store(self, conversation_id: str, cache_key: str, query: str,
+                                  limit: int, generation: int) -> list:
+        """检索记忆并回填缓存与会话快照"""
+        start = time.perf_counter()
+        with get_tracer().span("memory.retrieve", conversation_id=conversation_id, limit=limit) as span:
+            result = await self._retrieve_memory(conversation_id, query, limit)
+            span.set_attribute("results", len(result))
+        self._namespace_stats.record_load(time.perf_counter() - start)
+        # 缓存结果与快照（检索期间会话被写入或删除则都不回填，避免已删除的记忆作为过期数据返回）
+        if not self._memory_cache.store(conversation_id, cache_key, result, generation):
+            return result
+        if self.config.NEAR_DUPLICATE_ENABLED:
+            self._near_index.add(f"{conversation_id}:{limit}", query, cache_key)
+        # 空结果可能来自检索失败，不覆盖已有的可用快照
+        if result:
+            self._snapshots[conversation_id] = (result, time.time())
+        return result
+    
+    def _lookup_near_duplicate(self, conversation_id: str, query: str, limit: int):
+        """查找同一会话内近似重复查询的缓存结果，未命中返回 _CACHE_MISS"""
+        match = self._near_index.lookup(f"{conversation_id}:{limit}", query)
+        if match is None:
+            return _CACHE_MISS
+        cache_key, similarity = match
+        result = self._memory_cache.get(cache_key, _CACHE_MISS)
+        if result is _CACHE_MISS:
+            # 缓存条目已过期或因会话写入而失效
+            self._near_index.reject(cache_key)
+            return _CACHE_MISS
+        log.debug(f"💾 Memory缓存近似命中: conversation_id={conversation_id}, similarity={similarity:.2f}, 返回{len(result)}条记忆")
+        return result
+    
+    def _on_retrieval_done(self, inflight_key: tuple, task: asyncio.Task):
+        self._inflight.pop(inflight_key, None)
+        if not task.cancelled() and task.exception() is not None:
+            log.error(f"❌ 后台Memory检索失败: cache_key={inflight_key[0][:8]}..., error={task.exception()}")
     
     async def get_relevant_memory(self, conversation_id: str, query: str, limit: Optional[int] = None) -> list:
         """异步获取相关记忆 (带缓存和超时)"""
+        with get_tracer().span("memory.get_relevant", conversation_id=conversation_id) as span:
+            result = await self._get_relevant_memory(conversation_id, query, limit)
+            span.set_attributes(source=memory_retrieval_source.get(), results=len(result))
+            return result
+    
+    async def _get_relevant_memory(self, conversation_id: str, query: str, limit: Optional[int]) -> list:
         if limit is None:
             limit = self.config.MEMORY_RETRIEVAL_LIMIT
         
         # 检查缓存
         cache_key = self._get_cache_key(conversation_id, query, limit)
-        if cache_key in self._memory_cache:
-            cached_result = self._memory_cache[cache_key]
+        cached_result = self._memory_cache.lookup(cache_key)
+        if cached_result is not _CACHE_MISS:
+            self._namespace_stats.record_hit()
+            memory_retrieval_source.set("cache")
             log.debug(f"💾 Memory缓存命中: conversation_id={conversation_id}, cache_key={cache_key[:8]}..., 返回{len(cached_result)}条记忆")
             return cached_result
+        if self.config.NEAR_DUPLICATE_ENABLED:
+            cached_result = self._lookup_near_duplicate(conversation_id, query, limit)
+            if cached_result is not _CACHE_MISS:
+                self._namespace_stats.record_hit()
+                memory_retrieval_source.set("cache")
+                return cached_result
+        self._namespace_stats.record_miss()
+        generation = self._memory_cache.generation(conversation_id)
         
         log.debug(f"🔍 开始Memory检索: conversation_id={conversation_id}, query='{query[:100]}...', limit={limit}")
         try:
-            # 使用 asyncio.wait_for 实现超时
-            result = await asyncio.wait_for(
-                self._retrieve_memory(conversation_id, query, limit),
-                timeout=self.config.MEMORY_RETRIEVAL_TIMEOUT
-            )
+            # 相同缓存键、相同会话代数的并发检索共享同一个任务
+            inflight_key = (cache_key, generation)
+            task = self._inflight.get(inflight_key)
+            if task is not None:
+                self._namespace_stats.coalesced += 1
+            else:
+                task = asyncio.ensure_future(
+                    self._retrieve_and_store(conversation_id, cache_key, query, limit, generation)
+                )
+                self._inflight[inflight_key] = task
+                task.add_done_callback(lambda t, key=inflight_key: self._on_retrieval_done(key, t))
             
-            # 缓存结果
-            self._memory_cache[cache_key] = result
-            log.debug(f"✅ Memory检索完成，结果已缓存: conversation_id={conversation_id}, 找到{len(result)}条记忆, cache_key={cache_key[:8]}...")
+            # 使用 asyncio.wait 实现超时：超时后检索任务不会被取消
+            self._inflight_waiters[inflight_key] = self._inflight_waiters.get(inflight_key, 0) + 1
+            try:
+                done, _ = await asyncio.wait({task}, timeout=self.config.MEMORY_RETRIEVAL_TIMEOUT)
+            finally:
+                waiters = self._inflight_waiters.pop(inflight_key) - 1
+                if waiters:
+                    self._inflight_waiters[inflight_key] = waiters
+            if task in done and task.cancelled():
+                memory_retrieval_source.set("timeout")
+                return []
+            if task in done:
+                result = task.result()
+                self._swr_stats["fresh"] += 1
+                memory_retrieval_source.set("fresh")
+                log.debug(f"✅ Memory检索完成，结果已缓存: conversation_id={conversation_id}, 找到{len(result)}条记忆, cache_key={cache_key[:8]}...")
+                return result
             
-            return result
-        except asyncio.TimeoutError:
             log.warning(f"⏱️ Memory检索超时: conversation_id={conversation_id}, timeout={self.config.MEMORY_RETRIEVAL_TIMEOUT}s")
-            return []
+            memory_retrieval_source.set("timeout")
+            if not self.config.MEMORY_STALE_WHILE_REVALIDATE:
+                # 其他请求仍在等待同一任务时不取消
+                if not waiters:
+                    task.cancel()
+                return []
+            
+            # 检索继续在后台完成并刷新快照，本次请求返回最近一次成功的快照
+            self._swr_stats["background_refreshes"] += 1
+            snapshot = self._get_snapshot(conversation_id)
+            if snapshot is None:
+                self._swr_stats["empty_on_timeout"] += 1
+                return []
+            result, age = snapshot
+            self._swr_stats["stale"] += 1
+            memory_retrieval_source.set("stale")
+            log.info(f"♻️ 使用过期Memory快照: conversation_id={conversation_id}, {len(result)}条记忆, 陈旧{age:.1f}s")
+            return result
         except Exception as e:
             log.error(f"❌ Memory检索失败: conversation_id={conversation_id}, error={e}", exc_info=True)
+            memory_retrieval_source.set("error")
             return []
     
     async def _retrieve_memory(self, conversation_id: str, query: str, limit: int) -> list:
@@ -501,9 +634,6 @@ class AsyncChatMemory:
             content_preview = str(message.get("content", ""))[:100]  # 只记录前100个字符
             log.debug(f"💾 开始添加消息到记忆: conversation_id={conversation_id}, role={message.get('role')}, content='{content_preview}...'")
             
-            # 清除缓存
-            self._invalidate_cache(conversation_id)
-            
             metadata = {"role": message["role"]}
             if "timestamp" in message and message["timestamp"] is not None:
                 metadata["timestamp"] = message["timestamp"]
@@ -528,43 +658,49 @@ class AsyncChatMemory:
             log.debug(f"✅ 异步消息添加成功: conversation_id={conversation_id}, role={message.get('role')}")
         except Exception as e:
             log.error(f"❌ 异步消息添加失败: conversation_id={conversation_id}, error={e}", exc_info=True)
+        finally:
+            # 写入完成后再失效缓存，避免写入期间的检索结果回填旧数据
+            self._invalidate_cache(conversation_id)
     
     async def add_messages_batch(self, conversation_id: str, messages: list):
-        """异步批量添加消息"""
+        """异步批量添加消息（合并为一次 memory.add 调用）"""
+        if not messages:
+            return
+        span = get_tracer().span("memory.add_batch", conversation_id=conversation_id, messages=len(messages))
+        span.activate()
         try:
             log.debug(f"💾 开始批量添加消息到记忆: conversation_id={conversation_id}, 消息数量={len(messages)}")
             
-            # 清除缓存
-            self._invalidate_cache(conversation_id)
+            payload = [{"role": message["role"], "content": message["content"]} for message in messages]
+            roles = {message["role"] for message in messages}
+            # 单一角色保留原角色，多角色按对话记录处理
+            metadata = {"role": roles.pop() if len(roles) == 1 else "conversation"}
+            timestamps = [m["timestamp"] for m in messages if m.get("timestamp") is not None]
+            if timestamps:
+                metadata["timestamp"] = timestamps[-1]
             
-            for idx, message in enumerate(messages):
-                content_preview = str(message.get("content", ""))[:50]  # 只记录前50个字符
-                log.debug(f"💾 添加第{idx+1}/{len(messages)}条消息: conversation_id={conversation_id}, role={message.get('role')}, content='{content_preview}...'")
-                
-                metadata = {"role": message["role"]}
-                if "timestamp" in message and message["timestamp"] is not None:
-                    metadata["timestamp"] = message["timestamp"]
-                
-                if self.is_local:
-                    await self.memory.add(
-                        message["content"],
-                        user_id=conversation_id,
-                        metadata=metadata
-                    )
-                else:
-                    await self.memory.add(
-                        messages=[{
-                            "role": message["role"],
-                            "content": message["content"]
-                        }],
-                        user_id=conversation_id,
-                        metadata=metadata
-                    )
+            if self.is_local:
+                await self.memory.add(
+                    payload,
+                    user_id=conversation_id,
+                    metadata=metadata
+                )
+            else:
+                await self.memory.add(
+                    messages=payload,
+                    user_id=conversation_id,
+                    metadata=metadata
+                )
             
             log.debug(f"✅ 异步批量添加 {len(messages)} 条消息成功: conversation_id={conversation_id}")
         except Exception as e:
             log.error(f"❌ 异步批量添加消息失败: conversation_id={conversation_id}, error={e}", exc_info=True)
+            span.record_exception(e)
             raise
+        finally:
+            self._invalidate_cache(conversation_id)
+            span.deactivate()
+            span.end()
 
     async def get_all_memory(self, conversation_id: str) -> list:
         """异步获取所有记忆"""
@@ -625,13 +761,17 @@ class AsyncChatMemory:
 
     async def delete_memory(self, conversation_id: str):
         """异步删除记忆"""
+        # 先推进会话代数，进行中的检索不会再回填缓存与快照；记忆已删除，快照不能再作为回退数据
+        self._invalidate_cache(conversation_id)
+        self._snapshots.pop(conversation_id, None)
         try:
-            # 清除缓存
-            self._invalidate_cache(conversation_id)
-            
             await self.memory.delete_all(user_id=conversation_id)
         except Exception as e:
             log.error(f"Failed to delete async memory: {e}")
+        finally:
+            # 删除期间发起的检索可能读到删除前的数据
+            self._invalidate_cache(conversation_id)
+            self._snapshots.pop(conversation_id, None)
 
 
 # 全局实例
@@ -644,3 +784,13 @@ def get_async_chat_memory(memory=None):
         _async_chat_memory = AsyncChatMemory(memory)
     return _async_chat_memory
 
+
+def get_memory_cache_stats() -> dict:
+    """获取全局AsyncChatMemory的检索缓存统计（未初始化时返回空）"""
+    if _async_chat_memory is None:
+        return {}
+    try:
+        return _async_chat_memory.get_cache_stats()
+    except Exception as e:
+        log.error(f"获取Memory缓存统计失败: {e}")
+        return {}
@@ -0,0 +1,273 @@
+"""
+服务端会话日志
+客户端以 server_history=true 调用 /v1/chat/completions 时只上传新的用户消息，历史由服务端按 conversation_id 保存：
+- 进程内 LRU 为热层，可选追加写的持久层（Redis 列表 / 每会话一个 JSONL 文件），热层未命中时从持久层加载
+- 只追加不改写：一轮成功后把本轮用户消息与助手回复一起追加，失败的请求不留痕迹，客户端可直接重试
+- 每个会话只保留最近 CONVERSATION_LOG_MAX_MESSAGES 条
+持久层出错时记录日志并降级为仅进程内保存。
+"""
+import asyncio
+import hashlib
+import json
+import os
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from config.config import get_config
+from utils.log import log
+
+config = get_config()
+
+# 持久化的消息字段
+MESSAGE_FIELDS = ("role", "content", "name")
+
+
+def _clean(message: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: message[key] for key in MESSAGE_FIELDS if message.get(key) is not None}
+
+
+class ConversationLogBackend(ABC):
+    """追加写的持久层"""
+
+    @abstractmethod
+    async def load(self, conversation_id: str, limit: int) -> List[Dict[str, Any]]:
+        """读取最近 limit 条消息"""
+
+    @abstractmethod
+    async def append(self, conversation_id: str, messages: List[Dict[str, Any]]):
+        """追加消息"""
+
+    @abstractmethod
+    async def delete(self, conversation_id: str):
+        """删除会话"""
+
+    async def close(self):
+        pass
+
+    def get_name(self) -> str:
+        return self.__class__.__name__
+
+
+class RedisConversationLogBackend(ConversationLogBackend):
+    """Redis 列表：RPUSH 追加、LTRIM 限长、EXPIRE 续期，一次 pipeline 往返"""
+
+    def __init__(self, max_messages: int, ttl: int, prefix: str = "yychat:conversation_log"):
+        import redis.asyncio as aioredis
+
+        self.max_messages = max_messages
+        self.ttl = ttl
+        self.prefix = prefix
+        self.client = aioredis.Redis(
+            host=config.REDIS_HOST,
+            port=config.REDIS_PORT,
+            db=config.REDIS_DB,
+            password=config.REDIS_PASSWORD or None,
+            max_connections=config.REDIS_MAX_CONNECTIONS,
+            socket_timeout=config.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=config.REDIS_SOCKET_TIMEOUT,
+            protocol=2,
+        )
+        log.info(f"✅ 会话日志Redis持久层初始化完成 ({config.REDIS_HOST}:{config.REDIS_PORT})")
+
+    def _key(self, conversation_id: str) -> str:
+        return f"{self.prefix}:{conversation_id}"
+
+    async def load(self, conversation_id: str, limit: int) -> List[Dict[str, Any]]:
+        items = await self.client.lrange(self._key(conversation_id), -limit, -1)
+        return [json.loads(item) for item in items]
+
+    async def append(self, conversation_id: str, messages: List[Dict[str, Any]]):
+        key = self._key(conversation_id)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.rpush(key, *[json.dumps(m, ensure_ascii=False) for m in messages])
+            pipe.ltrim(key, -self.max_messages, -1)
+            if self.ttl:
+                pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def delete(self, conversation_id: str):
+        await self.client.delete(self._key(conversation_id))
+
+    async def close(self):
+        await self.client.aclose()
+
+
+class FileConversationLogBackend(ConversationLogBackend):
+    """每个会话一个 JSONL 文件（文件名为会话ID的哈希），文件读写在线程中执行"""
+
+    def __init__(self, directory: str, max_messages: int):
+        self.directory = directory
+        self.max_messages = max_messages
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, conversation_id: str) -> str:
+        name = hashlib.sha1(conversation_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{name}.jsonl")
+
+    def _read_lines(self, path: str) -> List[str]:
+        if not os.path.exists(path):
+            return []
+        with open(path, encoding="utf-8") as f:
+            return [line for line in f if line.strip()]
+
+    def _load(self, conversation_id: str, limit: int) -> List[Dict[str, Any]]:
+        return [json.loads(line) for line in self._read_lines(self._path(conversation_id))[-limit:]]
+
+    def _append(self, conversation_id: str, messages: List[Dict[str, Any]]):
+        path = self._path(conversation_id)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(m, ensure_ascii=False) + "\n" for m in messages))
+        # 文件超过两倍上限时压缩为最近的 max_messages 条
+        lines = self._read_lines(path)
+        if len(lines) > self.max_messages * 2:
+            tmp = f"{path}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write("".join(lines[-self.max_messages:]))
+            os.replace(tmp, path)
+
+    def _delete(self, conversation_id: str):
+        path = self._path(conversation_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def load(self, conversation_id: str, limit: int) -> List[Dict[str, Any]]:
+        return await asyncio.to_thread(self._load, conversation_id, limit)
+
+    async def append(self, conversation_id: str, messages: List[Dict[str, Any]]):
+        await asyncio.to_thread(self._append, conversation_id, messages)
+
+    async def delete(self, conversation_id: str):
+        await asyncio.to_thread(self._delete, conversation_id)
+
+
+class ConversationLog:
+    """进程内 LRU 热层 + 可选持久层"""
+
+    def __init__(self, backend: Optional[ConversationLogBackend] = None, max_messages: Optional[int] = None,
+                 max_conversations: Optional[int] = None):
+        self.backend = backend
+        self.max_messages = max_messages or config.CONVERSATION_LOG_MAX_MESSAGES
+        self.max_conversations = max_conversations or config.CONVERSATION_LOG_MAX_CONVERSATIONS
+        self._hot: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+
+        # 统计
+        self.loads = 0
+        self.hot_hits = 0
+        self.backend_loads = 0
+        self.appended_messages = 0
+        self.backend_errors = 0
+
+    def _put_hot(self, conversation_id: str, messages: List[Dict[str, Any]]):
+        self._hot[conversation_id] = messages
+        self._hot.move_to_end(conversation_id)
+        while len(self._hot) > self.max_conversations:
+            self._hot.popitem(last=False)
+
+    async def load(self, conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """读取会话最近的消息（返回新列表，消息字典与日志共享，调用方不应修改）"""
+        self.loads += 1
+        limit = limit or self.max_messages
+        messages = self._hot.get(conversation_id)
+        if messages is not None:
+            self.hot_hits += 1
+            self._hot.move_to_end(conversation_id)
+            return messages[-limit:]
+        messages = []
+        if self.backend is not None:
+            try:
+                messages = await self.backend.load(conversation_id, self.max_messages)
+                self.backend_loads += 1
+            except Exception as e:
+                self.backend_errors += 1
+                log.error(f"会话日志加载失败，按空历史处理: conversation_id={conversation_id}, error={e}")
+                return []
+        self._put_hot(conversation_id, messages)
+        return messages[-limit:]
+
+    async def append(self, conversation_id: str, messages: List[Dict[str, Any]]):
+        """追加一轮消息（用户消息 + 助手回复）"""
+        messages = [_clean(m) for m in messages if m.get("role") != "system"]
+        if not messages:
+            return
+        hot = self._hot.get(conversation_id)
+        if hot is None and self.backend is not None:
+            # 热层已淘汰：先从持久层加载，保证热层与持久层一致
+            await self.load(conversation_id)
+            hot = self._hot.get(conversation_id)
+        if hot is None:
+            hot = []
+        hot.extend(messages)
+        if len(hot) > self.max_messages:
+            del hot[:len(hot) - self.max_messages]
+        self._put_hot(conversation_id, hot)
+        self.appended_messages += len(messages)
+        if self.backend is not None:
+            try:
+                await self.backend.append(conversation_id, messages)
+            except Exception as e:
+                self.backend_errors += 1
+                log.error(f"会话日志持久化失败，仅保存在进程内: conversation_id={conversation_id}, error={e}")
+
+    async def delete(self, conversation_id: str) -> bool:
+        existed = self._hot.pop(conversation_id, None) is not None
+        if self.backend is not None:
+            try:
+                await self.backend.delete(conversation_id)
+            except Exception as e:
+                self.backend_errors += 1
+                log.error(f"会话日志删除失败: conversation_id={conversation_id}, error={e}")
+        return existed
+
+    async def close(self):
+        if self.backend is not None:
+            try:
+                await self.backend.close()
+            except Exception as e:
+                log.warning(f"关闭会话日志持久层失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.backend.get_name() if self.backend else "memory",
+            "conversations": len(self._hot),
+            "loads": self.loads,
+            "hot_hits": self.hot_hits,
+            "backend_loads": self.backend_loads,
+            "appended_messages": self.appended_messages,
+            "backend_errors": self.backend_errors,
+        }
+
+
+def _create_backend() -> Optional[ConversationLogBackend]:
+    kind = config.CONVERSATION_LOG_BACKEND.lower()
+    if kind == "memory":
+        return None
+    try:
+        if kind == "redis":
+            return RedisConversationLogBackend(config.CONVERSATION_LOG_MAX_MESSAGES, config.CONVERSATION_LOG_TTL)
+        if kind == "file":
+            return FileConversationLogBackend(config.CONVERSATION_LOG_DIR, config.CONVERSATION_LOG_MAX_MESSAGES)
+        log.warning(f"未知的CONVERSATION_LOG_BACKEND: {kind}，仅使用进程内会话日志")
+    except Exception as e:
+        log.error(f"初始化会话日志持久层失败，降级为进程内保存: {e}")
+    return None
+
+
+# 全局实例
+_conversation_log: Optional[ConversationLog] = None
+
+
+def get_conversation_log() -> ConversationLog:
+    """获取全局会话日志"""
+    global _conversation_log
+    if _conversation_log is None:
+        _conversation_log = ConversationLog(backend=_create_backend())
+    return _conversation_log
+
+
+async def close_conversation_log():
+    """关闭持久层连接（应用关闭时调用）"""
+    global _conversation_log
+    if _conversation_log is not None:
+        await _conversation_log.close()
+        _conversation_log = None
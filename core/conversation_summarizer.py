@@ -0,0 +1,256 @@
+"""
+会话滚动摘要
+客户端每轮重发最近 MAX_MESSAGE_HISTORY_COUNT 条原始消息，提示长度随历史增长直到被截断，被截断的内容直接丢失。
+本模块为每个会话维护一段滚动摘要：
+- 只有最近 CONVERSATION_SUMMARY_KEEP_RECENT 条消息以原文发送，更早的消息一旦被摘要覆盖就以摘要替代
+- 尚未被摘要覆盖的较早消息仍以原文发送（不丢上下文），同时在后台把它们并入摘要
+- 摘要更新在后台执行，请求路径只做哈希比对；同一会话同一时间只有一个摘要任务
+摘要由 compose_system_prompt 注入系统提示。
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config.config import get_config
+from utils.log import log
+from utils.tracing import detach_current_span
+
+config = get_config()
+
+SUMMARY_SYSTEM_PROMPT = (
+    "你负责维护一段对话摘要。把【新增对话】中的信息整合进【已有摘要】，输出更新后的完整摘要。"
+    "保留用户的身份信息、偏好、事实、做出的决定和尚未完成的事项，省略寒暄和重复内容。"
+    "使用第三人称，直接输出摘要正文，不超过{max_chars}字。"
+)
+# 摘要输入中每条消息的最大字符数
+MESSAGE_SNIPPET_CHARS = 500
+# 每个会话记录的已覆盖消息哈希上限
+MAX_COVERED_HASHES = 512
+
+ROLE_LABELS = {"user": "用户", "assistant": "助手", "tool": "工具结果"}
+
+
+def _message_text(message: Dict[str, Any]) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    text = content or ""
+    for call in message.get("tool_calls") or []:
+        function = call.get("function", {}) if isinstance(call, dict) else {}
+        text += f" [调用工具 {function.get('name', '')}({function.get('arguments', '')})]"
+    return text.strip()
+
+
+def message_fingerprint(message: Dict[str, Any]) -> bytes:
+    """消息指纹（角色 + 内容）"""
+    key = f"{message.get('role')}\x00{_message_text(message)}"
+    return hashlib.blake2b(key.encode("utf-8", "surrogatepass"), digest_size=12).digest()
+
+
+class _ConversationState:
+    """单个会话的摘要状态"""
+    __slots__ = ("summary", "covered", "task", "retry_after", "updated_at")
+
+    def __init__(self):
+        self.summary = ""
+        self.covered: "OrderedDict[bytes, None]" = OrderedDict()
+        self.task: Optional[asyncio.Task] = None
+        self.retry_after = 0.0
+        self.updated_at = 0.0
+
+    def cover(self, fingerprints: List[bytes]):
+        for fingerprint in fingerprints:
+            self.covered[fingerprint] = None
+        while len(self.covered) > MAX_COVERED_HASHES:
+            self.covered.popitem(last=False)
+
+
+class ConversationSummarizer:
+    """按会话维护滚动摘要，并据此压缩发送给模型的历史"""
+
+    def __init__(self, client: Any = None, model: Optional[str] = None, keep_recent: Optional[int] = None,
+                 min_messages: Optional[int] = None, max_chars: Optional[int] = None,
+                 max_conversations: Optional[int] = None, timeout: Optional[float] = None):
+        self._client = client
+        self.model = model or config.CONVERSATION_SUMMARY_MODEL or config.OPENAI_MODEL
+        self.keep_recent = keep_recent if keep_recent is not None else config.CONVERSATION_SUMMARY_KEEP_RECENT
+        self.min_messages = min_messages if min_messages is not None else config.CONVERSATION_SUMMARY_MIN_MESSAGES
+        self.max_chars = max_chars or config.CONVERSATION_SUMMARY_MAX_CHARS
+        self.max_conversations = max_conversations or config.CONVERSATION_SUMMARY_MAX_CONVERSATIONS
+        self.timeout = timeout or config.CONVERSATION_SUMMARY_TIMEOUT
+        self._states: "OrderedDict[str, _ConversationState]" = OrderedDict()
+        self._tasks: Set[asyncio.Task] = set()
+
+        # 统计
+        self.requests = 0
+        self.compacted_requests = 0
+        self.compacted_messages = 0
+        self.summaries = 0
+        self.failures = 0
+        self.summary_time = 0.0
+
+    @property
+    def client(self):
+        if self._client is None:
+            from core.openai_client import AsyncOpenAIClient
+            self._client = AsyncOpenAIClient()
+        return self._client
+
+    def _state(self, conversation_id: str) -> _ConversationState:
+        state = self._states.get(conversation_id)
+        if state is None:
+            state = self._states[conversation_id] = _ConversationState()
+            while len(self._states) > self.max_conversations:
+                _, evicted = self._states.popitem(last=False)
+                if evicted.task and not evicted.task.done():
+                    evicted.task.cancel()
+        else:
+            self._states.move_to_end(conversation_id)
+        return state
+
+    def get_summary(self, conversation_id: str) -> str:
+        state = self._states.get(conversation_id)
+        return state.summary if state else ""
+
+    def compact(self, conversation_id: str, history: List[Dict[str, Any]],
+                dropped: Optional[List[Dict[str, Any]]] = None) -> Tuple[List[Dict[str, Any]], str]:
+        """
+        压缩历史：返回 (要发送的消息, 要注入的摘要)
+        history 为本次请求的消息（已按条数截断），dropped 为被条数截断丢弃的更早消息
+        较早消息中从最前面开始已被摘要覆盖的部分以摘要替代，其余原文保留；未覆盖的消息交给后台摘要
+        """
+        self.requests += 1
+        head = 0
+        while head < len(history) and history[head].get("role") == "system":
+            head += 1
+        system, body = history[:head], history[head:]
+        boundary = max(len(body) - self.keep_recent, 0)
+        # 不把 tool 消息与其 assistant tool_calls 拆开
+        while 0 < boundary < len(body) and body[boundary].get("role") == "tool":
+            boundary -= 1
+        older = body[:boundary]
+        dropped = [m for m in (dropped or []) if m.get("role") != "system"]
+        if not older and not dropped:
+            return history, ""
+
+        state = self._state(conversation_id)
+        fingerprints = [message_fingerprint(m) for m in older]
+        covered = 0
+        while covered < len(older) and fingerprints[covered] in state.covered:
+            covered += 1
+        # 覆盖边界同样不能停在 tool 消息前
+        while 0 < covered < len(older) and older[covered].get("role") == "tool":
+            covered -= 1
+
+        pending = [m for m in dropped if message_fingerprint(m) not in state.covered]
+        pending += older[covered:]
+        self._schedule(conversation_id, state, pending)
+
+        if covered and state.summary:
+            self.compacted_requests += 1
+            self.compacted_messages += covered
+            log.debug(f"📝 会话摘要替代了 {covered} 条较早消息: conversation_id={conversation_id}")
+            return system + body[covered:], state.summary
+        return history, state.summary
+
+    def _schedule(self, conversation_id: str, state: _ConversationState, pending: List[Dict[str, Any]]):
+        if len(pending) < max(self.min_messages, 1):
+            return
+        if state.task is not None and not state.task.done():
+            return
+        if time.time() < state.retry_after:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._summarize(conversation_id, state, list(pending)))
+        state.task = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _build_request(self, summary: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        lines = []
+        for message in messages:
+            text = _message_text(message)
+            if text:
+                label = ROLE_LABELS.get(message.get("role"), message.get("role"))
+                lines.append(f"{label}: {text[:MESSAGE_SNIPPET_CHARS]}")
+        prompt = f"【已有摘要】\n{summary or '（无）'}\n\n【新增对话】\n" + "\n".join(lines)
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": SUMMARY_SYSTEM_PROMPT.format(max_chars=self.max_chars)},
+                {"role": "user", "content": prompt},
+            ],
+            "temperature": 0.2,
+            "max_tokens": self.max_chars * 2,
+        }
+
+    async def _summarize(self, conversation_id: str, state: _ConversationState, messages: List[Dict[str, Any]]):
+        # 摘要任务在请求中启动，不应计入该请求的追踪链路
+        detach_current_span()
+        start = time.time()
+        try:
+            response = await asyncio.wait_for(
+                self.client.create_chat(self._build_request(state.summary, messages)), timeout=self.timeout
+            )
+            summary = (response.choices[0].message.content or "").strip()
+            if not summary:
+                raise ValueError("摘要为空")
+            state.summary = summary[:self.max_chars * 2]
+            state.cover([message_fingerprint(m) for m in messages])
+            state.updated_at = time.time()
+            self.summaries += 1
+            log.debug(f"📝 会话摘要已更新: conversation_id={conversation_id}, 新增{len(messages)}条, 摘要{len(state.summary)}字")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failures += 1
+            state.retry_after = time.time() + config.CONVERSATION_SUMMARY_RETRY_INTERVAL
+            log.warning(f"会话摘要更新失败，较早消息继续以原文发送: conversation_id={conversation_id}, error={e}")
+        finally:
+            self.summary_time += time.time() - start
+
+    async def wait_idle(self):
+        """等待进行中的摘要任务完成（测试与关闭时使用）"""
+        if self._tasks:
+            await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    async def shutdown(self, timeout: float = 5.0):
+        """等待进行中的摘要任务，超时后取消"""
+        tasks = [t for t in self._tasks if not t.done()]
+        if not tasks:
+            return
+        _, not_done = await asyncio.wait(tasks, timeout=timeout)
+        for task in not_done:
+            task.cancel()
+        if not_done:
+            await asyncio.gather(*not_done, return_exceptions=True)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": config.CONVERSATION_SUMMARY_ENABLED,
+            "conversations": len(self._states),
+            "in_flight": len([t for t in self._tasks if not t.done()]),
+            "requests": self.requests,
+            "compacted_requests": self.compacted_requests,
+            "compacted_messages": self.compacted_messages,
+            "summaries": self.summaries,
+            "failures": self.failures,
+            "avg_summary_time": f"{self.summary_time / max(self.summaries + self.failures, 1):.3f}s",
+        }
+
+
+# 全局实例
+_conversation_summarizer: Optional[ConversationSummarizer] = None
+
+
+def get_conversation_summarizer() -> ConversationSummarizer:
+    """获取全局会话摘要器"""
+    global _conversation_summarizer
+    if _conversation_summarizer is None:
+        _conversation_summarizer = ConversationSummarizer()
+    return _conversation_summarizer
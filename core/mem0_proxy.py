@@ -3,12 +3,11 @@ import json
 import asyncio
 from typing import List, Dict, Any, Optional, Union, AsyncGenerator
 
-from mem0 import Memory
 from openai import OpenAI
-from mem0.proxy.main import Mem0
 from config.config import get_config
 from utils.log import log
 from core.chat_memory import ChatMemory, get_async_chat_memory
+from core.memory_backend import get_memory_backend
 from core.personality_manager import PersonalityManager
 from services.tools.manager import ToolManager
 from services.mcp.manager import get_mcp_manager
@@ -17,6 +16,9 @@ from services.mcp.exceptions import MCPServiceError, MCPServerNotFoundError, MCP
 from core.base_engine import BaseEngine, EngineCapabilities, EngineStatus
 # 工具规范化
 from core.tools_adapter import normalize_tool_calls, build_tool_response_messages
+from core.openai_client import AsyncOpenAIClient
+from core.memory_write_queue import get_memory_write_queue
+from core.request_coalescer import coalesce_requests
 # 性能监控
 from utils.performance import performance_monitor, PerformanceMetrics
 import uuid
@@ -32,75 +34,10 @@ class Mem0Client:
         self._init_client()
     
     def _init_client(self):
-        """初始化Mem0客户端"""
+        """初始化Mem0客户端（包装共享Memory后端，不再单独创建Memory实例）"""
         try:
-            if self.is_local:
-                # 本地配置
-                # 使用 Mem0 OSS 配置
-                # 根据 Mem0 官方文档规范化的配置
-                # 根据配置选择向量库提供者
-                if getattr(self.config, 'VECTOR_STORE_PROVIDER', 'chroma').lower() == 'qdrant':
-                    vector_store = {
-                        "provider": "qdrant",
-                        "config": {
-                            "collection_name": getattr(self.config, 'QDRANT_COLLECTION_NAME', self.config.CHROMA_COLLECTION_NAME),
-                            "host": getattr(self.config, 'QDRANT_HOST', '127.0.0.1'),
-                            "port": int(getattr(self.config, 'QDRANT_PORT', 6333)),
-                            **({"api_key": self.config.QDRANT_API_KEY} if getattr(self.config, 'QDRANT_API_KEY', None) else {})
-                        }
-                    }
-                else:
-                    vector_store = {
-                        "provider": "chroma",
-                        "config": {
-                            "collection_name": self.config.CHROMA_COLLECTION_NAME,
-                            "path": self.config.CHROMA_PERSIST_DIRECTORY
-                        }
-                    }
-
-                mem_config = {
-                    "vector_store": vector_store,
-                    "llm": {
-                        "provider": self.config.MEM0_LLM_PROVIDER,
-                        "config": {
-                            "api_key": self.config.OPENAI_API_KEY,
-                            "openai_base_url": self.config.OPENAI_BASE_URL,
-                            "model": self.config.MEM0_LLM_CONFIG_MODEL,
-                            "max_tokens": self.config.MEM0_LLM_CONFIG_MAX_TOKENS
-                        }
-                    },
-                    "embedder": {
-                        "provider": "openai",
-                        "config": {
-                            "model": self.config.MEM0_EMBEDDER_MODEL,  # 从配置文件读取嵌入模型
-                            "api_key": self.config.OPENAI_API_KEY,
-                            "openai_base_url": self.config.OPENAI_BASE_URL  # 自定义 OpenAI 服务器地址
-                        }
-                    }
-                }
-                
-                log.info(f"正在创建Mem0客户端，配置: {mem_config}")
-                self.client = Mem0(config=mem_config)
-                log.info("使用本地配置初始化Mem0客户端成功")
-
-                # 兼容本地 Memory.add 不支持 filters 参数的问题：移除 filters 以避免异常
-                try:
-                    if hasattr(self.client, 'mem0_client') and hasattr(self.client.mem0_client, 'add'):
-                        original_add = self.client.mem0_client.add
-
-                        def patched_add(*args, **kwargs):
-                            if 'filters' in kwargs:
-                                kwargs.pop('filters', None)
-                            return original_add(*args, **kwargs)
-
-                        self.client.mem0_client.add = patched_add
-                        log.debug("已为本地 Mem0 mem0_client.add 打补丁以移除不支持的 filters 参数")
-                except Exception as patch_err:
-                    log.warning(f"为本地 Mem0 添加 filters 兼容补丁失败: {patch_err}")
-            else:
-                # API密钥配置
-                self.client = Memory(api_key=self.config.MEM0_API_KEY)
-                log.info("使用Mem0 API密钥初始化客户端")
+            self.client = get_memory_backend(self.config).get_mem0_proxy()
+            log.info(f"使用共享Memory后端初始化Mem0客户端成功（{'本地' if self.is_local else 'API'}模式）")
         except Exception as e:
             log.error(f"初始化Mem0客户端失败: {e}")
             self.client = None
@@ -116,6 +53,8 @@ class OpenAIClient:
     def __init__(self, config):
         self.config = config
         self.client = None
+        # 原生异步客户端，与ChatEngine共享HTTP/2连接池
+        self.async_client = AsyncOpenAIClient()
         self._init_client()
 
     def _init_client(self):
@@ -136,6 +75,10 @@ class OpenAIClient:
         """获取OpenAI客户端"""
         return self.client
 
+    def get_async_client(self) -> AsyncOpenAIClient:
+        """获取原生异步OpenAI客户端"""
+        return self.async_client
+
 
 class PersonalityHandler:
     """人格处理器"""
@@ -167,30 +110,16 @@ class MemoryHandler:
 
     @property
     def chat_memory(self):
-        """延迟初始化ChatMemory，优先使用共享的Mem0客户端"""
+        """延迟初始化ChatMemory（与Mem0客户端共享同一Memory后端）"""
         if self._chat_memory is None:
-            if self.mem0_client and self.mem0_client.get_client():
-                # 使用共享的Mem0客户端，避免重复创建
-                log.debug("MemoryHandler: 使用共享的Mem0客户端创建ChatMemory")
-                # 从Mem0客户端获取底层的Memory实例
-                shared_memory = self.mem0_client.get_client().mem0_client
-                self._chat_memory = ChatMemory(memory=shared_memory)
-            else:
-                self._chat_memory = ChatMemory()
+            self._chat_memory = ChatMemory()
         return self._chat_memory
 
     @property
     def async_chat_memory(self):
-        """延迟初始化AsyncChatMemory，优先使用共享的Mem0客户端"""
+        """延迟初始化AsyncChatMemory（与Mem0客户端共享同一Memory后端）"""
         if self._async_chat_memory is None:
-            if self.mem0_client and self.mem0_client.get_client():
-                # 使用共享的Mem0客户端，避免重复创建
-                log.debug("MemoryHandler: 使用共享的Mem0客户端创建AsyncMemory")
-                # 从Mem0客户端获取底层的Memory实例
-                shared_memory = self.mem0_client.get_client().mem0_client
-                self._async_chat_memory = get_async_chat_memory(memory=shared_memory)
-            else:
-                self._async_chat_memory = get_async_chat_memory()
+            self._async_chat_memory = get_async_chat_memory()
         return self._async_chat_memory
 
     async def save_memory(self, messages: List[Dict[str, str]], response: Dict[str, Any], conversation_id: str):
@@ -205,6 +134,12 @@ class MemoryHandler:
         except Exception as e:
             log.error(f"保存记忆失败: {e}")
 
+    async def _enqueue(self, conversation_id: str, messages: List[Dict[str, str]]):
+        """加入Memory写后队列，由后台worker批量写入"""
+        # 先初始化AsyncChatMemory，确保写入使用共享的Mem0客户端
+        self.async_chat_memory
+        await get_memory_write_queue().enqueue(conversation_id, messages)
+
     async def _save_user_and_assistant_messages(self, messages: List[Dict[str, str]], response: Dict[str, Any], conversation_id: str):
         """保存用户输入和助手回复"""
         # 获取最后一条用户消息
@@ -215,33 +150,26 @@ class MemoryHandler:
                 break
 
         if user_message and response.get("content"):
-            # 异步保存消息到记忆
-            asyncio.create_task(self.async_chat_memory.add_message(
-                conversation_id=conversation_id,
-                message={"role": "user", "content": user_message.get("content", "")}
-            ))
-
-            asyncio.create_task(self.async_chat_memory.add_message(
-                conversation_id=conversation_id,
-                message={"role": "assistant", "content": response.get("content", "")}
-            ))
+            # 入队写后队列，同一会话的消息合并为一次写入
+            await self._enqueue(conversation_id, [
+                {"role": "user", "content": user_message.get("content", "")},
+                {"role": "assistant", "content": response.get("content", "")}
+            ])
 
     async def _save_user_messages(self, messages: List[Dict[str, str]], conversation_id: str):
         """只保存用户输入"""
-        for msg in messages:
-            if msg.get("role") == "user":
-                asyncio.create_task(self.async_chat_memory.add_message(
-                    conversation_id=conversation_id,
-                    message={"role": "user", "content": msg.get("content", "")}
-                ))
+        user_messages = [
+            {"role": "user", "content": msg.get("content", "")}
+            for msg in messages if msg.get("role") == "user"
+        ]
+        await self._enqueue(conversation_id, user_messages)
 
     async def _save_assistant_message(self, response: Dict[str, Any], conversation_id: str):
         """只保存助手回复"""
         if response.get("content"):
-            asyncio.create_task(self.async_chat_memory.add_message(
-                conversation_id=conversation_id,
-                message={"role": "assistant", "content": response.get("content", "")}
-            ))
+            await self._enqueue(conversation_id, [
+                {"role": "assistant", "content": response.get("content", "")}
+            ])
 
 
 class ToolHandler:
@@ -250,7 +178,7 @@ class ToolHandler:
     def __init__(self, config):
         self.config = config
         self.tool_manager = ToolManager()
-        self.mcp_manager = mcp_manager
+        self.mcp_manager = get_mcp_manager()
         self.personality_manager = PersonalityManager()
 
     async def get_allowed_tools(self, personality_id: Optional[str] = None) -> List[Dict]:
@@ -321,19 +249,12 @@ class ToolHandler:
             new_messages.extend(tool_response_messages)
 
             # 重新生成响应（递归调用，但不使用工具）
-            # 使用OpenAI客户端直接生成响应，避免循环导入
-            from openai import OpenAI
-            openai_client = OpenAI(
-                api_key=self.config.OPENAI_API_KEY,
-                base_url=self.config.OPENAI_BASE_URL
-            )
-            
-            response = await asyncio.to_thread(
-                openai_client.chat.completions.create,
-                messages=new_messages,
-                model=self.config.OPENAI_MODEL,
-                temperature=self.config.OPENAI_TEMPERATURE
-            )
+            # 使用共享的原生异步客户端生成响应，复用连接池
+            response = await AsyncOpenAIClient().create_chat({
+                "messages": new_messages,
+                "model": self.config.OPENAI_MODEL,
+                "temperature": self.config.OPENAI_TEMPERATURE
+            })
             
             if hasattr(response, 'choices') and response.choices:
                 message = response.choices[0].message
@@ -545,10 +466,10 @@ class ResponseHandler:
 
                     return result
 
-            return {"role": "assistant", "content": "无法生成响应"}
+            return {"role": "assistant", "content": "无法生成响应", "finish_reason": "error"}
         except Exception as e:
             log.error(f"处理非流式响应时出错: {e}")
-            return {"role": "assistant", "content": f"发生内部错误: {str(e)}"}
+            return {"role": "assistant", "content": f"发生内部错误: {str(e)}", "finish_reason": "error"}
 
 
 class FallbackHandler:
@@ -591,9 +512,13 @@ class FallbackHandler:
                 call_params["tools"] = await self.tool_handler.get_allowed_tools(personality_id)
                 call_params["tool_choice"] = "auto"
 
-            # 调用OpenAI API
+            # 调用OpenAI API（原生异步，不阻塞事件循环）
             api_start_time = time.time()
-            response = self.openai_client.get_client().chat.completions.create(**call_params)
+            async_client = self.openai_client.get_async_client()
+            if stream:
+                response = async_client.create_chat_stream(call_params)
+            else:
+                response = await async_client.create_chat(call_params)
             metrics.openai_api_time = time.time() - api_start_time
 
             if stream:
@@ -620,7 +545,7 @@ class FallbackHandler:
                     yield {"role": "assistant", "content": f"发生错误: {error_text}", "finish_reason": "error", "stream": True}
                 return error_generator()
             else:
-                return {"role": "assistant", "content": f"发生错误: {str(e)}"}
+                return {"role": "assistant", "content": f"发生错误: {str(e)}", "finish_reason": "error"}
 
     async def _handle_openai_streaming_response(self, response, conversation_id: str, original_messages: List[Dict]) -> AsyncGenerator[Dict[str, Any], None]:
         """处理OpenAI流式响应"""
@@ -713,10 +638,10 @@ class FallbackHandler:
 
                     return result
 
-            return {"role": "assistant", "content": "无法生成响应"}
+            return {"role": "assistant", "content": "无法生成响应", "finish_reason": "error"}
         except Exception as e:
             log.error(f"处理OpenAI非流式响应时出错: {e}")
-            return {"role": "assistant", "content": f"发生内部错误: {str(e)}"}
+            return {"role": "assistant", "content": f"发生内部错误: {str(e)}", "finish_reason": "error"}
 
     async def _wrap_fallback_streaming_response_with_performance(
         self, 
@@ -848,6 +773,7 @@ class Mem0ChatEngine(BaseEngine):
 
         return call_params
 
+    @coalesce_requests
     async def generate_response(
         self,
         messages: List[Dict[str, str]],
@@ -939,6 +865,8 @@ class Mem0ChatEngine(BaseEngine):
         try:
             first_chunk_time = None
             chunk_count = 0
+            # 上游流在首次迭代时才发起，从这里开始计算API耗时（不含人格与工具准备阶段）
+            stream_start_time = time.time()
             
             async for chunk in streaming_generator:
                 chunk_count += 1
@@ -953,7 +881,7 @@ class Mem0ChatEngine(BaseEngine):
             metrics.total_time = time.time() - total_start_time
             if first_chunk_time:
                 metrics.first_chunk_time = first_chunk_time - total_start_time
-            metrics.openai_api_time = metrics.total_time  # 流式响应中，总时间就是API时间
+            metrics.openai_api_time = time.time() - stream_start_time
             
             log.info(f"[PERF WRAPPER] 准备记录性能指标: ENABLE={self.config.ENABLE_PERFORMANCE_MONITOR}, total_time={metrics.total_time:.3f}s")
             if self.config.ENABLE_PERFORMANCE_MONITOR:
@@ -0,0 +1,226 @@
+"""
+共享Memory后端
+ChatMemory、AsyncChatMemory、Mem0Client 与 MemoryAdapter 共用进程内唯一的 mem0 实例：
+- Memory/MemoryClient 只创建一次，嵌入模型客户端、LLM客户端和向量库连接（Chroma/Qdrant）全部共享
+- 同步门面直接返回该实例；异步门面在有界线程池中执行同步调用
+- Mem0 代理（mem0.proxy.main.Mem0）包装同一实例，不再单独 Memory.from_config
+"""
+import asyncio
+import functools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from mem0.proxy.main import Chat, Mem0
+
+from config.config import get_config
+from utils.log import log
+from utils.tracing import get_tracer, wrap_context
+
+
+def build_vector_store_config(config) -> Dict:
+    """根据配置构建向量库配置（chroma 或 qdrant）"""
+    provider = getattr(config, 'VECTOR_STORE_PROVIDER', 'chroma').lower()
+    if provider == 'qdrant':
+        return {
+            "provider": "qdrant",
+            "config": {
+                "collection_name": getattr(config, 'QDRANT_COLLECTION_NAME', config.CHROMA_COLLECTION_NAME),
+                "host": getattr(config, 'QDRANT_HOST', '127.0.0.1'),
+                "port": int(getattr(config, 'QDRANT_PORT', 6333)),
+                **({"api_key": config.QDRANT_API_KEY} if getattr(config, 'QDRANT_API_KEY', None) else {})
+            }
+        }
+    return {
+        "provider": "chroma",
+        "config": {
+            "collection_name": config.CHROMA_COLLECTION_NAME,
+            "path": config.CHROMA_PERSIST_DIRECTORY
+        }
+    }
+
+
+def build_memory_config(config) -> Dict:
+    """构建本地模式的 MemoryConfig 参数（llm / vector_store / embedder）"""
+    return {
+        "llm": {
+            "provider": config.MEM0_LLM_PROVIDER,
+            "config": {
+                "api_key": getattr(config, 'OPENAI_API_KEY', None),
+                "openai_base_url": getattr(config, 'OPENAI_BASE_URL', None),
+                "model": config.MEM0_LLM_CONFIG_MODEL,
+                "max_tokens": config.MEM0_LLM_CONFIG_MAX_TOKENS
+            }
+        },
+        "vector_store": build_vector_store_config(config),
+        "embedder": {
+            "provider": "openai",
+            "config": {
+                "model": getattr(config, 'MEM0_EMBEDDER_MODEL', 'text-embedding-3-small'),
+                "api_key": getattr(config, 'OPENAI_API_KEY', None),
+                "openai_base_url": getattr(config, 'OPENAI_BASE_URL', None)
+            }
+        }
+    }
+
+
+class AsyncMemoryFacade:
+    """共享同步Memory的异步门面：方法调用在后端线程池中执行，接口与 AsyncMemory 一致"""
+
+    def __init__(self, memory, executor: ThreadPoolExecutor, stats: Dict):
+        self._memory = memory
+        self._executor = executor
+        self._stats = stats
+
+    def __getattr__(self, name):
+        # 底层不存在的方法抛出 AttributeError，保留调用方 get_relevant -> search 的降级链
+        attr = getattr(self._memory, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            self._stats["async_calls"] += 1
+            self._stats["async_inflight"] += 1
+            try:
+                with get_tracer().span(f"memory_backend.{name}", allow_root=False):
+                    # 携带当前上下文进入线程池，线程内的调用仍挂在同一条追踪链路上
+                    return await loop.run_in_executor(
+                        self._executor, wrap_context(functools.partial(attr, *args, **kwargs))
+                    )
+            finally:
+                self._stats["async_inflight"] -= 1
+
+        return call
+
+
+class _ProxyMemory:
+    """供 Mem0 代理使用的Memory包装：本地 Memory.add 不支持 filters 参数，调用前移除"""
+
+    def __init__(self, memory):
+        self._memory = memory
+
+    def add(self, *args, **kwargs):
+        kwargs.pop('filters', None)
+        return self._memory.add(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._memory, name)
+
+
+class SharedMem0(Mem0):
+    """
+    包装已有 Memory/MemoryClient 的 Mem0 代理
+    Mem0.__init__ 会按配置再创建一个 Memory，这里显式初始化相同的属性（mem0_client、chat）而不调用它；
+    依赖 mem0ai 2.x 的 Mem0 属性集合，由 test_memory_backend 中的契约测试校验
+    """
+
+    def __init__(self, mem0_client):
+        self.mem0_client = mem0_client
+        self.chat = Chat(mem0_client)
+
+
+class MemoryBackend:
+    """进程内共享的mem0后端"""
+
+    def __init__(self, config=None):
+        self.config = config or get_config()
+        self.is_local = self.config.MEMO_USE_LOCAL
+        self.max_workers = max(1, getattr(self.config, 'MEMORY_BACKEND_MAX_WORKERS', 8))
+        self._lock = threading.Lock()
+        self._memory = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._async_facade: Optional[AsyncMemoryFacade] = None
+        self._mem0_proxy = None
+        self.init_time = 0.0
+        self._stats = {"async_calls": 0, "async_inflight": 0}
+
+    def _create_memory(self):
+        """根据配置创建mem0实例（本地 Memory 或 API MemoryClient）"""
+        if self.is_local:
+            from mem0 import Memory
+            from mem0.configs.base import MemoryConfig
+
+            memory_config = MemoryConfig(**build_memory_config(self.config))
+            log.info(f"正在创建共享Memory后端（本地模式），配置: {memory_config}")
+            memory = Memory(config=memory_config)
+            if memory_config.vector_store.provider == 'chroma':
+                # 确保持久化目录存在
+                os.makedirs(self.config.CHROMA_PERSIST_DIRECTORY, exist_ok=True)
+            return memory
+
+        from mem0 import MemoryClient
+
+        if not self.config.MEM0_API_KEY:
+            raise ValueError("API模式需要配置 MEM0_API_KEY")
+        log.info("正在创建共享Memory后端（API模式）")
+        return MemoryClient(api_key=self.config.MEM0_API_KEY)
+
+    def get_sync_memory(self):
+        """同步门面：返回共享的 Memory/MemoryClient 实例"""
+        if self._memory is None:
+            with self._lock:
+                if self._memory is None:
+                    start = time.time()
+                    self._memory = self._create_memory()
+                    self.init_time = time.time() - start
+                    log.info(f"✅ 共享Memory后端初始化完成，耗时 {self.init_time:.2f}s")
+        return self._memory
+
+    def get_async_memory(self) -> AsyncMemoryFacade:
+        """异步门面：与同步门面共享同一实例"""
+        if self._async_facade is None:
+            memory = self.get_sync_memory()
+            with self._lock:
+                if self._async_facade is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="memory-backend"
+                    )
+                    self._async_facade = AsyncMemoryFacade(memory, self._executor, self._stats)
+        return self._async_facade
+
+    def get_mem0_proxy(self):
+        """返回包装共享实例的 Mem0 代理（chat.completions 接口）"""
+        if self._mem0_proxy is None:
+            memory = self.get_sync_memory()
+            target = _ProxyMemory(memory) if self.is_local else memory
+            with self._lock:
+                if self._mem0_proxy is None:
+                    self._mem0_proxy = SharedMem0(target)
+        return self._mem0_proxy
+
+    def shutdown(self):
+        """释放异步门面线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._async_facade = None
+
+    def get_stats(self) -> Dict:
+        """获取后端统计"""
+        return {
+            "mode": "local" if self.is_local else "api",
+            "initialized": self._memory is not None,
+            "init_time": f"{self.init_time:.3f}s",
+            "max_workers": self.max_workers,
+            "async_calls": self._stats["async_calls"],
+            "async_inflight": self._stats["async_inflight"],
+        }
+
+
+# 全局实例
+_memory_backend = None
+_memory_backend_lock = threading.Lock()
+
+
+def get_memory_backend(config=None) -> MemoryBackend:
+    """获取全局共享Memory后端（首次调用时的配置生效）"""
+    global _memory_backend
+    if _memory_backend is None:
+        with _memory_backend_lock:
+            if _memory_backend is None:
+                _memory_backend = MemoryBackend(config)
+    return _memory_backend
@@ -0,0 +1,243 @@
+"""
+Memory写后队列
+请求路径只负责入队，后台worker按会话合并消息后批量写入mem0：
+- 有界队列，队列满时按策略施加背压或丢弃
+- 同一会话的待写入消息合并为一次 memory.add 调用
+- 同一会话同一时间只有一个写入在执行，保证写入顺序
+- 应用关闭时在lifespan中刷盘
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from config.config import get_config
+from utils.log import log
+from utils.tracing import detach_current_span
+
+config = get_config()
+
+# 写入函数: (conversation_id, messages) -> Awaitable
+MemoryWriter = Callable[[str, List[Dict]], Awaitable]
+
+QUEUE_POLICIES = ("block", "drop_new", "drop_oldest")
+
+
+class _PendingBatch:
+    """单个会话的待写入消息"""
+    __slots__ = ("messages", "enqueued_at")
+
+    def __init__(self, messages: List[Dict], enqueued_at: float):
+        self.messages = messages
+        self.enqueued_at = enqueued_at
+
+
+class MemoryWriteQueue:
+    """按会话合并的Memory写后队列"""
+
+    def __init__(self, writer: Optional[MemoryWriter] = None, max_size: Optional[int] = None,
+                 workers: Optional[int] = None, policy: Optional[str] = None,
+                 put_timeout: Optional[float] = None):
+        self._writer = writer
+        self.max_size = max_size or config.MEMORY_WRITE_QUEUE_MAX_SIZE
+        self.workers = max(1, workers or config.MEMORY_WRITE_WORKERS)
+        self.policy = policy or config.MEMORY_WRITE_QUEUE_POLICY
+        if self.policy not in QUEUE_POLICIES:
+            log.warning(f"未知的MEMORY_WRITE_QUEUE_POLICY: {self.policy}，使用 block")
+            self.policy = "block"
+        self.put_timeout = config.MEMORY_WRITE_QUEUE_PUT_TIMEOUT if put_timeout is None else put_timeout
+
+        self._pending: "OrderedDict[str, _PendingBatch]" = OrderedDict()
+        self._in_flight = set()
+        self._depth = 0  # 待写入消息总数
+        self._loop = None
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._space: Optional[asyncio.Event] = None
+        self._closing = False
+
+        # 统计
+        self._lag_samples = deque(maxlen=1000)
+        self.enqueued_messages = 0
+        self.coalesced = 0
+        self.written_batches = 0
+        self.written_messages = 0
+        self.failed_batches = 0
+        self.dropped_messages = 0
+
+    # ---------- 生命周期 ----------
+
+    def _ensure_started(self):
+        """在当前事件循环中启动worker（事件循环变化时重新绑定，待写入数据保留）"""
+        loop = asyncio.get_running_loop()
+        if self._loop is loop and self._tasks and not all(t.done() for t in self._tasks):
+            return
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._space = asyncio.Event()
+        self._closing = False
+        self._in_flight.clear()
+        self._tasks = [loop.create_task(self._worker(i)) for i in range(self.workers)]
+        if self._pending:
+            self._wakeup.set()
+        log.debug(f"Memory写后队列已启动: workers={self.workers}, max_size={self.max_size}, policy={self.policy}")
+
+    async def shutdown(self, timeout: Optional[float] = None):
+        """刷盘并停止worker：等待已入队消息写入完成，超时后放弃剩余消息"""
+        timeout = config.MEMORY_WRITE_FLUSH_TIMEOUT if timeout is None else timeout
+        if not self._tasks:
+            return
+        self._closing = True
+        self._wakeup.set()
+        pending_before = self._depth
+        done, not_done = await asyncio.wait(self._tasks, timeout=timeout)
+        for task in not_done:
+            task.cancel()
+        if not_done:
+            await asyncio.gather(*not_done, return_exceptions=True)
+            log.warning(f"⚠️ Memory写后队列刷盘超时({timeout}s)，剩余 {self._depth} 条消息未写入")
+        else:
+            log.info(f"✅ Memory写后队列已刷盘: {pending_before} 条待写入消息已处理")
+        self._tasks = []
+
+    # ---------- 入队 ----------
+
+    async def enqueue(self, conversation_id: str, messages: List[Dict]) -> bool:
+        """入队待写入消息，返回是否被接受（被丢弃时返回False）"""
+        if not messages:
+            return True
+        self._ensure_started()
+        count = len(messages)
+
+        if self._depth + count > self.max_size and not await self._make_room(count):
+            self.dropped_messages += count
+            log.warning(f"⚠️ Memory写后队列已满({self._depth}/{self.max_size})，丢弃 {count} 条消息: conversation_id={conversation_id}")
+            return False
+
+        batch = self._pending.get(conversation_id)
+        if batch is None:
+            self._pending[conversation_id] = _PendingBatch(list(messages), time.time())
+        else:
+            # 合并到该会话尚未写入的批次
+            batch.messages.extend(messages)
+            self.coalesced += 1
+        self._depth += count
+        self.enqueued_messages += count
+        self._wakeup.set()
+        return True
+
+    async def _make_room(self, count: int) -> bool:
+        """按策略腾出空间"""
+        if self.policy == "drop_new" or count > self.max_size:
+            return False
+        if self.policy == "drop_oldest":
+            for conversation_id in list(self._pending.keys()):
+                if self._depth + count <= self.max_size:
+                    break
+                batch = self._pending.pop(conversation_id)
+                self._depth -= len(batch.messages)
+                self.dropped_messages += len(batch.messages)
+                log.warning(f"⚠️ Memory写后队列已满，丢弃最早的 {len(batch.messages)} 条消息: conversation_id={conversation_id}")
+            return self._depth + count <= self.max_size
+        # block: 等待worker消费出空间
+        deadline = time.time() + self.put_timeout
+        while self._depth + count > self.max_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return False
+            self._space.clear()
+            try:
+                await asyncio.wait_for(self._space.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    # ---------- 写入 ----------
+
+    def _next_ready(self) -> Optional[str]:
+        for conversation_id in self._pending:
+            if conversation_id not in self._in_flight:
+                return conversation_id
+        return None
+
+    async def _worker(self, worker_id: int):
+        # worker 在首个请求中启动，不应把之后所有批量写入都归到该请求的追踪链路
+        detach_current_span()
+        while True:
+            conversation_id = self._next_ready()
+            if conversation_id is None:
+                if self._closing and not self._pending and not self._in_flight:
+                    # 唤醒其他等待中的worker一起退出
+                    self._wakeup.set()
+                    return
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            batch = self._pending.pop(conversation_id)
+            self._in_flight.add(conversation_id)
+            self._depth -= len(batch.messages)
+            self._space.set()
+            try:
+                await self._write(conversation_id, batch.messages)
+                self.written_batches += 1
+                self.written_messages += len(batch.messages)
+            except Exception as e:
+                self.failed_batches += 1
+                log.error(f"❌ Memory写后队列写入失败: conversation_id={conversation_id}, 消息数={len(batch.messages)}, error={e}")
+            finally:
+                self._in_flight.discard(conversation_id)
+                self._lag_samples.append(time.time() - batch.enqueued_at)
+                if conversation_id in self._pending or self._closing:
+                    self._wakeup.set()
+
+    async def _write(self, conversation_id: str, messages: List[Dict]):
+        writer = self._writer
+        if writer is None:
+            from core.chat_memory import get_async_chat_memory
+            writer = get_async_chat_memory().add_messages_batch
+        await writer(conversation_id, messages)
+
+    # ---------- 统计 ----------
+
+    def get_stats(self) -> Dict:
+        """获取队列统计（深度、滞后、吞吐、丢弃）"""
+        lags = sorted(self._lag_samples)
+        oldest_age = 0.0
+        if self._pending:
+            oldest_age = time.time() - min(b.enqueued_at for b in self._pending.values())
+        lag = {}
+        if lags:
+            lag = {
+                "avg": f"{sum(lags) / len(lags):.3f}s",
+                "p95": f"{lags[min(int(len(lags) * 0.95), len(lags) - 1)]:.3f}s",
+                "max": f"{lags[-1]:.3f}s",
+            }
+        return {
+            "depth": self._depth,
+            "max_size": self.max_size,
+            "pending_conversations": len(self._pending),
+            "in_flight": len(self._in_flight),
+            "workers": len([t for t in self._tasks if not t.done()]),
+            "policy": self.policy,
+            "oldest_pending_age": f"{oldest_age:.3f}s",
+            "enqueued_messages": self.enqueued_messages,
+            "coalesced": self.coalesced,
+            "written_batches": self.written_batches,
+            "written_messages": self.written_messages,
+            "failed_batches": self.failed_batches,
+            "dropped_messages": self.dropped_messages,
+            "lag": lag,
+        }
+
+
+# 全局实例
+_memory_write_queue = None
+
+
+def get_memory_write_queue() -> MemoryWriteQueue:
+    """获取全局Memory写后队列"""
+    global _memory_write_queue
+    if _memory_write_queue is None:
+        _memory_write_queue = MemoryWriteQueue()
+    return _memory_write_queue
@@ -342,6 +342,10 @@ async def handle_audio_stream(client_id: str, message: dict):
         if not audio_data:
             return False
         return await voice_call_handler.handle_audio_stream(client_id, audio_data=audio_data, audio_base64=message.get("audio_base64"))
+    if scenario == "realtime_dialogue":
+        # 实时对话场景（start_realtime_dialogue）- 交给旧的实时处理器转发到Realtime API
+        from core.realtime_handler import realtime_handler
+        return await realtime_handler.handle_message(client_id, message)
     # 非语音通话场景不处理流式音频
     return True
 
@@ -1,5 +1,24 @@
 import asyncio
-from typing import Any, AsyncIterator, Dict
+import time
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI
+
+from config.config import get_config
+from utils.log import log
+
+config = get_config()
+
+# httpx 的 HTTP/2 支持依赖可选包 h2（httpx[http2]），缺失时回退到 HTTP/1.1
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+    log.warning("⚠️ 未安装 h2（pip install 'httpx[http2]'），上游连接回退到 HTTP/1.1")
 
 
 class AsyncOpenAIWrapper:
@@ -17,23 +36,245 @@ class AsyncOpenAIWrapper:
 
     async def create_chat_stream(self, request_params: Dict[str, Any]) -> AsyncIterator[Any]:
         params = {**request_params, "stream": True}
-        
+
         # 在后台线程中创建同步流
         def _create_stream():
             return self._client.chat.completions.create(**params)
-        
+
         sync_stream = await asyncio.to_thread(_create_stream)
-        
+
         # 将同步迭代器异步化
         def _next_chunk(iterator):
             try:
                 return next(iterator)
             except StopIteration:
                 return None
-        
+
         iterator = iter(sync_stream)
         while True:
             chunk = await asyncio.to_thread(_next_chunk, iterator)
             if chunk is None:
                 break
             yield chunk
+
+
+class OpenAIConnectionStats:
+    """
+    OpenAI 上游连接级指标（所有原生异步客户端共享）
+    - 请求数/流数/错误数/当前在途流
+    - 首个chunk耗时(TTFT)与流式chunk总数
+    - HTTP 协议版本与状态码分布（来自 httpx 事件钩子）
+    """
+
+    def __init__(self, max_samples: int = 1000):
+        self._lock = threading.Lock()
+        self._ttft_samples = deque(maxlen=max_samples)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests_total = 0
+            self.streams_total = 0
+            self.errors_total = 0
+            self.in_flight = 0
+            self.chunks_total = 0
+            self.http_responses = 0
+            self.http_versions: Dict[str, int] = {}
+            self.status_codes: Dict[str, int] = {}
+            self._ttft_samples.clear()
+
+    def on_request_start(self, stream: bool):
+        with self._lock:
+            self.requests_total += 1
+            self.in_flight += 1
+            if stream:
+                self.streams_total += 1
+
+    def on_request_end(self, error: bool = False):
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            if error:
+                self.errors_total += 1
+
+    def on_first_chunk(self, ttft: float):
+        with self._lock:
+            self._ttft_samples.append(ttft)
+
+    def on_chunk(self):
+        with self._lock:
+            self.chunks_total += 1
+
+    def on_http_response(self, http_version: str, status_code: int):
+        with self._lock:
+            self.http_responses += 1
+            self.http_versions[http_version] = self.http_versions.get(http_version, 0) + 1
+            key = str(status_code)
+            self.status_codes[key] = self.status_codes.get(key, 0) + 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = sorted(self._ttft_samples)
+            ttft = {}
+            if samples:
+                ttft = {
+                    "avg": f"{sum(samples) / len(samples):.3f}s",
+                    "p50": f"{samples[int(len(samples) * 0.5)]:.3f}s",
+                    "p95": f"{samples[min(int(len(samples) * 0.95), len(samples) - 1)]:.3f}s",
+                    "samples": len(samples),
+                }
+            return {
+                "requests_total": self.requests_total,
+                "streams_total": self.streams_total,
+                "errors_total": self.errors_total,
+                "in_flight": self.in_flight,
+                "chunks_total": self.chunks_total,
+                "http_responses": self.http_responses,
+                "http_versions": dict(self.http_versions),
+                "status_codes": dict(self.status_codes),
+                "first_chunk": ttft,
+            }
+
+
+# 全局连接指标
+openai_connection_stats = OpenAIConnectionStats()
+
+# 全局共享的原生异步客户端（连接池在所有引擎之间复用）
+_shared_async_openai: Optional[AsyncOpenAI] = None
+_shared_http_client: Optional[httpx.AsyncClient] = None
+
+
+async def _on_http_response(response: httpx.Response):
+    """httpx 响应事件钩子：记录协议版本与状态码"""
+    openai_connection_stats.on_http_response(response.http_version, response.status_code)
+
+
+def build_async_http_client() -> httpx.AsyncClient:
+    """按配置创建带连接池的 HTTP/2 异步客户端（未安装 h2 时使用 HTTP/1.1）"""
+    return httpx.AsyncClient(
+        follow_redirects=True,
+        verify=config.VERIFY_SSL,
+        http2=HTTP2_AVAILABLE,
+        timeout=httpx.Timeout(
+            connect=config.OPENAI_CONNECT_TIMEOUT,
+            read=config.OPENAI_READ_TIMEOUT,
+            write=config.OPENAI_WRITE_TIMEOUT,
+            pool=config.OPENAI_POOL_TIMEOUT
+        ),
+        limits=httpx.Limits(
+            max_connections=config.MAX_CONNECTIONS,
+            max_keepalive_connections=config.MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=config.KEEPALIVE_EXPIRY
+        ),
+        event_hooks={"response": [_on_http_response]}
+    )
+
+
+def get_shared_async_openai() -> AsyncOpenAI:
+    """获取全局共享的 AsyncOpenAI 客户端（延迟创建）"""
+    global _shared_async_openai, _shared_http_client
+    if _shared_async_openai is None:
+        _shared_http_client = build_async_http_client()
+        _shared_async_openai = AsyncOpenAI(
+            api_key=config.OPENAI_API_KEY,
+            base_url=config.OPENAI_BASE_URL,
+            timeout=config.OPENAI_API_TIMEOUT,
+            max_retries=config.OPENAI_API_RETRIES,
+            http_client=_shared_http_client
+        )
+        log.info("✅ 原生异步OpenAI客户端初始化完成 (HTTP/2 连接池)")
+    return _shared_async_openai
+
+
+async def close_shared_async_openai():
+    """关闭全局共享客户端，释放连接池（应用关闭时调用）"""
+    global _shared_async_openai, _shared_http_client
+    client = _shared_async_openai
+    _shared_async_openai = None
+    _shared_http_client = None
+    if client is not None:
+        try:
+            await client.close()
+            log.info("✅ 原生异步OpenAI客户端已关闭")
+        except Exception as e:
+            log.warning(f"关闭异步OpenAI客户端失败: {e}")
+
+
+def _get_pool_statistics() -> Dict[str, Any]:
+    """读取 httpx 连接池状态（依赖 httpcore 内部结构，失败时返回空）"""
+    if _shared_http_client is None:
+        return {}
+    try:
+        pool = _shared_http_client._transport._pool
+        connections = list(pool.connections)
+        return {
+            "connections": len(connections),
+            "idle_connections": sum(1 for c in connections if c.is_idle()),
+            "http2_connections": sum(1 for c in connections if "HTTP/2" in repr(c)),
+        }
+    except Exception:
+        return {}
+
+
+def get_openai_connection_stats() -> Dict[str, Any]:
+    """获取上游连接统计（请求指标 + 连接池状态）"""
+    stats = openai_connection_stats.to_dict()
+    stats["pool"] = _get_pool_statistics()
+    stats["native_async"] = config.OPENAI_NATIVE_ASYNC
+    return stats
+
+
+class AsyncOpenAIClient:
+    """
+    基于 openai.AsyncOpenAI 的原生异步客户端，接口与 AsyncOpenAIWrapper 一致：
+    - await create_chat(request_params)
+    - async for chunk in create_chat_stream(request_params)
+    流式响应直接在事件循环中读取，不再为每个 chunk 调度线程。
+    """
+
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        self._client = client
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        if self._client is None:
+            self._client = get_shared_async_openai()
+        return self._client
+
+    async def create_chat(self, request_params: Dict[str, Any]) -> Any:
+        openai_connection_stats.on_request_start(stream=False)
+        error = False
+        try:
+            return await self.client.chat.completions.create(**request_params)
+        except Exception:
+            error = True
+            raise
+        finally:
+            openai_connection_stats.on_request_end(error=error)
+
+    async def create_chat_stream(self, request_params: Dict[str, Any]) -> AsyncIterator[Any]:
+        params = {**request_params, "stream": True}
+        openai_connection_stats.on_request_start(stream=True)
+        start_time = time.time()
+        first_chunk = True
+        error = False
+        stream = None
+        try:
+            stream = await self.client.chat.completions.create(**params)
+            async for chunk in stream:
+                if first_chunk:
+                    openai_connection_stats.on_first_chunk(time.time() - start_time)
+                    first_chunk = False
+                openai_connection_stats.on_chunk()
+                yield chunk
+        except Exception:
+            error = True
+            raise
+        finally:
+            openai_connection_stats.on_request_end(error=error)
+            # 消费方提前退出时关闭响应，及时归还连接
+            close = getattr(stream, "close", None)
+            if close is not None:
+                try:
+                    await close()
+                except Exception:
+                    pass
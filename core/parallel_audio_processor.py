@@ -43,7 +43,7 @@ class ParallelAudioProcessor:
         """
         self.max_workers = max_workers
         self.timeout_seconds = timeout_seconds
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio-proc")
         self.processing_tasks: Dict[str, Future] = {}
         self.processing_stats = {
             'total_processed': 0,
@@ -15,6 +15,7 @@ class Personality(BaseModel):
     traits: List[str] = Field(default_factory=list, description="人格特质")
     examples: List[str] = Field(default_factory=list, description="对话示例")
     allowed_tools: List[Dict[str, str]] = Field(default_factory=list, description="允许使用的工具及使用条件")
+    response_cache_ttl: Optional[int] = Field(default=None, description="响应缓存TTL（秒），未设置时使用RESPONSE_CACHE_TTL，0表示不缓存")
 
 class PersonalityManager:
     def __init__(self, personalities_dir: str = "./personalities"):
@@ -1,16 +1,20 @@
 from typing import List, Dict
 
 
-def compose_system_prompt(existing_messages: List[Dict], personality_system: str, memory_section: str) -> List[Dict]:
+def compose_system_prompt(existing_messages: List[Dict], personality_system: str, memory_section: str,
+                          conversation_summary: str = "") -> List[Dict]:
     """
-    将人格与记忆合成一个 system 提示，放在队首；避免重复 system 叠加。
+    将人格、记忆与较早对话的摘要合成一个 system 提示，放在队首；避免重复 system 叠加。
     """
-    messages = [m.copy() for m in existing_messages]
+    # 只替换队首 system，不修改消息本身，浅拷贝列表即可
+    messages = list(existing_messages)
     system_blocks = []
     if personality_system:
         system_blocks.append(personality_system.strip())
     if memory_section:
         system_blocks.append(memory_section.strip())
+    if conversation_summary:
+        system_blocks.append(f"较早的对话摘要：\n{conversation_summary.strip()}")
     if system_blocks:
         merged = "\n\n".join(system_blocks)
         # 去除已有的开头 system，避免重复注入
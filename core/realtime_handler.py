@@ -941,7 +941,7 @@ class RealtimeMessageHandler:
             }
             
             # 建立WebSocket连接
-            websocket = await websockets.connect(url, extra_headers=headers)
+            websocket = await websockets.connect(url, additional_headers=headers)
             self.realtime_connections[client_id] = websocket
             
             # 启动消息处理任务
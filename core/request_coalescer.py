@@ -0,0 +1,202 @@
+"""
+相同并发请求合并（single-flight）
+重试风暴、重复点击、WebSocket 重连常在首个请求尚未完成时重发完全相同的
+(conversation_id, messages, personality_id, use_tools, stream)。本模块挂在引擎的 generate_response 前：
+- 相同请求在途时，后到的请求直接复用在途结果，不再发起新的上游调用和记忆写入
+- 非流式：共享同一个结果（返回浅拷贝）
+- 流式：上游流由后台任务读取并缓存，每个请求各自得到一个从头重放的异步生成器（tee）；
+  所有订阅者都断开时才取消上游流
+请求完成后立即从在途表移除，本模块不缓存已完成的响应。
+复用在途结果的请求会在调用方上下文中设置 coalesced_request，HTTP 处理器据此跳过
+会话日志追加、语音合成等只应由首个请求执行一次的副作用。
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+from contextvars import ContextVar
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+from config.config import get_config
+from utils.log import log
+
+config = get_config()
+
+# 当前请求是否复用了在途的相同请求（与 memory_retrieval_source 相同，在调用方的上下文中可读）
+coalesced_request: ContextVar[bool] = ContextVar("coalesced_request", default=False)
+
+# 参与合并键计算的参数
+KEY_ARGS = ("messages", "conversation_id", "personality_id", "use_tools", "stream")
+
+
+def request_key(engine: str, arguments: Dict[str, Any]) -> str:
+    """按引擎与请求参数计算合并键"""
+    payload = json.dumps([engine] + [arguments.get(name) for name in KEY_ARGS],
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+class _StreamFanout:
+    """把一个上游流分发给多个订阅者，晚到的订阅者从头重放已缓存的块"""
+
+    def __init__(self, source: AsyncGenerator[Dict[str, Any], None], on_cancel: Callable[[], None]):
+        self.source = source
+        self.chunks: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self._on_cancel = on_cancel
+        self._changed = asyncio.Event()
+        self._task = asyncio.get_running_loop().create_task(self._pump())
+
+    def _notify(self):
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _pump(self):
+        try:
+            async for chunk in self.source:
+                self.chunks.append(chunk)
+                self._notify()
+        except asyncio.CancelledError:
+            self.error = RuntimeError("上游流已取消")
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done = True
+            self._notify()
+            try:
+                await self.source.aclose()
+            except Exception:
+                pass
+
+    def subscribe(self) -> AsyncGenerator[Dict[str, Any], None]:
+        # 在交出生成器时计数（而非开始迭代时），避免订阅者尚未开始读取就被判定为全部断开
+        self.subscribers += 1
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncGenerator[Dict[str, Any], None]:
+        index = 0
+        try:
+            while True:
+                if index < len(self.chunks):
+                    chunk = self.chunks[index]
+                    index += 1
+                    yield dict(chunk)
+                    continue
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.done:
+                # 所有订阅者都已断开：先移出在途表，再取消上游流
+                self._on_cancel()
+                self._task.cancel()
+
+
+class RequestCoalescer:
+    """在途请求表：相同请求共享一次引擎调用"""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # 统计
+        self.requests = 0
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _release(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    async def run(self, key: str, call: Callable[[], Any], stream: bool) -> Any:
+        """执行或复用在途请求；call 为实际的引擎调用"""
+        self.requests += 1
+        coalesced_request.set(False)
+        while (future := self._inflight.get(key)) is not None:
+            try:
+                result = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # 首个请求被取消（客户端断开）而本请求仍有效：重新查找或自己执行
+                if not future.cancelled() or asyncio.current_task().cancelling():
+                    raise
+                continue
+            self.coalesced += 1
+            coalesced_request.set(True)
+            log.debug(f"🔗 合并相同的在途请求: key={key[:12]}, stream={stream}")
+            if isinstance(result, _StreamFanout):
+                return result.subscribe()
+            return dict(result) if isinstance(result, dict) else result
+
+        future = asyncio.get_running_loop().create_future()
+        # 无人等待时也取走异常，避免 "exception was never retrieved"
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        self.leaders += 1
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            self._release(key, future)
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            self._release(key, future)
+            raise
+
+        # stream=None 时由引擎按默认配置决定，以实际返回类型为准
+        if hasattr(result, "__aiter__"):
+            fanout = _StreamFanout(result, functools.partial(self._release, key, future))
+            fanout._task.add_done_callback(lambda _: self._release(key, future))
+            future.set_result(fanout)
+            return fanout.subscribe()
+        future.set_result(result)
+        self._release(key, future)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": config.REQUEST_COALESCING_ENABLED,
+            "in_flight": len(self._inflight),
+            "requests": self.requests,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+# 全局实例
+_request_coalescer: Optional[RequestCoalescer] = None
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """获取全局请求合并器"""
+    global _request_coalescer
+    if _request_coalescer is None:
+        _request_coalescer = RequestCoalescer()
+    return _request_coalescer
+
+
+def coalesce_requests(method):
+    """引擎 generate_response 的装饰器：相同的在途请求只执行一次"""
+    signature = inspect.signature(method)
+
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        if not config.REQUEST_COALESCING_ENABLED:
+            return await method(self, *args, **kwargs)
+        try:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            key = request_key(type(self).__name__, bound.arguments)
+        except Exception as e:
+            log.warning(f"计算请求合并键失败，直接执行: {e}")
+            return await method(self, *args, **kwargs)
+        stream = bool(bound.arguments.get("stream"))
+        return await get_request_coalescer().run(key, lambda: method(self, *args, **kwargs), stream)
+
+    return wrapper
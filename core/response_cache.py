@@ -0,0 +1,188 @@
+"""
+精确匹配响应缓存（可选）
+健康助手等人格会收到大量完全相同、与用户无关的问题。没有记忆上下文（也没有会话摘要）的请求，
+按规范化后的最终提示、人格、模型与工具集计算哈希，命中时直接返回缓存的回答：
+- 只缓存不含工具调用的普通回答（工具结果可能随时间变化），错误回复不缓存
+- 存储使用 utils/cache.py 的统一缓存命名空间（L1 进程内 + 可选 Redis L2）
+- TTL 可按人格配置：人格 JSON 中的 response_cache_ttl 覆盖 RESPONSE_CACHE_TTL，0 表示该人格不缓存
+- 流式请求命中时把回答切成与上游相近的小块重放，客户端无需特殊处理
+- 精确未命中时，在相同上下文（人格、模型、工具集与之前的消息）内按最后一条用户消息做近似重复查找
+  （utils/near_duplicate.py，本地 MinHash + LSH），覆盖改写与标点差异
+"""
+import hashlib
+import json
+import re
+import time
+from typing import Any, AsyncGenerator, Dict, List, NamedTuple, Optional
+
+from config.config import get_config
+from utils.cache import CacheNamespace, get_cache_namespace
+from utils.log import log
+from utils.near_duplicate import NearDuplicateIndex, get_near_duplicate_index
+
+config = get_config()
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# 重放时优先在这些标点之后切块
+_BREAK_CHARS = frozenset("，。！？；：,.!?;:\n")
+
+
+def _normalize_content(content: Any) -> Any:
+    if isinstance(content, str):
+        return _WHITESPACE_RE.sub(" ", content).strip()
+    return content
+
+
+def normalize_messages(messages: List[Dict[str, Any]]) -> List[List[Any]]:
+    """只保留影响回答的字段，并折叠空白"""
+    return [[m.get("role"), m.get("name"), _normalize_content(m.get("content"))] for m in messages]
+
+
+def split_for_replay(content: str, chunk_chars: int) -> List[str]:
+    """把缓存的回答切成与上游流相近的小块：不超过 chunk_chars，尽量在标点后断开"""
+    chunks = []
+    start = 0
+    while start < len(content):
+        end = min(start + chunk_chars, len(content))
+        if end < len(content):
+            for i in range(end - 1, start, -1):
+                if content[i] in _BREAK_CHARS:
+                    end = i + 1
+                    break
+        chunks.append(content[start:end])
+        start = end
+    return chunks
+
+
+class ResponseCacheLookup(NamedTuple):
+    """一次缓存查找：精确键，以及近似查找用的上下文范围与最后一条用户消息"""
+    key: str
+    scope: str
+    query: str
+
+
+def _digest(payload: Any) -> str:
+    data = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.blake2b(data.encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+
+
+class ResponseCache:
+    """按人格配置TTL的精确匹配响应缓存"""
+
+    def __init__(self, namespace: Optional[CacheNamespace] = None, default_ttl: Optional[int] = None,
+                 chunk_chars: Optional[int] = None, near_index: Optional[NearDuplicateIndex] = None):
+        self.default_ttl = config.RESPONSE_CACHE_TTL if default_ttl is None else default_ttl
+        self.chunk_chars = chunk_chars or config.RESPONSE_CACHE_REPLAY_CHUNK_CHARS
+        self.namespace = namespace or get_cache_namespace("response", default_ttl=self.default_ttl)
+        self.near_index = near_index or get_near_duplicate_index("response")
+        # 按人格统计：personality_id -> {hits, near_hits, misses, stores}
+        self._personality_stats: Dict[str, Dict[str, int]] = {}
+
+    def ttl_for(self, personality: Any) -> int:
+        """人格的缓存TTL（秒），0 表示不缓存"""
+        ttl = getattr(personality, "response_cache_ttl", None)
+        return self.default_ttl if ttl is None else ttl
+
+    def make_lookup(self, personality_id: Optional[str], request_params: Dict[str, Any]) -> ResponseCacheLookup:
+        """按规范化的最终提示、人格、模型和工具集计算缓存键；最后一条用户消息之外的部分构成近似查找范围"""
+        tool_names = sorted(
+            (tool.get("function") or {}).get("name", "") for tool in request_params.get("tools") or []
+        )
+        messages = request_params.get("messages") or []
+        query = ""
+        if messages and messages[-1].get("role") == "user" and isinstance(messages[-1].get("content"), str):
+            query = messages[-1]["content"]
+            messages = messages[:-1]
+        scope = _digest([
+            personality_id or "",
+            request_params.get("model"),
+            request_params.get("temperature"),
+            tool_names,
+            normalize_messages(messages),
+        ])
+        return ResponseCacheLookup(_digest([scope, _normalize_content(query)]), scope, query)
+
+    def make_key(self, personality_id: Optional[str], request_params: Dict[str, Any]) -> str:
+        return self.make_lookup(personality_id, request_params).key
+
+    def _count(self, personality_id: Optional[str], field: str):
+        stats = self._personality_stats.setdefault(
+            personality_id or "", {"hits": 0, "near_hits": 0, "misses": 0, "stores": 0}
+        )
+        stats[field] += 1
+
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """按精确键读取缓存的回答，出错时按未命中处理"""
+        try:
+            return await self.namespace.get(key)
+        except Exception as e:
+            log.warning(f"读取响应缓存失败，按未命中处理: {e}")
+            return None
+
+    async def find(self, lookup: ResponseCacheLookup, personality_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """精确查找，未命中时在相同上下文内查找近似重复的提问"""
+        entry = await self.get(lookup.key)
+        if entry:
+            self._count(personality_id, "hits")
+            return entry
+        if config.NEAR_DUPLICATE_ENABLED and lookup.query:
+            match = self.near_index.lookup(lookup.scope, lookup.query)
+            if match is not None:
+                key, similarity = match
+                try:
+                    entry = await self.namespace.peek(key)
+                except Exception as e:
+                    log.warning(f"读取响应缓存失败，按未命中处理: {e}")
+                if entry:
+                    log.debug(f"💾 响应缓存近似命中: personality={personality_id}, similarity={similarity:.2f}")
+                    self._count(personality_id, "near_hits")
+                    return entry
+                self.near_index.reject(key)
+        self._count(personality_id, "misses")
+        return None
+
+    async def set(self, key: str, content: str, model: Optional[str], ttl: int,
+                  personality_id: Optional[str] = None) -> bool:
+        """缓存一条普通回答（空回答不缓存）"""
+        if not content or ttl <= 0:
+            return False
+        try:
+            await self.namespace.set(key, {"content": content, "model": model, "created": time.time()}, ttl=ttl)
+            self._count(personality_id, "stores")
+            return True
+        except Exception as e:
+            log.warning(f"写入响应缓存失败: {e}")
+            return False
+
+    async def store(self, lookup: ResponseCacheLookup, content: str, model: Optional[str], ttl: int,
+                    personality_id: Optional[str] = None):
+        """缓存回答，并把最后一条用户消息登记到近似重复索引"""
+        if await self.set(lookup.key, content, model, ttl, personality_id) and config.NEAR_DUPLICATE_ENABLED \
+                and lookup.query:
+            self.near_index.add(lookup.scope, lookup.query, lookup.key)
+
+    async def replay(self, entry: Dict[str, Any]) -> AsyncGenerator[Dict[str, Any], None]:
+        """把缓存的回答按上游流的块格式重放"""
+        for part in split_for_replay(entry["content"], self.chunk_chars):
+            yield {"role": "assistant", "content": part, "finish_reason": None, "stream": True}
+        yield {"role": "assistant", "content": "", "finish_reason": "stop", "stream": True}
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": config.RESPONSE_CACHE_ENABLED,
+            "default_ttl": self.default_ttl,
+            "personalities": {pid or "default": dict(stats) for pid, stats in self._personality_stats.items()},
+            **self.namespace.stats.get_stats(),
+        }
+
+
+# 全局实例
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """获取全局响应缓存"""
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache()
+    return _response_cache
@@ -1,20 +1,190 @@
-from typing import List, Dict, Any
+"""
+Token 计量与预算
+- 编码器只加载一次（tiktoken 缺失或编码文件不可用时也只尝试一次），之后回退到按中日韩字符计数的快速估算
+- 单条文本的 token 数按内容哈希缓存（LRU），多轮对话中重复出现的历史消息不再重复编码
+- 按 token 预算裁剪历史：系统提示（人格 + 记忆）与工具 schema 先占用预算，剩余预算从最近的消息往前分配
+"""
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+
+from config.config import get_config
+from utils.log import log
+
+config = get_config()
+
+# 每条消息的格式开销（role/分隔符）与回复引导开销，参照 OpenAI 的 chat 计数方式
+MESSAGE_OVERHEAD_TOKENS = 3
+NAME_OVERHEAD_TOKENS = 1
+REPLY_PRIMING_TOKENS = 3
+
+# 中日韩字符（含全角标点）在 cl100k/o200k 下大多为 1 个及以上 token，其余文本约 4 字符 1 个 token
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uff00-\uffef]")
+
+
+def estimate_text_tokens(text: str) -> int:
+    """无编码器时的快速估算：中日韩字符按 1 个 token 计，其余按 4 字符 1 个 token 计"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+class TokenCounter:
+    """带内容哈希缓存的 token 计数器"""
+
+    def __init__(self, encoding_name: str = "cl100k_base", cache_size: int = 4096):
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self._encoder = None
+        self._encoder_loaded = False
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _get_encoder(self):
+        if not self._encoder_loaded:
+            with self._lock:
+                if not self._encoder_loaded:
+                    try:
+                        import tiktoken  # type: ignore
+                        self._encoder = tiktoken.get_encoding(self.encoding_name)
+                        log.debug(f"Token编码器已加载: {self.encoding_name}")
+                    except Exception as e:
+                        log.warning(f"Token编码器不可用，使用中日韩字符感知的估算: {e}")
+                    self._encoder_loaded = True
+        return self._encoder
+
+    def count_text(self, text: str) -> int:
+        """单段文本的 token 数（按内容哈希缓存）"""
+        if not text:
+            return 0
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached
+        encoder = self._get_encoder()
+        if encoder is not None:
+            try:
+                tokens = len(encoder.encode(text, disallowed_special=()))
+            except Exception:
+                tokens = estimate_text_tokens(text)
+        else:
+            tokens = estimate_text_tokens(text)
+        with self._lock:
+            self.misses += 1
+            self._cache[key] = tokens
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tokens
+
+    def count_content(self, content: Any) -> int:
+        """消息 content：字符串或多模态分段列表（只计文本段）"""
+        if isinstance(content, str):
+            return self.count_text(content)
+        if isinstance(content, list):
+            return sum(self.count_text(part.get("text") or "") for part in content
+                       if isinstance(part, dict) and part.get("type") == "text")
+        return 0
+
+    def count_message(self, message: Dict[str, Any]) -> int:
+        """单条消息（含格式开销、工具调用名称与参数）"""
+        tokens = MESSAGE_OVERHEAD_TOKENS + self.count_content(message.get("content"))
+        if message.get("name"):
+            tokens += NAME_OVERHEAD_TOKENS + self.count_text(message["name"])
+        for call in message.get("tool_calls") or []:
+            function = call.get("function", {}) if isinstance(call, dict) else {}
+            tokens += self.count_text(function.get("name") or "") + self.count_text(function.get("arguments") or "")
+        return tokens
+
+    def count_messages(self, messages: List[Dict[str, Any]]) -> int:
+        """整段对话发送给模型时的 token 数"""
+        if not messages:
+            return 0
+        return sum(self.count_message(m) for m in messages) + REPLY_PRIMING_TOKENS
+
+    def count_tools(self, tools_schema: Optional[List[Dict[str, Any]]]) -> int:
+        """工具 schema 的 token 数（按序列化后的 JSON 近似）"""
+        if not tools_schema:
+            return 0
+        return self.count_text(json.dumps(tools_schema, ensure_ascii=False, separators=(",", ":")))
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "encoder": self.encoding_name if self._encoder is not None else ("estimate" if self._encoder_loaded else "unloaded"),
+            "cache_size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+def trim_messages_to_budget(messages: List[Dict[str, Any]], budget: int,
+                            tools_schema: Optional[List[Dict[str, Any]]] = None,
+                            counter: Optional[TokenCounter] = None) -> List[Dict[str, Any]]:
+    """
+    按 token 预算裁剪历史：保留开头的系统提示和最后一条消息，其余从新到旧放入剩余预算
+    工具 schema 先计入预算；裁剪后不以孤立的 tool 消息开头（其 assistant tool_calls 已被裁掉）
+    budget <= 0 时不裁剪
+    """
+    if budget <= 0 or not messages:
+        return messages
+    counter = counter or get_token_counter()
+    head = 0
+    while head < len(messages) - 1 and messages[head].get("role") == "system":
+        head += 1
+    system, history = messages[:head], messages[head:]
+
+    remaining = (budget - REPLY_PRIMING_TOKENS - counter.count_tools(tools_schema)
+                 - sum(counter.count_message(m) for m in system) - counter.count_message(history[-1]))
+    keep = len(history) - 1
+    while keep > 0:
+        cost = counter.count_message(history[keep - 1])
+        if cost > remaining:
+            break
+        remaining -= cost
+        keep -= 1
+    while keep < len(history) - 1 and history[keep].get("role") == "tool":
+        keep += 1
+    if keep:
+        log.debug(f"按token预算({budget})裁剪历史: 丢弃最早的{keep}条消息，保留{len(history) - keep}条")
+        return system + history[keep:]
+    return messages
 
 
 def estimate_tokens(messages: List[Dict[str, Any]]) -> int:
     """
-    粗略估算 token 数。若无 tiktoken 依赖，回退到 char/4。
+    估算消息内容的 token 数（不含消息格式开销）。编码器不可用时使用中日韩字符感知的估算。
     """
-    try:
-        import tiktoken  # type: ignore
-        enc = tiktoken.get_encoding("cl100k_base")
-        text = "\n".join([(m.get("content") or "") for m in messages])
-        return len(enc.encode(text))
-    except Exception:
-        return sum(len(m.get("content", "")) for m in messages) // 4
+    counter = get_token_counter()
+    return sum(counter.count_content(m.get("content")) for m in messages)
 
 
 def should_include_memory(messages: List[Dict[str, Any]], memory_section: str, max_tokens: int, safety_ratio: float = 0.8) -> bool:
-    memory_tokens = len(memory_section) // 4
+    counter = get_token_counter()
+    memory_tokens = counter.count_text(memory_section)
     user_tokens = estimate_tokens(messages)
     return (memory_tokens + user_tokens) < int(max_tokens * safety_ratio)
+
+
+# 全局计数器
+_token_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """获取全局 token 计数器"""
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = TokenCounter(
+            encoding_name=getattr(config, "TOKENIZER_ENCODING", "cl100k_base"),
+            cache_size=getattr(config, "TOKEN_COUNT_CACHE_SIZE", 4096),
+        )
+    return _token_counter
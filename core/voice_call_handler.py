@@ -11,11 +11,22 @@ import os
 import ssl
 import websockets
 from typing import Dict, Any, Optional
-from utils.log import log
+from utils.log import get_logger, log
 from core.websocket_manager import websocket_manager
 from config.realtime_config import realtime_config
 from adapters.personality_adapter import personality_adapter
 
+_event_log = get_logger("realtime.event")
+_audio_delta_log = get_logger("voice.audio_delta")
+
+
+def _truncate_delta(data: dict) -> dict:
+    """日志用：截断过长的delta内容"""
+    delta_content = data.get("delta")
+    if isinstance(delta_content, str) and len(delta_content) > 15:
+        data = {**data, "delta": delta_content[:15] + "..."}
+    return data
+
 
 class VoiceCallHandler:
     """语音通话处理器 - 专门处理实时语音通话"""
@@ -333,7 +344,7 @@ class VoiceCallHandler:
                 ping_interval=20,  # 保持连接活跃
                 ping_timeout=10,   # 快速检测断线
                 close_timeout=5,    # 快速关闭
-                ssl=ssl_context  # 使用自定义SSL上下文（仅用于开发环境）
+                ssl=ssl_context if url.startswith("wss://") else None  # 使用自定义SSL上下文（仅用于开发环境）；ws:// 本地上游不能带ssl
             )
             self.realtime_connections[client_id] = websocket
             
@@ -488,14 +499,8 @@ class VoiceCallHandler:
         try:
             message_type = data.get("type")
             
-            # 处理日志显示，截断过长的delta内容
-            log_data = data.copy()
-            if "delta" in log_data and isinstance(log_data["delta"], str):
-                delta_content = log_data["delta"]
-                if len(delta_content) > 15:
-                    log_data["delta"] = delta_content[:15] + "..."
-            
-            log.debug(f"收到Realtime API消息: {client_id}, 类型: {message_type}, 数据: {log_data}")
+            # 处理日志显示，截断过长的delta内容（只在日志真正输出时复制事件）
+            _event_log.debug(lambda: f"收到Realtime API消息: {client_id}, 类型: {message_type}, 数据: {_truncate_delta(data)}")
             
             # 🔍 调试：记录所有消息类型，特别是转录相关的
             if "transcription" in message_type.lower() or "input_audio" in message_type.lower():
@@ -520,7 +525,8 @@ class VoiceCallHandler:
                     if sequence_number is not None:
                         # 使用OpenAI提供的sequence_number（最可靠！）
                         seq = sequence_number
-                        log.info(f"🎵 收到AI音频数据: {client_id}, 数据大小: {len(audio_data)}, sequence_number={seq}, item_id={item_id}, event_id={event_id}")
+                        _audio_delta_log.info("🎵 收到AI音频数据: {}, 数据大小: {}, sequence_number={}, item_id={}, event_id={}",
+                                              client_id, len(audio_data), seq, item_id, event_id)
                     else:
                         # 如果OpenAI没有提供sequence_number，使用后端生成的序列号（按item_id管理）
                         item_seq_key = f"audio_seq_{item_id}"
@@ -531,7 +537,8 @@ class VoiceCallHandler:
                             self.active_calls[client_id][item_seq_key] += 1
                         
                         seq = self.active_calls[client_id][item_seq_key]
-                        log.info(f"🎵 收到AI音频数据: {client_id}, 数据大小: {len(audio_data)}, seq={seq} (后端生成), item_id={item_id}, event_id={event_id}, sequence_number={sequence_number}")
+                        _audio_delta_log.info("🎵 收到AI音频数据: {}, 数据大小: {}, seq={} (后端生成), item_id={}, event_id={}, sequence_number={}",
+                                              client_id, len(audio_data), seq, item_id, event_id, sequence_number)
                     
                     receive_timestamp = time.time()
                     
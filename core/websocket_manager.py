@@ -8,7 +8,9 @@ import json
 import time
 from typing import Dict, List, Optional, Any
 from fastapi import WebSocket, WebSocketDisconnect
-from utils.log import log
+from utils.log import get_logger, log
+from utils.metrics import get_metrics_registry
+from utils.tracing import get_tracer
 from config.websocket_config import websocket_config
 from core.connection_pool import ConnectionPool
 from core.error_recovery import ErrorRecoveryManager, ErrorType
@@ -42,6 +44,17 @@ class ConnectionInfo:
         return time.time() - self.last_heartbeat > timeout
 
 
+# 下行消息计数与发送耗时（按消息类型）
+_ws_messages_sent = get_metrics_registry().counter(
+    "yychat_websocket_messages_sent", "WebSocket messages sent to clients", ("type", "status")
+)
+_ws_send_duration = get_metrics_registry().histogram(
+    "yychat_websocket_send_seconds", "WebSocket send latency", ("type",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+)
+_send_log = get_logger("ws.send")
+
+
 class WebSocketManager:
     """WebSocket连接管理器"""
     
@@ -184,26 +197,32 @@ class WebSocketManager:
             
             # 发送前输出结构化日志，便于排查串音
             msg_type = message.get("type", "unknown")
-            session_id = message.get("session_id") or message.get("conversation_id")
-            message_id = message.get("message_id")
             # 注释掉心跳消息的WS下行日志，减少日志噪音
             if msg_type not in ['heartbeat', 'heartbeat_response']:
-                log.debug(
-                    f"WS下行 | type={msg_type} client_id={client_id} session_id={session_id} message_id={message_id}"
+                _send_log.debug(
+                    "WS下行 | type={} client_id={} session_id={} message_id={}",
+                    msg_type, client_id, message.get("session_id") or message.get("conversation_id"),
+                    message.get("message_id")
                 )
 
-            # 发送消息
-            await connection_info.websocket.send_text(message_str)
+            # 发送消息（只在已有请求链路中记录span，心跳等独立消息不产生追踪）
+            send_start = time.perf_counter()
+            with get_tracer().span("ws.send", allow_root=False, type=msg_type, bytes=len(message_str)):
+                await connection_info.websocket.send_text(message_str)
+            _ws_send_duration.labels(msg_type).observe(time.perf_counter() - send_start)
+            _ws_messages_sent.labels(msg_type, "sent").inc()
             connection_info.increment_message_count()
             return True
             
         except WebSocketDisconnect:
+            _ws_messages_sent.labels(message.get("type", "unknown"), "disconnected").inc()
             log.info(f"客户端已断开连接: {client_id}")
             # 标记连接为不活跃，避免重复处理
             connection_info.is_active = False
             await self.disconnect(client_id)
             return False
         except Exception as e:
+            _ws_messages_sent.labels(message.get("type", "unknown"), "error").inc()
             log.error(f"发送消息失败: {client_id}, 错误: {e}")
             # 对于某些错误，标记连接为不活跃
             if "close message has been sent" in str(e) or "not connected" in str(e):
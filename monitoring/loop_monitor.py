@@ -0,0 +1,221 @@
+"""
+事件循环延迟监控与阻塞调用检测
+- 心跳任务按固定间隔 sleep，实际唤醒时间与预期之差即为事件循环延迟（lag）
+- 看门狗线程检查心跳是否超过阈值未推进；一旦超过，抓取事件循环线程当前的调用栈，
+  即正在占用事件循环的同步代码位置
+- 阻塞位置按调用点聚合（次数/总耗时/最长耗时/最近一次调用栈），延迟与阻塞同时导出为 OpenMetrics 指标
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from config.config import get_config
+from utils.log import log
+from utils.metrics import get_metrics_registry
+from utils.performance import QuantileSketch, RollingSketch
+from utils.tracing import detach_current_span
+
+config = get_config()
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_LIBRARY_MARKERS = ("site-packages", "dist-packages", f"{os.sep}lib{os.sep}python")
+
+_loop_lag = get_metrics_registry().histogram(
+    "yychat_event_loop_lag_seconds", "Event loop scheduling lag",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+)
+_loop_stalls = get_metrics_registry().counter("yychat_event_loop_stalls", "Event loop stalls above the blocking threshold")
+
+
+def _is_project_frame(filename: str) -> bool:
+    return filename.startswith(_PROJECT_ROOT) and not any(marker in filename for marker in _LIBRARY_MARKERS)
+
+
+def _blocking_site(frame) -> str:
+    """阻塞调用点：调用栈中最内层的项目代码帧（没有时取最内层帧）"""
+    innermost = None
+    while frame is not None:
+        code = frame.f_code
+        location = f"{os.path.relpath(code.co_filename, _PROJECT_ROOT) if _is_project_frame(code.co_filename) else code.co_filename}:{frame.f_lineno} {code.co_name}"
+        if innermost is None:
+            innermost = location
+        if _is_project_frame(code.co_filename) and not code.co_filename.endswith(os.path.join("monitoring", "loop_monitor.py")):
+            return location
+        frame = frame.f_back
+    return innermost or "unknown"
+
+
+class LoopLagMonitor:
+    """事件循环延迟监控器（心跳任务 + 看门狗线程）"""
+
+    def __init__(self, interval: float = 0.1, threshold: float = 0.1, max_events: int = 50, stack_depth: int = 30):
+        self.interval = interval
+        self.threshold = threshold
+        self.stack_depth = stack_depth
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._loop_thread_id: Optional[int] = None
+        self._beat = 0.0
+        self._beat_id = 0
+        self._captured_beat = -1
+        self._open_stall: Optional[Dict[str, Any]] = None
+        self._events: deque = deque(maxlen=max_events)
+        self._sites: Dict[str, Dict[str, Any]] = {}
+        self._lag = QuantileSketch()
+        self._recent_lag = RollingSketch(60, 6)
+        self._last_lag = 0.0
+        self.stalls = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """在事件循环中启动（重复调用无效果）"""
+        if self.running:
+            return
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.perf_counter()
+        self._stop.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+        log.info(f"✅ 事件循环监控已启动 (心跳间隔: {self.interval*1000:.0f}ms, 阻塞阈值: {self.threshold*1000:.0f}ms)")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=self.threshold + 1)
+            self._thread = None
+
+    async def _heartbeat(self):
+        detach_current_span()
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.perf_counter()
+            lag = max(0.0, now - expected)
+            with self._lock:
+                self._beat = now
+                self._beat_id += 1
+                stall, self._open_stall = self._open_stall, None
+            self._record_lag(lag, now)
+            if stall is not None:
+                self._close_stall(stall, lag)
+
+    def _record_lag(self, lag: float, now: float):
+        self._last_lag = lag
+        self._lag.add(lag)
+        self._recent_lag.add(lag, now)
+        _loop_lag.observe(lag)
+
+    def _watch(self):
+        """看门狗：心跳超过阈值未推进时抓取事件循环线程的调用栈（每次阻塞只抓一次）"""
+        while not self._stop.wait(self.threshold / 2):
+            with self._lock:
+                blocked_for = time.perf_counter() - self._beat - self.interval
+                if blocked_for < self.threshold or self._captured_beat == self._beat_id:
+                    continue
+                self._captured_beat = self._beat_id
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stall = {
+                "detected_at": time.time(),
+                "site": _blocking_site(frame),
+                "stack": traceback.format_stack(frame)[-self.stack_depth:],
+            }
+            with self._lock:
+                self._open_stall = stall
+
+    def _close_stall(self, stall: Dict[str, Any], duration: float):
+        stall["duration"] = duration
+        self.stalls += 1
+        _loop_stalls.inc()
+        site = self._sites.get(stall["site"])
+        if site is None:
+            site = self._sites[stall["site"]] = {"count": 0, "total": 0.0, "max": 0.0, "stack": []}
+        site["count"] += 1
+        site["total"] += duration
+        site["max"] = max(site["max"], duration)
+        site["stack"] = stall["stack"]
+        self._events.append(stall)
+        log.warning(f"⚠️ 事件循环被阻塞 {duration*1000:.0f}ms: {stall['site']}")
+
+    def get_blocking_sites(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """按总阻塞时间排序的阻塞调用点"""
+        sites = sorted(self._sites.items(), key=lambda item: item[1]["total"], reverse=True)[:limit]
+        return [
+            {
+                "site": name,
+                "count": site["count"],
+                "total": f"{site['total']:.3f}s",
+                "max": f"{site['max']:.3f}s",
+                "stack": "".join(site["stack"]),
+            }
+            for name, site in sites
+        ]
+
+    def get_stats(self, include_events: bool = False) -> Dict[str, Any]:
+        """获取延迟与阻塞统计"""
+        recent = self._recent_lag.snapshot(time.perf_counter())
+        stats = {
+            "running": self.running,
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "lag": {
+                "current": f"{self._last_lag * 1000:.1f}ms",
+                "avg": f"{self._lag.mean * 1000:.1f}ms",
+                "p99": f"{self._lag.quantile(0.99) * 1000:.1f}ms",
+                "max": f"{(self._lag.max if self._lag.count else 0) * 1000:.1f}ms",
+                "p99_1m": f"{recent.quantile(0.99) * 1000:.1f}ms",
+                "samples": self._lag.count,
+            },
+            "stalls": self.stalls,
+            "blocking_sites": self.get_blocking_sites(),
+        }
+        if include_events:
+            stats["recent_stalls"] = [
+                {**event, "duration": f"{event['duration']:.3f}s", "stack": "".join(event["stack"])}
+                for event in self._events
+            ]
+        return stats
+
+    def reset(self):
+        """清除统计（不停止监控）"""
+        with self._lock:
+            self._events.clear()
+            self._sites.clear()
+            self._lag = QuantileSketch()
+            self._recent_lag = RollingSketch(60, 6)
+            self.stalls = 0
+
+
+# 全局实例
+_loop_monitor: Optional[LoopLagMonitor] = None
+
+
+def get_loop_monitor() -> LoopLagMonitor:
+    """获取全局事件循环监控器"""
+    global _loop_monitor
+    if _loop_monitor is None:
+        _loop_monitor = LoopLagMonitor(
+            interval=config.LOOP_MONITOR_INTERVAL,
+            threshold=config.LOOP_MONITOR_BLOCK_THRESHOLD,
+            max_events=config.LOOP_MONITOR_MAX_EVENTS,
+        )
+    return _loop_monitor
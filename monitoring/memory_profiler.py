@@ -0,0 +1,298 @@
+"""
+内存分析：tracemalloc 快照对比与按子系统的字节统计
+- tracemalloc 只在显式启动后才开启（开启期间每次分配都有额外开销），停止后释放全部快照
+- 快照带标签保存（数量有上限），两份快照的分配差异按模块聚合，用于定位 RSS 持续增长的来源
+- 子系统统计：对按客户端增长的字典与缓存（VAD、音频流缓冲、语音通话、Mem0 客户端缓存、TTS 音频缓存）
+  做近似深度计量，直接看出哪一个在增长
+"""
+import os
+import sys
+import time
+import tracemalloc
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, List, Optional
+
+from config.config import get_config
+from utils.log import log
+
+config = get_config()
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_CONTAINERS = (dict, list, tuple, set, frozenset, deque)
+_ATOMIC = (bytes, bytearray, str, int, float, bool, type(None))
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def module_of(filename: str) -> str:
+    """文件路径 -> 模块名（项目内为点分模块路径，第三方库为顶层包名）"""
+    if filename.startswith(_PROJECT_ROOT):
+        relative = os.path.relpath(filename, _PROJECT_ROOT)
+        return os.path.splitext(relative)[0].replace(os.sep, ".").removesuffix(".__init__")
+    for marker in ("site-packages", "dist-packages"):
+        if marker in filename:
+            tail = filename.split(marker, 1)[1].lstrip(os.sep)
+            return tail.split(os.sep, 1)[0].removesuffix(".py")
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+def deep_sizeof(obj: Any, max_depth: int = 4, max_objects: int = 200000) -> int:
+    """
+    近似深度计量：容器与基础类型完整计入；普通对象计入自身与 __dict__，
+    递归深度与对象数有上限，共享对象只计一次
+    """
+    seen = set()
+    total = 0
+    stack = [(obj, 0)]
+    while stack and len(seen) < max_objects:
+        current, depth = stack.pop()
+        if id(current) in seen:
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current, 0)
+        if isinstance(current, _ATOMIC) or depth >= max_depth:
+            continue
+        if isinstance(current, dict):
+            for key, value in current.items():
+                stack.append((key, depth + 1))
+                stack.append((value, depth + 1))
+        elif isinstance(current, _CONTAINERS):
+            stack.extend((item, depth + 1) for item in current)
+        elif hasattr(current, "__dict__"):
+            stack.append((vars(current), depth + 1))
+    return total
+
+
+class MemoryProfiler:
+    """tracemalloc 快照管理与子系统字节统计"""
+
+    def __init__(self, max_snapshots: int = 5):
+        self.max_snapshots = max_snapshots
+        self._snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._subsystems: Dict[str, Callable[[], Dict[str, Any]]] = {}
+        self._started_here = False
+
+    # ---------- tracemalloc ----------
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> Dict[str, Any]:
+        """启动 tracemalloc（frames 为每次分配记录的调用栈深度）"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(max(1, frames))
+            self._started_here = True
+            log.info(f"🧠 tracemalloc 已启动 (frames={frames})")
+        return self.get_status()
+
+    def stop(self) -> Dict[str, Any]:
+        """停止 tracemalloc 并丢弃快照"""
+        if tracemalloc.is_tracing() and self._started_here:
+            tracemalloc.stop()
+            self._started_here = False
+            log.info("🧠 tracemalloc 已停止")
+        self._snapshots.clear()
+        return self.get_status()
+
+    def take_snapshot(self, label: Optional[str] = None) -> Dict[str, Any]:
+        """拍摄带标签的快照；超过上限时丢弃最早的快照"""
+        snapshot = self._capture()
+        if not label:
+            # 自动标签按秒生成，同一秒内的多次快照追加序号，避免互相覆盖
+            label = stamp = time.strftime("%H%M%S")
+            suffix = 1
+            while label in self._snapshots:
+                suffix += 1
+                label = f"{stamp}-{suffix}"
+        self._snapshots.pop(label, None)
+        self._snapshots[label] = {
+            "snapshot": snapshot,
+            "taken_at": time.time(),
+            "traced_bytes": sum(trace.size for trace in snapshot.traces),
+        }
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+        return self._describe(label)
+
+    def _capture(self) -> tracemalloc.Snapshot:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc 未启动")
+        return tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+
+    def _describe(self, label: str) -> Dict[str, Any]:
+        entry = self._snapshots[label]
+        return {
+            "label": label,
+            "taken_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["taken_at"])),
+            "traced_bytes": entry["traced_bytes"],
+        }
+
+    def list_snapshots(self) -> List[Dict[str, Any]]:
+        return [self._describe(label) for label in self._snapshots]
+
+    def delete_snapshot(self, label: str) -> bool:
+        return self._snapshots.pop(label, None) is not None
+
+    def _get_snapshot(self, label: str) -> tracemalloc.Snapshot:
+        if label not in self._snapshots:
+            raise KeyError(f"快照不存在: {label}")
+        return self._snapshots[label]["snapshot"]
+
+    def diff(self, base: str, target: Optional[str] = None, limit: int = 20,
+             group_by: str = "module") -> Dict[str, Any]:
+        """
+        对比两份快照的分配差异（target 为空时与当前状态对比，当前状态的快照不保存，
+        不会挤掉反复用作基线的旧快照）
+        group_by: module（按模块聚合）/ filename / lineno
+        """
+        base_snapshot = self._get_snapshot(base)
+        if target is None:
+            target, target_snapshot = "current", self._capture()
+        else:
+            target_snapshot = self._get_snapshot(target)
+        key_type = "lineno" if group_by == "lineno" else "filename"
+        stats = target_snapshot.compare_to(base_snapshot, key_type)
+
+        if group_by == "module":
+            grouped: Dict[str, Dict[str, int]] = {}
+            for stat in stats:
+                module = module_of(stat.traceback[0].filename)
+                entry = grouped.setdefault(module, {"size": 0, "size_diff": 0, "count": 0, "count_diff": 0})
+                entry["size"] += stat.size
+                entry["size_diff"] += stat.size_diff
+                entry["count"] += stat.count
+                entry["count_diff"] += stat.count_diff
+            rows = [{"key": module, **entry} for module, entry in grouped.items()]
+        else:
+            rows = [
+                {
+                    "key": f"{frame.filename}:{frame.lineno}" if key_type == "lineno" else frame.filename,
+                    "size": stat.size, "size_diff": stat.size_diff,
+                    "count": stat.count, "count_diff": stat.count_diff,
+                }
+                for stat in stats
+                for frame in (stat.traceback[0],)
+            ]
+        rows.sort(key=lambda row: abs(row["size_diff"]), reverse=True)
+        return {
+            "base": base,
+            "target": target,
+            "group_by": group_by,
+            "total_size_diff": sum(stat.size_diff for stat in stats),
+            "top": rows[:limit],
+        }
+
+    # ---------- 子系统统计 ----------
+
+    def register_subsystem(self, name: str, getter: Callable[[], Optional[Dict[str, Any]]]):
+        """
+        注册子系统：getter 返回 {名称: 对象} 的字典（子系统未加载时返回 None），
+        每个对象按 deep_sizeof 计量，可 len() 的对象同时给出条目数
+        """
+        self._subsystems[name] = getter
+
+    def get_subsystem_usage(self) -> Dict[str, Any]:
+        """各子系统的条目数与近似字节数"""
+        usage = {}
+        for name, getter in self._subsystems.items():
+            try:
+                parts = getter()
+            except Exception as e:
+                log.warning(f"子系统内存统计失败 {name}: {e}")
+                continue
+            if parts is None:
+                continue
+            detail = {}
+            for part, obj in parts.items():
+                detail[part] = {
+                    "entries": len(obj) if hasattr(obj, "__len__") else None,
+                    "bytes": deep_sizeof(obj),
+                }
+            usage[name] = {"bytes": sum(item["bytes"] for item in detail.values()), "parts": detail}
+        return dict(sorted(usage.items(), key=lambda item: item[1]["bytes"], reverse=True))
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {"tracing": tracemalloc.is_tracing(), "snapshots": self.list_snapshots()}
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            status.update({
+                "traced_current_bytes": current,
+                "traced_peak_bytes": peak,
+                "tracemalloc_overhead_bytes": tracemalloc.get_tracemalloc_memory(),
+                "frames": tracemalloc.get_traceback_limit(),
+            })
+        return status
+
+
+def _realtime_handler():
+    module = sys.modules.get("core.realtime_handler")
+    if module is None:
+        return None
+    return module.realtime_handler
+
+
+def _vad_usage():
+    handler = _realtime_handler()
+    if handler is None:
+        return None
+    return {"speech_segments": handler.vad.speech_segments, "frame_buffers": handler.vad.frame_buffers}
+
+
+def _audio_stream_buffer_usage():
+    handler = _realtime_handler()
+    if handler is None:
+        return None
+    buffer = handler.audio_buffer
+    return {
+        "buffers": buffer.buffers,
+        "client_metadata": buffer.client_metadata,
+        "sequence_counters": buffer.sequence_counters,
+    }
+
+
+def _voice_calls_usage():
+    module = sys.modules.get("core.voice_call_handler")
+    if module is None:
+        return None
+    return {"active_calls": module.voice_call_handler.active_calls}
+
+
+def _mem0_clients_usage():
+    module = sys.modules.get("core.mem0_proxy")
+    engine = getattr(module, "_mem0_proxy", None) if module is not None else None
+    if engine is None:
+        return None
+    # 客户端实例为共享的 Memory，只计字典本身与键，避免把整个 Memory 对象图算进来
+    return {"clients_cache": dict.fromkeys(engine.clients_cache)}
+
+
+def register_default_subsystems(profiler: "MemoryProfiler", audio_cache_getter: Optional[Callable] = None):
+    """注册按流量增长的默认子系统（只读取已加载的模块）"""
+    profiler.register_subsystem("vad", _vad_usage)
+    profiler.register_subsystem("audio_stream_buffer", _audio_stream_buffer_usage)
+    profiler.register_subsystem("voice_call_handler", _voice_calls_usage)
+    profiler.register_subsystem("mem0_clients", _mem0_clients_usage)
+    if audio_cache_getter is not None:
+        def _audio_cache_usage():
+            cache = audio_cache_getter()
+            if cache is None:
+                return None
+            return {"cache": cache.cache, "access_times": cache.access_times, "expires_at": cache.expires_at}
+        profiler.register_subsystem("audio_cache", _audio_cache_usage)
+
+
+# 全局实例
+_memory_profiler: Optional[MemoryProfiler] = None
+
+
+def get_memory_profiler() -> MemoryProfiler:
+    """获取全局内存分析器"""
+    global _memory_profiler
+    if _memory_profiler is None:
+        _memory_profiler = MemoryProfiler(max_snapshots=config.MEMORY_PROFILER_MAX_SNAPSHOTS)
+    return _memory_profiler
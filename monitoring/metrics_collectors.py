@@ -0,0 +1,149 @@
+"""
+OpenMetrics 抓取时采集器
+把各模块已有的统计接口（连接池、错误恢复、语音会话、缓存、写后队列、上游连接）转换为带标签的指标族。
+只在 /metrics 被抓取时读取，请求热路径上没有额外开销。
+"""
+import sys
+from typing import Callable, List, Optional
+
+from utils.log import log
+from utils.metrics import MetricFamily, MetricsRegistry, get_metrics_registry
+
+
+def collect_websocket(websocket_manager) -> List[MetricFamily]:
+    """WebSocket连接、连接池与错误恢复"""
+    connections = websocket_manager.get_connection_stats()
+    pool = websocket_manager.connection_pool.get_statistics()
+    recovery = websocket_manager.error_recovery.get_recovery_statistics()
+    return [
+        MetricFamily("yychat_websocket_connections", "gauge", "Open WebSocket connections")
+        .add(connections["active_connections"], state="active")
+        .add(connections["total_connections"] - connections["active_connections"], state="inactive"),
+        MetricFamily("yychat_connection_pool_active", "gauge", "Connections tracked by the connection pool")
+        .add(pool["active_connections"]),
+        MetricFamily("yychat_connection_pool_utilization", "gauge", "Connection pool utilization ratio")
+        .add(pool["pool_utilization"]),
+        MetricFamily("yychat_connection_pool_connections", "counter", "Connections accepted or dropped by the pool")
+        .add(pool["total_connections"], outcome="accepted")
+        .add(pool["dropped_connections"], outcome="dropped"),
+        MetricFamily("yychat_error_recovery_errors", "counter", "Errors handled by the recovery manager")
+        .add(recovery["recovered_errors"], outcome="recovered")
+        .add(recovery["failed_recoveries"], outcome="failed")
+        .add(recovery["abandoned_recoveries"], outcome="abandoned"),
+        MetricFamily("yychat_error_recovery_active", "gauge", "Errors currently being recovered")
+        .add(recovery["active_errors"]),
+    ]
+
+
+def collect_voice_sessions() -> List[MetricFamily]:
+    """语音会话数（只读取已加载的处理器，不为采集而导入它们）"""
+    family = MetricFamily("yychat_voice_sessions", "gauge", "Active voice sessions")
+    voice_module = sys.modules.get("core.voice_call_handler")
+    if voice_module is not None:
+        family.add(len(voice_module.voice_call_handler.active_calls), kind="voice_call")
+    realtime_module = sys.modules.get("core.realtime_handler")
+    if realtime_module is not None:
+        handler = realtime_module.realtime_handler
+        family.add(len(handler.realtime_connections), kind="realtime")
+        family.add(len(handler.speech_segments), kind="speech_segment")
+    return [family]
+
+
+def collect_caches() -> List[MetricFamily]:
+    """缓存命名空间、Memory检索缓存、写后队列与Memory后端"""
+    from core.chat_memory import get_memory_cache_stats
+    from core.memory_backend import get_memory_backend
+    from core.memory_write_queue import get_memory_write_queue
+    from utils.cache import get_cache_namespace_stats
+
+    requests = MetricFamily("yychat_cache_requests", "counter", "Cache lookups by namespace and result")
+    hit_ratio = MetricFamily("yychat_cache_hit_ratio", "gauge", "Cache hit ratio by namespace")
+    loads = MetricFamily("yychat_cache_loads", "counter", "Cache loader executions")
+    coalesced = MetricFamily("yychat_cache_coalesced", "counter", "Lookups that joined an in-flight load")
+    for name, stats in get_cache_namespace_stats().items():
+        total = stats["hits"] + stats["misses"]
+        requests.add(stats["hits"], namespace=name, result="hit").add(stats["misses"], namespace=name, result="miss")
+        hit_ratio.add(stats["hits"] / total if total else 0.0, namespace=name)
+        loads.add(stats["loads"] - stats["load_errors"], namespace=name, status="ok")
+        loads.add(stats["load_errors"], namespace=name, status="error")
+        coalesced.add(stats["coalesced"], namespace=name)
+    families = [requests, hit_ratio, loads, coalesced]
+
+    memory_cache = get_memory_cache_stats()
+    if memory_cache:
+        families.append(
+            MetricFamily("yychat_memory_cache_entries", "gauge", "Memory retrieval cache entries")
+            .add(memory_cache["size"])
+        )
+        families.append(
+            MetricFamily("yychat_memory_cache_removals", "counter", "Memory retrieval cache removals")
+            .add(memory_cache["evictions"], reason="eviction")
+            .add(memory_cache["expirations"], reason="expiration")
+            .add(memory_cache["invalidations"], reason="invalidation")
+        )
+
+    queue = get_memory_write_queue().get_stats()
+    families.append(
+        MetricFamily("yychat_memory_write_queue_depth", "gauge", "Messages waiting in the memory write-behind queue")
+        .add(queue["depth"], state="queued")
+        .add(queue["in_flight"], state="in_flight")
+    )
+    families.append(
+        MetricFamily("yychat_memory_write_queue_messages", "counter", "Messages handled by the write-behind queue")
+        .add(queue["enqueued_messages"], outcome="enqueued")
+        .add(queue["coalesced"], outcome="coalesced")
+        .add(queue["written_messages"], outcome="written")
+        .add(queue["dropped_messages"], outcome="dropped")
+    )
+    families.append(
+        MetricFamily("yychat_memory_backend_inflight", "gauge", "Memory backend calls running in the thread pool")
+        .add(get_memory_backend().get_stats()["async_inflight"])
+    )
+    return families
+
+
+def collect_upstream() -> List[MetricFamily]:
+    """上游 OpenAI 连接"""
+    from core.openai_client import get_openai_connection_stats
+
+    stats = get_openai_connection_stats()
+    families = [
+        MetricFamily("yychat_upstream_requests", "counter", "Upstream chat completion requests")
+        .add(stats["requests_total"] - stats["streams_total"], mode="non_stream")
+        .add(stats["streams_total"], mode="stream"),
+        MetricFamily("yychat_upstream_errors", "counter", "Upstream request errors").add(stats["errors_total"]),
+        MetricFamily("yychat_upstream_inflight", "gauge", "Upstream requests in flight").add(stats["in_flight"]),
+    ]
+    if stats["pool"]:
+        families.append(
+            MetricFamily("yychat_upstream_pool_connections", "gauge", "Upstream HTTP pool connections")
+            .add(stats["pool"]["idle_connections"], state="idle")
+            .add(stats["pool"]["connections"] - stats["pool"]["idle_connections"], state="busy")
+        )
+    return families
+
+
+def collect_audio_cache(audio_cache) -> List[MetricFamily]:
+    """TTS 音频缓存容量"""
+    if audio_cache is None:
+        return []
+    stats = audio_cache.get_stats()
+    return [
+        MetricFamily("yychat_audio_cache_entries", "gauge", "Cached TTS clips").add(stats["cache_size"]),
+        MetricFamily("yychat_audio_cache_bytes", "gauge", "Cached TTS audio size").add(stats["total_bytes"]),
+    ]
+
+
+def register_default_collectors(websocket_manager=None, audio_cache_getter: Optional[Callable] = None,
+                                registry: Optional[MetricsRegistry] = None) -> MetricsRegistry:
+    """注册应用的全部抓取时采集器"""
+    registry = registry or get_metrics_registry()
+    if websocket_manager is not None:
+        registry.register_collector("websocket", lambda: collect_websocket(websocket_manager))
+    registry.register_collector("voice_sessions", collect_voice_sessions)
+    registry.register_collector("caches", collect_caches)
+    registry.register_collector("upstream", collect_upstream)
+    if audio_cache_getter is not None:
+        registry.register_collector("audio_cache", lambda: collect_audio_cache(audio_cache_getter()))
+    log.debug("OpenMetrics 采集器已注册")
+    return registry
@@ -0,0 +1,150 @@
+"""
+按需采样分析器
+- 仅在被调用的 N 秒内运行一个采样线程，按固定间隔读取 sys._current_frames()，空闲时没有任何开销
+- 按线程分组：事件循环线程、TTS 线程池、并行音频处理线程池、默认 to_thread 线程池、Memory 后端线程池
+- 输出 collapsed stacks（flamegraph.pl / speedscope 可直接读取）：每行 "分组;帧;帧;... 次数"，帧从根到叶
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, Optional
+
+from config.config import get_config
+from utils.log import log
+
+config = get_config()
+
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 线程名前缀 -> 分组名（线程池通过 thread_name_prefix 命名）
+THREAD_GROUPS = {
+    "tts": "tts_executor",
+    "audio-proc": "audio_processor",
+    "asyncio": "to_thread",
+    "memory-backend": "memory_backend",
+}
+LOOP_GROUP = "event_loop"
+OTHER_GROUP = "other"
+
+
+class ProfilerBusyError(RuntimeError):
+    """已有采样正在进行"""
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_PROJECT_ROOT):
+        filename = os.path.relpath(filename, _PROJECT_ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{filename}:{code.co_name}"
+
+
+def _collapse(frame) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame.f_code))
+        frame = frame.f_back
+    labels.reverse()
+    return ";".join(labels)
+
+
+def _thread_group(thread_id: int, name: str, loop_thread_id: Optional[int]) -> str:
+    if thread_id == loop_thread_id:
+        return LOOP_GROUP
+    for prefix, group in THREAD_GROUPS.items():
+        if name.startswith(prefix):
+            return group
+    return OTHER_GROUP
+
+
+class SamplingProfiler:
+    """基于 sys._current_frames 的采样分析器（同一时间只允许一次采样）"""
+
+    def __init__(self, max_seconds: float = 60.0):
+        self.max_seconds = max_seconds
+        self._busy = threading.Lock()
+        self.last_profile: Optional[Dict[str, Any]] = None
+
+    @property
+    def running(self) -> bool:
+        return self._busy.locked()
+
+    def sample(self, seconds: float, interval: float = 0.005, loop_thread_id: Optional[int] = None,
+               groups: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """在当前线程中同步采样 seconds 秒"""
+        if not self._busy.acquire(blocking=False):
+            raise ProfilerBusyError("已有采样正在进行")
+        try:
+            return self._sample(min(seconds, self.max_seconds), max(interval, 0.001), loop_thread_id,
+                                set(groups) if groups else None)
+        finally:
+            self._busy.release()
+
+    def _sample(self, seconds: float, interval: float, loop_thread_id: Optional[int],
+                groups: Optional[set]) -> Dict[str, Any]:
+        own_id = threading.get_ident()
+        stacks: Counter = Counter()
+        samples_per_group: Counter = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                group = _thread_group(thread_id, names.get(thread_id, ""), loop_thread_id)
+                if groups is not None and group not in groups:
+                    continue
+                stacks[f"{group};{_collapse(frame)}"] += 1
+                samples_per_group[group] += 1
+            samples += 1
+            time.sleep(interval)
+        elapsed = time.perf_counter() - started
+        profile = {
+            "duration": round(elapsed, 3),
+            "interval": interval,
+            "samples": samples,
+            "samples_per_group": dict(samples_per_group),
+            "collapsed": "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()),
+        }
+        self.last_profile = profile
+        log.info(f"🔬 采样分析完成: {elapsed:.1f}s, {samples} 次采样, {len(stacks)} 条调用栈")
+        return profile
+
+    async def profile(self, seconds: float, interval: float = 0.005,
+                      groups: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        在事件循环中发起采样：采样在专用线程中进行（不占用 to_thread 线程池），
+        调用方所在线程即被视为事件循环线程
+        """
+        if self.running:
+            raise ProfilerBusyError("已有采样正在进行")
+        loop_thread_id = threading.get_ident()
+        future: Future = Future()
+
+        def run():
+            try:
+                future.set_result(self.sample(seconds, interval, loop_thread_id, groups))
+            except BaseException as e:
+                future.set_exception(e)
+
+        threading.Thread(target=run, name="sampling-profiler", daemon=True).start()
+        return await asyncio.wrap_future(future)
+
+
+# 全局实例
+_sampling_profiler: Optional[SamplingProfiler] = None
+
+
+def get_sampling_profiler() -> SamplingProfiler:
+    """获取全局采样分析器"""
+    global _sampling_profiler
+    if _sampling_profiler is None:
+        _sampling_profiler = SamplingProfiler(max_seconds=config.PROFILER_MAX_SECONDS)
+    return _sampling_profiler
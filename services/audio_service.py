@@ -11,9 +11,17 @@ from openai import OpenAI
 from utils.log import log
 from config.config import get_config
 from utils.audio_utils import AudioUtils
+from utils.cache import CacheNamespace, get_cache_namespace
+from utils.metrics import get_metrics_registry
+from utils.tracing import get_tracer
 
 config = get_config()
 
+# 语音上游调用耗时（stt / tts / tts_sync）
+_voice_upstream = get_metrics_registry().histogram(
+    "yychat_voice_upstream_seconds", "Speech API call latency", ("operation",)
+)
+
 
 class AudioService:
     """音频服务类"""
@@ -32,6 +40,12 @@ class AudioService:
             log.error(f"音频服务初始化失败: {e}")
             raise
     
+    def _get_tts_cache(self) -> CacheNamespace:
+        """TTS结果缓存命名空间（数据存储在AudioCache中）"""
+        if self.audio_cache is None:
+            self.audio_cache = AudioCache()
+        return get_cache_namespace("tts", backend=self.audio_cache, default_ttl=config.AUDIO_CACHE_TTL)
+    
     async def transcribe_audio(self, audio_data: bytes, model: str = None) -> str:
         """
         语音转文本
@@ -91,8 +105,10 @@ class AudioService:
                 api_params["language"] = config.STT_LANGUAGE
                 log.debug(f"使用指定语言进行转录: {config.STT_LANGUAGE}")
             
-            response = self.openai_client.audio.transcriptions.create(**api_params)
+            with get_tracer().span("audio.stt", model=model, bytes=len(audio_data)):
+                response = self.openai_client.audio.transcriptions.create(**api_params)
             processing_time = time.time() - start_time
+            _voice_upstream.labels("stt").observe(processing_time)
             
             # 获取转录结果
             if isinstance(response, str):
@@ -148,35 +164,30 @@ class AudioService:
             if speed < config.TTS_MIN_SPEED or speed > config.TTS_MAX_SPEED:
                 raise ValueError(f"语速必须在{config.TTS_MIN_SPEED}-{config.TTS_MAX_SPEED}之间")
             
-            # 检查缓存
-            if self.audio_cache is None:
-                self.audio_cache = AudioCache()
+            # 检查缓存（相同文本的并发请求只调用一次TTS API）
             cache_key = f"{text}_{voice}_{model}_{speed}"
-            cached_audio = await self.audio_cache.get(cache_key)
-            if cached_audio:
-                log.debug(f"使用缓存的TTS结果: {cache_key}")
-                return cached_audio
-            
-            # 调用OpenAI TTS API
-            start_time = time.time()
-            response = self.openai_client.audio.speech.create(
-                model=model,
-                voice=voice,
-                input=text,
-                speed=speed
-            )
-            processing_time = time.time() - start_time
-            
-            # 获取音频数据
-            audio_data = response.content
             
-            # 缓存结果
-            if self.audio_cache is None:
-                self.audio_cache = AudioCache()
-            await self.audio_cache.set(cache_key, audio_data)
+            async def _synthesize() -> bytes:
+                # 调用OpenAI TTS API
+                start_time = time.time()
+                with get_tracer().span("audio.tts.synthesize", model=model, voice=voice):
+                    response = self.openai_client.audio.speech.create(
+                        model=model,
+                        voice=voice,
+                        input=text,
+                        speed=speed
+                    )
+                processing_time = time.time() - start_time
+                _voice_upstream.labels("tts").observe(processing_time)
+                
+                # 获取音频数据
+                audio_data = response.content
+                log.info(f"文本转语音完成，耗时: {processing_time:.2f}s，音频大小: {len(audio_data)} bytes")
+                return audio_data
             
-            log.info(f"文本转语音完成，耗时: {processing_time:.2f}s，音频大小: {len(audio_data)} bytes")
-            return audio_data
+            # 缓存命中时 audio.tts 下没有 audio.tts.synthesize 子span
+            with get_tracer().span("audio.tts", chars=len(text)):
+                return await self._get_tts_cache().get_or_load(cache_key, _synthesize)
             
         except Exception as e:
             log.error(f"文本转语音失败: {e}")
@@ -264,6 +275,7 @@ class AudioService:
                 speed=speed
             )
             processing_time = time.time() - start_time
+            _voice_upstream.labels("tts_sync").observe(processing_time)
             audio_data = response.content
             log.info(f"文本转语音(同步)完成，耗时: {processing_time:.2f}s，音频大小: {len(audio_data)} bytes")
             return audio_data
@@ -365,6 +377,7 @@ class AudioCache:
         self.cache: Dict[str, bytes] = {}
         self.max_size = max_size
         self.access_times: Dict[str, float] = {}
+        self.expires_at: Dict[str, float] = {}
     
     async def get(self, key: str) -> Optional[bytes]:
         """
@@ -377,25 +390,33 @@ class AudioCache:
             Optional[bytes]: 音频数据，如果不存在返回None
         """
         if key in self.cache:
+            if self.expires_at.get(key, float("inf")) <= time.time():
+                await self.delete(key)
+                return None
             self.access_times[key] = time.time()
             log.debug(f"音频缓存命中: {key}")
             return self.cache[key]
         return None
     
-    async def set(self, key: str, audio_data: bytes):
+    async def set(self, key: str, audio_data: bytes, ttl: Optional[int] = None):
         """
         设置缓存音频数据
         
         Args:
             key: 缓存键
             audio_data: 音频数据
+            ttl: 过期时间（秒），为空时不过期
         """
         # 如果缓存已满，删除最旧的条目
-        if len(self.cache) >= self.max_size:
+        if key not in self.cache and len(self.cache) >= self.max_size:
             await self._evict_oldest()
         
         self.cache[key] = audio_data
         self.access_times[key] = time.time()
+        if ttl:
+            self.expires_at[key] = time.time() + ttl
+        else:
+            self.expires_at.pop(key, None)
         log.debug(f"音频缓存设置: {key}, 大小: {len(audio_data)} bytes")
     
     async def _evict_oldest(self):
@@ -404,14 +425,20 @@ class AudioCache:
             return
         
         oldest_key = min(self.access_times.keys(), key=lambda k: self.access_times[k])
-        del self.cache[oldest_key]
-        del self.access_times[oldest_key]
+        await self.delete(oldest_key)
         log.debug(f"删除最旧缓存条目: {oldest_key}")
     
+    async def delete(self, key: str):
+        """删除缓存条目"""
+        self.cache.pop(key, None)
+        self.access_times.pop(key, None)
+        self.expires_at.pop(key, None)
+    
     def clear(self):
         """清空缓存"""
         self.cache.clear()
         self.access_times.clear()
+        self.expires_at.clear()
         log.info("音频缓存已清空")
     
     def get_stats(self) -> Dict[str, Any]:
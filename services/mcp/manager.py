@@ -6,6 +6,7 @@ from typing import Any, Dict, List
 from config.config import get_config
 from services.mcp.exceptions import MCPServerNotFoundError, MCPToolNotFoundError, MCPServiceError
 from services.mcp.utils.mcp_client import McpClients
+from utils.tracing import get_tracer
 
 
 
@@ -73,6 +74,10 @@ class MCPManager:
     
     def call_tool(self, tool_name: str, arguments: Dict[str, Any], mcp_server: str = None) -> List[Dict]:
         """调用指定的MCP工具，可以选择特定的MCP服务器"""
+        with get_tracer().span("mcp.call_tool", tool=tool_name, server=mcp_server or "auto"):
+            return self._call_tool(tool_name, arguments, mcp_server)
+    
+    def _call_tool(self, tool_name: str, arguments: Dict[str, Any], mcp_server: str = None) -> List[Dict]:
         if not self._clients:
             raise MCPServiceError("MCP clients not initialized")
         try:
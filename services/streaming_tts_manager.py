@@ -7,6 +7,7 @@ from services.tts_segmenter import TTSSegmenter
 from services.audio_service import AudioService
 from core.websocket_manager import websocket_manager
 from utils.log import log
+from utils.tracing import get_tracer, wrap_context
 from config.config import get_config
 
 config = get_config()
@@ -21,7 +22,7 @@ class StreamingTTSManager:
         self.is_processing = False
         self.current_seq = 0  # 当前序列号
         # 线程池大小从配置读取
-        self.executor = ThreadPoolExecutor(max_workers=config.TTS_THREAD_POOL_SIZE)
+        self.executor = ThreadPoolExecutor(max_workers=config.TTS_THREAD_POOL_SIZE, thread_name_prefix="tts")
     
     def process_streaming_text(self, text_chunk: str, client_id: str, 
                              session_id: str, message_id: str, voice: str = None):
@@ -47,9 +48,9 @@ class StreamingTTSManager:
             # 分块处理
             segments = self.segmenter.segment_text(current_text)
             
-            # 处理完整的分块（线程池执行，不等待）
+            # 处理完整的分块（线程池执行，不等待；携带当前追踪上下文）
             for i, segment in enumerate(segments[:-1]):  # 除了最后一个
-                self.executor.submit(self._synthesize_and_send_sync, segment, client_id, session_id, message_id, voice, self.current_seq)
+                self.executor.submit(wrap_context(self._synthesize_and_send_sync), segment, client_id, session_id, message_id, voice, self.current_seq)
                 self.current_seq += 1
             
             # 保留最后一个不完整的分块
@@ -60,9 +61,9 @@ class StreamingTTSManager:
             # 强制分块
             segments = self.segmenter.segment_with_force_split(current_text)
             
-            # 处理完整的分块（线程池执行，不等待）
+            # 处理完整的分块（线程池执行，不等待；携带当前追踪上下文）
             for i, segment in enumerate(segments[:-1]):  # 除了最后一个
-                self.executor.submit(self._synthesize_and_send_sync, segment, client_id, session_id, message_id, voice, self.current_seq)
+                self.executor.submit(wrap_context(self._synthesize_and_send_sync), segment, client_id, session_id, message_id, voice, self.current_seq)
                 self.current_seq += 1
             
             # 保留最后一个不完整的分块
@@ -130,6 +131,8 @@ class StreamingTTSManager:
             voice: 语音类型
             seq: 序列号
         """
+        span = get_tracer().span("tts.segment", seq=seq, chars=len(text), message_id=message_id)
+        span.activate()
         try:
             # 合成语音
             audio_data = await self.audio_service.synthesize_speech(text, voice)
@@ -148,6 +151,10 @@ class StreamingTTSManager:
             
         except Exception as e:
             log.error(f"TTS synthesis failed: {e}")
+            span.record_exception(e)
+        finally:
+            span.deactivate()
+            span.end()
     
     def reset(self):
         """重置管理器状态"""
@@ -4,6 +4,8 @@ from typing import Dict, Any, Optional
 class Tool(ABC):
     # 添加工具类型属性，默认为None
     tool_type: Optional[str] = None
+    # 结果缓存时间（秒），None表示不缓存；只应为无副作用、结果短期稳定的工具设置
+    cache_ttl: Optional[int] = None
     
     @property
     @abstractmethod
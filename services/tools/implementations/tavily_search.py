@@ -7,6 +7,9 @@ from typing import Dict, Any  # 添加缺失的类型导入
 
 config = get_config()
 class TavilySearchTool(Tool):
+    # 相同查询短时间内结果稳定，缓存以避免重复调用搜索API
+    cache_ttl = config.TOOL_RESULT_CACHE_TTL
+
     @property
     def name(self) -> str:
         return "tavily_search"
@@ -1,8 +1,16 @@
 
 from typing import Dict, Any, Optional
 import asyncio  # 添加asyncio模块导入
+import json
+import time
 from .registry import tool_registry
+from utils.cache import get_cache_namespace, hash_key
 from utils.log import log
+from utils.metrics import get_metrics_registry
+from utils.tracing import get_tracer
+
+_tool_calls = get_metrics_registry().counter("yychat_tool_calls", "Tool executions", ("tool", "status"))
+_tool_duration = get_metrics_registry().histogram("yychat_tool_duration_seconds", "Tool execution latency", ("tool",))
 
 
 class ToolManager:
@@ -10,21 +18,41 @@ class ToolManager:
         tool = tool_registry.get_tool(tool_name)
         if not tool:
             log.warning(f"Tool {tool_name} not found")
+            # 未注册的工具名来自调用方输入，不作为标签值，避免标签基数失控
+            _tool_calls.labels("unknown", "not_found").inc()
             return {
                 "success": False, 
                 "error": f"工具 '{tool_name}' 未找到",
                 "tool_name": tool_name
             }
         
+        start_time = time.perf_counter()
+        span = get_tracer().span("tool.execute", tool=tool_name)
+        span.activate()
         try:
             # 异步执行工具
             log.debug(f"Executing tool: {tool_name} with params: {params}")
-            result = await tool.execute(params)
+            cache_ttl = getattr(tool, "cache_ttl", None)
+            if isinstance(cache_ttl, (int, float)) and cache_ttl > 0:
+                # 可缓存工具：相同参数的并发调用只执行一次，结果在cache_ttl内复用
+                cache_key = hash_key(tool_name, json.dumps(params, sort_keys=True, ensure_ascii=False, default=str))
+                result = await get_cache_namespace("tools").get_or_load(
+                    cache_key, lambda: tool.execute(params), ttl=cache_ttl
+                )
+            else:
+                result = await tool.execute(params)
             log.debug(f"Tool {tool_name} execution finished. Success: True")
+            _tool_calls.labels(tool_name, "success").inc()
             return {"success": True, "result": result, "tool_name": tool_name}
         except Exception as e:
             log.error(f"Error executing tool {tool_name}: {e}")
+            _tool_calls.labels(tool_name, "error").inc()
+            span.record_exception(e)
             return {"success": False, "error": str(e), "tool_name": tool_name}
+        finally:
+            _tool_duration.labels(tool_name).observe(time.perf_counter() - start_time)
+            span.deactivate()
+            span.end()
     
     async def execute_tools_concurrently(self, tool_calls: list) -> list:
         # 并行执行多个工具
@@ -0,0 +1,123 @@
+"""
+Minimal in-process Redis server (RESP2) for tests
+Supports the commands used by utils.cache: PING GET SET SETEX MGET DEL EXISTS FLUSHDB SELECT CLIENT
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+class FakeRedisServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        self.data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self.commands: List[str] = []
+        self.connections = 0
+        self.delay = 0.0
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.stop()
+
+    # ---------- RESP ----------
+
+    async def _read_command(self, reader) -> Optional[List[bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None
+        count = int(line[1:].strip())
+        args = []
+        for _ in range(count):
+            size = int((await reader.readline())[1:].strip())
+            args.append((await reader.readexactly(size + 2))[:-2])
+        return args
+
+    @staticmethod
+    def _encode(value) -> bytes:
+        if value is None:
+            return b"$-1\r\n"
+        if isinstance(value, bool) or value == "OK":
+            return b"+OK\r\n"
+        if isinstance(value, int):
+            return b":%d\r\n" % value
+        if isinstance(value, list):
+            return b"*%d\r\n" % len(value) + b"".join(FakeRedisServer._encode(v) for v in value)
+        if isinstance(value, Exception):
+            return b"-ERR %s\r\n" % str(value).encode()
+        if isinstance(value, str):
+            value = value.encode()
+        return b"$%d\r\n%s\r\n" % (len(value), value)
+
+    async def _handle(self, reader, writer):
+        self.connections += 1
+        try:
+            while True:
+                args = await self._read_command(reader)
+                if args is None:
+                    break
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+                writer.write(self._encode(self._execute(args)))
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    # ---------- commands ----------
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def _execute(self, args: List[bytes]):
+        name = args[0].decode().upper()
+        self.commands.append(name)
+        if name == "PING":
+            return b"PONG"
+        if name in ("SELECT", "CLIENT"):
+            return "OK"
+        if name == "GET":
+            return self._get(args[1])
+        if name == "MGET":
+            return [self._get(k) for k in args[1:]]
+        if name == "SET":
+            expires_at = None
+            options = [a.decode().upper() for a in args[3:]]
+            if "EX" in options:
+                expires_at = time.time() + int(options[options.index("EX") + 1])
+            if "PX" in options:
+                expires_at = time.time() + int(options[options.index("PX") + 1]) / 1000
+            self.data[args[1]] = (args[2], expires_at)
+            return "OK"
+        if name == "SETEX":
+            self.data[args[1]] = (args[3], time.time() + int(args[2]))
+            return "OK"
+        if name == "DEL":
+            return sum(1 for k in args[1:] if self.data.pop(k, None) is not None)
+        if name == "EXISTS":
+            return sum(1 for k in args[1:] if self._get(k) is not None)
+        if name == "FLUSHDB":
+            self.data.clear()
+            return "OK"
+        return Exception(f"unknown command '{name}'")
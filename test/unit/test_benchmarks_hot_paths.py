@@ -0,0 +1,65 @@
+"""
+benchmarks.bench_hot_paths tests
+Covers the timing helper, baseline storage and the regression comparator, and that every case still runs
+"""
+import asyncio
+import json
+
+import pytest
+
+from benchmarks.bench_hot_paths import (
+    BENCHMARKS, BenchResult, compare, load_baseline, measure, save_baseline,
+)
+
+
+def _result(name, seconds, reference=None):
+    return BenchResult(name=name, rounds=3, number=10, min=seconds, median=seconds, mean=seconds, stdev=0.0,
+                       reference=reference)
+
+
+class TestComparator:
+    def test_status_against_tolerance(self):
+        baseline = {"meta": {"tolerance": 0.2},
+                    "benchmarks": {"a": {"min": 1.0}, "b": {"min": 1.0, "tolerance": 1.0}, "c": {"min": 2.0}}}
+        results = [_result("a", 1.3), _result("b", 1.3), _result("c", 1.0), _result("d", 1.0)]
+        assert [c.status for c in compare(results, baseline)] == ["regressed", "ok", "improved", "new"]
+        assert compare(results, baseline, tolerance=0.5)[0].status == "ok"
+
+    def test_normalizes_by_reference_workload(self):
+        baseline = {"benchmarks": {"a": {"min": 1.0, "reference": 1.0}}}
+        # 机器整体慢了一倍：参考负载与被测函数同比变慢，不算回归
+        slower_machine = [_result("a", 2.0, reference=2.0)]
+        assert compare(slower_machine, baseline)[0].status == "ok"
+        assert compare(slower_machine, baseline, normalize=False)[0].status == "regressed"
+
+    def test_save_keeps_configured_tolerances(self, tmp_path):
+        path = str(tmp_path / "baselines" / "hot.json")
+        save_baseline(path, [_result("a", 1.0)], {"meta": {"tolerance": 0.4}, "benchmarks": {"a": {"tolerance": 1.0}}})
+        saved = load_baseline(path)
+        assert saved["meta"]["tolerance"] == 0.4
+        assert saved["benchmarks"]["a"]["tolerance"] == 1.0 and saved["benchmarks"]["a"]["min"] == 1.0
+        assert json.loads((tmp_path / "baselines" / "hot.json").read_text())["meta"]["python"]
+        assert load_baseline(str(tmp_path / "missing.json")) == {}
+
+
+class TestMeasure:
+    def test_sync_and_async_functions(self):
+        calls = []
+        result = measure("sync", lambda: calls.append(1), rounds=3, min_time=0.001)
+        assert result.number >= 1 and result.min <= result.median and len(calls) > result.number
+
+        async def coroutine():
+            await asyncio.sleep(0)
+
+        loop = asyncio.new_event_loop()
+        try:
+            assert measure("async", coroutine, rounds=2, min_time=0.001, loop=loop).rounds == 2
+        finally:
+            loop.close()
+
+
+@pytest.mark.parametrize("name", sorted(BENCHMARKS))
+def test_every_case_runs(name):
+    outcome = BENCHMARKS[name]()()
+    if asyncio.iscoroutine(outcome):
+        asyncio.run(outcome)
@@ -0,0 +1,124 @@
+"""
+benchmarks.mock_openai_upstream / benchmarks.load_chat / benchmarks.load_voice tests
+Covers the stand-in upstream endpoints used by the load generators and their result summaries
+"""
+import base64
+import json
+import struct
+from dataclasses import replace
+
+from fastapi.testclient import TestClient
+
+from benchmarks.load_chat import LoadResult, percentile
+from benchmarks.load_voice import VoiceStepResult, pcm16_tone
+from benchmarks.mock_openai_upstream import PROFILES, create_app
+
+TOOLS = [{"type": "function", "function": {"name": "get_weather", "parameters": {}}}]
+
+
+def _client(**overrides):
+    return TestClient(create_app(replace(PROFILES["instant"], **overrides)))
+
+
+def _sse(response):
+    return [json.loads(line[6:]) for line in response.text.splitlines()
+            if line.startswith("data: ") and line != "data: [DONE]"]
+
+
+class TestMockUpstream:
+    def test_stream_tokens_and_tool_calls(self):
+        client = _client(tokens=3, tool_call_rate=1.0)
+        chunks = _sse(client.post("/v1/chat/completions", json={"messages": [], "stream": True}))
+        assert [c["choices"][0]["delta"].get("content") for c in chunks[:3]] == ["你好"] * 3
+        assert chunks[-1]["choices"][0]["finish_reason"] == "stop"
+
+        chunks = _sse(client.post("/v1/chat/completions", json={
+            "messages": [{"role": "user", "content": "天气"}], "stream": True, "tools": TOOLS,
+        }))
+        assert chunks[0]["choices"][0]["delta"]["tool_calls"][0]["function"]["name"] == "get_weather"
+        assert chunks[-1]["choices"][0]["finish_reason"] == "tool_calls"
+
+        body = client.post("/v1/chat/completions", json={
+            "messages": [{"role": "tool", "content": "晴"}], "tools": TOOLS,
+        }).json()
+        assert body["choices"][0]["finish_reason"] == "stop"
+
+    def test_json_mode_returns_parseable_content(self):
+        body = _client().post("/v1/chat/completions", json={
+            "messages": [], "response_format": {"type": "json_object"},
+        }).json()
+        assert json.loads(body["choices"][0]["message"]["content"]) == {"facts": [], "memory": []}
+
+    def test_audio_and_embeddings(self):
+        client = _client()
+        speech = client.post("/v1/audio/speech", json={"input": "你好", "voice": "alloy"})
+        assert speech.headers["content-type"] == "audio/mpeg"
+        assert len(speech.content) == 3 + 2 * PROFILES["instant"].tts_bytes_per_char
+
+        text = client.post("/v1/audio/transcriptions", files={"file": ("a.wav", b"RIFF")},
+                           data={"model": "whisper-1", "response_format": "text"})
+        assert text.text == PROFILES["instant"].transcript
+
+        embedded = client.post("/v1/embeddings", json={"input": ["a", "a"], "encoding_format": "base64",
+                                                       "dimensions": 4}).json()["data"]
+        vector = struct.unpack("<4f", base64.b64decode(embedded[0]["embedding"]))
+        assert embedded[0]["embedding"] == embedded[1]["embedding"] and len(vector) == 4
+
+    def test_profile_can_be_switched_at_runtime(self):
+        client = _client()
+        assert client.put("/mock/profile", json={"profile": "slow", "tokens": 7}).json()["ttft"] == PROFILES["slow"].ttft
+        assert client.get("/mock/profile").json()["tokens"] == 7
+
+
+class TestMockRealtime:
+    def _events_until(self, ws, last_type):
+        events = []
+        while not events or events[-1]["type"] != last_type:
+            events.append(ws.receive_json())
+        return [event["type"] for event in events]
+
+    def test_commit_replays_voice_call_events(self):
+        client = _client(realtime_deltas=3)
+        audio = base64.b64encode(pcm16_tone(20)).decode("ascii")
+        with client.websocket_connect("/v1/realtime?model=mock") as ws:
+            assert ws.receive_json()["type"] == "session.created"
+            ws.send_json({"type": "session.update", "session": {"turn_detection": {"silence_duration_ms": 5000}}})
+            assert ws.receive_json()["type"] == "session.updated"
+            for _ in range(2):
+                ws.send_json({"type": "input_audio_buffer.append", "audio": audio})
+            ws.send_json({"type": "input_audio_buffer.commit"})
+            types = self._events_until(ws, "response.done")
+        assert types.count("response.audio.delta") == 3
+        assert types[0] == "input_audio_buffer.speech_started" and "response.audio_transcript.done" in types
+        assert client.get("/mock/realtime").json() == {"sessions": 1, "active": 0, "frames": 2, "responses": 1,
+                                                        "deltas": 3}
+
+    def test_server_vad_replays_legacy_events(self):
+        client = _client(realtime_deltas=2)
+        with client.websocket_connect("/v1/realtime") as ws:
+            ws.receive_json()
+            ws.send_json({"type": "session.update", "session": {"turn_detection": {"silence_duration_ms": 10}}})
+            ws.receive_json()
+            ws.send_json({"type": "conversation.item.input_audio_buffer.append", "audio": "AAAA"})
+            types = self._events_until(ws, "conversation.item.output_text.committed")
+        assert types.count("conversation.item.output_audio_buffer.delta") == 2
+        assert "response.audio.delta" not in types
+
+
+class TestLoadResult:
+    def test_summary_reports_stream_percentiles(self):
+        result = LoadResult(engine="chat_engine", stream=True, completed=4, wall=2.0,
+                            latencies=[0.1, 0.2, 0.3, 0.4], ttfts=[0.05, 0.06], itls=[0.01] * 10)
+        summary = result.summary()
+        assert summary["rps"] == 2.0
+        assert summary["ttft_p50_ms"] == 60.0 and summary["itl_p99_ms"] == 10.0
+        assert "ttft_p50_ms" not in LoadResult(engine="x", stream=False).summary()
+        assert percentile([], 0.5) == 0.0
+
+    def test_voice_summary_reports_drops(self):
+        result = VoiceStepResult(scenario="voice_call", clients=2, frames_sent=40, audio_received=18,
+                                 mouth_to_ear=[0.3, 0.5], upstream={"frames": 38, "deltas": 20}, rss_per_conn=1.234)
+        summary = result.summary()
+        assert summary["frames_dropped"] == 2 and summary["audio_dropped"] == 2
+        assert summary["mouth_to_ear_p50_ms"] == 500.0 and summary["rss_per_conn_mb"] == 1.23
+        assert len(pcm16_tone(20)) == 960
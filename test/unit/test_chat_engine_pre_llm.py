@@ -0,0 +1,91 @@
+"""
+ChatEngine pre-LLM stage tests
+Covers concurrent memory/personality/tool-schema stages, per-stage deadlines and timings
+"""
+import asyncio
+import time
+import types
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from core.chat_engine import ChatEngine
+from utils.performance import PerformanceMetrics
+
+
+def _engine():
+    engine = ChatEngine()
+    # 记忆后端替换为 Mock，测试不依赖 MEM0_API_KEY 或本地向量库
+    with patch("core.chat_engine.ChatMemory"), patch("core.chat_engine.get_async_chat_memory"):
+        engine._ensure_initialized()
+    return engine
+
+
+class TestPreLLMStages:
+    async def test_stages_run_concurrently(self):
+        engine = _engine()
+
+        async def slow_memory(*args, **kwargs):
+            await asyncio.sleep(0.2)
+            return ["m1"]
+
+        async def slow_tools(*args, **kwargs):
+            await asyncio.sleep(0.2)
+            return [{"type": "function", "function": {"name": "t"}}]
+
+        engine.async_chat_memory.get_relevant_memory = slow_memory
+        engine.get_allowed_tools_schema = slow_tools
+        metrics = PerformanceMetrics()
+
+        with patch("core.chat_engine.config.MEMORY_RETRIEVAL_TIMEOUT", 1.0):
+            start = time.time()
+            memory_section, _, tools = await engine._prepare_request_context(
+                [{"role": "user", "content": "q"}], "conv-1", None, True, metrics
+            )
+            elapsed = time.time() - start
+
+        assert elapsed < 0.35
+        assert "m1" in memory_section
+        assert tools and tools[0]["function"]["name"] == "t"
+        assert metrics.memory_retrieval_time >= 0.2
+        assert metrics.tool_schema_build_time >= 0.2
+        assert 0 < metrics.pre_llm_time < 0.35
+
+    async def test_tool_stage_deadline_degrades(self):
+        engine = _engine()
+        engine.async_chat_memory.get_relevant_memory = AsyncMock(return_value=[])
+
+        async def hang(*args, **kwargs):
+            await asyncio.sleep(5)
+
+        engine.get_allowed_tools_schema = hang
+        metrics = PerformanceMetrics()
+        with patch("core.chat_engine.config.TOOL_SCHEMA_TIMEOUT", 0.05):
+            _, _, tools = await engine._prepare_request_context(
+                [{"role": "user", "content": "q"}], "conv-1", None, True, metrics
+            )
+        assert tools is None
+        assert metrics.tool_schema_build_time < 1
+
+    async def test_memory_error_does_not_fail_request(self):
+        engine = _engine()
+        engine.async_chat_memory.get_relevant_memory = AsyncMock(side_effect=Exception("boom"))
+        personality = types.SimpleNamespace(system_prompt="你是助手", allowed_tools=[])
+        engine.personality_manager.get_personality = MagicMock(return_value=personality)
+
+        memory_section, personality_system, tools = await engine._prepare_request_context(
+            [{"role": "user", "content": "q"}], "conv-1", "p1", False, PerformanceMetrics()
+        )
+        assert memory_section == ""
+        assert personality_system == "你是助手"
+        assert tools is None
+
+    async def test_default_conversation_skips_memory_timing(self):
+        engine = _engine()
+        engine.async_chat_memory.get_relevant_memory = AsyncMock(return_value=["m"])
+        metrics = PerformanceMetrics()
+        memory_section, _, _ = await engine._prepare_request_context(
+            [{"role": "user", "content": "q"}], "default", None, False, metrics
+        )
+        assert memory_section == ""
+        assert metrics.memory_retrieval_time == 0.0
+        engine.async_chat_memory.get_relevant_memory.assert_not_called()
@@ -65,17 +65,18 @@ class TestChatMemoryBasic:
         """测试缓存清除"""
         memory = ChatMemory()
         
-        # 添加一些缓存
-        memory._memory_cache["key1"] = "value1"
-        memory._memory_cache["key2"] = "value2"
+        # 添加一些缓存（两个会话）
+        memory._memory_cache.store("test_conv", "key1", "value1")
+        memory._memory_cache.store("other_conv", "key2", "value2")
         
         assert len(memory._memory_cache) == 2
         
         # 清除缓存
         memory._invalidate_cache("test_conv")
         
-        # 缓存应该被清空
-        assert len(memory._memory_cache) == 0
+        # 只清除该会话的缓存
+        assert "key1" not in memory._memory_cache
+        assert "key2" in memory._memory_cache
         
         print("✅ 缓存清除成功")
     
@@ -275,7 +276,7 @@ class TestChatMemoryCache:
         
         # 手动添加缓存
         test_key = "test_cache_key"
-        memory._memory_cache[test_key] = "cached_value"
+        memory._memory_cache.store("test_conv", test_key, "cached_value")
         
         assert test_key in memory._memory_cache
         
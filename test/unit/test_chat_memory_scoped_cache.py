@@ -0,0 +1,247 @@
+"""
+core.chat_memory retrieval cache tests
+Covers per-conversation invalidation, generation guard, cache stats and stale-while-revalidate
+"""
+import pytest
+
+from core.chat_memory import ConversationScopedCache, AsyncChatMemory, _CACHE_MISS
+
+
+class TestConversationScopedCache:
+    def test_invalidate_only_target_conversation(self):
+        cache = ConversationScopedCache(maxsize=10, ttl=60)
+        cache.store("c1", "k1", ["a"])
+        cache.store("c1", "k2", ["b"])
+        cache.store("c2", "k3", ["c"])
+
+        assert cache.invalidate("c1") == 2
+        assert "k1" not in cache and "k2" not in cache
+        assert cache.lookup("k3") == ["c"]
+
+    def test_generation_guard_skips_stale_store(self):
+        cache = ConversationScopedCache(maxsize=10, ttl=60)
+        generation = cache.generation("c1")
+        cache.invalidate("c1")  # a write landed while retrieval was in flight
+        assert cache.store("c1", "k1", ["old"], generation) is False
+        assert "k1" not in cache
+        assert cache.store("c1", "k1", ["new"], cache.generation("c1")) is True
+
+    def test_generations_stay_bounded(self):
+        cache = ConversationScopedCache(maxsize=2, ttl=60)
+        cache.store("kept", "k1", ["a"])
+        cache.invalidate("kept")
+        cache.store("kept", "k1", ["a"], cache.generation("kept"))
+        kept_generation = cache.generation("kept")
+        stale_generation = cache.generation("c0")
+        for i in range(20):
+            cache.invalidate(f"c{i}")
+        assert cache.get_stats()["generations"] <= 4
+        assert cache.generation("kept") == kept_generation
+        # 已清理会话的代数不回退，失效前发起的检索仍不能回填
+        assert cache.store("c0", "k2", ["old"], stale_generation) is False
+        assert cache.store("c0", "k2", ["new"], cache.generation("c0")) is True
+
+    def test_stats_hits_misses_evictions(self):
+        cache = ConversationScopedCache(maxsize=2, ttl=60)
+        assert cache.lookup("missing") is _CACHE_MISS
+        cache.store("c1", "k1", [])
+        assert cache.lookup("k1") == []
+        cache.store("c1", "k2", [])
+        cache.store("c2", "k3", [])  # evicts one entry
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["evictions"] == 1
+        assert stats["size"] == 2
+        assert stats["hit_rate"] == "50.0%"
+
+    def test_expiration_cleans_index(self):
+        now = [0.0]
+        cache = ConversationScopedCache(maxsize=10, ttl=1, timer=lambda: now[0])
+        cache.store("c1", "k1", ["a"])
+        now[0] = 5.0
+        cache.expire()
+        assert cache.get_stats()["expirations"] == 1
+        assert cache.get_stats()["conversations"] == 0
+
+
+class _FakeAsyncMemory:
+    def __init__(self):
+        self.added = []
+
+    async def add(self, *args, **kwargs):
+        self.added.append((args, kwargs))
+
+
+class TestAsyncChatMemoryScopedInvalidation:
+    async def test_add_message_keeps_other_conversations_cached(self):
+        m = AsyncChatMemory(memory=_FakeAsyncMemory())
+        calls = []
+
+        async def fake_retrieve(conversation_id, query, limit):
+            calls.append(conversation_id)
+            return [f"{conversation_id}-mem"]
+
+        m._retrieve_memory = fake_retrieve
+        await m.get_relevant_memory("c1", "q", limit=5)
+        await m.get_relevant_memory("c2", "q", limit=5)
+
+        await m.add_message("c1", {"role": "user", "content": "hi"})
+
+        await m.get_relevant_memory("c1", "q", limit=5)
+        await m.get_relevant_memory("c2", "q", limit=5)
+        # c1 re-fetched after its write, c2 still served from cache
+        assert calls == ["c1", "c2", "c1"]
+        stats = m.get_cache_stats()
+        assert stats["hits"] == 1
+        assert stats["invalidations"] == 1
+
+
+class TestAsyncChatMemoryStaleWhileRevalidate:
+    def _memory(self, timeout=0.05):
+        m = AsyncChatMemory(memory=_FakeAsyncMemory())
+        m.config.MEMORY_RETRIEVAL_TIMEOUT = timeout
+        m.config.MEMORY_STALE_WHILE_REVALIDATE = True
+        return m
+
+    async def test_timeout_serves_snapshot_and_refreshes_in_background(self):
+        import asyncio
+        m = self._memory()
+        delay = {"value": 0.0}
+        version = {"value": 0}
+
+        async def fake_retrieve(conversation_id, query, limit):
+            await asyncio.sleep(delay["value"])
+            version["value"] += 1
+            return [f"mem-v{version['value']}"]
+
+        m._retrieve_memory = fake_retrieve
+        assert await m.get_relevant_memory("c1", "q1") == ["mem-v1"]
+
+        # Slow store: different query misses the cache, times out, gets the snapshot
+        delay["value"] = 0.2
+        assert await m.get_relevant_memory("c1", "q2") == ["mem-v1"]
+        stats = m.get_cache_stats()["stale_while_revalidate"]
+        assert stats["stale"] == 1
+        assert stats["fresh"] == 1
+
+        # Background retrieval completes and refreshes snapshot + cache
+        await asyncio.sleep(0.25)
+        assert m._get_snapshot("c1")[0] == ["mem-v2"]
+        assert await m.get_relevant_memory("c1", "q2") == ["mem-v2"]
+
+    async def test_timeout_without_snapshot_returns_empty(self):
+        import asyncio
+        m = self._memory()
+
+        async def slow(conversation_id, query, limit):
+            await asyncio.sleep(0.2)
+            return ["late"]
+
+        m._retrieve_memory = slow
+        assert await m.get_relevant_memory("c1", "q") == []
+        assert m.get_cache_stats()["stale_while_revalidate"]["empty_on_timeout"] == 1
+        await asyncio.sleep(0.25)
+        # The abandoned retrieval still filled the cache for the next request
+        assert await m.get_relevant_memory("c1", "q") == ["late"]
+
+    async def test_concurrent_identical_retrievals_share_one_task(self):
+        import asyncio
+        m = self._memory(timeout=1)
+        calls = []
+
+        async def fake_retrieve(conversation_id, query, limit):
+            calls.append(query)
+            await asyncio.sleep(0.05)
+            return ["m"]
+
+        m._retrieve_memory = fake_retrieve
+        results = await asyncio.gather(*(m.get_relevant_memory("c1", "q") for _ in range(5)))
+        assert results == [["m"]] * 5
+        assert calls == ["q"]
+
+    async def test_request_after_invalidation_does_not_join_older_retrieval(self):
+        import asyncio
+        m = self._memory(timeout=1)
+        version = {"value": 0}
+        release = asyncio.Event()
+
+        async def fake_retrieve(conversation_id, query, limit):
+            version["value"] += 1
+            current = version["value"]
+            if current == 1:
+                await release.wait()
+            return [f"mem-v{current}"]
+
+        m._retrieve_memory = fake_retrieve
+        before_write = asyncio.ensure_future(m.get_relevant_memory("c1", "q"))
+        await asyncio.sleep(0)
+        m._invalidate_cache("c1")  # a write landed while the first retrieval was in flight
+        after_write = asyncio.ensure_future(m.get_relevant_memory("c1", "q"))
+        await asyncio.sleep(0)
+        release.set()
+        assert await after_write == ["mem-v2"]
+        assert await before_write == ["mem-v1"]
+        assert version["value"] == 2
+        assert m._inflight == {}
+
+    async def test_snapshot_respects_max_age(self):
+        m = self._memory()
+        m._snapshots = type(m._snapshots)(maxsize=10, ttl=0.01)
+        m._snapshots["c1"] = (["old"], 0.0)
+        import asyncio
+        await asyncio.sleep(0.02)
+        assert m._get_snapshot("c1") is None
+
+    async def test_delete_memory_drops_snapshot(self):
+        m = self._memory()
+
+        async def delete_all(**kwargs):
+            return None
+
+        m.memory.delete_all = delete_all
+        m._snapshots["c1"] = (["m"], 0.0)
+        await m.delete_memory("c1")
+        assert m._get_snapshot("c1") is None
+
+    async def test_inflight_retrieval_does_not_restore_deleted_snapshot(self):
+        import asyncio
+        m = self._memory(timeout=0.01)
+        release = asyncio.Event()
+
+        async def slow(conversation_id, query, limit):
+            await release.wait()
+            return ["secret fact"]
+
+        async def delete_all(**kwargs):
+            return None
+
+        m._retrieve_memory = slow
+        m.memory.delete_all = delete_all
+        assert await m.get_relevant_memory("c1", "q") == []
+        await m.delete_memory("c1")
+        release.set()
+        await asyncio.sleep(0.01)
+        assert m._get_snapshot("c1") is None
+        assert m._memory_cache.get_stats()["size"] == 0
+
+    async def test_timeout_without_swr_keeps_shared_task_for_other_waiters(self):
+        import asyncio
+        m = self._memory(timeout=1)
+        calls = []
+
+        async def slow(conversation_id, query, limit):
+            calls.append(query)
+            await asyncio.sleep(0.1)
+            return ["m"]
+
+        m._retrieve_memory = slow
+        waiter = asyncio.ensure_future(m.get_relevant_memory("c1", "q"))
+        await asyncio.sleep(0)
+        m.config.MEMORY_STALE_WHILE_REVALIDATE = False
+        m.config.MEMORY_RETRIEVAL_TIMEOUT = 0.01
+        assert await m.get_relevant_memory("c1", "q") == []
+        # 首个请求的等待不受后加入者超时影响
+        assert await waiter == ["m"]
+        assert calls == ["q"]
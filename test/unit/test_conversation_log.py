@@ -0,0 +1,170 @@
+"""
+core.conversation_log tests
+Covers the in-process hot layer, the file backend, reloading evicted conversations and backend failures
+"""
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from core.conversation_log import ConversationLog, FileConversationLogBackend
+from core.request_coalescer import coalesce_requests
+
+
+def _turn(i):
+    return [{"role": "user", "content": f"问题{i}"}, {"role": "assistant", "content": f"回答{i}"}]
+
+
+class TestConversationLog:
+    async def test_append_and_load_with_limits(self):
+        conversation_log = ConversationLog(max_messages=4, max_conversations=10)
+        assert await conversation_log.load("c1") == []
+        for i in range(3):
+            await conversation_log.append("c1", _turn(i))
+        assert await conversation_log.load("c1") == _turn(1) + _turn(2)
+        assert await conversation_log.load("c1", 1) == [{"role": "assistant", "content": "回答2"}]
+        assert conversation_log.get_stats()["appended_messages"] == 6
+
+    async def test_loaded_list_is_not_the_log(self):
+        conversation_log = ConversationLog(max_messages=10, max_conversations=10)
+        await conversation_log.append("c1", _turn(0))
+        loaded = await conversation_log.load("c1")
+        loaded.append({"role": "user", "content": "未提交"})
+        assert len(await conversation_log.load("c1")) == 2
+
+    async def test_drops_system_and_extra_fields(self):
+        conversation_log = ConversationLog(max_messages=10, max_conversations=10)
+        await conversation_log.append("c1", [
+            {"role": "system", "content": "人格"},
+            {"role": "user", "content": "你好", "name": "alice", "extra": "x"},
+        ])
+        assert await conversation_log.load("c1") == [{"role": "user", "content": "你好", "name": "alice"}]
+
+    async def test_lru_evicts_conversations(self):
+        conversation_log = ConversationLog(max_messages=10, max_conversations=2)
+        for cid in ("a", "b", "c"):
+            await conversation_log.append(cid, _turn(0))
+        assert list(conversation_log._hot) == ["b", "c"]
+        # 无持久层时被淘汰的会话从空历史开始
+        assert await conversation_log.load("a") == []
+
+    async def test_delete(self):
+        conversation_log = ConversationLog(max_messages=10, max_conversations=10)
+        await conversation_log.append("c1", _turn(0))
+        assert await conversation_log.delete("c1") is True
+        assert await conversation_log.load("c1") == []
+
+
+class TestFileBackend:
+    async def test_persists_across_instances(self, tmp_path):
+        first = ConversationLog(FileConversationLogBackend(str(tmp_path), 4), max_messages=4, max_conversations=10)
+        for i in range(3):
+            await first.append("会话/1", _turn(i))
+
+        second = ConversationLog(FileConversationLogBackend(str(tmp_path), 4), max_messages=4, max_conversations=10)
+        assert await second.load("会话/1") == _turn(1) + _turn(2)
+        assert second.get_stats()["backend_loads"] == 1
+
+    async def test_evicted_conversation_reloads_before_append(self, tmp_path):
+        conversation_log = ConversationLog(FileConversationLogBackend(str(tmp_path), 10), max_messages=10,
+                                           max_conversations=1)
+        await conversation_log.append("a", _turn(0))
+        await conversation_log.append("b", _turn(0))
+        await conversation_log.append("a", _turn(1))
+        assert await conversation_log.load("a") == _turn(0) + _turn(1)
+
+    async def test_compacts_file(self, tmp_path):
+        backend = FileConversationLogBackend(str(tmp_path), 2)
+        for i in range(3):
+            await backend.append("c1", _turn(i))
+        assert len(backend._read_lines(backend._path("c1"))) == 2
+        assert await backend.load("c1", 10) == _turn(2)
+
+
+async def test_backend_errors_degrade_to_memory():
+    backend = AsyncMock()
+    backend.load.side_effect = RuntimeError("redis down")
+    backend.append.side_effect = RuntimeError("redis down")
+    backend.get_name = lambda: "MockBackend"
+    conversation_log = ConversationLog(backend, max_messages=10, max_conversations=10)
+    await conversation_log.append("c1", _turn(0))
+    assert await conversation_log.load("c1") == _turn(0)
+    assert conversation_log.get_stats()["backend_errors"] >= 2
+
+
+class _ErrorEngine:
+    """模拟引擎失败：流式返回 finish_reason="error" 的块，非流式返回带 finish_reason="error" 的回复"""
+
+    async def generate_response(self, messages, conversation_id, personality_id=None, use_tools=None, stream=False):
+        if not stream:
+            return {"role": "assistant", "content": "发生错误: upstream down", "finish_reason": "error"}
+
+        async def error_stream():
+            yield {"role": "assistant", "content": "抱歉，我现在无法为您提供帮助。", "finish_reason": "error", "stream": True}
+        return error_stream()
+
+
+class _SlowEngine:
+    def __init__(self):
+        self.calls = 0
+
+    @coalesce_requests
+    async def generate_response(self, messages, conversation_id, personality_id=None, use_tools=None, stream=False):
+        self.calls += 1
+        await asyncio.sleep(0.02)
+        if not stream:
+            return {"role": "assistant", "content": "回答"}
+
+        async def answer():
+            yield {"role": "assistant", "content": "回答", "finish_reason": "stop", "stream": True}
+        return answer()
+
+
+def _request(stream, content="你好"):
+    from schemas.api_schemas import ChatCompletionRequest
+    return ChatCompletionRequest(model="gpt-4o", messages=[{"role": "user", "content": content}],
+                                 conversation_id="c1", server_history=True, stream=stream)
+
+
+@pytest.fixture
+def server_history(monkeypatch):
+    import app as app_module
+    from config.config import Config
+
+    conversation_log = ConversationLog(max_messages=10, max_conversations=10)
+    monkeypatch.setattr(Config, "CONVERSATION_LOG_ENABLED", True)
+    monkeypatch.setattr(Config, "REQUEST_COALESCING_ENABLED", True)
+    monkeypatch.setattr(app_module, "get_conversation_log", lambda: conversation_log)
+    return app_module, conversation_log
+
+
+async def _body(response):
+    return [chunk async for chunk in response.body_iterator]
+
+
+class TestServerHistoryHandler:
+    async def test_error_replies_are_not_logged(self, server_history, monkeypatch):
+        app_module, conversation_log = server_history
+        monkeypatch.setattr(app_module, "chat_engine", _ErrorEngine())
+        result = await app_module.create_chat_completion(_request(False), api_key="k")
+        assert result.choices[0].finish_reason == "error"
+        assert "finish_reason" not in result.choices[0].message
+        response = await app_module.create_chat_completion(_request(True), api_key="k")
+        body = await _body(response)
+        assert any('"finish_reason": "error"' in chunk for chunk in body)
+        assert await conversation_log.load("c1") == []
+
+    async def test_coalesced_duplicates_record_turn_once(self, server_history, monkeypatch):
+        app_module, conversation_log = server_history
+        engine = _SlowEngine()
+        monkeypatch.setattr(app_module, "chat_engine", engine)
+
+        await asyncio.gather(*(app_module.create_chat_completion(_request(False), api_key="k") for _ in range(2)))
+        assert engine.calls == 1
+        assert [m["content"] for m in await conversation_log.load("c1")] == ["你好", "回答"]
+
+        responses = await asyncio.gather(*(app_module.create_chat_completion(_request(True, "再见"), api_key="k")
+                                           for _ in range(2)))
+        await asyncio.gather(*(_body(response) for response in responses))
+        assert engine.calls == 2
+        assert [m["content"] for m in await conversation_log.load("c1")] == ["你好", "回答", "再见", "回答"]
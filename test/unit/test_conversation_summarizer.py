@@ -0,0 +1,116 @@
+"""
+core.conversation_summarizer tests
+Drives the rolling summary against the in-process mock LLM (benchmarks.mock_openai_upstream) and checks that
+the prompt stays flat as the conversation grows, uncovered turns are never dropped, and failures degrade
+"""
+from dataclasses import replace
+from unittest.mock import AsyncMock
+
+import httpx
+from openai import AsyncOpenAI
+
+from benchmarks.mock_openai_upstream import PROFILES, create_app
+from core.conversation_summarizer import ConversationSummarizer, message_fingerprint
+from core.openai_client import AsyncOpenAIClient
+from core.prompt_builder import compose_system_prompt
+
+
+def _mock_llm_client():
+    app = create_app(replace(PROFILES["instant"], tokens=5))
+    http_client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://mock")
+    return AsyncOpenAIClient(AsyncOpenAI(api_key="sk-mock", base_url="http://mock/v1", http_client=http_client))
+
+
+def _turns(count, start=0):
+    messages = []
+    for i in range(start, start + count):
+        messages.append({"role": "user", "content": f"第{i}轮：我住在北京，喜欢爬山"})
+        messages.append({"role": "assistant", "content": f"好的，已记录第{i}轮"})
+    return messages
+
+
+def _summarizer(client, **kwargs):
+    options = dict(model="gpt-4o", keep_recent=4, min_messages=4, max_chars=100, max_conversations=10, timeout=5)
+    options.update(kwargs)
+    return ConversationSummarizer(client=client, **options)
+
+
+class TestCompact:
+    def test_short_history_untouched(self):
+        summarizer = _summarizer(AsyncMock())
+        history = _turns(2)
+        assert summarizer.compact("c1", history) == (history, "")
+
+    async def test_prompt_stays_flat_against_mock_llm(self):
+        summarizer = _summarizer(_mock_llm_client())
+        conversation = []
+        sent_sizes = []
+        for turn in range(20):
+            conversation += _turns(1, start=turn)
+            # 客户端按 30 条滑动窗口重发
+            window = conversation[-30:]
+            dropped = conversation[:-30][-2:]
+            sent, summary = summarizer.compact("c1", window, dropped)
+            await summarizer.wait_idle()
+            sent_sizes.append(len(sent))
+            if summary:
+                assert sent[-1] is window[-1]
+                assert sent[:len(sent)] == window[len(window) - len(sent):]
+
+        assert summarizer.summaries >= 1 and summarizer.failures == 0
+        assert summarizer.get_summary("c1").startswith("你好")
+        # 已覆盖的消息以摘要替代：发送条数不随对话增长，始终不超过 最近N条 + 未达摘要阈值的条数
+        assert max(sent_sizes[10:]) <= 4 + 4 + 1
+        assert summarizer.get_stats()["compacted_messages"] > 0
+
+    async def test_uncovered_messages_stay_raw_while_summarizing(self):
+        client = AsyncMock()
+        summarizer = _summarizer(client)
+        history = _turns(5)
+        sent, summary = summarizer.compact("c1", history)
+        # 尚无摘要：原样发送，后台开始摘要
+        assert sent is history and summary == ""
+        await summarizer.wait_idle()
+        client.create_chat.assert_awaited_once()
+
+    async def test_does_not_split_tool_call_from_result(self):
+        summarizer = _summarizer(AsyncMock(), keep_recent=2)
+        history = _turns(2) + [
+            {"role": "assistant", "content": None,
+             "tool_calls": [{"id": "1", "type": "function", "function": {"name": "gettime", "arguments": "{}"}}]},
+            {"role": "tool", "tool_call_id": "1", "content": "12:00"},
+            {"role": "assistant", "content": "现在12点"},
+        ]
+        state = summarizer._state("c1")
+        state.summary = "用户住在北京"
+        state.cover([message_fingerprint(m) for m in history[:5]])
+        sent, summary = summarizer.compact("c1", history)
+        assert summary == "用户住在北京"
+        assert sent[0]["role"] == "assistant" and sent[0].get("tool_calls")
+        assert sent[1]["role"] == "tool"
+
+    async def test_failure_keeps_history_and_backs_off(self):
+        client = AsyncMock()
+        client.create_chat.side_effect = RuntimeError("upstream down")
+        summarizer = _summarizer(client)
+        history = _turns(5)
+        summarizer.compact("c1", history)
+        await summarizer.wait_idle()
+        assert summarizer.failures == 1
+        # 重试间隔内不再发起摘要，历史继续原文发送
+        assert summarizer.compact("c1", history)[0] is history
+        await summarizer.wait_idle()
+        assert client.create_chat.await_count == 1
+
+    def test_lru_evicts_old_conversations(self):
+        summarizer = _summarizer(AsyncMock(), max_conversations=2)
+        for cid in ("a", "b", "c"):
+            summarizer.compact(cid, _turns(5))
+        assert list(summarizer._states) == ["b", "c"]
+
+
+def test_compose_system_prompt_injects_summary():
+    messages = compose_system_prompt([{"role": "user", "content": "hi"}], "人格", "参考记忆：x", "用户住在北京")
+    assert messages[0]["role"] == "system"
+    assert messages[0]["content"].endswith("较早的对话摘要：\n用户住在北京")
+    assert compose_system_prompt([{"role": "user", "content": "hi"}], "", "")[0]["role"] == "user"
@@ -15,7 +15,7 @@ class TestMem0ProxyBasicCoverage:
     def test_mem0_client_get_client(self):
         """测试Mem0Client的get_client方法"""
         with patch('core.mem0_proxy.get_config') as mock_config, \
-             patch('core.mem0_proxy.Mem0') as mock_mem0:
+             patch('core.mem0_proxy.get_memory_backend') as mock_mem0:
             
             # Mock配置
             mock_config.return_value.MEM0_USE_LOCAL = True
@@ -30,7 +30,7 @@ class TestMem0ProxyBasicCoverage:
             mock_config.return_value.MEM0_LLM_CONFIG_MAX_TOKENS = 1000
             
             mock_client = Mock()
-            mock_mem0.return_value = mock_client
+            mock_mem0.return_value.get_mem0_proxy.return_value = mock_client
             
             # 创建Mem0Client实例
             client = Mem0Client(mock_config.return_value)
@@ -80,7 +80,7 @@ class TestMem0ProxyBasicCoverage:
     @pytest.mark.asyncio
     async def test_mem0_chat_engine_health_check_basic(self):
         """测试Mem0ChatEngine基础健康检查"""
-        with patch('core.mem0_proxy.Mem0') as mock_mem0, \
+        with patch('core.mem0_proxy.get_memory_backend') as mock_mem0, \
              patch('core.mem0_proxy.OpenAI') as mock_openai, \
              patch('core.mem0_proxy.get_config') as mock_config, \
              patch('core.mem0_proxy.get_async_chat_memory') as mock_memory:
@@ -99,7 +99,7 @@ class TestMem0ProxyBasicCoverage:
             
             # Mock客户端
             mock_mem0_client = Mock()
-            mock_mem0.return_value = mock_mem0_client
+            mock_mem0.return_value.get_mem0_proxy.return_value = mock_mem0_client
             mock_openai_client = Mock()
             mock_openai.return_value = mock_openai_client
             
@@ -121,7 +121,7 @@ class TestMem0ProxyBasicCoverage:
     @pytest.mark.asyncio
     async def test_mem0_chat_engine_get_engine_info(self):
         """测试Mem0ChatEngine获取引擎信息"""
-        with patch('core.mem0_proxy.Mem0') as mock_mem0, \
+        with patch('core.mem0_proxy.get_memory_backend') as mock_mem0, \
              patch('core.mem0_proxy.OpenAI') as mock_openai, \
              patch('core.mem0_proxy.get_config') as mock_config, \
              patch('core.mem0_proxy.get_async_chat_memory') as mock_memory:
@@ -140,7 +140,7 @@ class TestMem0ProxyBasicCoverage:
             
             # Mock客户端
             mock_mem0_client = Mock()
-            mock_mem0.return_value = mock_mem0_client
+            mock_mem0.return_value.get_mem0_proxy.return_value = mock_mem0_client
             mock_openai_client = Mock()
             mock_openai.return_value = mock_openai_client
             
@@ -162,7 +162,7 @@ class TestMem0ProxyBasicCoverage:
     @pytest.mark.asyncio
     async def test_mem0_chat_engine_get_supported_personalities(self):
         """测试Mem0ChatEngine获取支持的人格"""
-        with patch('core.mem0_proxy.Mem0') as mock_mem0, \
+        with patch('core.mem0_proxy.get_memory_backend') as mock_mem0, \
              patch('core.mem0_proxy.OpenAI') as mock_openai, \
              patch('core.mem0_proxy.get_config') as mock_config, \
              patch('core.mem0_proxy.get_async_chat_memory') as mock_memory:
@@ -181,7 +181,7 @@ class TestMem0ProxyBasicCoverage:
             
             # Mock客户端
             mock_mem0_client = Mock()
-            mock_mem0.return_value = mock_mem0_client
+            mock_mem0.return_value.get_mem0_proxy.return_value = mock_mem0_client
             mock_openai_client = Mock()
             mock_openai.return_value = mock_openai_client
             
@@ -201,7 +201,7 @@ class TestMem0ProxyBasicCoverage:
     @pytest.mark.asyncio
     async def test_mem0_chat_engine_get_available_tools(self):
         """测试Mem0ChatEngine获取可用工具"""
-        with patch('core.mem0_proxy.Mem0') as mock_mem0, \
+        with patch('core.mem0_proxy.get_memory_backend') as mock_mem0, \
              patch('core.mem0_proxy.OpenAI') as mock_openai, \
              patch('core.mem0_proxy.get_config') as mock_config, \
              patch('core.mem0_proxy.get_async_chat_memory') as mock_memory:
@@ -220,7 +220,7 @@ class TestMem0ProxyBasicCoverage:
             
             # Mock客户端
             mock_mem0_client = Mock()
-            mock_mem0.return_value = mock_mem0_client
+            mock_mem0.return_value.get_mem0_proxy.return_value = mock_mem0_client
             mock_openai_client = Mock()
             mock_openai.return_value = mock_openai_client
             
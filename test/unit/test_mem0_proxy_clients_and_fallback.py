@@ -5,8 +5,9 @@ from unittest.mock import MagicMock, AsyncMock, patch
 
 
 def test_mem0_client_init_local_with_filters_patch(monkeypatch):
-    # Patch Mem0 class used in core.mem0_proxy
+    # Mem0Client wraps the shared memory backend instead of building its own Memory
     import core.mem0_proxy as mp
+    from core.memory_backend import MemoryBackend
 
     class FakeInnerClient:
         def __init__(self):
@@ -17,45 +18,41 @@ def test_mem0_client_init_local_with_filters_patch(monkeypatch):
                 self.called_with_filters = True
             return 'ok'
 
-    class FakeMem0:
-        def __init__(self, config=None, api_key=None):
-            self.config = config
-            self.api_key = api_key
-            self.mem0_client = FakeInnerClient()
-
-    monkeypatch.setattr(mp, 'Mem0', FakeMem0)
-
     # Force local mode
     cfg = mp.get_config()
     cfg.MEMO_USE_LOCAL = True
 
+    inner = FakeInnerClient()
+    backend = MemoryBackend(cfg)
+    backend._memory = inner
+    monkeypatch.setattr(mp, 'get_memory_backend', lambda config=None: backend)
+
     c = mp.Mem0Client(cfg)
     client = c.get_client()
 
-    # After init, mem0_client.add should be patched to drop 'filters'
-    # Call with filters to ensure it does not raise and does not mark flag
-    client.mem0_client.add(x=1, filters={'k': 'v'})
-    assert client.mem0_client.called_with_filters is False
+    # The proxy's mem0_client drops 'filters' before reaching the shared Memory.add
+    assert client.mem0_client.add(x=1, filters={'k': 'v'}) == 'ok'
+    assert inner.called_with_filters is False
+    assert c.get_client() is backend.get_mem0_proxy()
 
 
 def test_mem0_client_init_api_mode(monkeypatch):
     import core.mem0_proxy as mp
-
-    class FakeMem0:
-        def __init__(self, config=None, api_key=None):
-            self.config = config
-            self.api_key = api_key
-
-    monkeypatch.setattr(mp, 'Mem0', FakeMem0)
+    from core.memory_backend import MemoryBackend
 
     cfg = mp.get_config()
     cfg.MEMO_USE_LOCAL = False
     cfg.MEM0_API_KEY = 'k'
 
+    api_client = object()
+    backend = MemoryBackend(cfg)
+    backend._memory = api_client
+    monkeypatch.setattr(mp, 'get_memory_backend', lambda config=None: backend)
+
     c = mp.Mem0Client(cfg)
     client = c.get_client()
-    assert isinstance(client, FakeMem0)
-    assert client.api_key == 'k'
+    # API mode shares the MemoryClient as-is
+    assert client.mem0_client is api_client
 
 
 def test_get_client_caching(monkeypatch):
@@ -96,13 +93,8 @@ async def test_fallback_handler_use_tools_non_stream(monkeypatch):
     # Mock OpenAI client to return simple non-stream response
     resp = type('R', (), {'choices':[type('C', (), {'message': type('M', (), {'content':'ok', 'tool_calls': None})()})()]})()
 
-    client = type('X', (), {})()
-    co = type('Co', (), {})()
-    co.create = (lambda **kw: resp)
-    ch = type('Ch', (), {})()
-    ch.completions = co
-    client.chat = ch
-    engine.fallback_handler.openai_client.get_client = MagicMock(return_value=client)
+    async_client = types.SimpleNamespace(create_chat=AsyncMock(return_value=resp))
+    engine.fallback_handler.openai_client.get_async_client = MagicMock(return_value=async_client)
 
     # Tools allowed: ensure handler sets them and still returns content
     engine.fallback_handler.tool_handler.get_allowed_tools = AsyncMock(return_value=[{'function': {'name':'a'}}])
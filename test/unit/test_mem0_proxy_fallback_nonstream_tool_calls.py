@@ -13,11 +13,9 @@ async def test_fallback_nonstream_with_tool_calls():
     msg = type('M', (), {'tool_calls': [{}], 'content': None})()
     resp = type('R', (), {'choices':[type('C', (), {'message': msg})()]})()
 
-    client = type('X', (), {})()
-    co = type('Co', (), {})()
-    co.create = (lambda **kw: resp)
-    client.chat = type('Ch', (), {'completions': co})()
-    engine.fallback_handler.openai_client.get_client = MagicMock(return_value=client)
+    async_client = type('X', (), {})()
+    async_client.create_chat = AsyncMock(return_value=resp)
+    engine.fallback_handler.openai_client.get_async_client = MagicMock(return_value=async_client)
 
     engine.fallback_handler.tool_handler.handle_tool_calls = AsyncMock(return_value={'role':'assistant','content':'after tool'})
 
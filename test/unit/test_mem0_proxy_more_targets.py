@@ -1,5 +1,5 @@
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
 
 
 @pytest.mark.asyncio
@@ -21,14 +21,10 @@ async def test_mem0_proxy_fallback_openai_stream_and_non_stream(monkeypatch):
         yield SimpleChunk('a')
         yield SimpleChunk('b')
 
-    # Build instance tree with instance-level 'create' to avoid bound 'self'
-    co = type('Co', (), {})()
-    co.create = (lambda **kw: stream_gen())
-    ch = type('Ch', (), {})()
-    ch.completions = co
+    # Native async client: create_chat_stream returns an async iterator
     client = type('X', (), {})()
-    client.chat = ch
-    fh.openai_client.get_client = MagicMock(return_value=client)
+    client.create_chat_stream = (lambda params: stream_gen())
+    fh.openai_client.get_async_client = MagicMock(return_value=client)
 
     # Stream true -> returns async generator
     gen = await engine.generate_response([{"role":"user","content":"q"}], "cid", stream=True)
@@ -38,13 +34,10 @@ async def test_mem0_proxy_fallback_openai_stream_and_non_stream(monkeypatch):
     assert ''.join(i['content'] for i in outs if i['content']) == 'ab'
 
     # Non-stream -> returns dict
-    co2 = type('Co', (), {})()
-    co2.create = (lambda **kw: type('R', (), {'choices':[type('M', (), {'message': type('Msg', (), {'content':'ok'})()})()]})())
-    ch2 = type('Ch', (), {})()
-    ch2.completions = co2
+    resp = type('R', (), {'choices':[type('M', (), {'message': type('Msg', (), {'content':'ok'})()})()]})()
     client2 = type('X', (), {})()
-    client2.chat = ch2
-    fh.openai_client.get_client = MagicMock(return_value=client2)
+    client2.create_chat = AsyncMock(return_value=resp)
+    fh.openai_client.get_async_client = MagicMock(return_value=client2)
     res = await engine.generate_response([{"role":"user","content":"q"}], "cid", stream=False)
     assert res.get('content') == 'ok'
 
@@ -0,0 +1,112 @@
+"""
+core.memory_backend tests
+Covers the shared mem0 instance, sync/async facades, Mem0 proxy wrapping and config building
+"""
+import threading
+import pytest
+
+import core.memory_backend as mb
+from core.memory_backend import MemoryBackend, build_memory_config
+
+
+class _FakeMemory:
+    def __init__(self):
+        self.threads = []
+
+    def search(self, query, **kwargs):
+        self.threads.append(threading.current_thread().name)
+        return [{"memory": f"{query}-{kwargs.get('user_id')}"}]
+
+    def add(self, *args, **kwargs):
+        return kwargs
+
+
+def _backend(memory=None):
+    backend = MemoryBackend(mb.get_config())
+    backend._memory = memory or _FakeMemory()
+    return backend
+
+
+class TestMemoryBackend:
+    def test_memory_created_once_under_concurrency(self, monkeypatch):
+        backend = MemoryBackend(mb.get_config())
+        created = []
+
+        def fake_create():
+            created.append(1)
+            return _FakeMemory()
+
+        monkeypatch.setattr(backend, "_create_memory", fake_create)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(backend.get_sync_memory())) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(created) == 1
+        assert all(r is results[0] for r in results)
+        assert backend.get_stats()["initialized"] is True
+
+    async def test_async_facade_runs_in_backend_pool(self):
+        memory = _FakeMemory()
+        backend = _backend(memory)
+        facade = backend.get_async_memory()
+
+        assert await facade.search("q", user_id="c1") == [{"memory": "q-c1"}]
+        assert memory.threads[0].startswith("memory-backend")
+        assert backend.get_stats()["async_calls"] == 1
+        assert backend.get_stats()["async_inflight"] == 0
+        backend.shutdown()
+
+    async def test_async_facade_preserves_missing_method_fallback(self):
+        facade = _backend().get_async_memory()
+        with pytest.raises(AttributeError):
+            facade.get_relevant
+
+    def test_mem0_proxy_shares_memory_and_drops_filters(self):
+        memory = _FakeMemory()
+        backend = _backend(memory)
+        backend.is_local = True
+        proxy = backend.get_mem0_proxy()
+
+        assert proxy is backend.get_mem0_proxy()
+        assert proxy.chat.completions.mem0_client is proxy.mem0_client
+        assert proxy.mem0_client.add("m", user_id="u", filters={"k": "v"}) == {"user_id": "u"}
+        assert proxy.mem0_client.search("q", user_id="u") == [{"memory": "q-u"}]
+
+    def test_shared_mem0_matches_mem0_attributes(self, monkeypatch):
+        # mem0 的 Mem0.__init__ 新增属性时此测试失败，提示同步更新 SharedMem0
+        import mem0.proxy.main as proxy_main
+        monkeypatch.setattr(proxy_main, "MemoryClient", lambda *args, **kwargs: _FakeMemory())
+        upstream = proxy_main.Mem0(api_key="test")
+        shared = mb.SharedMem0(_FakeMemory())
+        assert isinstance(shared, proxy_main.Mem0)
+        assert set(vars(shared)) == set(vars(upstream))
+
+    def test_chat_memories_share_backend_instance(self, monkeypatch):
+        from core.chat_memory import AsyncChatMemory, ChatMemory
+
+        memory = _FakeMemory()
+        backend = _backend(memory)
+        monkeypatch.setattr(mb, "_memory_backend", backend)
+
+        sync_memory = ChatMemory()
+        async_memory = AsyncChatMemory()
+        assert sync_memory.memory is memory
+        assert async_memory.memory._memory is memory
+        backend.shutdown()
+
+    def test_build_memory_config_vector_store(self):
+        cfg = type("C", (), {
+            "VECTOR_STORE_PROVIDER": "qdrant",
+            "QDRANT_HOST": "q", "QDRANT_PORT": "6333", "QDRANT_API_KEY": None,
+            "CHROMA_COLLECTION_NAME": "c", "CHROMA_PERSIST_DIRECTORY": "/tmp",
+            "MEM0_LLM_PROVIDER": "openai", "MEM0_LLM_CONFIG_MODEL": "m", "MEM0_LLM_CONFIG_MAX_TOKENS": 10,
+            "OPENAI_API_KEY": "k", "OPENAI_BASE_URL": "http://x",
+        })()
+        built = build_memory_config(cfg)
+        assert built["vector_store"]["provider"] == "qdrant"
+        assert built["vector_store"]["config"] == {"collection_name": "c", "host": "q", "port": 6333}
+        assert built["llm"]["config"]["api_key"] == "k"
+        assert built["embedder"]["config"]["openai_base_url"] == "http://x"
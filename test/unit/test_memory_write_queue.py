@@ -0,0 +1,143 @@
+"""
+core.memory_write_queue tests
+Covers per-conversation coalescing, ordering, backpressure policies, shutdown flush and stats
+"""
+import asyncio
+import pytest
+
+from core.memory_write_queue import MemoryWriteQueue
+
+
+def _msg(content, role="user"):
+    return {"role": role, "content": content}
+
+
+class _RecordingWriter:
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = []
+        self.delay = delay
+        self.fail = fail
+        self.gate = None
+
+    async def __call__(self, conversation_id, messages):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("mem0 down")
+        self.calls.append((conversation_id, [m["content"] for m in messages]))
+
+
+class TestMemoryWriteQueue:
+    async def test_coalesces_same_conversation_into_one_write(self):
+        writer = _RecordingWriter()
+        writer.gate = asyncio.Event()
+        q = MemoryWriteQueue(writer=writer, max_size=100, workers=1)
+
+        await q.enqueue("c1", [_msg("a")])
+        await asyncio.sleep(0)  # worker picks "a" and waits on the gate
+        await q.enqueue("c1", [_msg("b")])
+        await q.enqueue("c1", [_msg("c")])
+        writer.gate.set()
+        await q.shutdown(timeout=2)
+
+        assert writer.calls == [("c1", ["a"]), ("c1", ["b", "c"])]
+        stats = q.get_stats()
+        assert stats["coalesced"] == 1
+        assert stats["written_batches"] == 2
+        assert stats["written_messages"] == 3
+        assert stats["depth"] == 0
+
+    async def test_conversations_written_in_parallel(self):
+        writer = _RecordingWriter(delay=0.1)
+        q = MemoryWriteQueue(writer=writer, max_size=100, workers=4)
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for i in range(4):
+            await q.enqueue(f"c{i}", [_msg(str(i))])
+        await q.shutdown(timeout=2)
+        assert len(writer.calls) == 4
+        assert loop.time() - start < 0.3
+
+    async def test_drop_new_policy(self):
+        writer = _RecordingWriter()
+        writer.gate = asyncio.Event()
+        q = MemoryWriteQueue(writer=writer, max_size=2, workers=1, policy="drop_new")
+        assert await q.enqueue("c1", [_msg("a"), _msg("b")]) is True
+        assert await q.enqueue("c2", [_msg("c")]) is False
+        assert q.get_stats()["dropped_messages"] == 1
+        writer.gate.set()
+        await q.shutdown(timeout=2)
+
+    async def test_drop_oldest_policy(self):
+        writer = _RecordingWriter()
+        writer.gate = asyncio.Event()
+        q = MemoryWriteQueue(writer=writer, max_size=2, workers=1, policy="drop_oldest")
+        await q.enqueue("busy", [_msg("x")])
+        await asyncio.sleep(0)  # "busy" is in flight
+        await q.enqueue("c1", [_msg("a"), _msg("b")])
+        assert await q.enqueue("c2", [_msg("c")]) is True
+        writer.gate.set()
+        await q.shutdown(timeout=2)
+        assert ("c1", ["a", "b"]) not in writer.calls
+        assert ("c2", ["c"]) in writer.calls
+        assert q.get_stats()["dropped_messages"] == 2
+
+    async def test_block_policy_waits_for_space(self):
+        writer = _RecordingWriter(delay=0.05)
+        q = MemoryWriteQueue(writer=writer, max_size=1, workers=1, policy="block", put_timeout=1.0)
+        await q.enqueue("c1", [_msg("a")])
+        await q.enqueue("c2", [_msg("b")])
+        assert await q.enqueue("c3", [_msg("c")]) is True
+        await q.shutdown(timeout=2)
+        assert [c for c, _ in writer.calls] == ["c1", "c2", "c3"]
+
+    async def test_block_policy_times_out(self):
+        writer = _RecordingWriter()
+        writer.gate = asyncio.Event()
+        q = MemoryWriteQueue(writer=writer, max_size=1, workers=1, policy="block", put_timeout=0.05)
+        await q.enqueue("c1", [_msg("a")])
+        await asyncio.sleep(0)
+        await q.enqueue("c2", [_msg("b")])
+        assert await q.enqueue("c3", [_msg("c")]) is False
+        writer.gate.set()
+        await q.shutdown(timeout=2)
+
+    async def test_failed_write_is_counted(self):
+        q = MemoryWriteQueue(writer=_RecordingWriter(fail=True), max_size=10, workers=1)
+        await q.enqueue("c1", [_msg("a")])
+        await q.shutdown(timeout=2)
+        stats = q.get_stats()
+        assert stats["failed_batches"] == 1
+        assert stats["lag"]
+
+    async def test_shutdown_timeout_cancels_workers(self):
+        writer = _RecordingWriter()
+        writer.gate = asyncio.Event()  # never released
+        q = MemoryWriteQueue(writer=writer, max_size=10, workers=1)
+        await q.enqueue("c1", [_msg("a")])
+        await q.shutdown(timeout=0.05)
+        assert q.get_stats()["workers"] == 0
+
+
+class TestAddMessagesBatchSingleCall:
+    async def test_batch_uses_one_memory_add(self):
+        from core.chat_memory import AsyncChatMemory
+
+        class FakeMemory:
+            def __init__(self):
+                self.calls = []
+
+            async def add(self, *args, **kwargs):
+                self.calls.append((args, kwargs))
+
+        fake = FakeMemory()
+        m = AsyncChatMemory(memory=fake)
+        m.is_local = True
+        await m.add_messages_batch("c1", [_msg("q"), _msg("a", role="assistant")])
+
+        assert len(fake.calls) == 1
+        args, kwargs = fake.calls[0]
+        assert [x["content"] for x in args[0]] == ["q", "a"]
+        assert kwargs["metadata"]["role"] == "conversation"
@@ -0,0 +1,56 @@
+"""
+monitoring.loop_monitor tests
+Covers lag measurement, stall capture with the blocking call site, and the exported metrics
+"""
+import asyncio
+import time
+
+from monitoring.loop_monitor import LoopLagMonitor
+from utils.metrics import get_metrics_registry
+
+
+def _block_the_loop(seconds):
+    time.sleep(seconds)
+
+
+class TestLoopLagMonitor:
+    async def test_idle_loop_has_no_stalls(self):
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.1)
+        await monitor.start()
+        await asyncio.sleep(0.1)
+        await monitor.stop()
+
+        stats = monitor.get_stats()
+        assert stats["running"] is False
+        assert stats["lag"]["samples"] > 0
+        assert stats["stalls"] == 0
+
+    async def test_blocking_call_is_captured_with_site_and_stack(self):
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+        await monitor.start()
+        await asyncio.sleep(0.03)
+        _block_the_loop(0.25)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        stats = monitor.get_stats(include_events=True)
+        assert stats["stalls"] == 1
+        site = stats["blocking_sites"][0]
+        assert "test_monitoring_loop_monitor.py" in site["site"]
+        assert "_block_the_loop" in site["site"]
+        assert "time.sleep" in site["stack"]
+        assert float(stats["recent_stalls"][0]["duration"].rstrip("s")) >= 0.2
+        assert "yychat_event_loop_stalls_total" in get_metrics_registry().render()
+
+    async def test_reset_clears_stalls(self):
+        monitor = LoopLagMonitor(interval=0.01, threshold=0.05)
+        await monitor.start()
+        await asyncio.sleep(0.03)
+        _block_the_loop(0.15)
+        await asyncio.sleep(0.05)
+        await monitor.stop()
+
+        monitor.reset()
+        stats = monitor.get_stats(include_events=True)
+        assert stats["stalls"] == 0
+        assert stats["blocking_sites"] == [] and stats["recent_stalls"] == []
@@ -0,0 +1,84 @@
+"""
+monitoring.memory_profiler tests
+Covers labelled snapshots, module-grouped diffs and per-subsystem byte accounting
+"""
+import pytest
+
+from monitoring.memory_profiler import MemoryProfiler, deep_sizeof, module_of, register_default_subsystems
+
+_retained = []
+
+
+def _allocate():
+    _retained.append([bytes(1024) for _ in range(500)])
+
+
+class TestMemoryProfiler:
+    def test_snapshot_diff_groups_by_module(self):
+        profiler = MemoryProfiler(max_snapshots=3)
+        with pytest.raises(RuntimeError):
+            profiler.take_snapshot("before")
+        profiler.start()
+        try:
+            profiler.take_snapshot("before")
+            _allocate()
+            diff = profiler.diff("before", group_by="module")
+        finally:
+            profiler.stop()
+            _retained.clear()
+
+        top = {row["key"]: row for row in diff["top"]}
+        assert top["test.unit.test_monitoring_memory_profiler"]["size_diff"] >= 500 * 1024
+        assert diff["total_size_diff"] >= 500 * 1024
+        assert profiler.list_snapshots() == []
+
+    def test_snapshots_are_capped_and_missing_label_raises(self):
+        profiler = MemoryProfiler(max_snapshots=2)
+        profiler.start()
+        try:
+            for label in ("a", "b", "c"):
+                profiler.take_snapshot(label)
+            assert [s["label"] for s in profiler.list_snapshots()] == ["b", "c"]
+            with pytest.raises(KeyError):
+                profiler.diff("a", "c")
+        finally:
+            profiler.stop()
+
+    def test_diff_against_current_keeps_baseline(self):
+        profiler = MemoryProfiler(max_snapshots=2)
+        profiler.start()
+        try:
+            profiler.take_snapshot("a")
+            for _ in range(4):
+                assert profiler.diff("a")["target"] == "current"
+            assert [s["label"] for s in profiler.list_snapshots()] == ["a"]
+            first, second = profiler.take_snapshot(), profiler.take_snapshot()
+            assert first["label"] != second["label"]
+        finally:
+            profiler.stop()
+
+    def test_module_of(self):
+        assert module_of("/usr/lib/python3.11/site-packages/httpx/_client.py") == "httpx"
+        assert module_of("/usr/lib/python3.11/json/decoder.py") == "decoder"
+
+
+class TestSubsystemUsage:
+    def test_deep_sizeof_counts_shared_objects_once(self):
+        payload = bytes(10000)
+        assert deep_sizeof({"a": payload, "b": payload}) < 2 * 10000
+
+    def test_audio_cache_and_failing_getter(self):
+        class _Cache:
+            cache = {"k": bytes(50000)}
+            access_times = {"k": 1.0}
+            expires_at = {}
+
+        profiler = MemoryProfiler()
+        register_default_subsystems(profiler, audio_cache_getter=lambda: _Cache)
+        profiler.register_subsystem("broken", lambda: 1 / 0)
+
+        usage = profiler.get_subsystem_usage()
+        assert "broken" not in usage
+        assert usage["audio_cache"]["bytes"] >= 50000
+        assert usage["audio_cache"]["parts"]["cache"]["entries"] == 1
+        assert next(iter(usage)) == "audio_cache"
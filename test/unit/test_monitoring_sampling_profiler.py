@@ -0,0 +1,57 @@
+"""
+monitoring.sampling_profiler tests
+Covers thread grouping, collapsed-stack output and the single-run guard
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from monitoring.sampling_profiler import ProfilerBusyError, SamplingProfiler
+
+
+def _spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+class TestSamplingProfiler:
+    async def test_groups_loop_and_named_pools(self):
+        profiler = SamplingProfiler()
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+        try:
+            executor.submit(_spin, 0.3)
+            task = asyncio.create_task(profiler.profile(0.2, interval=0.005))
+            await asyncio.sleep(0)
+            _spin(0.1)
+            profile = await task
+        finally:
+            executor.shutdown()
+
+        assert profile["samples"] > 0
+        assert profile["samples_per_group"]["tts_executor"] > 0
+        assert profile["samples_per_group"]["event_loop"] > 0
+        lines = profile["collapsed"].splitlines()
+        assert any(line.startswith("tts_executor;") and "_spin" in line for line in lines)
+        assert any(line.startswith("event_loop;") and "test_groups_loop_and_named_pools;" in line for line in lines)
+        assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+        assert "sampling_profiler.py:_sample" not in profile["collapsed"]
+
+    def test_group_filter_and_busy_guard(self):
+        profiler = SamplingProfiler()
+        result = {}
+        thread = threading.Thread(target=lambda: result.update(profiler.sample(0.2, groups=["tts_executor"])))
+        thread.start()
+        time.sleep(0.05)
+        with pytest.raises(ProfilerBusyError):
+            profiler.sample(0.01)
+        thread.join()
+        assert profiler.running is False
+        assert result["collapsed"] == ""
+
+    def test_duration_is_capped(self):
+        profiler = SamplingProfiler(max_seconds=0.05)
+        assert profiler.sample(10)["duration"] < 1
@@ -0,0 +1,184 @@
+"""
+utils.near_duplicate tests
+Normalization, MinHash/LSH lookup with exact-Jaccard verification, scope isolation, LRU and the
+response cache / memory retrieval integrations
+"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from config.config import Config
+from core.chat_memory import AsyncChatMemory, memory_retrieval_source
+from core.response_cache import ResponseCache
+from utils.cache import CacheNamespace, TieredCache
+from utils.near_duplicate import NearDuplicateIndex, guard_features, jaccard, normalize_text, shingles
+
+PREAMBLE = ("我今年六十五岁，退休前是中学教师，有十年高血压病史，一直在服用氨氯地平控制血压，"
+            "去年体检发现血糖偏高，医生建议控制饮食并加强锻炼，平时喜欢散步和打太极拳，"
+            "晚上睡眠不太好，经常半夜醒来，家里人也比较担心我的身体状况。老伴前年做过心脏支架手术，"
+            "现在每天要吃阿司匹林和他汀类药物，我们两个人的饮食都由我来安排，早餐一般是小米粥和鸡蛋，"
+            "午饭和晚饭以蔬菜为主，偶尔吃一点鱼和瘦肉。最近天气转凉，早上起床时头有点晕，"
+            "量血压大概在一百四十到一百五十之间，比夏天的时候高一些，孩子们在外地工作，"
+            "不能经常回来，所以想在网上咨询一下专业的意见，看看需要注意哪些方面。")
+
+
+def _index(**kwargs):
+    options = dict(threshold=0.9, num_perm=32, bands=8, max_entries=100, shingle_size=2)
+    options.update(kwargs)
+    return NearDuplicateIndex("test", **options)
+
+
+class TestNormalization:
+    def test_normalize_text(self):
+        assert normalize_text("血压高，怎么办？") == normalize_text("血压高 怎么办?") == "血压高怎么办"
+        assert normalize_text("ＡＢＣ Hello!") == "abchello"
+        assert normalize_text("") == ""
+
+    def test_shingles_and_jaccard(self):
+        assert shingles("abc") == frozenset(["ab", "bc"])
+        assert shingles("a") == frozenset(["a"])
+        assert jaccard(shingles("血压高怎么办"), shingles("血压高怎么办")) == 1.0
+        assert jaccard(shingles("血压高怎么办"), shingles("血压低怎么办")) < 0.75
+        assert jaccard(frozenset(), shingles("abc")) == 0.0
+
+    def test_guard_features(self):
+        assert guard_features("高血压患者可以喝咖啡吗") != guard_features("高血压患者不可以喝咖啡吗")
+        assert guard_features("每天吃５克盐") == guard_features("每天吃5克盐？")
+        assert guard_features("I can't sleep") != guard_features("I can sleep")
+
+
+class TestNearDuplicateIndex:
+    def test_punctuation_variant_is_exact_hit(self):
+        index = _index()
+        index.add("s", "血压高怎么办？", "k1")
+        assert index.lookup("s", "血压高，怎么办!") == ("k1", 1.0)
+        assert index.get_stats()["exact_hits"] == 1
+
+    def test_paraphrase_is_near_hit(self):
+        index = _index()
+        index.add("s", "最近血压有点高应该怎么办", "k1")
+        value, similarity = index.lookup("s", "最近血压有点高应该怎么办呢")
+        assert value == "k1" and 0.9 <= similarity < 1.0
+        stats = index.get_stats()
+        assert stats["near_hits"] == 1 and stats["candidates"] >= 1
+
+    def test_dissimilar_query_misses(self):
+        index = _index()
+        index.add("s", "最近血压有点高应该怎么办", "k1")
+        assert index.lookup("s", "最近血压有点低应该怎么办") is None
+        assert index.lookup("s", "今天天气怎么样") is None
+        assert index.lookup("s", "") is None
+
+    def test_negation_or_digit_change_misses(self):
+        index = _index(threshold=0.7)
+        index.add("s", "高血压患者可以喝咖啡吗", "k1")
+        index.add("s", "每天应该吃5克盐对吗", "k2")
+        assert index.lookup("s", "高血压患者不可以喝咖啡吗") is None
+        assert index.lookup("s", "每天应该吃6克盐对吗") is None
+        assert index.get_stats()["guard_rejects"] >= 1
+
+    def test_long_text_uses_whole_question(self):
+        index = _index()
+        index.add("s", PREAMBLE + "请问高血压患者每天应该吃多少盐？", "k1")
+        assert index.lookup("s", PREAMBLE + "请问糖尿病患者可以吃西瓜吗？") is None
+        assert index.lookup("s", PREAMBLE + "请问高血压患者每天应该吃多少盐呢？")[0] == "k1"
+
+    def test_scopes_are_isolated(self):
+        index = _index()
+        index.add("health", "血压高怎么办", "k1")
+        assert index.lookup("friendly", "血压高怎么办") is None
+
+    def test_lru_eviction_discard_and_reject(self):
+        index = _index(max_entries=2)
+        index.add("s", "第一个问题是什么", "k1")
+        index.add("s", "第二个问题是什么", "k2")
+        index.lookup("s", "第一个问题是什么")
+        index.add("s", "完全不同的第三句话", "k3")
+        assert len(index) == 2
+        assert index.lookup("s", "第二个问题是什么") is None
+        index.discard("k1")
+        assert index.lookup("s", "第一个问题是什么") is None
+        index.reject("k3")
+        assert len(index) == 0 and index.get_stats()["stale_hits"] == 1
+        assert index._buckets == {} and index._exact == {}
+
+    def test_re_adding_value_replaces_entry(self):
+        index = _index()
+        index.add("s", "旧的问题文本", "k1")
+        index.add("s", "新的问题文本内容", "k1")
+        assert len(index) == 1
+        assert index.lookup("s", "旧的问题文本") is None
+        assert index.lookup("s", "新的问题文本内容") == ("k1", 1.0)
+
+    def test_bands_must_divide_num_perm(self):
+        with pytest.raises(ValueError):
+            _index(num_perm=30, bands=8)
+
+
+def _params(content):
+    return {"model": "gpt-4o", "temperature": 0.7,
+            "messages": [{"role": "system", "content": "人格"}, {"role": "user", "content": content}]}
+
+
+class TestResponseCacheNearDuplicate:
+    @pytest.fixture
+    def cache(self, monkeypatch):
+        monkeypatch.setattr(Config, "NEAR_DUPLICATE_ENABLED", True)
+        namespace = CacheNamespace("near_dup_test", backend=TieredCache(l1_maxsize=100, l1_ttl=60), beta=0)
+        return ResponseCache(namespace=namespace, default_ttl=60, chunk_chars=8, near_index=_index())
+
+    async def test_near_duplicate_question_hits(self, cache):
+        await cache.store(cache.make_lookup("health", _params("最近血压有点高应该怎么办")), "多休息", "gpt-4o", 60, "health")
+        entry = await cache.find(cache.make_lookup("health", _params("最近血压有点高应该怎么办呢？")), "health")
+        assert entry["content"] == "多休息"
+        assert cache.get_stats()["personalities"]["health"]["near_hits"] == 1
+
+    async def test_different_context_or_question_misses(self, cache):
+        await cache.store(cache.make_lookup("health", _params("最近血压有点高应该怎么办")), "多休息", "gpt-4o", 60, "health")
+        assert await cache.find(cache.make_lookup("friendly", _params("最近血压有点高应该怎么办")), "friendly") is None
+        assert await cache.find(cache.make_lookup("health", _params("最近血压有点低应该怎么办")), "health") is None
+
+    async def test_expired_entry_is_rejected(self, cache):
+        lookup = cache.make_lookup("health", _params("最近血压有点高应该怎么办"))
+        await cache.store(lookup, "多休息", "gpt-4o", 60, "health")
+        await cache.namespace.delete(lookup.key)
+        assert await cache.find(cache.make_lookup("health", _params("最近血压有点高应该怎么办呢")), "health") is None
+        assert cache.near_index.get_stats()["stale_hits"] == 1
+
+    async def test_disabled(self, cache, monkeypatch):
+        monkeypatch.setattr(Config, "NEAR_DUPLICATE_ENABLED", False)
+        await cache.store(cache.make_lookup("health", _params("最近血压有点高应该怎么办")), "多休息", "gpt-4o", 60, "health")
+        assert await cache.find(cache.make_lookup("health", _params("最近血压有点高应该怎么办呢")), "health") is None
+
+
+class TestMemoryNearDuplicate:
+    @pytest.fixture
+    def memory(self, monkeypatch):
+        monkeypatch.setattr(Config, "NEAR_DUPLICATE_ENABLED", True)
+        backend = MagicMock()
+        chat_memory = AsyncChatMemory(memory=backend)
+        chat_memory._near_index = _index()
+        chat_memory._retrieve_memory = MagicMock(side_effect=self._retrieve)
+        return chat_memory
+
+    @staticmethod
+    async def _retrieve(conversation_id, query, limit):
+        return [f"记忆:{query}"]
+
+    async def test_rephrased_query_reuses_retrieval(self, memory):
+        first = await memory.get_relevant_memory("c1", "最近血压有点高应该怎么办", 5)
+        second = await memory.get_relevant_memory("c1", "最近血压有点高应该怎么办呢", 5)
+        assert first == second
+        assert memory._retrieve_memory.call_count == 1
+        assert memory_retrieval_source.get() == "cache"
+        # 不同会话、不同 limit 不共享
+        await memory.get_relevant_memory("c2", "最近血压有点高应该怎么办呢", 5)
+        await memory.get_relevant_memory("c1", "最近血压有点高应该怎么办呢", 3)
+        assert memory._retrieve_memory.call_count == 3
+
+    async def test_invalidated_conversation_is_not_reused(self, memory):
+        await memory.get_relevant_memory("c1", "最近血压有点高应该怎么办", 5)
+        memory._invalidate_cache("c1")
+        await memory.get_relevant_memory("c1", "最近血压有点高应该怎么办呢", 5)
+        assert memory._retrieve_memory.call_count == 2
+        assert memory._near_index.get_stats()["stale_hits"] == 1
@@ -0,0 +1,115 @@
+"""
+core.openai_client tests
+Covers AsyncOpenAIClient native streaming, connection stats and the legacy wrapper
+"""
+import json
+import pytest
+import httpx
+from openai import AsyncOpenAI
+from unittest.mock import MagicMock
+
+from core.openai_client import (
+    AsyncOpenAIClient,
+    AsyncOpenAIWrapper,
+    build_async_http_client,
+    openai_connection_stats,
+    get_openai_connection_stats,
+)
+
+
+def _chunk(content=None, finish_reason=None):
+    return {
+        "id": "chatcmpl-test",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "mock",
+        "choices": [{"index": 0, "delta": {"content": content} if content else {}, "finish_reason": finish_reason}],
+    }
+
+
+def _sse_handler(request: httpx.Request) -> httpx.Response:
+    body = json.loads(request.content)
+    if body.get("stream"):
+        lines = [f"data: {json.dumps(_chunk(t))}\n\n" for t in ("你", "好")]
+        lines.append(f"data: {json.dumps(_chunk(finish_reason='stop'))}\n\n")
+        lines.append("data: [DONE]\n\n")
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, content="".join(lines).encode())
+    return httpx.Response(200, json={
+        "id": "chatcmpl-test",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "mock",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    })
+
+
+def _make_client(handler=_sse_handler):
+    http_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return AsyncOpenAIClient(AsyncOpenAI(api_key="sk-test", base_url="http://mock/v1", http_client=http_client, max_retries=0))
+
+
+class TestAsyncOpenAIClient:
+    def setup_method(self):
+        openai_connection_stats.reset()
+
+    async def test_create_chat(self):
+        client = _make_client()
+        resp = await client.create_chat({"model": "mock", "messages": [{"role": "user", "content": "hi"}]})
+        assert resp.choices[0].message.content == "ok"
+        stats = openai_connection_stats.to_dict()
+        assert stats["requests_total"] == 1
+        assert stats["streams_total"] == 0
+        assert stats["in_flight"] == 0
+
+    async def test_create_chat_stream_native(self):
+        client = _make_client()
+        contents = []
+        async for chunk in client.create_chat_stream({"model": "mock", "messages": []}):
+            if chunk.choices[0].delta.content:
+                contents.append(chunk.choices[0].delta.content)
+        assert "".join(contents) == "你好"
+        stats = openai_connection_stats.to_dict()
+        assert stats["streams_total"] == 1
+        assert stats["chunks_total"] == 3
+        assert stats["first_chunk"]["samples"] == 1
+        assert stats["in_flight"] == 0
+
+    async def test_stream_early_exit_releases_in_flight(self):
+        client = _make_client()
+        gen = client.create_chat_stream({"model": "mock", "messages": []})
+        async for _ in gen:
+            break
+        await gen.aclose()
+        assert openai_connection_stats.to_dict()["in_flight"] == 0
+
+    async def test_error_counted(self):
+        client = _make_client(lambda request: httpx.Response(500, json={"error": {"message": "boom"}}))
+        with pytest.raises(Exception):
+            await client.create_chat({"model": "mock", "messages": []})
+        stats = openai_connection_stats.to_dict()
+        assert stats["errors_total"] == 1
+        assert stats["in_flight"] == 0
+
+    async def test_http_client_falls_back_without_h2(self, monkeypatch):
+        import core.openai_client as openai_client
+        monkeypatch.setattr(openai_client, "HTTP2_AVAILABLE", False)
+        client = build_async_http_client()
+        try:
+            assert client._transport._pool._http2 is False
+        finally:
+            await client.aclose()
+
+    def test_get_openai_connection_stats_shape(self):
+        stats = get_openai_connection_stats()
+        assert "pool" in stats
+        assert "native_async" in stats
+
+
+class TestAsyncOpenAIWrapper:
+    async def test_wrapper_stream(self):
+        sync_client = MagicMock()
+        sync_client.chat.completions.create.return_value = iter(["a", "b"])
+        wrapper = AsyncOpenAIWrapper(sync_client)
+        chunks = [c async for c in wrapper.create_chat_stream({"model": "m"})]
+        assert chunks == ["a", "b"]
+        assert sync_client.chat.completions.create.call_args.kwargs["stream"] is True
@@ -0,0 +1,135 @@
+"""
+core.request_coalescer tests
+Identical concurrent generate_response calls share one engine call; streams are tee'd to every caller
+"""
+import asyncio
+
+import pytest
+
+from core.request_coalescer import RequestCoalescer, coalesce_requests, coalesced_request, get_request_coalescer
+
+
+class FakeEngine:
+    def __init__(self, chunks=3, delay=0.01, error=None):
+        self.calls = 0
+        self.closed = 0
+        self.chunks = chunks
+        self.delay = delay
+        self.error = error
+
+    @coalesce_requests
+    async def generate_response(self, messages, conversation_id="default", personality_id=None, use_tools=None,
+                                stream=None):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        if not stream:
+            return {"role": "assistant", "content": f"回答{self.calls}"}
+        return self._stream()
+
+    async def _stream(self):
+        try:
+            for i in range(self.chunks):
+                await asyncio.sleep(self.delay)
+                yield {"content": str(i), "finish_reason": "stop" if i == self.chunks - 1 else None, "stream": True}
+        finally:
+            self.closed += 1
+
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+
+async def _collect(generator):
+    return [chunk["content"] async for chunk in generator]
+
+
+class TestRequestCoalescer:
+    async def test_identical_concurrent_calls_share_one_call(self):
+        engine = FakeEngine()
+        first, second = await asyncio.gather(
+            engine.generate_response(MESSAGES, "c1", stream=False),
+            engine.generate_response(MESSAGES, conversation_id="c1", stream=False),
+        )
+        assert engine.calls == 1
+        assert first == second and first is not second
+        # 完成后不缓存：再次请求会重新执行
+        await engine.generate_response(MESSAGES, "c1", stream=False)
+        assert engine.calls == 2
+
+    async def test_different_requests_are_not_coalesced(self):
+        engine = FakeEngine()
+        await asyncio.gather(
+            engine.generate_response(MESSAGES, "c1", stream=False),
+            engine.generate_response(MESSAGES, "c2", stream=False),
+            engine.generate_response(MESSAGES, "c1", use_tools=True, stream=False),
+        )
+        assert engine.calls == 3
+
+    async def test_stream_is_teed_to_late_joiner(self):
+        engine = FakeEngine(chunks=4)
+        leader = await engine.generate_response(MESSAGES, "c1", stream=True)
+        leader_task = asyncio.create_task(_collect(leader))
+        await asyncio.sleep(0.025)
+        follower = await engine.generate_response(MESSAGES, "c1", stream=True)
+        assert await leader_task == ["0", "1", "2", "3"]
+        assert await _collect(follower) == ["0", "1", "2", "3"]
+        assert engine.calls == 1 and engine.closed == 1
+
+    async def test_upstream_cancelled_when_all_subscribers_leave(self):
+        engine = FakeEngine(chunks=50)
+        stream = await engine.generate_response(MESSAGES, "c1", stream=True)
+        async for _ in stream:
+            break
+        await stream.aclose()
+        await asyncio.sleep(0.02)
+        assert engine.closed == 1
+        assert get_request_coalescer().get_stats()["in_flight"] == 0
+
+    async def test_errors_propagate_to_followers(self):
+        engine = FakeEngine(error=RuntimeError("upstream down"))
+        results = await asyncio.gather(
+            engine.generate_response(MESSAGES, "c1", stream=False),
+            engine.generate_response(MESSAGES, "c1", stream=False),
+            return_exceptions=True,
+        )
+        assert engine.calls == 1
+        assert all(isinstance(r, RuntimeError) for r in results)
+
+    async def test_follower_runs_itself_when_leader_cancelled(self):
+        engine = FakeEngine(delay=0.05)
+        leader = asyncio.create_task(engine.generate_response(MESSAGES, "c1", stream=False))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(engine.generate_response(MESSAGES, "c1", stream=False))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        assert (await follower)["content"] == "回答2"
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+
+    async def test_followers_are_flagged_as_coalesced(self):
+        engine = FakeEngine()
+
+        async def call():
+            await engine.generate_response(MESSAGES, "c1", stream=False)
+            return coalesced_request.get()
+
+        assert await asyncio.gather(call(), call()) == [False, True]
+
+    async def test_disabled(self, monkeypatch):
+        from core import request_coalescer
+        monkeypatch.setattr(request_coalescer.config, "REQUEST_COALESCING_ENABLED", False)
+        engine = FakeEngine()
+        await asyncio.gather(*[engine.generate_response(MESSAGES, "c1", stream=False) for _ in range(2)])
+        assert engine.calls == 2
+
+
+async def test_stats():
+    coalescer = RequestCoalescer()
+
+    async def call():
+        await asyncio.sleep(0.01)
+        return {"content": "x"}
+
+    await asyncio.gather(coalescer.run("k", call, False), coalescer.run("k", call, False))
+    assert coalescer.get_stats()["leaders"] == 1 and coalescer.get_stats()["coalesced"] == 1
@@ -0,0 +1,129 @@
+"""
+core.response_cache tests
+Key normalization, replay chunking, per-personality TTL and the ChatEngine hit/miss paths (stream and non-stream)
+"""
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from config.config import Config
+from core.chat_engine import ChatEngine
+from core.response_cache import ResponseCache, split_for_replay
+from utils.cache import CacheNamespace, TieredCache
+from utils.near_duplicate import NearDuplicateIndex
+
+
+def _cache(**kwargs):
+    options = dict(default_ttl=60, chunk_chars=8, near_index=NearDuplicateIndex("response_test"))
+    options.update(kwargs)
+    namespace = CacheNamespace("response_test", backend=TieredCache(l1_maxsize=100, l1_ttl=60), beta=0)
+    return ResponseCache(namespace=namespace, **options)
+
+
+def _params(content="血压高怎么办？", tools=None):
+    params = {"model": "gpt-4o", "temperature": 0.7,
+              "messages": [{"role": "system", "content": "人格"}, {"role": "user", "content": content}]}
+    if tools:
+        params["tools"] = [{"type": "function", "function": {"name": name}} for name in tools]
+    return params
+
+
+class TestResponseCache:
+    def test_key_normalizes_whitespace(self):
+        cache = _cache()
+        assert cache.make_key("health_assistant", _params("血压高 怎么办？")) == \
+            cache.make_key("health_assistant", _params("  血压高\n怎么办？ "))
+        base = cache.make_key("health_assistant", _params())
+        assert base != cache.make_key("friendly", _params())
+        assert base != cache.make_key("health_assistant", _params(tools=["gettime"]))
+        assert cache.make_key("p", _params(tools=["a", "b"])) == cache.make_key("p", _params(tools=["b", "a"]))
+
+    def test_split_for_replay(self):
+        text = "领导，血压偏高可不能大意。建议您先休息半小时，保持心情平静。"
+        parts = split_for_replay(text, 8)
+        assert "".join(parts) == text
+        assert all(len(part) <= 8 for part in parts)
+        assert parts[0] == "领导，"
+        assert split_for_replay("", 8) == []
+
+    def test_ttl_for_personality(self):
+        cache = _cache(default_ttl=60)
+        assert cache.ttl_for(None) == 60
+        assert cache.ttl_for(SimpleNamespace(response_cache_ttl=None)) == 60
+        assert cache.ttl_for(SimpleNamespace(response_cache_ttl=0)) == 0
+        assert cache.ttl_for(SimpleNamespace(response_cache_ttl=86400)) == 86400
+
+    async def test_find_store_and_stats(self):
+        cache = _cache()
+        lookup = cache.make_lookup("health_assistant", _params())
+        assert await cache.find(lookup, "health_assistant") is None
+        await cache.store(lookup, "多喝水", "gpt-4o", 60, "health_assistant")
+        await cache.set("empty", "", "gpt-4o", 60, "health_assistant")
+        assert (await cache.find(lookup, "health_assistant"))["content"] == "多喝水"
+        assert (await cache.get(lookup.key))["content"] == "多喝水"
+        stats = cache.get_stats()
+        assert stats["personalities"]["health_assistant"] == {"hits": 1, "near_hits": 0, "misses": 1, "stores": 1}
+
+    async def test_replay_matches_engine_chunk_format(self):
+        chunks = [c async for c in _cache().replay({"content": "你好，领导。今天感觉怎么样？"})]
+        assert chunks[-1] == {"role": "assistant", "content": "", "finish_reason": "stop", "stream": True}
+        assert "".join(c["content"] for c in chunks) == "你好，领导。今天感觉怎么样？"
+        assert all(c["finish_reason"] is None for c in chunks[:-1])
+
+
+@pytest.fixture
+def engine(monkeypatch):
+    monkeypatch.setattr(Config, "RESPONSE_CACHE_ENABLED", True)
+    engine = ChatEngine()
+    # 记忆后端替换为 Mock，测试不依赖 MEM0_API_KEY 或本地向量库
+    with patch("core.chat_engine.ChatMemory"), patch("core.chat_engine.get_async_chat_memory"):
+        engine._ensure_initialized()
+    engine._prepare_request_context = AsyncMock(return_value=("", "人格", None))
+    engine._async_save_message_to_memory = AsyncMock()
+    engine.client = MagicMock()
+    engine.client.create_chat = AsyncMock(return_value=SimpleNamespace(
+        model="gpt-4o", usage=None,
+        choices=[SimpleNamespace(message=SimpleNamespace(content="领导，多喝温水，注意休息。", tool_calls=None))],
+    ))
+    return engine
+
+
+class TestChatEngineIntegration:
+    async def test_non_stream_hit_skips_upstream(self, engine):
+        cache = _cache()
+        with patch("core.chat_engine.get_response_cache", return_value=cache):
+            first = await engine.generate_response([{"role": "user", "content": "嗓子疼"}], "c1", stream=False)
+            second = await engine.generate_response([{"role": "user", "content": "嗓子疼 "}], "c2", stream=False)
+        assert first["content"] == second["content"] == "领导，多喝温水，注意休息。"
+        assert engine.client.create_chat.await_count == 1
+        assert second["usage"]["total_tokens"] == 0
+        # 命中时仍按原流程写入记忆
+        assert engine._async_save_message_to_memory.await_count == 2
+
+    async def test_stream_hit_replays_chunks(self, engine):
+        cache = _cache()
+        with patch("core.chat_engine.get_response_cache", return_value=cache):
+            await engine.generate_response([{"role": "user", "content": "嗓子疼"}], "c1", stream=False)
+            stream = await engine.generate_response([{"role": "user", "content": "嗓子疼"}], "c2", stream=True)
+            chunks = [chunk async for chunk in stream]
+        assert len(chunks) > 2 and chunks[-1]["finish_reason"] == "stop"
+        assert "".join(c["content"] for c in chunks) == "领导，多喝温水，注意休息。"
+        assert engine.client.create_chat.await_count == 1
+
+    async def test_memory_context_bypasses_cache(self, engine):
+        cache = _cache()
+        engine._prepare_request_context = AsyncMock(return_value=("参考记忆：用户有高血压", "人格", None))
+        with patch("core.chat_engine.get_response_cache", return_value=cache):
+            for cid in ("c1", "c2"):
+                await engine.generate_response([{"role": "user", "content": "嗓子疼"}], cid, stream=False)
+        assert engine.client.create_chat.await_count == 2
+        assert cache.get_stats()["personalities"] == {}
+
+    async def test_personality_ttl_zero_disables(self, engine):
+        cache = _cache()
+        engine.personality_manager.get_personality = MagicMock(return_value=SimpleNamespace(response_cache_ttl=0))
+        with patch("core.chat_engine.get_response_cache", return_value=cache):
+            for cid in ("c1", "c2"):
+                await engine.generate_response([{"role": "user", "content": "嗓子疼"}], cid, stream=False)
+        assert engine.client.create_chat.await_count == 2
@@ -59,6 +59,35 @@ class TestToolManager:
             assert result["error"] == "Tool execution failed"
             assert result["tool_name"] == "failing_tool"
 
+    @pytest.mark.asyncio
+    async def test_cacheable_tool_result_is_reused(self):
+        """Tools declaring cache_ttl share one execution for identical params"""
+        import asyncio
+        from utils.cache import reset_cache
+
+        reset_cache()
+        manager = ToolManager()
+        calls = []
+
+        class SearchTool:
+            cache_ttl = 60
+
+            async def execute(self, params):
+                calls.append(params)
+                await asyncio.sleep(0.01)
+                return {"answer": params["query"]}
+
+        with patch('services.tools.manager.tool_registry.get_tool', return_value=SearchTool()):
+            results = await asyncio.gather(*(manager.execute_tool("search", {"query": "q"}) for _ in range(3)))
+            again = await manager.execute_tool("search", {"query": "q"})
+            other = await manager.execute_tool("search", {"query": "other"})
+
+        assert [r["result"] for r in results] == [{"answer": "q"}] * 3
+        assert again["result"] == {"answer": "q"}
+        assert other["result"] == {"answer": "other"}
+        assert len(calls) == 2
+        reset_cache()
+
     @pytest.mark.asyncio
     async def test_execute_tools_concurrently_success(self):
         """Test concurrent tool execution with all tools succeeding"""
@@ -32,3 +32,72 @@ class TestTokenBudget:
         memory_section = "y" * 1000
         # small max_tokens -> should be false
         assert not should_include_memory(msgs, memory_section, max_tokens=10)
+
+
+class TestTokenCounter:
+    def test_cjk_aware_estimate(self):
+        from core.token_budget import estimate_text_tokens
+        # 中文按字计：char/4 会把 20 个汉字估成 5 个 token
+        assert estimate_text_tokens("你好" * 10) == 20
+        assert estimate_text_tokens("abcdefgh") == 2
+        assert estimate_text_tokens("你好 ab") == 3
+        assert estimate_text_tokens("") == 0
+
+    def test_counts_cached_by_content(self):
+        from core.token_budget import TokenCounter
+        counter = TokenCounter(encoding_name="missing-encoding", cache_size=2)
+        assert counter.count_text("你好世界") == 4
+        assert counter.count_text("你好世界") == 4
+        assert counter.get_stats()["hits"] == 1 and counter.get_stats()["encoder"] == "estimate"
+        counter.count_text("a")
+        counter.count_text("b")
+        assert counter.get_stats()["cache_size"] == 2
+
+    def test_message_overhead_and_tool_calls(self):
+        from core.token_budget import TokenCounter, MESSAGE_OVERHEAD_TOKENS, REPLY_PRIMING_TOKENS
+        counter = TokenCounter(encoding_name="missing-encoding")
+        call = {"role": "assistant", "content": None,
+                "tool_calls": [{"function": {"name": "gettime", "arguments": "{}"}}]}
+        assert counter.count_message(call) == MESSAGE_OVERHEAD_TOKENS + 2 + 1
+        parts = {"role": "user", "content": [{"type": "text", "text": "你好"}, {"type": "image_url"}]}
+        assert counter.count_messages([parts]) == MESSAGE_OVERHEAD_TOKENS + 2 + REPLY_PRIMING_TOKENS
+        assert counter.count_messages([]) == 0
+
+
+class TestTrimMessagesToBudget:
+    def _counter(self):
+        from core.token_budget import TokenCounter
+        return TokenCounter(encoding_name="missing-encoding")
+
+    def test_keeps_system_and_latest_within_budget(self):
+        from core.token_budget import trim_messages_to_budget
+        system = {"role": "system", "content": "系" * 20}
+        history = [{"role": "user" if i % 2 == 0 else "assistant", "content": "字" * 10} for i in range(10)]
+        messages = [system] + history
+        # 系统 23 + 引导 3 + 最后一条 13 = 39，剩余 61 可再放 4 条（每条 13）
+        trimmed = trim_messages_to_budget(messages, 100, counter=self._counter())
+        assert trimmed[0] is system and trimmed[-1] is history[-1]
+        assert len(trimmed) == 1 + 5
+        assert trim_messages_to_budget(messages, 0, counter=self._counter()) is messages
+        assert trim_messages_to_budget(messages, 10000, counter=self._counter()) is messages
+
+    def test_tool_schema_consumes_budget(self):
+        from core.token_budget import trim_messages_to_budget
+        messages = [{"role": "user", "content": "字" * 10} for _ in range(6)]
+        tools = [{"type": "function", "function": {"name": "t", "description": "描" * 40}}]
+        with_tools = trim_messages_to_budget(messages, 80, tools, counter=self._counter())
+        without = trim_messages_to_budget(messages, 80, counter=self._counter())
+        assert len(with_tools) < len(without)
+        # 预算不足时至少保留最后一条
+        assert trim_messages_to_budget(messages, 1, tools, counter=self._counter()) == messages[-1:]
+
+    def test_does_not_start_with_orphan_tool_message(self):
+        from core.token_budget import trim_messages_to_budget
+        messages = [
+            {"role": "user", "content": "字" * 30},
+            {"role": "assistant", "content": None, "tool_calls": [{"function": {"name": "x", "arguments": "字" * 30}}]},
+            {"role": "tool", "tool_call_id": "1", "content": "结果"},
+            {"role": "user", "content": "好"},
+        ]
+        trimmed = trim_messages_to_budget(messages, 20, counter=self._counter())
+        assert trimmed == messages[-1:]
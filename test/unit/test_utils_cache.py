@@ -1,11 +1,19 @@
 """
 utils.cache tests
-Covers MemoryCache basic ops, get_cache singleton fallback, and hash_key uniqueness
+Covers MemoryCache basic ops, get_cache singleton fallback, hash_key uniqueness,
+the cache codec, AsyncRedisCache against a local fake server, TieredCache,
+per-key TTL, and CacheNamespace single-flight / early refresh / stats
 """
+import asyncio
 import pytest
 from unittest.mock import patch
 
-from utils.cache import MemoryCache, get_cache, reset_cache, hash_key
+from utils.cache import (
+    MemoryCache, get_cache, reset_cache, hash_key,
+    CacheCodec, AsyncRedisCache, TieredCache, get_async_cache,
+    PerKeyTTLCache, CacheNamespace, get_cache_namespace_stats,
+)
+from test.fixtures.fake_redis_server import FakeRedisServer
 
 
 class TestMemoryCache:
@@ -46,3 +54,208 @@ class TestMemoryCache:
         k3 = hash_key("a", 2, x=2, y=3)
         assert k1 == k2
         assert k1 != k3
+
+
+class TestCacheCodec:
+    def test_roundtrip_json_and_bytes(self):
+        value = {"text": "你好", "items": [1, 2.5, None, True], "nested": {"k": "v"}}
+        assert CacheCodec.decode(CacheCodec.encode(value)) == value
+        assert CacheCodec.decode(CacheCodec.encode(b"\x00audio")) == b"\x00audio"
+
+    def test_rejects_unknown_payload_and_unsupported_values(self):
+        import pickle
+        with pytest.raises(ValueError):
+            CacheCodec.decode(pickle.dumps({"a": 1}))
+        with pytest.raises(TypeError):
+            CacheCodec.encode(object())
+
+
+@pytest.fixture
+async def redis_server():
+    async with FakeRedisServer() as server:
+        yield server
+
+
+def _redis_cache(server, **kwargs):
+    return AsyncRedisCache(host=server.host, port=server.port, db=0, password="",
+                           max_connections=4, default_ttl=60, **kwargs)
+
+
+class TestAsyncRedisCache:
+    async def test_basic_ops(self, redis_server):
+        cache = _redis_cache(redis_server)
+        await cache.set("k1", {"v": 1})
+        assert await cache.get("k1") == {"v": 1}
+        assert await cache.exists("k1")
+        await cache.delete("k1")
+        assert await cache.get("k1") is None
+        assert await cache.ping()
+        await cache.close()
+
+    async def test_batch_ops_use_mget_and_single_round_trip(self, redis_server):
+        cache = _redis_cache(redis_server)
+        await cache.set_many({"a": 1, "b": [2], "c": "3"}, ttl=30)
+        redis_server.commands.clear()
+        assert await cache.get_many(["a", "b", "missing", "c"]) == {"a": 1, "b": [2], "c": "3"}
+        assert redis_server.commands == ["MGET"]
+        await cache.close()
+
+    async def test_concurrent_requests_share_bounded_pool(self, redis_server):
+        cache = _redis_cache(redis_server)
+        redis_server.delay = 0.01
+        await asyncio.gather(*(cache.set(f"k{i}", i) for i in range(20)))
+        assert redis_server.connections <= 4
+        await cache.close()
+
+    async def test_timeout_degrades_to_miss(self, redis_server):
+        cache = _redis_cache(redis_server, socket_timeout=0.05)
+        await cache.set("k", 1)
+        redis_server.delay = 0.2
+        assert await cache.get("k") is None
+        assert cache.errors == 1
+        await cache.close()
+
+
+class TestTieredCache:
+    async def test_l1_serves_after_l2_hit(self, redis_server):
+        l2 = _redis_cache(redis_server)
+        await l2.set("k", "v")
+        cache = TieredCache(l2=l2, l1_maxsize=10, l1_ttl=10)
+        assert await cache.get("k") == "v"
+        redis_server.commands.clear()
+        assert await cache.get("k") == "v"
+        assert redis_server.commands == []
+        stats = cache.get_stats()
+        assert stats["l1_hits"] == 1 and stats["l2_hits"] == 1
+        await cache.close()
+
+    async def test_get_many_fetches_only_l1_misses(self, redis_server):
+        cache = TieredCache(l2=_redis_cache(redis_server), l1_maxsize=10, l1_ttl=10)
+        await cache.set_many({"a": 1, "b": 2})
+        cache.l1.pop("b")
+        redis_server.commands.clear()
+        assert await cache.get_many(["a", "b", "c"]) == {"a": 1, "b": 2}
+        assert redis_server.commands == ["MGET"]
+        assert cache.get_stats()["misses"] == 1
+        await cache.close()
+
+    async def test_without_l2_is_in_process_only(self):
+        cache = TieredCache(l1_maxsize=10, l1_ttl=10)
+        await cache.set("k", 1)
+        assert await cache.exists("k")
+        await cache.delete("k")
+        assert await cache.get("k") is None
+
+    def test_get_async_cache_without_redis(self):
+        reset_cache()
+        with patch("utils.cache.config") as mock_cfg:
+            mock_cfg.USE_REDIS_CACHE = False
+            mock_cfg.CACHE_L1_MAXSIZE = 5
+            mock_cfg.CACHE_L1_TTL = 10
+            mock_cfg.MEMORY_CACHE_TTL = 30
+            cache = get_async_cache()
+            assert isinstance(cache, TieredCache)
+            assert cache.l2 is None
+            assert get_async_cache() is cache
+        reset_cache()
+
+
+class TestPerKeyTTL:
+    def test_keys_expire_independently(self):
+        now = [0.0]
+        cache = PerKeyTTLCache(maxsize=10, ttl=100, timer=lambda: now[0])
+        cache.set("short", 1, ttl=5)
+        cache.set("default", 2)
+        now[0] = 10
+        assert "short" not in cache
+        assert cache["default"] == 2
+        now[0] = 101
+        assert "default" not in cache
+
+    def test_memory_cache_honours_ttl_argument(self):
+        cache = MemoryCache(maxsize=10, ttl=1800)
+        cache.set("k", "v", ttl=60)
+        assert cache.get("k") == "v"
+        assert cache.cache.default_ttl == 1800
+
+    async def test_tiered_l1_ttl_capped_only_with_l2(self, redis_server):
+        tiered = TieredCache(l2=_redis_cache(redis_server), l1_maxsize=10, l1_ttl=10)
+        assert tiered._l1_ttl(3600) == 10
+        assert tiered._l1_ttl(5) == 5
+        assert TieredCache(l1_maxsize=10, l1_ttl=10)._l1_ttl(3600) == 3600
+        await tiered.close()
+
+
+class TestCacheNamespace:
+    def _namespace(self, name, **kwargs):
+        return CacheNamespace(name, backend=TieredCache(l1_maxsize=100, l1_ttl=60), default_ttl=60, **kwargs)
+
+    async def test_single_flight_loads_once(self):
+        ns = self._namespace("ns-single-flight", beta=0)
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "value"
+
+        results = await asyncio.gather(*(ns.get_or_load("k", loader) for _ in range(10)))
+        assert results == ["value"] * 10
+        assert len(calls) == 1
+        assert await ns.get_or_load("k", loader) == "value"
+        stats = ns.stats.get_stats()
+        assert stats["loads"] == 1
+        assert stats["coalesced"] == 9
+        assert stats["hits"] == 1
+        assert stats["load_latency"]
+
+    async def test_loader_error_propagates_to_waiters_and_is_not_cached(self):
+        ns = self._namespace("ns-error", beta=0)
+
+        async def failing():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("tts down")
+
+        results = await asyncio.gather(*(ns.get_or_load("k", failing) for _ in range(3)),
+                                       return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert ns.stats.load_errors == 1
+        assert await ns.get("k") is None
+
+    async def test_cancelled_leader_does_not_strand_waiters(self):
+        ns = self._namespace("ns-cancel", beta=0)
+        attempts = []
+
+        async def loader():
+            attempts.append(1)
+            await asyncio.sleep(0.05)
+            return len(attempts)
+
+        leader = asyncio.ensure_future(ns.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(ns.get_or_load("k", loader))
+        await asyncio.sleep(0)
+        leader.cancel()
+        assert await follower == 2
+
+    async def test_early_refresh_near_expiry(self):
+        ns = self._namespace("ns-early", beta=1.0)
+        version = [0]
+
+        async def loader():
+            version[0] += 1
+            return version[0]
+
+        assert await ns.get_or_load("k", loader, ttl=60) == 1
+        # Pretend the entry is about to expire and was slow to load
+        full_key = ns._key("k")
+        import time as _time
+        ns._meta[full_key] = (_time.monotonic() + 0.001, 10.0)
+        assert await ns.get_or_load("k", loader) == 1  # stale value served immediately
+        await asyncio.sleep(0.01)
+        assert await ns.get_or_load("k", loader) == 2
+        assert ns.stats.early_refreshes >= 1
+
+    def test_namespace_stats_registry(self):
+        self._namespace("ns-registry").stats.record_hit()
+        assert get_cache_namespace_stats()["ns-registry"]["hits"] >= 1
@@ -229,4 +229,70 @@ class TestLogConfiguration:
         for handler in handlers:
             if hasattr(handler, 'enqueue'):
                 # Enqueue should be True for thread safety
-                assert handler.enqueue is True
\ No newline at end of file
+                assert handler.enqueue is True
+
+class TestCategoryLogger:
+    @pytest.fixture
+    def captured(self, monkeypatch):
+        import utils.log as log_module
+        monkeypatch.setattr(log_module, "_MIN_LEVEL_NO", 20)
+        records = []
+        handler_id = log.add(lambda message: records.append(message.record), level="DEBUG",
+                             filter=lambda record: "category" in record["extra"])
+        yield records
+        log.remove(handler_id)
+
+    def test_below_level_is_lazy(self, captured):
+        from utils.log import CategoryLogger
+
+        calls = []
+        logger = CategoryLogger("test.lazy")
+        logger.debug(lambda: calls.append(1) or "never")
+        logger.debug("{}", MagicMock(__format__=MagicMock(side_effect=AssertionError)))
+        assert calls == [] and captured == []
+
+        logger.info("value={}", 42)
+        assert captured[0]["message"] == "value=42"
+        assert captured[0]["extra"]["category"] == "test.lazy"
+        assert captured[0]["function"] == "test_below_level_is_lazy"
+
+    def test_rate_limit_reports_suppressed_and_spares_warnings(self, captured):
+        from utils.log import CategoryLogger
+
+        logger = CategoryLogger("test.rate", rate=0.001, burst=2)
+        for i in range(5):
+            logger.info("tick {}", i)
+        logger.warning("still logged")
+        assert [r["message"] for r in captured] == ["tick 0", "tick 1", "still logged (此前抑制 3 条)"]
+        assert logger.suppressed == 3
+
+        logger._tokens = 1.0
+        logger.info("after")
+        assert captured[-1]["message"] == "after"
+
+    def test_sampling_and_settings_parsing(self, captured):
+        from utils.log import CategoryLogger, _parse_category_settings, _parse_rate
+
+        logger = CategoryLogger("test.sample", sample_rate=0.0)
+        logger.info("dropped")
+        assert captured == [] and logger.suppressed == 1
+
+        settings = _parse_category_settings("voice.audio_delta=5, ws.send=20:40,bad")
+        assert settings == {"voice.audio_delta": "5", "ws.send": "20:40"}
+        assert _parse_rate("20:40") == (20.0, 40.0)
+        assert _parse_rate("0.5") == (0.5, 1.0)
+
+    def test_json_format_is_compact(self):
+        import json
+        from utils.log import _json_format
+
+        records = []
+        handler_id = log.add(lambda message: records.append(message.record), level="DEBUG")
+        log.bind(category="test.json").warning("hello")
+        log.remove(handler_id)
+
+        record = records[0]
+        assert _json_format(record) == "{extra[_json]}\n"
+        entry = json.loads(record["extra"]["_json"])
+        assert entry["cat"] == "test.json" and entry["lvl"] == "WARNING" and entry["msg"] == "hello"
+        assert entry["src"].startswith("test_utils_log.py:")
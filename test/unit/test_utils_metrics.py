@@ -0,0 +1,92 @@
+"""
+utils.metrics tests
+Covers labelled instruments, OpenMetrics rendering, collectors and the chat/tool hot-path exports
+"""
+import pytest
+
+from utils.metrics import MetricFamily, MetricsRegistry, get_metrics_registry
+from utils.performance import PerformanceMetrics, PerformanceMonitor
+
+
+class TestMetricsRegistry:
+    def test_counter_children_are_cached_per_label_set(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("requests", "Requests", ("route",))
+        assert counter.labels("a") is counter.labels(route="a")
+        counter.labels("a").inc()
+        counter.labels("a").inc(2)
+        counter.labels("b").inc()
+
+        text = registry.render()
+        assert "# TYPE requests counter" in text
+        assert 'requests_total{route="a"} 3' in text
+        assert 'requests_total{route="b"} 1' in text
+        assert text.endswith("# EOF\n")
+
+    def test_histogram_renders_cumulative_buckets(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value)
+
+        text = registry.render()
+        assert 'latency_seconds_bucket{le="0.1"} 2' in text
+        assert 'latency_seconds_bucket{le="1.0"} 3' in text
+        assert 'latency_seconds_bucket{le="+Inf"} 4' in text
+        assert "latency_seconds_count 4" in text
+        assert "latency_seconds_sum 3.65" in text
+
+    def test_same_name_returns_existing_metric_and_rejects_type_mismatch(self):
+        registry = MetricsRegistry()
+        gauge = registry.gauge("depth", "Depth")
+        assert registry.gauge("depth", "Depth") is gauge
+        with pytest.raises(ValueError):
+            registry.counter("depth", "Depth")
+
+    def test_label_values_are_escaped(self):
+        registry = MetricsRegistry()
+        registry.counter("c", "C", ("v",)).labels('a"b\\c').inc()
+        assert 'c_total{v="a\\"b\\\\c"} 1' in registry.render()
+
+    def test_collectors_render_and_failures_are_skipped(self):
+        registry = MetricsRegistry()
+        registry.register_collector("ok", lambda: [MetricFamily("queue_depth", "gauge", "Depth").add(5, queue="w")])
+
+        def broken():
+            raise RuntimeError("boom")
+
+        registry.register_collector("broken", broken)
+        text = registry.render()
+        assert 'queue_depth{queue="w"} 5' in text
+
+
+class TestHotPathExports:
+    def test_performance_record_exports_ttft_and_stages(self):
+        monitor = PerformanceMonitor()
+        monitor.record(PerformanceMetrics(
+            personality_id="metrics_test", stream=True, use_tools=True, tool_called=True,
+            memory_retrieval_time=0.02, openai_api_time=0.8, first_chunk_time=0.3, total_time=1.0,
+        ), log_enabled=False)
+
+        text = get_metrics_registry().render()
+        assert 'yychat_chat_requests_total{personality="metrics_test",stream="true",tool_use="called"} 1' in text
+        assert 'yychat_chat_ttft_seconds_count{personality="metrics_test",tool_use="called"} 1' in text
+        assert 'yychat_chat_stage_seconds_count{stage="memory_retrieval",personality="metrics_test",tool_use="called"} 1' in text
+        assert 'stage="tool_execution",personality="metrics_test"' not in text
+
+    async def test_tool_manager_exports_calls(self):
+        from unittest.mock import AsyncMock, MagicMock, patch
+        from services.tools.manager import ToolManager
+
+        tool = MagicMock()
+        tool.cache_ttl = None
+        tool.execute = AsyncMock(return_value="ok")
+        with patch("services.tools.manager.tool_registry") as registry:
+            registry.get_tool.side_effect = lambda name: tool if name == "metrics_tool" else None
+            await ToolManager().execute_tool("metrics_tool", {})
+            await ToolManager().execute_tool("no_such_tool", {})
+
+        text = get_metrics_registry().render()
+        assert 'yychat_tool_calls_total{tool="metrics_tool",status="success"}' in text
+        assert 'yychat_tool_duration_seconds_count{tool="metrics_tool"} 1' in text
+        assert 'tool="no_such_tool"' not in text
@@ -9,6 +9,8 @@ from unittest.mock import patch, MagicMock
 from utils.performance import (
     PerformanceMetrics, 
     PerformanceMonitor, 
+    QuantileSketch,
+    RollingSketch,
     performance_monitor,
     get_performance_monitor
 )
@@ -335,6 +337,77 @@ class TestPerformanceMonitor:
             mock_log.info.assert_called_once_with("[PERF] 性能监控数据已清除")
 
 
+class TestQuantileSketch:
+    def test_quantiles_within_relative_accuracy(self):
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        for i in range(1, 10001):
+            sketch.add(i / 1000)
+        assert sketch.count == 10000
+        assert sketch.quantile(0.5) == pytest.approx(5.0, rel=0.02)
+        assert sketch.quantile(0.99) == pytest.approx(9.9, rel=0.02)
+        assert sketch.min == 0.001 and sketch.max == 10.0
+
+    def test_merge_equals_single_sketch(self):
+        a, b, whole = QuantileSketch(), QuantileSketch(), QuantileSketch()
+        for i in range(100):
+            (a if i % 2 else b).add(i * 0.01)
+            whole.add(i * 0.01)
+        a.merge(b)
+        assert a.count == whole.count
+        assert a.quantile(0.95) == whole.quantile(0.95)
+        assert a.mean == pytest.approx(whole.mean)
+
+    def test_rolling_sketch_expires_old_slots(self):
+        window = RollingSketch(window_seconds=60, slots=6)
+        window.add(1.0, now=0)
+        window.add(2.0, now=30)
+        assert window.snapshot(now=30).count == 2
+        assert window.snapshot(now=65).count == 1
+        assert window.snapshot(now=200).count == 0
+
+
+class TestPerformanceMonitorAggregates:
+    def test_history_is_bounded_but_stats_cover_all_requests(self):
+        monitor = PerformanceMonitor(max_history=10)
+        for i in range(100):
+            monitor.record(PerformanceMetrics(total_time=0.1 * (i + 1)), log_enabled=False)
+
+        assert len(monitor._metrics_history) == 10
+        stats = monitor.get_statistics()
+        assert stats["summary"]["total_requests"] == 100
+        assert stats["total_time"]["max"] == "10.000s"
+        assert stats["windows"]["1m"]["requests"] == 100
+        assert "p99" in stats["windows"]["5m"]["total_time"]
+
+    def test_sampling_rate_applies_to_history_and_logs(self):
+        monitor = PerformanceMonitor(sampling_rate=0.0)
+        with patch('utils.performance.log') as mock_log:
+            for _ in range(20):
+                monitor.record(PerformanceMetrics(total_time=1.0))
+            mock_log.info.assert_not_called()
+
+        assert len(monitor._metrics_history) == 0
+        stats = monitor.get_statistics()
+        assert stats["summary"]["total_requests"] == 20
+        assert stats["summary"]["sampled_requests"] == 0
+
+    def test_configure_resizes_history(self):
+        monitor = PerformanceMonitor(max_history=5)
+        for i in range(5):
+            monitor.record(PerformanceMetrics(request_id=str(i)), log_enabled=False)
+        monitor.configure(max_history=2, sampling_rate=2.0)
+
+        assert monitor._max_history == 2
+        assert [m.request_id for m in monitor._metrics_history] == ["3", "4"]
+        assert monitor.sampling_rate == 1.0
+
+    def test_clear_resets_aggregates(self):
+        monitor = PerformanceMonitor()
+        monitor.record(PerformanceMetrics(total_time=1.0), log_enabled=False)
+        monitor.clear()
+        assert monitor.get_statistics()["status"] == "no_data"
+
+
 class TestGlobalPerformanceMonitor:
     def test_global_performance_monitor(self):
         """Test global performance monitor instance"""
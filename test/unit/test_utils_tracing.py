@@ -0,0 +1,174 @@
+"""
+utils.tracing tests
+Covers span parenting across asyncio tasks and threads, sampling, JSONL rotation, OTLP payloads
+and the retrieval source that replaces the "< 10ms means cache hit" guess
+"""
+import asyncio
+import contextvars
+import json
+import threading
+
+from utils.tracing import (
+    NOOP_SPAN, JsonlSpanExporter, OtlpHttpSpanExporter, SpanExporter, Tracer,
+    current_span, wrap_context,
+)
+
+
+class _CollectingExporter(SpanExporter):
+    def __init__(self):
+        super().__init__()
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+
+def _tracer(**kwargs):
+    exporter = _CollectingExporter()
+    return Tracer(exporter, **kwargs), exporter
+
+
+class TestSpans:
+    async def test_children_in_gathered_tasks_share_trace(self):
+        tracer, exporter = _tracer()
+
+        async def child(name):
+            with tracer.span(name):
+                await asyncio.sleep(0)
+
+        with tracer.span("root") as root:
+            await asyncio.gather(child("a"), child("b"))
+        assert current_span() is NOOP_SPAN
+
+        by_name = {s.name: s for s in exporter.spans}
+        assert by_name["a"].parent_id == root.span_id
+        assert by_name["b"].trace_id == root.trace_id
+        assert by_name["root"].parent_id is None
+        assert by_name["root"].duration >= by_name["a"].duration
+
+    def test_exception_marks_span_error(self):
+        tracer, exporter = _tracer()
+        try:
+            with tracer.span("boom"):
+                raise ValueError("bad")
+        except ValueError:
+            pass
+        assert exporter.spans[0].status == "error"
+        assert "ValueError" in exporter.spans[0].error
+
+    def test_unsampled_root_makes_whole_trace_noop(self):
+        tracer, exporter = _tracer(sample_rate=0.0)
+        with tracer.span("root") as root:
+            with tracer.span("child") as child:
+                assert current_span() is child
+        assert not root.recording and not child.recording
+        assert current_span() is NOOP_SPAN
+        assert exporter.spans == []
+
+    async def test_partial_sampling_never_exports_orphan_children(self):
+        tracer, exporter = _tracer(sample_rate=0.5)
+
+        async def request():
+            with tracer.span("root"):
+                await asyncio.gather(*(leaf(i) for i in range(3)))
+
+        async def leaf(i):
+            with tracer.span(f"child{i}"):
+                with tracer.span("grandchild"):
+                    await asyncio.sleep(0)
+
+        for _ in range(200):
+            await request()
+        roots = [s for s in exporter.spans if s.parent_id is None]
+        assert 0 < len(roots) < 200
+        assert all(s.name == "root" for s in roots)
+        assert len(exporter.spans) == len(roots) * 7
+
+    def test_disabled_and_allow_root(self):
+        disabled, _ = _tracer(enabled=False)
+        assert disabled.span("x") is NOOP_SPAN
+
+        tracer, exporter = _tracer()
+        assert tracer.span("heartbeat", allow_root=False) is NOOP_SPAN
+        with tracer.span("request"):
+            with tracer.span("ws.send", allow_root=False):
+                pass
+        assert [s.name for s in exporter.spans] == ["ws.send", "request"]
+
+    def test_ending_in_another_context_restores_parent(self):
+        for sample_rate in (1.0, 0.0):
+            tracer, _ = _tracer(sample_rate=sample_rate)
+            with tracer.span("root") as root:
+                child = tracer.span("stream")
+                child.activate()
+                # 流式响应由另一个任务消费，在复制出的上下文中结束
+                other = contextvars.copy_context()
+                other.run(child.deactivate)
+                assert other.run(current_span) is root
+            assert current_span() is NOOP_SPAN
+
+    def test_wrap_context_carries_span_into_thread(self):
+        tracer, exporter = _tracer()
+
+        def work():
+            with tracer.span("in-thread"):
+                pass
+
+        with tracer.span("root") as root:
+            thread = threading.Thread(target=wrap_context(work))
+            thread.start()
+            thread.join()
+        assert exporter.spans[0].parent_id == root.span_id
+
+
+class TestExporters:
+    def test_jsonl_exporter_writes_and_rotates(self, tmp_path):
+        path = tmp_path / "traces.jsonl"
+        exporter = JsonlSpanExporter(str(path), max_bytes=600, backup_count=2)
+        tracer = Tracer(exporter)
+        for i in range(10):
+            with tracer.span("op", index=i):
+                pass
+            exporter.flush()
+        exporter.shutdown()
+
+        record = json.loads(path.read_text().splitlines()[-1])
+        assert record["name"] == "op"
+        assert record["attributes"]["index"] == 9
+        assert (tmp_path / "traces.jsonl.1").exists()
+        assert not (tmp_path / "traces.jsonl.3").exists()
+
+    def test_otlp_payload_shape(self):
+        tracer, exporter = _tracer()
+        with tracer.span("root", stream=True):
+            with tracer.span("child", tool="weather") as child:
+                child.add_event("first_chunk")
+        payload = OtlpHttpSpanExporter("http://collector/v1/traces").build_payload(exporter.spans)
+
+        spans = payload["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        child_record = spans[0]
+        assert len(child_record["traceId"]) == 32 and len(child_record["spanId"]) == 16
+        assert child_record["parentSpanId"] == spans[1]["spanId"]
+        assert {"key": "tool", "value": {"stringValue": "weather"}} in child_record["attributes"]
+        assert child_record["events"][0]["name"] == "first_chunk"
+        assert "parentSpanId" not in spans[1]
+
+
+class TestRetrievalSource:
+    async def test_async_chat_memory_reports_cache_hit(self):
+        from core.chat_memory import AsyncChatMemory, memory_retrieval_source
+
+        class _Memory:
+            async def add(self, *args, **kwargs):
+                pass
+
+        memory = AsyncChatMemory(memory=_Memory())
+
+        async def fake_retrieve(conversation_id, query, limit):
+            return ["m"]
+
+        memory._retrieve_memory = fake_retrieve
+        await memory.get_relevant_memory("c1", "q")
+        assert memory_retrieval_source.get() == "fresh"
+        await memory.get_relevant_memory("c1", "q")
+        assert memory_retrieval_source.get() == "cache"
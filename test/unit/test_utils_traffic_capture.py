@@ -0,0 +1,156 @@
+"""
+utils.traffic_capture tests
+Covers anonymization, the capture middleware for streaming HTTP and WebSocket sessions,
+and that the replayer restores captured records deterministically
+"""
+import json
+
+import pytest
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+
+from benchmarks.replay_traffic import load_capture, restore
+from utils.traffic_capture import (
+    Anonymizer, CaptureWriter, TrafficCaptureMiddleware, TrafficRecorder, set_traffic_recorder,
+)
+
+
+class TestAnonymizer:
+    def test_fields_by_kind(self):
+        anonymizer = Anonymizer("salt")
+        result = anonymizer.anonymize({
+            "model": "gpt-4o",
+            "stream": True,
+            "temperature": 0.7,
+            "conversation_id": "user-42",
+            "messages": [{"role": "user", "content": "你好，帮我查一下天气"}],
+            "audio_base64": "QUJDRA==",
+        })
+        assert result["model"] == "gpt-4o" and result["stream"] is True and result["temperature"] == 0.7
+        assert result["conversation_id"].startswith("h:") and "user-42" not in result["conversation_id"]
+        content = result["messages"][0]["content"]
+        assert content["len"] == 10 and content["cjk"] is True and result["messages"][0]["role"] == "user"
+        assert result["audio_base64"] == {"b64len": 8}
+        assert "天气" not in json.dumps(result, ensure_ascii=False)
+
+    def test_participant_names_hashed_tool_names_kept(self):
+        result = Anonymizer("salt").anonymize({
+            "messages": [
+                {"role": "user", "name": "zhang_san", "content": "你好"},
+                {"role": "assistant", "tool_calls": [
+                    {"id": "call_1", "type": "function", "function": {"name": "get_weather", "arguments": "{}"}},
+                ]},
+                {"role": "tool", "name": "get_weather", "tool_call_id": "call_1", "content": "晴"},
+            ],
+            "tools": [{"type": "function", "function": {"name": "get_weather", "description": "查询天气"}}],
+            "tool_choice": {"type": "function", "function": {"name": "get_weather"}},
+        })
+        user, assistant, tool = result["messages"]
+        assert user["name"].startswith("h:") and "zhang_san" not in json.dumps(result)
+        assert assistant["tool_calls"][0]["function"]["name"] == "get_weather"
+        assert tool["name"] == "get_weather"
+        assert result["tools"][0]["function"]["name"] == "get_weather"
+        assert result["tool_choice"]["function"]["name"] == "get_weather"
+
+    def test_same_text_same_hash_only_with_same_salt(self):
+        first, second = Anonymizer("a"), Anonymizer("b")
+        assert first.text("hello") == first.text("hello")
+        assert first.text("hello")["h"] != second.text("hello")["h"]
+        assert Anonymizer().digest("x") != Anonymizer().digest("x")  # 未配置盐时每个实例随机
+
+
+@pytest.fixture
+def recorder(tmp_path):
+    recorder = TrafficRecorder(CaptureWriter(str(tmp_path / "capture.jsonl")), salt="test", max_ws_events=4)
+    set_traffic_recorder(recorder)
+    yield recorder
+    recorder.shutdown()
+    set_traffic_recorder(None)
+
+
+def _client() -> TestClient:
+    app = FastAPI()
+    app.add_middleware(TrafficCaptureMiddleware)
+
+    @app.post("/v1/chat/completions")
+    async def completions(request: Request):
+        await request.json()
+
+        async def body():
+            for token in ("a", "b", "c"):
+                yield f"data: {token}\n\n"
+        return StreamingResponse(body(), media_type="text/event-stream")
+
+    @app.post("/other")
+    async def other():
+        return {}
+
+    @app.websocket("/ws/chat")
+    async def ws_chat(websocket: WebSocket):
+        await websocket.accept()
+        try:
+            while True:
+                message = json.loads(await websocket.receive_text())
+                await websocket.send_text(json.dumps({"type": "reply", "content": message.get("content")}))
+        except WebSocketDisconnect:
+            pass
+
+    return TestClient(app)
+
+
+def _records(recorder):
+    recorder.writer.flush()
+    return load_capture(recorder.writer.path)
+
+
+class TestMiddleware:
+    def test_streaming_http_request(self, recorder):
+        client = _client()
+        response = client.post("/v1/chat/completions",
+                               json={"messages": [{"role": "user", "content": "secret"}], "stream": True})
+        assert response.text == "data: a\n\ndata: b\n\ndata: c\n\n"
+        client.post("/other", json={"content": "not captured"})
+
+        [record] = _records(recorder)
+        assert record["kind"] == "http" and record["status"] == 200
+        assert record["chunks"] == 3 and record["bytes"] == len(response.text)
+        assert 0 <= record["ttfb"] <= record["duration"]
+        assert "secret" not in json.dumps(record)
+        assert recorder.get_stats()["http_recorded"] == 1
+
+    def test_websocket_session_with_event_cap(self, recorder):
+        with _client().websocket_connect("/ws/chat") as ws:
+            for text in ("one", "two", "three"):
+                ws.send_text(json.dumps({"type": "text_message", "content": text}))
+                ws.receive_text()
+
+        [record] = _records(recorder)
+        assert record["kind"] == "ws" and record["truncated"] is True
+        assert [event["dir"] for event in record["events"]] == ["in", "out", "in", "out"]
+        assert record["events"][0]["msg"]["type"] == "text_message"
+        assert record["events"][1]["type"] == "reply" and "msg" not in record["events"][1]
+
+    def test_disabled_recorder_passes_through(self, tmp_path):
+        set_traffic_recorder(None)
+        assert _client().post("/v1/chat/completions", json={}).status_code == 200
+
+
+class TestReplayRestore:
+    def test_restore_is_deterministic_and_preserves_shape(self):
+        anonymizer = Anonymizer("salt")
+        original = {"conversation_id": "c1", "messages": [{"role": "user", "content": "你好世界"}],
+                    "audio_data": "QUJDRA==", "stream": False}
+        restored = restore(anonymizer.anonymize(original))
+        assert restored == restore(anonymizer.anonymize(original))
+        assert restored["conversation_id"].startswith("replay-") and restored["stream"] is False
+        assert len(restored["messages"][0]["content"]) == 4 and restored["messages"][0]["role"] == "user"
+        assert restored["audio_data"] == "AAAAAAAA"
+
+    def test_load_capture_includes_rotated_files_in_time_order(self, tmp_path):
+        path = tmp_path / "capture.jsonl"
+        (tmp_path / "capture.jsonl.1").write_text(json.dumps({"ts": 2}) + "\n")
+        (tmp_path / "capture.jsonl.2").write_text(json.dumps({"ts": 1}) + "\n")
+        path.write_text(json.dumps({"ts": 3}) + "\n\n")
+        assert [record["ts"] for record in load_capture(str(path))] == [1, 2, 3]
+        assert len(load_capture(str(path), limit=2)) == 2
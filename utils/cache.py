@@ -1,18 +1,82 @@
 """
 统一缓存抽象层
 支持内存缓存和Redis缓存，便于切换和扩展
+- 同步后端: MemoryCache / RedisCache
+- 异步后端: AsyncRedisCache（连接池 + mget/pipeline批量操作）/ TieredCache（进程内L1 + Redis L2）
 """
-import pickle
+import asyncio
+import json
 import hashlib
+import math
+import random
+import time
 from abc import ABC, abstractmethod
-from typing import Any, Optional
-from cachetools import TTLCache
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+from cachetools import LRUCache, TLRUCache
 from utils.log import log
 from config.config import get_config
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson为可选依赖，缺失时使用标准库json
+    orjson = None
+
 config = get_config()
 
 
+class CacheCodec:
+    """
+    缓存值编解码（替代pickle）
+    
+    格式: 1字节类型标记 + 负载
+    - b"j": JSON（优先使用orjson）
+    - b"b": 原始bytes（如音频数据）
+    
+    解码不会执行任意代码；不支持JSON序列化的值在写入时抛出TypeError
+    """
+    
+    JSON = b"j"
+    RAW = b"b"
+    
+    @classmethod
+    def encode(cls, value: Any) -> bytes:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            return cls.RAW + bytes(value)
+        if orjson is not None:
+            return cls.JSON + orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+        return cls.JSON + json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    
+    @classmethod
+    def decode(cls, data: bytes) -> Any:
+        tag, payload = data[:1], data[1:]
+        if tag == cls.RAW:
+            return payload
+        if tag == cls.JSON:
+            return orjson.loads(payload) if orjson is not None else json.loads(payload)
+        raise ValueError(f"未知的缓存编码标记: {tag!r}")
+
+
+class PerKeyTTLCache(TLRUCache):
+    """支持按key设置过期时间的TTL缓存（未指定ttl时使用默认ttl）"""
+    
+    def __init__(self, maxsize: int, ttl: float, timer=time.monotonic):
+        self.default_ttl = ttl
+        self._next_ttl = None
+        super().__init__(maxsize, ttu=self._ttu, timer=timer)
+    
+    def _ttu(self, _key, _value, now):
+        return now + (self._next_ttl or self.default_ttl)
+    
+    def set(self, key, value, ttl: Optional[float] = None):
+        """写入并指定该key的过期时间（秒）"""
+        self._next_ttl = ttl
+        try:
+            self[key] = value
+        finally:
+            self._next_ttl = None
+
+
 class CacheBackend(ABC):
     """缓存后端抽象基类"""
     
@@ -48,7 +112,7 @@ class CacheBackend(ABC):
 
 class MemoryCache(CacheBackend):
     """
-    内存缓存实现（基于cachetools.TTLCache）
+    内存缓存实现（基于PerKeyTTLCache，支持按key过期）
     
     优点：
     - 速度快
@@ -65,7 +129,7 @@ class MemoryCache(CacheBackend):
             maxsize: 最大缓存条目数
             ttl: 默认过期时间（秒）
         """
-        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.cache = PerKeyTTLCache(maxsize=maxsize, ttl=ttl)
         self.default_ttl = ttl
         log.info(f"✅ MemoryCache初始化完成 (maxsize={maxsize}, ttl={ttl}s)")
     
@@ -78,9 +142,9 @@ class MemoryCache(CacheBackend):
             return None
     
     def set(self, key: str, value: Any, ttl: Optional[int] = None):
-        """设置缓存值（TTLCache不支持单独设置ttl，使用全局ttl）"""
+        """设置缓存值（ttl为空时使用默认过期时间）"""
         try:
-            self.cache[key] = value
+            self.cache.set(key, value, ttl)
         except Exception as e:
             log.error(f"MemoryCache set error for key {key}: {e}")
     
@@ -129,7 +193,7 @@ class RedisCache(CacheBackend):
                 port=config.REDIS_PORT,
                 db=config.REDIS_DB,
                 password=config.REDIS_PASSWORD if config.REDIS_PASSWORD else None,
-                decode_responses=False,  # 使用bytes模式，便于pickle
+                decode_responses=False,  # 使用bytes模式，由CacheCodec编解码
                 socket_timeout=5,
                 socket_connect_timeout=5,
                 health_check_interval=30
@@ -148,7 +212,7 @@ class RedisCache(CacheBackend):
         try:
             data = self.client.get(key)
             if data:
-                return pickle.loads(data)
+                return CacheCodec.decode(data)
             return None
         except Exception as e:
             log.error(f"RedisCache get error for key {key}: {e}")
@@ -157,7 +221,7 @@ class RedisCache(CacheBackend):
     def set(self, key: str, value: Any, ttl: Optional[int] = None):
         """设置缓存值"""
         try:
-            data = pickle.dumps(value)
+            data = CacheCodec.encode(value)
             if ttl:
                 self.client.setex(key, ttl, data)
             else:
@@ -197,6 +261,502 @@ class RedisCache(CacheBackend):
             return False
 
 
+class AsyncCacheBackend(ABC):
+    """异步缓存后端抽象基类（在事件循环中使用，不阻塞）"""
+    
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        pass
+    
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """设置缓存值"""
+        pass
+    
+    @abstractmethod
+    async def delete(self, key: str):
+        """删除缓存"""
+        pass
+    
+    @abstractmethod
+    async def clear(self):
+        """清空所有缓存"""
+        pass
+    
+    @abstractmethod
+    async def exists(self, key: str) -> bool:
+        """检查key是否存在"""
+        pass
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """批量获取，返回命中的 {key: value}"""
+        result = {}
+        for key in keys:
+            value = await self.get(key)
+            if value is not None:
+                result[key] = value
+        return result
+    
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None):
+        """批量设置"""
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+    
+    async def close(self):
+        """释放连接等资源"""
+        pass
+    
+    def get_name(self) -> str:
+        """获取缓存后端名称"""
+        return self.__class__.__name__
+
+
+class AsyncRedisCache(AsyncCacheBackend):
+    """
+    异步Redis缓存实现（redis.asyncio）
+    
+    - 共享连接池，连接数受 REDIS_MAX_CONNECTIONS 限制
+    - get_many 使用 MGET，set_many 使用非事务pipeline，一次往返完成批量操作
+    - socket超时较短，超时/异常按未命中处理，不拖慢请求
+    """
+    
+    def __init__(self, host: Optional[str] = None, port: Optional[int] = None, db: Optional[int] = None,
+                 password: Optional[str] = None, max_connections: Optional[int] = None,
+                 socket_timeout: Optional[float] = None, default_ttl: Optional[int] = None):
+        import redis.asyncio as aioredis
+        
+        self.host = host or config.REDIS_HOST
+        self.port = port or config.REDIS_PORT
+        self.default_ttl = config.REDIS_TTL if default_ttl is None else default_ttl
+        timeout = config.REDIS_SOCKET_TIMEOUT if socket_timeout is None else socket_timeout
+        password = config.REDIS_PASSWORD if password is None else password
+        self.pool = aioredis.ConnectionPool(
+            host=self.host,
+            port=self.port,
+            db=config.REDIS_DB if db is None else db,
+            password=password or None,
+            max_connections=max_connections or config.REDIS_MAX_CONNECTIONS,
+            socket_timeout=timeout,
+            socket_connect_timeout=timeout,
+            health_check_interval=30,
+            protocol=2  # RESP2，兼容所有Redis版本
+        )
+        self.client = aioredis.Redis(connection_pool=self.pool)
+        self.errors = 0
+        log.info(f"✅ AsyncRedisCache初始化完成 ({self.host}:{self.port})")
+    
+    def _decode(self, key: str, data: Optional[bytes]) -> Optional[Any]:
+        if data is None:
+            return None
+        try:
+            return CacheCodec.decode(data)
+        except Exception as e:
+            log.warning(f"AsyncRedisCache decode error for key {key}: {e}")
+            return None
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        try:
+            return self._decode(key, await self.client.get(key))
+        except Exception as e:
+            self.errors += 1
+            log.error(f"AsyncRedisCache get error for key {key}: {e}")
+            return None
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """设置缓存值"""
+        try:
+            await self.client.set(key, CacheCodec.encode(value), ex=ttl or self.default_ttl or None)
+        except Exception as e:
+            self.errors += 1
+            log.error(f"AsyncRedisCache set error for key {key}: {e}")
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """批量获取（MGET）"""
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = await self.client.mget(keys)
+        except Exception as e:
+            self.errors += 1
+            log.error(f"AsyncRedisCache mget error ({len(keys)} keys): {e}")
+            return {}
+        result = {}
+        for key, data in zip(keys, values):
+            value = self._decode(key, data)
+            if value is not None:
+                result[key] = value
+        return result
+    
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None):
+        """批量设置（pipeline，单次往返）"""
+        if not items:
+            return
+        ex = ttl or self.default_ttl or None
+        try:
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key, value in items.items():
+                    pipe.set(key, CacheCodec.encode(value), ex=ex)
+                await pipe.execute()
+        except Exception as e:
+            self.errors += 1
+            log.error(f"AsyncRedisCache pipeline set error ({len(items)} keys): {e}")
+    
+    async def delete(self, key: str):
+        """删除缓存"""
+        try:
+            await self.client.delete(key)
+        except Exception as e:
+            self.errors += 1
+            log.error(f"AsyncRedisCache delete error for key {key}: {e}")
+    
+    async def clear(self):
+        """清空所有缓存（慎用！会清空整个DB）"""
+        try:
+            await self.client.flushdb()
+            log.warning("⚠️ AsyncRedisCache cleared (flushdb)")
+        except Exception as e:
+            self.errors += 1
+            log.error(f"AsyncRedisCache clear error: {e}")
+    
+    async def exists(self, key: str) -> bool:
+        """检查key是否存在"""
+        try:
+            return await self.client.exists(key) > 0
+        except Exception as e:
+            self.errors += 1
+            log.error(f"AsyncRedisCache exists error for key {key}: {e}")
+            return False
+    
+    async def ping(self) -> bool:
+        """健康检查"""
+        try:
+            return await self.client.ping()
+        except Exception as e:
+            log.error(f"AsyncRedisCache ping error: {e}")
+            return False
+    
+    async def close(self):
+        """关闭连接池"""
+        try:
+            await self.client.aclose()
+            await self.pool.disconnect()
+        except Exception as e:
+            log.error(f"AsyncRedisCache close error: {e}")
+
+
+class TieredCache(AsyncCacheBackend):
+    """
+    两级缓存：进程内L1(PerKeyTTLCache) + 可选L2(AsyncRedisCache)
+    
+    - 读: L1命中直接返回；L1未命中查L2，命中后回填L1
+    - 写/删: 同时作用于L1和L2
+    - 有L2时L1的过期时间不超过 CACHE_L1_TTL，限制多实例间的不一致
+    - 未配置L2时退化为纯进程内缓存，按key的ttl过期
+    """
+    
+    def __init__(self, l2: Optional[AsyncCacheBackend] = None, l1_maxsize: Optional[int] = None,
+                 l1_ttl: Optional[int] = None):
+        if l1_ttl is None:
+            l1_ttl = config.CACHE_L1_TTL if l2 is not None else config.MEMORY_CACHE_TTL
+        self.l1 = PerKeyTTLCache(maxsize=l1_maxsize or config.CACHE_L1_MAXSIZE, ttl=l1_ttl)
+        self.l2 = l2
+        self.stats = {"l1_hits": 0, "l2_hits": 0, "misses": 0}
+        log.info(f"✅ TieredCache初始化完成 (L1 maxsize={self.l1.maxsize}, ttl={l1_ttl}s, "
+                 f"L2={l2.get_name() if l2 else 'none'})")
+    
+    def _l1_ttl(self, ttl: Optional[int]) -> Optional[int]:
+        if self.l2 is None or not ttl:
+            return ttl
+        return min(ttl, self.l1.default_ttl)
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值"""
+        value = self.l1.get(key)
+        if value is not None:
+            self.stats["l1_hits"] += 1
+            return value
+        if self.l2 is not None:
+            value = await self.l2.get(key)
+            if value is not None:
+                self.stats["l2_hits"] += 1
+                self.l1[key] = value
+                return value
+        self.stats["misses"] += 1
+        return None
+    
+    async def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """批量获取：L1未命中的key一次性从L2取回"""
+        result = {}
+        missing: List[str] = []
+        for key in keys:
+            value = self.l1.get(key)
+            if value is not None:
+                result[key] = value
+            else:
+                missing.append(key)
+        self.stats["l1_hits"] += len(result)
+        if missing and self.l2 is not None:
+            found = await self.l2.get_many(missing)
+            self.l1.update(found)
+            result.update(found)
+            self.stats["l2_hits"] += len(found)
+            self.stats["misses"] += len(missing) - len(found)
+        else:
+            self.stats["misses"] += len(missing)
+        return result
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """设置缓存值"""
+        self.l1.set(key, value, self._l1_ttl(ttl))
+        if self.l2 is not None:
+            await self.l2.set(key, value, ttl)
+    
+    async def set_many(self, items: Dict[str, Any], ttl: Optional[int] = None):
+        """批量设置"""
+        for key, value in items.items():
+            self.l1.set(key, value, self._l1_ttl(ttl))
+        if self.l2 is not None:
+            await self.l2.set_many(items, ttl)
+    
+    async def delete(self, key: str):
+        """删除缓存"""
+        self.l1.pop(key, None)
+        if self.l2 is not None:
+            await self.l2.delete(key)
+    
+    async def clear(self):
+        """清空所有缓存"""
+        self.l1.clear()
+        if self.l2 is not None:
+            await self.l2.clear()
+    
+    async def exists(self, key: str) -> bool:
+        """检查key是否存在"""
+        if key in self.l1:
+            return True
+        return self.l2 is not None and await self.l2.exists(key)
+    
+    async def close(self):
+        """关闭L2连接"""
+        if self.l2 is not None:
+            await self.l2.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """获取命中统计"""
+        total = sum(self.stats.values())
+        hits = self.stats["l1_hits"] + self.stats["l2_hits"]
+        return {
+            **self.stats,
+            "l1_size": len(self.l1),
+            "hit_rate": f"{(hits / total * 100) if total else 0:.1f}%",
+            "l2": self.l2.get_name() if self.l2 else None,
+        }
+
+
+class NamespaceStats:
+    """单个缓存命名空间的命中、未命中与加载耗时统计"""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+        self.load_errors = 0
+        self.coalesced = 0
+        self.early_refreshes = 0
+        self._load_times = deque(maxlen=1000)
+    
+    def record_hit(self):
+        self.hits += 1
+    
+    def record_miss(self):
+        self.misses += 1
+    
+    def record_load(self, seconds: float, ok: bool = True):
+        self.loads += 1
+        if not ok:
+            self.load_errors += 1
+        self._load_times.append(seconds)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        times = sorted(self._load_times)
+        load_latency = {}
+        if times:
+            load_latency = {
+                "avg": f"{sum(times) / len(times):.3f}s",
+                "p95": f"{times[min(int(len(times) * 0.95), len(times) - 1)]:.3f}s",
+                "max": f"{times[-1]:.3f}s",
+            }
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": f"{(self.hits / total * 100) if total else 0:.1f}%",
+            "loads": self.loads,
+            "load_errors": self.load_errors,
+            "coalesced": self.coalesced,
+            "early_refreshes": self.early_refreshes,
+            "load_latency": load_latency,
+        }
+
+
+_namespace_stats: Dict[str, NamespaceStats] = {}
+
+
+def get_namespace_stats(name: str) -> NamespaceStats:
+    """获取（必要时创建）命名空间统计对象，供自行管理缓存的模块上报"""
+    stats = _namespace_stats.get(name)
+    if stats is None:
+        stats = _namespace_stats[name] = NamespaceStats(name)
+    return stats
+
+
+def get_cache_namespace_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有缓存命名空间的统计"""
+    return {name: stats.get_stats() for name, stats in _namespace_stats.items()}
+
+
+class CacheNamespace:
+    """
+    带命名空间的异步缓存入口
+    
+    - get_or_load: 同一key的并发未命中只执行一次loader（single-flight），其余请求等待同一个future
+    - 概率提前刷新（XFetch）：越接近过期、加载越慢，命中时越可能在后台提前重新加载，
+      避免热点key集中过期时的惊群
+    - 按命名空间统计命中、未命中与加载耗时
+    """
+    
+    def __init__(self, name: str, backend: Optional[AsyncCacheBackend] = None,
+                 default_ttl: Optional[int] = None, beta: Optional[float] = None):
+        """
+        Args:
+            name: 命名空间（同时作为key前缀）
+            backend: 异步缓存后端，默认使用全局 get_async_cache()
+            default_ttl: 默认过期时间（秒）
+            beta: 提前刷新系数，越大越早刷新，0表示关闭
+        """
+        self.name = name
+        self._backend = backend
+        self.default_ttl = default_ttl or config.MEMORY_CACHE_TTL
+        self.beta = config.CACHE_EARLY_REFRESH_BETA if beta is None else beta
+        self.stats = get_namespace_stats(name)
+        self._inflight: Dict[str, asyncio.Future] = {}
+        # key -> (过期时间, 加载耗时)，用于提前刷新判断
+        self._meta = LRUCache(maxsize=10000)
+        self._refresh_tasks = set()
+    
+    @property
+    def backend(self) -> AsyncCacheBackend:
+        if self._backend is None:
+            self._backend = get_async_cache()
+        return self._backend
+    
+    def _key(self, key: str) -> str:
+        return f"{self.name}:{key}"
+    
+    async def get(self, key: str) -> Optional[Any]:
+        """获取缓存值（计入命中统计）"""
+        value = await self.backend.get(self._key(key))
+        if value is None:
+            self.stats.record_miss()
+        else:
+            self.stats.record_hit()
+        return value
+    
+    async def peek(self, key: str) -> Optional[Any]:
+        """获取缓存值（不计入命中统计）"""
+        return await self.backend.get(self._key(key))
+    
+    async def set(self, key: str, value: Any, ttl: Optional[int] = None):
+        """设置缓存值"""
+        await self._store(self._key(key), value, ttl, 0.0)
+    
+    async def delete(self, key: str):
+        """删除缓存"""
+        full_key = self._key(key)
+        self._meta.pop(full_key, None)
+        await self.backend.delete(full_key)
+    
+    async def get_or_load(self, key: str, loader: Callable[[], Awaitable[Any]],
+                          ttl: Optional[int] = None) -> Any:
+        """
+        读取缓存，未命中时调用loader加载并回填（loader返回None时不缓存）
+        
+        Example:
+            audio = await get_cache_namespace("tts").get_or_load(key, lambda: synthesize(text))
+        """
+        full_key = self._key(key)
+        value = await self.backend.get(full_key)
+        if value is not None:
+            self.stats.record_hit()
+            if full_key not in self._inflight and self._should_refresh_early(full_key):
+                self.stats.early_refreshes += 1
+                task = asyncio.ensure_future(self._load(full_key, loader, ttl))
+                self._refresh_tasks.add(task)
+                task.add_done_callback(self._on_refresh_done)
+            return value
+        self.stats.record_miss()
+        return await self._load(full_key, loader, ttl)
+    
+    def _should_refresh_early(self, full_key: str) -> bool:
+        if self.beta <= 0:
+            return False
+        meta = self._meta.get(full_key)
+        if meta is None:
+            return False
+        expires_at, delta = meta
+        # XFetch: now - delta * beta * ln(rand) >= expiry
+        return time.monotonic() - delta * self.beta * math.log(1.0 - random.random()) >= expires_at
+    
+    def _on_refresh_done(self, task: asyncio.Task):
+        self._refresh_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            log.warning(f"缓存提前刷新失败 [{self.name}]: {task.exception()}")
+    
+    async def _load(self, full_key: str, loader: Callable[[], Awaitable[Any]], ttl: Optional[int]) -> Any:
+        future = self._inflight.get(full_key)
+        if future is not None:
+            self.stats.coalesced += 1
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled():
+                    # 发起加载的请求被取消，由当前请求重新加载
+                    return await self._load(full_key, loader, ttl)
+                raise
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[full_key] = future
+        start = time.perf_counter()
+        try:
+            value = await loader()
+            delta = time.perf_counter() - start
+            self.stats.record_load(delta)
+            if value is not None:
+                await self._store(full_key, value, ttl, delta)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            if not future.done():
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    self.stats.record_load(time.perf_counter() - start, ok=False)
+                    future.set_exception(e)
+                    future.exception()  # 标记已读取，避免无人等待时的告警
+            raise
+        finally:
+            self._inflight.pop(full_key, None)
+    
+    async def _store(self, full_key: str, value: Any, ttl: Optional[int], delta: float):
+        ttl = ttl or self.default_ttl
+        await self.backend.set(full_key, value, ttl)
+        self._meta[full_key] = (time.monotonic() + ttl, delta)
+
+
 # 全局缓存实例
 _cache_instance: Optional[CacheBackend] = None
 
@@ -234,8 +794,61 @@ def get_cache() -> CacheBackend:
 
 def reset_cache():
     """重置缓存实例（主要用于测试）"""
-    global _cache_instance
+    global _cache_instance, _async_cache_instance
     _cache_instance = None
+    _async_cache_instance = None
+    _namespaces.clear()
+
+
+_async_cache_instance: Optional[AsyncCacheBackend] = None
+
+
+def get_async_cache() -> AsyncCacheBackend:
+    """
+    获取全局异步缓存实例（单例）
+    
+    USE_REDIS_CACHE=true 时使用Redis（CACHE_TIERED=true 时在前面加进程内L1），
+    否则为纯进程内缓存
+    """
+    global _async_cache_instance
+    
+    if _async_cache_instance is not None:
+        return _async_cache_instance
+    
+    l2 = None
+    if config.USE_REDIS_CACHE:
+        try:
+            log.info("🔄 初始化异步Redis缓存...")
+            l2 = AsyncRedisCache()
+        except Exception as e:
+            log.error(f"初始化异步Redis缓存失败: {e}")
+            log.warning("⚠️ 降级到进程内缓存")
+    
+    if l2 is not None and not config.CACHE_TIERED:
+        _async_cache_instance = l2
+    else:
+        _async_cache_instance = TieredCache(l2=l2)
+    return _async_cache_instance
+
+
+async def close_async_cache():
+    """关闭全局异步缓存（应用关闭时调用）"""
+    global _async_cache_instance
+    if _async_cache_instance is not None:
+        await _async_cache_instance.close()
+        _async_cache_instance = None
+
+
+_namespaces: Dict[str, CacheNamespace] = {}
+
+
+def get_cache_namespace(name: str, backend: Optional[AsyncCacheBackend] = None,
+                        default_ttl: Optional[int] = None) -> CacheNamespace:
+    """获取全局缓存命名空间（单例，首次调用的参数生效）"""
+    namespace = _namespaces.get(name)
+    if namespace is None:
+        namespace = _namespaces[name] = CacheNamespace(name, backend=backend, default_ttl=default_ttl)
+    return namespace
 
 
 def hash_key(*args, **kwargs) -> str:
@@ -9,13 +9,23 @@
 #  @Email   : ibmzhangjun@139.com
 #  @Software: VACDA
 
+import json
 import os
+import random
 import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple, Union
 
 from loguru import logger as log
 
 from config import Config
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson为可选依赖，缺失时使用标准库json
+    orjson = None
+
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 LOG_DIR = os.path.join(BASE_DIR, 'logs')
 LOG_PATH = os.path.join(LOG_DIR, Config.LOG_FILE_NAME)
@@ -34,6 +44,156 @@ log.add(sys.stdout,
             level=Config.LOG_LEVEL,
             enqueue=True)
 
+
+def _json_format(record) -> str:
+    """紧凑JSON行：ts/lvl/cat/src/msg（异常时附加exc）"""
+    entry = {
+        "ts": round(record["time"].timestamp(), 3),
+        "lvl": record["level"].name,
+        "cat": record["extra"].get("category"),
+        "src": f"{record['file'].name}:{record['line']}",
+        "msg": record["message"],
+    }
+    if record["exception"] is not None:
+        entry["exc"] = repr(record["exception"].value)
+    if orjson is not None:
+        line = orjson.dumps(entry).decode("utf-8")
+    else:
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+    record["extra"]["_json"] = line
+    return "{extra[_json]}\n"
+
+
+if Config.LOG_JSON_ENABLED:
+    log.add(os.path.join(LOG_DIR, Config.LOG_JSON_FILE_NAME),
+            format=_json_format,
+            rotation="100 MB",
+            retention="14 days",
+            level=Config.LOG_LEVEL,
+            enqueue=True)
+
+# 所有sink共用的最低级别：低于该级别的日志在门面中直接返回，不做任何格式化
+_MIN_LEVEL_NO = log.level(Config.LOG_LEVEL.upper()).no
+_WARNING_NO = log.level("WARNING").no
+
+
+def _parse_category_settings(raw: str) -> Dict[str, str]:
+    settings = {}
+    for item in (raw or "").split(","):
+        if "=" in item:
+            category, value = item.split("=", 1)
+            settings[category.strip()] = value.strip()
+    return settings
+
+
+def _parse_rate(value: str) -> Tuple[float, float]:
+    rate, _, burst = value.partition(":")
+    rate = float(rate)
+    return rate, float(burst) if burst else max(1.0, rate)
+
+
+class CategoryLogger:
+    """
+    按类别的日志门面（用于每个token/音频块都会执行的热路径）
+    - 惰性格式化：低于配置级别时直接返回；消息可为带 {} 占位符的模板加参数，或无参函数，只在真正输出时求值
+    - 限流（令牌桶）与采样只作用于 DEBUG/INFO，WARNING 及以上总是输出
+    - 被限流/采样丢弃的条数会附加在下一条输出的日志中
+    """
+
+    def __init__(self, category: str, rate: Optional[float] = None, burst: Optional[float] = None,
+                 sample_rate: float = 1.0):
+        self.category = category
+        self.rate = rate
+        self.burst = burst if burst is not None else (max(1.0, rate) if rate else None)
+        self.sample_rate = sample_rate
+        self._tokens = self.burst or 0.0
+        self._refilled_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._logger = log.bind(category=category)
+        self.emitted = 0
+        self.suppressed = 0
+        self._pending_suppressed = 0
+
+    def enabled(self, level: str = "DEBUG") -> bool:
+        return log.level(level).no >= _MIN_LEVEL_NO
+
+    def _admit(self) -> bool:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return False
+        if self.rate is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._refilled_at) * self.rate)
+            self._refilled_at = now
+            if self._tokens < 1.0:
+                return False
+            self._tokens -= 1.0
+            return True
+
+    def _emit(self, level: str, level_no: int, message: Union[str, Callable[[], str]], args, kwargs):
+        if level_no < _MIN_LEVEL_NO:
+            return
+        if level_no < _WARNING_NO and not self._admit():
+            self.suppressed += 1
+            self._pending_suppressed += 1
+            return
+        if callable(message):
+            message = message()
+        elif args or kwargs:
+            message = message.format(*args, **kwargs)
+        if self._pending_suppressed:
+            message = f"{message} (此前抑制 {self._pending_suppressed} 条)"
+            self._pending_suppressed = 0
+        self.emitted += 1
+        self._logger.opt(depth=2).log(level, message)
+
+    def debug(self, message: Union[str, Callable[[], str]], *args, **kwargs):
+        self._emit("DEBUG", 10, message, args, kwargs)
+
+    def info(self, message: Union[str, Callable[[], str]], *args, **kwargs):
+        self._emit("INFO", 20, message, args, kwargs)
+
+    def warning(self, message: Union[str, Callable[[], str]], *args, **kwargs):
+        self._emit("WARNING", 30, message, args, kwargs)
+
+    def error(self, message: Union[str, Callable[[], str]], *args, **kwargs):
+        self._emit("ERROR", 40, message, args, kwargs)
+
+
+_category_loggers: Dict[str, CategoryLogger] = {}
+_category_lock = threading.Lock()
+_RATE_LIMITS = _parse_category_settings(Config.LOG_RATE_LIMITS)
+_SAMPLE_RATES = _parse_category_settings(Config.LOG_SAMPLE_RATES)
+
+
+def get_logger(category: str) -> CategoryLogger:
+    """获取类别日志门面（限流与采样按 LOG_RATE_LIMITS / LOG_SAMPLE_RATES 配置）"""
+    logger = _category_loggers.get(category)
+    if logger is None:
+        with _category_lock:
+            logger = _category_loggers.get(category)
+            if logger is None:
+                rate, burst = _parse_rate(_RATE_LIMITS[category]) if category in _RATE_LIMITS else (None, None)
+                sample_rate = float(_SAMPLE_RATES.get(category, 1.0))
+                logger = CategoryLogger(category, rate=rate, burst=burst, sample_rate=sample_rate)
+                _category_loggers[category] = logger
+    return logger
+
+
+def get_log_stats() -> Dict[str, Any]:
+    """各类别的输出与抑制条数"""
+    return {
+        category: {
+            "emitted": logger.emitted,
+            "suppressed": logger.suppressed,
+            "rate": logger.rate,
+            "sample_rate": logger.sample_rate,
+        }
+        for category, logger in _category_loggers.items()
+    }
+
+
 if __name__ == '__main__':
     log.success('[测试log] hello, world')
     log.info('[测试log] hello, world')
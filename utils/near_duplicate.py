@@ -0,0 +1,248 @@
+"""
+近似重复查询索引（本地 MinHash + LSH，不调用向量接口）
+精确匹配缓存无法命中改写、标点或语气词不同的提问（中文输入中很常见）。本模块：
+- 规范化文本（NFKC、小写、去掉标点与空白）后取字符 n-gram，规范化后完全相同的文本直接命中
+- 计算 MinHash 签名，按 band 分桶建立 LSH 索引，只对同桶候选在全文 n-gram 上计算精确 Jaccard 相似度，
+  达到阈值且不同的 n-gram 数不超过上限才算命中（长文本共享开头、只有问题不同时 Jaccard 仍可能很高）
+- 字符 n-gram 对否定词与数字不敏感（“可以”/“不可以”只差一两个 n-gram），
+  因此候选的否定词或数字与查询不一致时直接拒绝
+- 条目按 scope 隔离（例如同一人格与上下文、同一会话），按 LRU 限制条目数
+- 统计查询数、命中数（规范化精确 / 近似）、候选数与候选接受率（通过阈值的 LSH 候选占比）、否定词/数字拒绝数、命中相似度
+索引只保存 文本特征 -> 缓存键 的映射，值本身仍在各自的缓存中；缓存键失效时命中方自行丢弃。
+"""
+import hashlib
+import heapq
+import random
+import re
+import unicodedata
+from collections import Counter, OrderedDict
+from typing import Any, Dict, FrozenSet, List, Optional, Tuple
+
+from config.config import get_config
+
+config = get_config()
+
+_HASH_MASK = (1 << 64) - 1
+# \w 包含中日韩文字，去掉其余的标点、符号与空白
+_NON_WORD_RE = re.compile(r"[\W_]+", re.UNICODE)
+# 参与签名计算的最大 n-gram 数：超出时按哈希值取最小的若干个（bottom-k 采样，覆盖全文而不是只取开头）；
+# 候选校验始终使用全文 n-gram
+MAX_SIGNATURE_SHINGLES = 256
+# 近似重复最多允许的不同 n-gram 数（约两三处小改动），与文本长度无关
+MAX_SHINGLE_DIFFERENCE = 8
+# 每次查询最多校验的候选数（按命中的 band 数排序，模板化文本大量同桶时限制开销）
+MAX_CANDIDATES = 16
+# 否定词与数字：两段文本中这些特征不一致时语义可能相反，不算近似重复
+_NEGATION_RE = re.compile(r"[不没无非别未勿莫否]|\b(?:not|no|never|none|nothing|neither|nor|without)\b|n['’]t\b")
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def normalize_text(text: str) -> str:
+    """NFKC（全角转半角）、小写，去掉标点与空白"""
+    if not text:
+        return ""
+    return _NON_WORD_RE.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def guard_features(text: str) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """提取否定词（排序后的多重集）与数字序列，用于拒绝语义相反的候选"""
+    folded = unicodedata.normalize("NFKC", text or "").lower()
+    return tuple(sorted(_NEGATION_RE.findall(folded))), tuple(_DIGITS_RE.findall(folded))
+
+
+def _shingle_hash(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8", "surrogatepass"), digest_size=8).digest(), "little")
+
+
+def shingles(normalized: str, size: int = 2) -> FrozenSet[str]:
+    """字符 n-gram 集合；短于 n 的文本整体作为一个特征"""
+    if len(normalized) <= size:
+        return frozenset([normalized]) if normalized else frozenset()
+    return frozenset(normalized[i:i + size] for i in range(len(normalized) - size + 1))
+
+
+def jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    if not a or not b:
+        return 0.0
+    intersection = len(a & b)
+    return intersection / (len(a) + len(b) - intersection)
+
+
+class MinHasher:
+    """MinHash 签名：每个特征哈希一次，再用 num_perm 组 (a*h+b) mod 2^64 模拟排列"""
+
+    def __init__(self, num_perm: int = 32, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._perms = [(rng.getrandbits(64) | 1, rng.getrandbits(64)) for _ in range(num_perm)]
+
+    def signature(self, features: FrozenSet[str]) -> Tuple[int, ...]:
+        hashes = [_shingle_hash(f) for f in features]
+        return tuple(min((a * h + b) & _HASH_MASK for h in hashes) for a, b in self._perms)
+
+
+class _Entry:
+    __slots__ = ("scope", "normalized", "features", "guard", "buckets")
+
+    def __init__(self, scope: str, normalized: str, features: FrozenSet[str], guard: tuple, buckets: List[tuple]):
+        self.scope = scope
+        self.normalized = normalized
+        self.features = features
+        self.guard = guard
+        self.buckets = buckets
+
+
+class NearDuplicateIndex:
+    """文本 -> 缓存键 的近似重复索引"""
+
+    def __init__(self, name: str, threshold: Optional[float] = None, num_perm: Optional[int] = None,
+                 bands: Optional[int] = None, max_entries: Optional[int] = None, shingle_size: Optional[int] = None):
+        self.name = name
+        self.threshold = config.NEAR_DUPLICATE_THRESHOLD if threshold is None else threshold
+        self.bands = bands or config.NEAR_DUPLICATE_BANDS
+        self.shingle_size = shingle_size or config.NEAR_DUPLICATE_SHINGLE_SIZE
+        self.max_entries = max_entries or config.NEAR_DUPLICATE_MAX_ENTRIES
+        self.hasher = MinHasher(num_perm or config.NEAR_DUPLICATE_NUM_PERM)
+        if self.hasher.num_perm % self.bands:
+            raise ValueError(f"num_perm({self.hasher.num_perm}) 必须是 bands({self.bands}) 的整数倍")
+        self.rows = self.hasher.num_perm // self.bands
+        # value -> _Entry（LRU 顺序）
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # (scope, 规范化文本) -> value
+        self._exact: Dict[Tuple[str, str], str] = {}
+        # (scope, band, band 签名) -> {value}
+        self._buckets: Dict[tuple, set] = {}
+
+        # 统计
+        self.lookups = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.candidates = 0
+        self.accepted_candidates = 0
+        self.guard_rejects = 0
+        self.stale_hits = 0
+        self._similarity_sum = 0.0
+
+    def _features(self, text: str) -> Tuple[str, FrozenSet[str]]:
+        normalized = normalize_text(text)
+        return normalized, shingles(normalized, self.shingle_size)
+
+    def _bucket_keys(self, scope: str, features: FrozenSet[str]) -> List[tuple]:
+        if len(features) > MAX_SIGNATURE_SHINGLES:
+            # 两段文本按同一哈希采样，重合部分保留同样的 n-gram，签名仍反映全文相似度
+            features = frozenset(heapq.nsmallest(MAX_SIGNATURE_SHINGLES, features, key=_shingle_hash))
+        signature = self.hasher.signature(features)
+        rows = self.rows
+        return [(scope, band, signature[band * rows:(band + 1) * rows]) for band in range(self.bands)]
+
+    def lookup(self, scope: str, text: str) -> Optional[Tuple[str, float]]:
+        """查找近似重复文本对应的缓存键，返回 (value, 相似度) 或 None"""
+        self.lookups += 1
+        normalized, features = self._features(text)
+        if not features:
+            return None
+        value = self._exact.get((scope, normalized))
+        if value is not None:
+            self.exact_hits += 1
+            self._similarity_sum += 1.0
+            self._entries.move_to_end(value)
+            return value, 1.0
+
+        band_matches = Counter()
+        for key in self._bucket_keys(scope, features):
+            band_matches.update(self._buckets.get(key, ()))
+        if len(band_matches) > MAX_CANDIDATES:
+            candidates = heapq.nlargest(MAX_CANDIDATES, band_matches, key=band_matches.__getitem__)
+        else:
+            candidates = band_matches
+        best, best_similarity = None, 0.0
+        guard = None
+        for candidate in candidates:
+            self.candidates += 1
+            entry = self._entries[candidate]
+            similarity = jaccard(features, entry.features)
+            if similarity >= self.threshold and len(features ^ entry.features) <= MAX_SHINGLE_DIFFERENCE:
+                if guard is None:
+                    guard = guard_features(text)
+                if entry.guard != guard:
+                    self.guard_rejects += 1
+                    continue
+                self.accepted_candidates += 1
+                if similarity > best_similarity:
+                    best, best_similarity = candidate, similarity
+        if best is None:
+            return None
+        self.near_hits += 1
+        self._similarity_sum += best_similarity
+        self._entries.move_to_end(best)
+        return best, best_similarity
+
+    def add(self, scope: str, text: str, value: str):
+        """登记 文本 -> 缓存键"""
+        normalized, features = self._features(text)
+        if not features:
+            return
+        self.discard(value)
+        buckets = self._bucket_keys(scope, features)
+        self._entries[value] = _Entry(scope, normalized, features, guard_features(text), buckets)
+        self._exact[(scope, normalized)] = value
+        for key in buckets:
+            self._buckets.setdefault(key, set()).add(value)
+        while len(self._entries) > self.max_entries:
+            self.discard(next(iter(self._entries)))
+
+    def discard(self, value: str):
+        """移除条目（缓存键已失效时调用）"""
+        entry = self._entries.pop(value, None)
+        if entry is None:
+            return
+        if self._exact.get((entry.scope, entry.normalized)) == value:
+            del self._exact[(entry.scope, entry.normalized)]
+        for key in entry.buckets:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(value)
+                if not bucket:
+                    del self._buckets[key]
+
+    def reject(self, value: str):
+        """命中的缓存键已失效：移除条目并计入陈旧命中"""
+        self.stale_hits += 1
+        self.discard(value)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_stats(self) -> Dict[str, Any]:
+        hits = self.exact_hits + self.near_hits
+        return {
+            "entries": len(self._entries),
+            "threshold": self.threshold,
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "hit_rate": f"{(hits / self.lookups * 100) if self.lookups else 0:.1f}%",
+            "candidates": self.candidates,
+            # LSH 候选中通过精确 Jaccard 与否定词/数字校验的比例（衡量 LSH 过滤效果，不代表命中答案的正确率）
+            "candidate_accept_rate": f"{(self.accepted_candidates / self.candidates * 100) if self.candidates else 0:.1f}%",
+            "guard_rejects": self.guard_rejects,
+            "avg_hit_similarity": round(self._similarity_sum / hits, 3) if hits else 0.0,
+            "stale_hits": self.stale_hits,
+        }
+
+
+_indexes: Dict[str, NearDuplicateIndex] = {}
+
+
+def get_near_duplicate_index(name: str) -> NearDuplicateIndex:
+    """获取全局近似重复索引（按名称单例）"""
+    index = _indexes.get(name)
+    if index is None:
+        index = _indexes[name] = NearDuplicateIndex(name)
+    return index
+
+
+def get_near_duplicate_stats() -> Dict[str, Dict[str, Any]]:
+    """获取所有近似重复索引的统计"""
+    return {"enabled": config.NEAR_DUPLICATE_ENABLED,
+            **{name: index.get_stats() for name, index in _indexes.items()}}
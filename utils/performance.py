@@ -2,12 +2,16 @@
 性能监控模块
 用于收集和分析系统性能指标
 """
+from collections import deque
 from dataclasses import dataclass, asdict, field
+from itertools import islice
 from typing import Dict, List, Optional
+import math
+import random
 import time
-import statistics
 from datetime import datetime
 from utils.log import log
+from utils.metrics import get_metrics_registry
 
 
 @dataclass
@@ -19,8 +23,10 @@ class PerformanceMetrics:
     # 各阶段耗时
     memory_retrieval_time: float = 0.0
     memory_cache_hit: bool = False
+    response_cache_hit: bool = False  # 命中精确匹配响应缓存（未请求上游）
     personality_apply_time: float = 0.0
     tool_schema_build_time: float = 0.0
+    pre_llm_time: float = 0.0  # 前置阶段（并发）总耗时
     openai_api_time: float = 0.0
     first_chunk_time: float = 0.0
     tool_execution_time: float = 0.0
@@ -45,12 +51,18 @@ class PerformanceMetrics:
             hit_str = "✓缓存命中" if self.memory_cache_hit else "✗缓存未命中"
             parts.append(f"Memory={self.memory_retrieval_time:.3f}s({hit_str})")
         
+        if self.response_cache_hit:
+            parts.append("✓响应缓存命中")
+        
         if self.personality_apply_time > 0:
             parts.append(f"Personality={self.personality_apply_time:.3f}s")
         
         if self.tool_schema_build_time > 0:
             parts.append(f"ToolSchema={self.tool_schema_build_time:.3f}s")
         
+        if self.pre_llm_time > 0:
+            parts.append(f"前置阶段={self.pre_llm_time:.3f}s")
+        
         if self.openai_api_time > 0:
             parts.append(f"OpenAI={self.openai_api_time:.3f}s")
         
@@ -63,18 +75,215 @@ class PerformanceMetrics:
         return " | ".join(parts)
 
 
+class QuantileSketch:
+    """
+    可合并的分位数草图（对数分桶，DDSketch/HDR风格）
+    - 分位数相对误差不超过 relative_accuracy
+    - 桶数只取决于数值范围，与样本数量无关；写入和查询均不需要保存原始样本
+    - 支持 merge，滚动窗口由多个时间片草图合并得到
+    """
+    __slots__ = ("relative_accuracy", "_gamma", "_log_gamma", "bins", "zero_count",
+                 "count", "sum", "min", "max")
+    
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+    
+    def add(self, value: float):
+        if value <= 0:
+            self.zero_count += 1
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+    
+    def merge(self, other: "QuantileSketch"):
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+    
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return max(self.min, 0.0)
+        cumulative = self.zero_count
+        for index in sorted(self.bins):
+            cumulative += self.bins[index]
+            if cumulative > rank:
+                value = 2 * self._gamma ** index / (self._gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+    
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+
+
+class RollingSketch:
+    """滚动时间窗口：窗口切分为若干时间片，每片一个草图，查询时合并未过期的时间片"""
+    
+    def __init__(self, window_seconds: float, slots: int, relative_accuracy: float = 0.01):
+        self.window_seconds = window_seconds
+        self.slot_seconds = window_seconds / slots
+        self.relative_accuracy = relative_accuracy
+        self._slots: List[Optional[tuple]] = [None] * slots  # (时间片编号, 草图)
+    
+    def add(self, value: float, now: float):
+        slot_id = int(now // self.slot_seconds)
+        index = slot_id % len(self._slots)
+        slot = self._slots[index]
+        if slot is None or slot[0] != slot_id:
+            slot = (slot_id, QuantileSketch(self.relative_accuracy))
+            self._slots[index] = slot
+        slot[1].add(value)
+    
+    def snapshot(self, now: float) -> QuantileSketch:
+        current = int(now // self.slot_seconds)
+        merged = QuantileSketch(self.relative_accuracy)
+        for slot in self._slots:
+            if slot is not None and current - slot[0] < len(self._slots):
+                merged.merge(slot[1])
+        return merged
+
+
+# 滚动窗口: 名称 -> (窗口秒数, 时间片数)
+ROLLING_WINDOWS = {"1m": (60, 6), "5m": (300, 10), "1h": (3600, 12)}
+
+# 统计的指标: 统计名 -> PerformanceMetrics字段
+TRACKED_METRICS = {
+    "total_time": "total_time",
+    "memory_retrieval": "memory_retrieval_time",
+    "openai_api": "openai_api_time",
+    "first_chunk": "first_chunk_time",
+}
+
+
+class _MetricSeries:
+    """单个指标的全量草图 + 各滚动窗口草图"""
+    
+    def __init__(self):
+        self.lifetime = QuantileSketch()
+        self.windows = {name: RollingSketch(seconds, slots) for name, (seconds, slots) in ROLLING_WINDOWS.items()}
+    
+    def add(self, value: float, now: float):
+        self.lifetime.add(value)
+        for window in self.windows.values():
+            window.add(value, now)
+
+
+# OpenMetrics 仪表：聊天请求数、首字节时间与各阶段耗时（按人格与工具使用情况分标签）
+_metrics_registry = get_metrics_registry()
+_chat_requests = _metrics_registry.counter(
+    "yychat_chat_requests", "Chat completion requests", ("personality", "stream", "tool_use")
+)
+_chat_ttft = _metrics_registry.histogram(
+    "yychat_chat_ttft_seconds", "Time to first streamed chunk", ("personality", "tool_use")
+)
+_chat_stage = _metrics_registry.histogram(
+    "yychat_chat_stage_seconds", "Chat request stage latency", ("stage", "personality", "tool_use")
+)
+
+# 导出的阶段: 标签值 -> PerformanceMetrics字段
+EXPORTED_STAGES = {
+    "memory_retrieval": "memory_retrieval_time",
+    "personality": "personality_apply_time",
+    "tool_schema": "tool_schema_build_time",
+    "pre_llm": "pre_llm_time",
+    "llm": "openai_api_time",
+    "tool_execution": "tool_execution_time",
+    "total": "total_time",
+}
+
+
+def _export_metrics(metrics: PerformanceMetrics):
+    """将单次请求的指标写入 OpenMetrics 仪表"""
+    personality = metrics.personality_id or "default"
+    tool_use = "called" if metrics.tool_called else ("enabled" if metrics.use_tools else "disabled")
+    _chat_requests.labels(personality, "true" if metrics.stream else "false", tool_use).inc()
+    if metrics.first_chunk_time > 0:
+        _chat_ttft.labels(personality, tool_use).observe(metrics.first_chunk_time)
+    for stage, field_name in EXPORTED_STAGES.items():
+        value = getattr(metrics, field_name)
+        if value > 0:
+            _chat_stage.labels(stage, personality, tool_use).observe(value)
+
+
+def _format_sketch(sketch: QuantileSketch, full: bool = True) -> Dict[str, str]:
+    result = {
+        "avg": f"{sketch.mean:.3f}s",
+        "median": f"{sketch.quantile(0.5):.3f}s",
+    }
+    if full:
+        result.update({
+            "min": f"{sketch.min:.3f}s",
+            "max": f"{sketch.max:.3f}s",
+            "p95": f"{sketch.quantile(0.95):.3f}s",
+            "p99": f"{sketch.quantile(0.99):.3f}s",
+        })
+    return result
+
+
 class PerformanceMonitor:
-    """性能监控器"""
+    """
+    性能监控器
+    - 明细历史保存在固定大小的环形缓冲区中（按采样率采样）
+    - 聚合统计使用分位数草图，覆盖所有请求；读取统计的开销与历史长度无关
+    """
+    
+    def __init__(self, max_history: int = 1000, sampling_rate: float = 1.0):
+        self._metrics_history: deque = deque(maxlen=max_history)
+        self.sampling_rate = sampling_rate
+        self._init_aggregates()
     
-    def __init__(self, max_history: int = 1000):
-        self._metrics_history: List[PerformanceMetrics] = []
-        self._max_history = max_history
+    def _init_aggregates(self):
         self._cache_hit_count = 0
         self._cache_miss_count = 0
+        self._total_requests = 0
+        self._sampled_requests = 0
+        self._first_timestamp: Optional[float] = None
+        self._last_timestamp: Optional[float] = None
+        self._series = {name: _MetricSeries() for name in TRACKED_METRICS}
+        self._request_windows = {name: RollingSketch(seconds, slots) for name, (seconds, slots) in ROLLING_WINDOWS.items()}
+    
+    @property
+    def _max_history(self) -> int:
+        return self._metrics_history.maxlen
+    
+    @_max_history.setter
+    def _max_history(self, value: int):
+        self._metrics_history = deque(self._metrics_history, maxlen=value)
+    
+    def configure(self, max_history: Optional[int] = None, sampling_rate: Optional[float] = None):
+        """调整历史记录容量与采样率"""
+        if max_history is not None and max_history != self._max_history:
+            self._max_history = max_history
+        if sampling_rate is not None:
+            self.sampling_rate = min(max(sampling_rate, 0.0), 1.0)
     
     def record(self, metrics: PerformanceMetrics, log_enabled: bool = True):
-        """记录性能指标"""
-        self._metrics_history.append(metrics)
+        """记录性能指标（聚合统计覆盖所有请求，明细历史与日志按采样率采样）"""
+        now = time.time()
+        timestamp = metrics.timestamp or now
+        self._total_requests += 1
+        if self._first_timestamp is None:
+            self._first_timestamp = timestamp
+        self._last_timestamp = timestamp
         
         # 统计缓存命中率
         if metrics.memory_retrieval_time > 0:
@@ -83,9 +292,19 @@ class PerformanceMonitor:
             else:
                 self._cache_miss_count += 1
         
-        # 限制历史记录数量
-        if len(self._metrics_history) > self._max_history:
-            self._metrics_history.pop(0)
+        for name, field_name in TRACKED_METRICS.items():
+            value = getattr(metrics, field_name)
+            if name == "total_time" or value > 0:
+                self._series[name].add(value, now)
+        for window in self._request_windows.values():
+            window.add(0.0, now)
+        _export_metrics(metrics)
+        
+        if self.sampling_rate < 1.0 and random.random() >= self.sampling_rate:
+            return
+        self._sampled_requests += 1
+        # 环形缓冲区，超出容量时自动淘汰最旧记录
+        self._metrics_history.append(metrics)
         
         # 可选的日志记录
         if log_enabled:
@@ -93,18 +312,12 @@ class PerformanceMonitor:
     
     def get_statistics(self) -> Dict:
         """获取统计信息"""
-        if not self._metrics_history:
+        if self._total_requests == 0:
             return {
                 "status": "no_data",
                 "message": "暂无性能数据"
             }
         
-        # 计算各项统计
-        total_times = [m.total_time for m in self._metrics_history]
-        memory_times = [m.memory_retrieval_time for m in self._metrics_history if m.memory_retrieval_time > 0]
-        openai_times = [m.openai_api_time for m in self._metrics_history if m.openai_api_time > 0]
-        first_chunk_times = [m.first_chunk_time for m in self._metrics_history if m.first_chunk_time > 0]
-        
         # 缓存命中率
         total_cache_requests = self._cache_hit_count + self._cache_miss_count
         cache_hit_rate = (self._cache_hit_count / total_cache_requests * 100) if total_cache_requests > 0 else 0
@@ -112,20 +325,15 @@ class PerformanceMonitor:
         stats = {
             "status": "ok",
             "summary": {
-                "total_requests": len(self._metrics_history),
+                "total_requests": self._total_requests,
+                "sampled_requests": self._sampled_requests,
+                "sampling_rate": self.sampling_rate,
                 "time_range": {
-                    "from": datetime.fromtimestamp(self._metrics_history[0].timestamp).strftime("%Y-%m-%d %H:%M:%S"),
-                    "to": datetime.fromtimestamp(self._metrics_history[-1].timestamp).strftime("%Y-%m-%d %H:%M:%S")
+                    "from": datetime.fromtimestamp(self._first_timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+                    "to": datetime.fromtimestamp(self._last_timestamp).strftime("%Y-%m-%d %H:%M:%S")
                 }
             },
-            "total_time": {
-                "avg": f"{statistics.mean(total_times):.3f}s",
-                "median": f"{statistics.median(total_times):.3f}s",
-                "min": f"{min(total_times):.3f}s",
-                "max": f"{max(total_times):.3f}s",
-                "p95": f"{self._percentile(total_times, 0.95):.3f}s",
-                "p99": f"{self._percentile(total_times, 0.99):.3f}s"
-            },
+            "total_time": _format_sketch(self._series["total_time"].lifetime),
             "cache": {
                 "hit_count": self._cache_hit_count,
                 "miss_count": self._cache_miss_count,
@@ -133,33 +341,33 @@ class PerformanceMonitor:
             }
         }
         
-        # 添加Memory统计
-        if memory_times:
-            stats["memory_retrieval"] = {
-                "avg": f"{statistics.mean(memory_times):.3f}s",
-                "median": f"{statistics.median(memory_times):.3f}s",
-                "min": f"{min(memory_times):.3f}s",
-                "max": f"{max(memory_times):.3f}s"
-            }
-        
-        # 添加OpenAI API统计
-        if openai_times:
-            stats["openai_api"] = {
-                "avg": f"{statistics.mean(openai_times):.3f}s",
-                "median": f"{statistics.median(openai_times):.3f}s",
-                "min": f"{min(openai_times):.3f}s",
-                "max": f"{max(openai_times):.3f}s"
-            }
-        
-        # 添加首字节统计
-        if first_chunk_times:
-            stats["first_chunk"] = {
-                "avg": f"{statistics.mean(first_chunk_times):.3f}s",
-                "median": f"{statistics.median(first_chunk_times):.3f}s"
-            }
+        # 添加Memory、OpenAI API与首字节统计
+        for name in ("memory_retrieval", "openai_api", "first_chunk"):
+            sketch = self._series[name].lifetime
+            if sketch.count:
+                stats[name] = _format_sketch(sketch, full=name != "first_chunk")
         
+        stats["windows"] = self.get_window_statistics()
         return stats
     
+    def get_window_statistics(self) -> Dict:
+        """获取滚动窗口（1m/5m/1h）统计"""
+        now = time.time()
+        windows = {}
+        for name, (seconds, _) in ROLLING_WINDOWS.items():
+            requests = self._request_windows[name].snapshot(now).count
+            window = {"requests": requests, "rps": round(requests / seconds, 3)}
+            for metric in TRACKED_METRICS:
+                sketch = self._series[metric].windows[name].snapshot(now)
+                if sketch.count:
+                    window[metric] = {
+                        "p50": f"{sketch.quantile(0.5):.3f}s",
+                        "p95": f"{sketch.quantile(0.95):.3f}s",
+                        "p99": f"{sketch.quantile(0.99):.3f}s",
+                    }
+            windows[name] = window
+        return windows
+    
     def _percentile(self, data: List[float], percentile: float) -> float:
         """计算百分位数"""
         sorted_data = sorted(data)
@@ -170,14 +378,14 @@ class PerformanceMonitor:
     
     def get_recent_metrics(self, count: int = 10) -> List[Dict]:
         """获取最近的指标"""
-        recent = self._metrics_history[-count:]
-        return [m.to_dict() for m in recent]
+        count = max(0, min(count, len(self._metrics_history)))
+        recent = list(islice(reversed(self._metrics_history), count))
+        return [m.to_dict() for m in reversed(recent)]
     
     def clear(self):
         """清除历史数据"""
         self._metrics_history.clear()
-        self._cache_hit_count = 0
-        self._cache_miss_count = 0
+        self._init_aggregates()
         log.info("[PERF] 性能监控数据已清除")
 
 
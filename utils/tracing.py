@@ -0,0 +1,518 @@
+"""
+轻量级进程内请求追踪
+- span 通过 contextvars 传递父子关系，asyncio 任务创建时自动继承上下文；
+  线程池中执行的函数使用 wrap_context 携带当前上下文
+- 采样在根 span 决定，未采样的请求整条链路都是无开销的空 span
+- span 结束后放入队列，由后台线程批量导出到滚动 JSONL 文件或 OTLP/HTTP(JSON) 本地采集器
+"""
+import contextvars
+import functools
+import json
+import os
+import queue
+import random
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from config.config import get_config
+from utils.log import log
+
+config = get_config()
+
+_current_span: contextvars.ContextVar = contextvars.ContextVar("yychat_current_span", default=None)
+
+
+def _new_id(nbytes: int) -> str:
+    return os.urandom(nbytes).hex()
+
+
+def _restore_current_span(token: contextvars.Token):
+    """恢复激活前的当前span；在其他上下文中结束（例如流式响应由另一个任务消费）时无法reset，直接设回父span"""
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        previous = token.old_value
+        _current_span.set(None if previous is contextvars.Token.MISSING else previous)
+
+
+class Span:
+    """一次操作的耗时记录，可用作同步或异步上下文管理器"""
+    __slots__ = ("tracer", "name", "trace_id", "span_id", "parent_id", "attributes", "events",
+                 "start_time", "end_time", "_start_perf", "duration", "status", "error", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, trace_id: str, parent_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.tracer = tracer
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = _new_id(8)
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes) if attributes else {}
+        self.events: List[Dict[str, Any]] = []
+        self.start_time = time.time()
+        self._start_perf = time.perf_counter()
+        self.end_time: Optional[float] = None
+        self.duration: Optional[float] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self._token = None
+
+    @property
+    def recording(self) -> bool:
+        return True
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes):
+        self.events.append({
+            "name": name,
+            "time": time.time(),
+            "offset": time.perf_counter() - self._start_perf,
+            "attributes": attributes,
+        })
+
+    def record_exception(self, exc: BaseException):
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def end(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start_perf
+        self.end_time = self.start_time + self.duration
+        self.tracer._on_end(self)
+
+    # ---------- 上下文管理 ----------
+
+    def activate(self):
+        """设为当前span（不结束）"""
+        self._token = _current_span.set(self)
+
+    def deactivate(self):
+        if self._token is not None:
+            _restore_current_span(self._token)
+            self._token = None
+
+    def __enter__(self):
+        self.activate()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is not None:
+            self.record_exception(exc)
+        self.deactivate()
+        self.end()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "events": self.events,
+        }
+
+
+class _NoopSpan:
+    """未启用或未采样时使用的空span，子span同样为空"""
+    __slots__ = ()
+    name = ""
+    trace_id = None
+    span_id = None
+    attributes: Dict[str, Any] = {}
+    duration = None
+
+    @property
+    def recording(self) -> bool:
+        return False
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def add_event(self, name, **attributes):
+        pass
+
+    def record_exception(self, exc):
+        pass
+
+    def end(self):
+        pass
+
+    def activate(self):
+        pass
+
+    def deactivate(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _UnsampledSpan(_NoopSpan):
+    """未采样链路中的空span：每次使用一个实例，激活时设为当前span，子span据此同样不记录"""
+    __slots__ = ("_token",)
+
+    def __init__(self):
+        self._token = None
+
+    def activate(self):
+        self._token = _current_span.set(self)
+
+    def deactivate(self):
+        if self._token is not None:
+            _restore_current_span(self._token)
+            self._token = None
+
+    def __enter__(self):
+        self.activate()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.deactivate()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class SpanExporter:
+    """后台批量导出：span 结束时只入队，由导出线程写出"""
+
+    def __init__(self, batch_size: int = 256, flush_interval: float = 1.0, max_queue: int = 10000):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue)
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def export(self, span: Span):
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+                    self._thread.start()
+
+    def _drain(self, block: bool) -> List[Span]:
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=self.flush_interval) if block else self._queue.get_nowait())
+            while len(batch) < self.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while not self._stopped.is_set():
+            batch = self._drain(block=True)
+            if batch:
+                self._write(batch)
+
+    def _write(self, batch: List[Span]):
+        try:
+            self.write_batch(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            log.warning(f"追踪数据导出失败({len(batch)}条): {e}")
+
+    def write_batch(self, spans: List[Span]):
+        raise NotImplementedError
+
+    def flush(self):
+        """同步写出队列中剩余的span"""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.flush_interval + 1)
+            self._thread = None
+        self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "exporter": type(self).__name__,
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped,
+            "failed": self.failed,
+        }
+
+
+class JsonlSpanExporter(SpanExporter):
+    """写入按大小滚动的 JSONL 文件（traces.jsonl, traces.jsonl.1, ...）"""
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024, backup_count: int = 5, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _rotate(self):
+        if self.backup_count <= 0:
+            os.remove(self.path)
+            return
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        os.replace(self.path, f"{self.path}.1")
+
+    def write_batch(self, spans: List[Span]):
+        data = "".join(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n" for span in spans)
+        if self.max_bytes > 0 and os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """以 OTLP/HTTP JSON 格式发送到本地采集器（如 OpenTelemetry Collector 的 :4318/v1/traces）"""
+
+    def __init__(self, endpoint: str, service_name: str = "yychat", timeout: float = 5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+        self._client = None
+
+    def build_payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "yychat.tracing"},
+                    "spans": [self._otlp_span(span) for span in spans],
+                }],
+            }]
+        }
+
+    @staticmethod
+    def _otlp_span(span: Span) -> Dict[str, Any]:
+        record = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(int(span.start_time * 1e9)),
+            "endTimeUnixNano": str(int(span.end_time * 1e9)),
+            "attributes": _otlp_attributes(span.attributes),
+            "events": [
+                {"name": e["name"], "timeUnixNano": str(int(e["time"] * 1e9)),
+                 "attributes": _otlp_attributes(e["attributes"])}
+                for e in span.events
+            ],
+            "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+        }
+        if span.parent_id:
+            record["parentSpanId"] = span.parent_id
+        return record
+
+    def write_batch(self, spans: List[Span]):
+        if self._client is None:
+            import httpx
+            self._client = httpx.Client(timeout=self.timeout)
+        response = self._client.post(self.endpoint, json=self.build_payload(spans))
+        response.raise_for_status()
+
+    def shutdown(self):
+        super().shutdown()
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+class Tracer:
+    """创建span并交给导出器"""
+
+    def __init__(self, exporter: Optional[SpanExporter] = None, sample_rate: float = 1.0, enabled: bool = True):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.enabled = enabled
+        self.started = 0
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None, parent=None,
+                   allow_root: bool = True):
+        """创建span（不设为当前span）
+
+        parent 缺省时使用当前上下文中的span；allow_root=False 时没有父span则不记录，
+        用于心跳、音频分片等只在请求链路中才有意义的高频操作
+        """
+        if not self.enabled:
+            return NOOP_SPAN
+        parent = _current_span.get() if parent is None else parent
+        if parent is NOOP_SPAN or (parent is None and not allow_root):
+            return NOOP_SPAN
+        if isinstance(parent, _UnsampledSpan):
+            return _UnsampledSpan()
+        if parent is None:
+            # 根span决定整条链路是否采样
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                return _UnsampledSpan()
+            trace_id, parent_id = _new_id(16), None
+        else:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+        self.started += 1
+        return Span(self, name, trace_id, parent_id, attributes)
+
+    def span(self, name: str, allow_root: bool = True, **attributes):
+        """创建span，作为上下文管理器使用时设为当前span"""
+        return self.start_span(name, attributes, allow_root=allow_root)
+
+    def _on_end(self, span: Span):
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {"enabled": self.enabled, "sample_rate": self.sample_rate, "spans_started": self.started}
+        if self.exporter is not None:
+            stats.update(self.exporter.get_stats())
+        return stats
+
+
+def current_span():
+    """获取当前上下文中的span（没有时返回空span）"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def detach_current_span():
+    """清除当前上下文中的span：常驻后台任务调用，避免继承创建它的请求链路"""
+    _current_span.set(None)
+
+
+def wrap_context(func: Callable) -> Callable:
+    """携带当前上下文（含当前span）在线程池中执行"""
+    ctx = contextvars.copy_context()
+    return functools.partial(ctx.run, func)
+
+
+def traced(name: Optional[str] = None):
+    """异步函数装饰器：每次调用包裹在一个span中"""
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with get_tracer().span(span_name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _create_exporter() -> Optional[SpanExporter]:
+    exporter = getattr(config, "TRACING_EXPORTER", "jsonl").lower()
+    if exporter == "otlp":
+        return OtlpHttpSpanExporter(config.TRACING_OTLP_ENDPOINT)
+    if exporter == "jsonl":
+        return JsonlSpanExporter(
+            config.TRACING_JSONL_PATH,
+            max_bytes=config.TRACING_JSONL_MAX_BYTES,
+            backup_count=config.TRACING_JSONL_BACKUP_COUNT,
+        )
+    return None
+
+
+# 全局追踪器
+_tracer: Optional[Tracer] = None
+
+
+def get_tracer() -> Tracer:
+    """获取全局追踪器（按配置创建，未启用时所有span均为空span）"""
+    global _tracer
+    if _tracer is None:
+        enabled = getattr(config, "TRACING_ENABLED", False)
+        try:
+            exporter = _create_exporter() if enabled else None
+        except Exception as e:
+            log.error(f"追踪导出器初始化失败，追踪已禁用: {e}")
+            enabled, exporter = False, None
+        _tracer = Tracer(exporter, sample_rate=getattr(config, "TRACING_SAMPLE_RATE", 1.0), enabled=enabled)
+        if enabled:
+            log.info(f"✅ 请求追踪已启用 (导出: {config.TRACING_EXPORTER}, 采样率: {_tracer.sample_rate*100:.0f}%)")
+    return _tracer
+
+
+def set_tracer(tracer: Optional[Tracer]):
+    """替换全局追踪器（None 表示下次按配置重建）"""
+    global _tracer
+    _tracer = tracer
+
+
+def shutdown_tracer():
+    """写出剩余span并停止导出线程"""
+    if _tracer is not None:
+        _tracer.shutdown()
@@ -0,0 +1,283 @@
+"""
+生产流量录制（可选，默认关闭）
+- ASGI 中间件录制 /v1/chat/completions 请求与 /ws/chat 的上下行消息序列及时间信息，写入滚动 JSONL
+- 录制前匿名化：文本只保留长度、加盐哈希与是否以中文为主，ID 只保留加盐哈希，音频只保留 base64 长度；
+  相同内容得到相同哈希，回放时据此生成同长度的确定性文本，保留重复/缓存命中的流量形态
+- 写出由后台线程批量完成，请求路径上只做匿名化与入队
+回放见 benchmarks/replay_traffic.py
+"""
+import hashlib
+import json
+import os
+import random
+import secrets
+import time
+from typing import Any, Dict, List, Optional
+
+from config.config import get_config
+from utils.log import log
+from utils.tracing import JsonlSpanExporter
+
+config = get_config()
+
+# 原样保留的字段（枚举类取值，不含用户内容）
+KEEP_KEYS = {
+    "type", "role", "model", "scenario", "command", "format", "personality_id", "finish_reason", "voice",
+    "response_format",
+}
+# 只保留哈希的标识字段（消息中的 name 是参与者名称，同样视为标识）
+ID_KEYS = {
+    "user", "conversation_id", "session_id", "message_id", "client_id", "item_id", "tool_call_id", "id", "name",
+}
+# 其下的 name 为工具/函数名，原样保留
+TOOL_KEYS = {"function", "functions", "function_call"}
+TOOL_ROLES = {"tool", "function"}
+# 只保留长度的音频字段
+AUDIO_KEYS = {"audio", "audio_base64", "audio_b64", "audio_data", "data"}
+
+CAPTURE_HTTP_PATHS = ("/v1/chat/completions",)
+CAPTURE_WS_PATHS = ("/ws/chat",)
+
+
+def _is_cjk_text(text: str) -> bool:
+    sample = text[:64]
+    return sum(1 for ch in sample if "一" <= ch <= "鿿") * 2 >= len(sample) > 0
+
+
+class Anonymizer:
+    """按字段类型匿名化任意 JSON 结构"""
+
+    def __init__(self, salt: str = ""):
+        self.salt = (salt or secrets.token_hex(16)).encode("utf-8")
+
+    def digest(self, value: str) -> str:
+        return hashlib.blake2b(value.encode("utf-8"), key=self.salt[:64], digest_size=8).hexdigest()
+
+    def text(self, value: str) -> Dict[str, Any]:
+        return {"len": len(value), "h": self.digest(value), "cjk": _is_cjk_text(value)}
+
+    def anonymize(self, value: Any, key: Optional[str] = None) -> Any:
+        if isinstance(value, dict):
+            keep_name = key in TOOL_KEYS or value.get("role") in TOOL_ROLES
+            return {k: v if k == "name" and keep_name else self.anonymize(v, k) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self.anonymize(item, key) for item in value]
+        if not isinstance(value, str):
+            return value
+        if key in KEEP_KEYS:
+            return value
+        if key in ID_KEYS or (key and key.endswith("_id")):
+            return f"h:{self.digest(value)}"
+        if key in AUDIO_KEYS:
+            return {"b64len": len(value)}
+        return self.text(value)
+
+
+class CaptureWriter(JsonlSpanExporter):
+    """复用追踪导出器的后台批量写出与按大小滚动，写出的是录制记录字典"""
+
+    def write_batch(self, records: List[Dict[str, Any]]):
+        data = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+        if self.max_bytes > 0 and os.path.exists(self.path) and os.path.getsize(self.path) + len(data) > self.max_bytes:
+            self._rotate()
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(data)
+
+
+class TrafficRecorder:
+    """录制器：采样、匿名化并入队"""
+
+    def __init__(self, writer: CaptureWriter, sample_rate: float = 1.0, salt: str = "",
+                 max_ws_events: int = 5000):
+        self.writer = writer
+        self.sample_rate = sample_rate
+        self.max_ws_events = max_ws_events
+        self.anonymizer = Anonymizer(salt)
+        self.http_recorded = 0
+        self.ws_recorded = 0
+
+    def should_sample(self) -> bool:
+        return self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def record_http(self, path: str, started: float, body: bytes, status: int, ttfb: Optional[float],
+                    duration: float, chunks: int, size: int):
+        try:
+            request = json.loads(body) if body else {}
+        except ValueError:
+            request = {"unparsed": {"len": len(body)}}
+        self.writer.export({
+            "kind": "http",
+            "ts": round(started, 6),
+            "path": path,
+            "request": self.anonymizer.anonymize(request),
+            "status": status,
+            "ttfb": round(ttfb, 6) if ttfb is not None else None,
+            "duration": round(duration, 6),
+            "chunks": chunks,
+            "bytes": size,
+        })
+        self.http_recorded += 1
+
+    def ws_event(self, offset: float, direction: str, text: Optional[str]) -> Dict[str, Any]:
+        """单条 WebSocket 消息 -> 录制事件（下行只保留类型与大小）"""
+        event: Dict[str, Any] = {"t": round(offset, 6), "dir": direction, "bytes": len(text or "")}
+        try:
+            message = json.loads(text) if text else None
+        except ValueError:
+            message = None
+        if not isinstance(message, dict):
+            return event
+        if direction == "in":
+            event["msg"] = self.anonymizer.anonymize(message)
+        else:
+            event["type"] = message.get("type")
+        return event
+
+    def record_ws(self, path: str, started: float, events: List[Dict[str, Any]], truncated: bool):
+        self.writer.export({
+            "kind": "ws",
+            "ts": round(started, 6),
+            "path": path,
+            "duration": round(events[-1]["t"], 6) if events else 0.0,
+            "truncated": truncated,
+            "events": events,
+        })
+        self.ws_recorded += 1
+
+    def shutdown(self):
+        self.writer.shutdown()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "path": self.writer.path,
+            "sample_rate": self.sample_rate,
+            "http_recorded": self.http_recorded,
+            "ws_recorded": self.ws_recorded,
+            **self.writer.get_stats(),
+        }
+
+
+class TrafficCaptureMiddleware:
+    """
+    纯 ASGI 中间件（不缓冲响应体，流式响应照常逐块下发）
+    只在 get_traffic_recorder() 返回录制器时生效
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        recorder = get_traffic_recorder()
+        path = scope.get("path", "")
+        if recorder is None or not recorder.should_sample():
+            return await self.app(scope, receive, send)
+        if scope["type"] == "http" and scope.get("method") == "POST" and path in CAPTURE_HTTP_PATHS:
+            return await self._capture_http(recorder, path, scope, receive, send)
+        if scope["type"] == "websocket" and path in CAPTURE_WS_PATHS:
+            return await self._capture_ws(recorder, path, scope, receive, send)
+        return await self.app(scope, receive, send)
+
+    async def _capture_http(self, recorder: TrafficRecorder, path: str, scope, receive, send):
+        started_wall, started = time.time(), time.perf_counter()
+        body_parts: List[bytes] = []
+        state = {"status": 0, "ttfb": None, "chunks": 0, "bytes": 0}
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                body_parts.append(message.get("body", b""))
+            return message
+
+        async def capture_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body" and message.get("body"):
+                if state["ttfb"] is None:
+                    state["ttfb"] = time.perf_counter() - started
+                state["chunks"] += 1
+                state["bytes"] += len(message["body"])
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            try:
+                recorder.record_http(path, started_wall, b"".join(body_parts), state["status"], state["ttfb"],
+                                     time.perf_counter() - started, state["chunks"], state["bytes"])
+            except Exception as e:
+                log.warning(f"流量录制失败(http): {e}")
+
+    async def _capture_ws(self, recorder: TrafficRecorder, path: str, scope, receive, send):
+        started_wall, started = time.time(), time.perf_counter()
+        events: List[Dict[str, Any]] = []
+        truncated = False
+
+        def add(direction: str, text: Optional[str]):
+            nonlocal truncated
+            if len(events) >= recorder.max_ws_events:
+                truncated = True
+                return
+            try:
+                events.append(recorder.ws_event(time.perf_counter() - started, direction, text))
+            except Exception as e:
+                log.warning(f"流量录制失败(ws): {e}")
+
+        async def capture_receive():
+            message = await receive()
+            if message["type"] == "websocket.receive":
+                add("in", message.get("text"))
+            return message
+
+        async def capture_send(message):
+            if message["type"] == "websocket.send":
+                add("out", message.get("text"))
+            await send(message)
+
+        try:
+            await self.app(scope, capture_receive, capture_send)
+        finally:
+            try:
+                recorder.record_ws(path, started_wall, events, truncated)
+            except Exception as e:
+                log.warning(f"流量录制失败(ws): {e}")
+
+
+# 全局录制器
+_recorder: Optional[TrafficRecorder] = None
+_initialized = False
+
+
+def get_traffic_recorder() -> Optional[TrafficRecorder]:
+    """获取全局录制器（TRAFFIC_CAPTURE_ENABLED 关闭时返回 None）"""
+    global _recorder, _initialized
+    if not _initialized:
+        _initialized = True
+        if getattr(config, "TRAFFIC_CAPTURE_ENABLED", False):
+            try:
+                writer = CaptureWriter(config.TRAFFIC_CAPTURE_PATH, max_bytes=config.TRAFFIC_CAPTURE_MAX_BYTES,
+                                       backup_count=config.TRAFFIC_CAPTURE_BACKUP_COUNT)
+                _recorder = TrafficRecorder(writer, sample_rate=config.TRAFFIC_CAPTURE_SAMPLE_RATE,
+                                            salt=config.TRAFFIC_CAPTURE_SALT,
+                                            max_ws_events=config.TRAFFIC_CAPTURE_MAX_WS_EVENTS)
+                log.info(f"✅ 流量录制已启用 (文件: {config.TRAFFIC_CAPTURE_PATH}, 采样率: {_recorder.sample_rate*100:.0f}%)")
+            except Exception as e:
+                log.error(f"流量录制初始化失败，录制已禁用: {e}")
+    return _recorder
+
+
+def set_traffic_recorder(recorder: Optional[TrafficRecorder]):
+    """替换全局录制器（测试用；None 表示禁用）"""
+    global _recorder, _initialized
+    _recorder, _initialized = recorder, True
+
+
+def shutdown_traffic_recorder():
+    """写出剩余记录并停止写出线程"""
+    if _recorder is not None:
+        _recorder.shutdown()
+
+
+def get_traffic_capture_stats() -> Dict[str, Any]:
+    recorder = get_traffic_recorder()
+    return recorder.get_stats() if recorder else {"enabled": False}